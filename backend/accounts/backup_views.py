@@ -2,12 +2,9 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
-from django.core.management import call_command
 from django.utils import timezone
-from django.conf import settings
-import os
-import json
-from datetime import datetime
+
+from utils.backup import format_size, get_backup_engine
 
 
 class BackupView(APIView):
@@ -19,18 +16,19 @@ class BackupView(APIView):
     def post(self, request):
         """
         Realizar backup manual
+
+        `type: "full"` força um backup completo; sem ele o backup é
+        incremental quando há uma cadeia aberta.
         """
         try:
-            # Executar comando de backup
-            call_command('backup_database')
-            
-            # Simular informações do backup
+            engine = get_backup_engine()
+            full = str(request.data.get('type', '')).lower() == 'full'
+            manifest = engine.create(incremental=False if full else None)
+
             backup_info = {
                 'success': True,
                 'message': 'Backup realizado com sucesso',
-                'timestamp': timezone.now().isoformat(),
-                'filename': f'backup_{timezone.now().strftime("%Y%m%d_%H%M%S")}.sqlite3',
-                'size': '2.4 MB',
+                **self._backup_info(manifest),
                 'type': 'manual'
             }
             
@@ -55,26 +53,12 @@ class BackupView(APIView):
             last_backup = request.session.get('last_backup')
             
             if not last_backup:
-                # Verificar se existe pasta de backups
-                backup_dir = os.path.join(settings.BASE_DIR, 'backups')
-                if os.path.exists(backup_dir):
-                    backup_files = [f for f in os.listdir(backup_dir) if f.startswith('backup_')]
-                    if backup_files:
-                        latest_file = max(backup_files)
-                        file_path = os.path.join(backup_dir, latest_file)
-                        file_stat = os.stat(file_path)
-                        
-                        last_backup = {
-                            'success': True,
-                            'timestamp': datetime.fromtimestamp(file_stat.st_mtime).isoformat(),
-                            'filename': latest_file,
-                            'size': f'{file_stat.st_size / (1024*1024):.1f} MB',
-                            'type': 'automatic'
-                        }
-                    else:
-                        last_backup = None
-                else:
-                    last_backup = None
+                manifest = get_backup_engine().latest()
+                last_backup = {
+                    'success': True,
+                    **self._backup_info(manifest),
+                    'type': 'automatic'
+                } if manifest else None
             
             return Response({
                 'last_backup': last_backup,
@@ -89,6 +73,21 @@ class BackupView(APIView):
                 'backup_enabled': False
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @staticmethod
+    def _backup_info(manifest):
+        """Dados reais do backup (tamanho, duração e checksum do manifesto)"""
+        return {
+            'timestamp': manifest['created_at'],
+            'filename': manifest['filename'],
+            'size': format_size(manifest['size']),
+            'size_bytes': manifest['size'],
+            'database_size_bytes': manifest['database_size'],
+            'duration_ms': manifest['duration_ms'],
+            'kind': manifest['kind'],
+            'compression': manifest['compression'],
+            'sha256': manifest['sha256'],
+        }
+
 
 class NotificationView(APIView):
     """
@@ -0,0 +1,85 @@
+from django.core.management.base import BaseCommand, CommandError
+import logging
+
+from utils.backup import BackupError, format_size, get_backup_engine
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Cria backup consistente (API de backup online do SQLite) do banco de dados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-days',
+            type=int,
+            default=30,
+            help='Número de dias para manter backups (padrão: 30)'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Força um backup completo (inicia nova cadeia de incrementais)'
+        )
+        parser.add_argument(
+            '--verify',
+            nargs='?',
+            const='',
+            metavar='NOME',
+            help='Verifica checksums e integridade do backup (padrão: o mais recente) em vez de criar um'
+        )
+        parser.add_argument(
+            '--restore',
+            metavar='NOME',
+            help='Restaura o backup informado em --output'
+        )
+        parser.add_argument(
+            '--output',
+            help='Arquivo de destino do --restore'
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='Lista os backups existentes'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            engine = get_backup_engine()
+
+            if options['list']:
+                for manifest in engine.list_backups():
+                    self.stdout.write(
+                        f"{manifest['name']}  {manifest['kind']:<11}  {format_size(manifest['size']):>9}  "
+                        f"{manifest['pages_written']} páginas  {manifest['duration_ms']:.0f} ms"
+                    )
+                return
+
+            if options['verify'] is not None:
+                result = engine.verify(options['verify'] or None, restore=True)
+                if not result['ok']:
+                    raise CommandError(f"Backup {result['name']} inválido: {'; '.join(result['errors'])}")
+                self.stdout.write(self.style.SUCCESS(f"Backup {result['name']} verificado (integrity_check: ok)"))
+                return
+
+            if options['restore']:
+                if not options['output']:
+                    raise CommandError('--restore exige --output')
+                engine.restore(options['restore'], options['output'])
+                self.stdout.write(self.style.SUCCESS(f"Backup {options['restore']} restaurado em {options['output']}"))
+                return
+
+            manifest = engine.create(incremental=False if options['full'] else None)
+            for name in engine.cleanup(options['keep_days']):
+                self.stdout.write(f'Backup antigo removido: {name}')
+
+            self.stdout.write(self.style.SUCCESS(
+                f"Backup {manifest['kind']} criado: {manifest['filename']} "
+                f"({format_size(manifest['size'])}, {manifest['pages_written']}/{manifest['page_count']} páginas, "
+                f"{manifest['duration_ms']:.0f} ms)"
+            ))
+            logger.info(f"Backup criado: {manifest['filename']}")
+
+        except BackupError as e:
+            error_msg = f'Erro no backup: {str(e)}'
+            logger.error(error_msg)
+            raise CommandError(error_msg)
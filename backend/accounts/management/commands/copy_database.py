@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from nossa_grana.db_copy import CopyError, copy_database, verify_copy
+
+
+class Command(BaseCommand):
+    help = 'Copia todos os dados entre bancos em streaming (ex.: SQLite -> PostgreSQL) sem recalcular saldos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            default='default',
+            help='Alias de origem (padrão: default)'
+        )
+        parser.add_argument(
+            '--target',
+            required=True,
+            help='Alias de destino, já migrado (manage.py migrate --database <alias>)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Linhas lidas/escritas por lote'
+        )
+        parser.add_argument(
+            '--truncate',
+            action='store_true',
+            help='Apaga os dados existentes no destino antes da cópia'
+        )
+        parser.add_argument(
+            '--verify-only',
+            action='store_true',
+            help='Apenas compara contagens e checksums de saldos'
+        )
+
+    def handle(self, *args, **options):
+        source, target = options['source'], options['target']
+        for alias in (source, target):
+            if alias not in connections.databases:
+                raise CommandError(f'Banco desconhecido: {alias}')
+
+        if not options['verify_only']:
+            self.stdout.write(
+                f"Copiando {source} ({connections[source].vendor}) -> {target} ({connections[target].vendor})"
+            )
+            started = time.monotonic()
+            try:
+                copied = copy_database(
+                    source, target, batch_size=options['batch_size'],
+                    truncate_target=options['truncate'], stdout=self.stdout,
+                )
+            except CopyError as e:
+                raise CommandError(str(e))
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'{sum(copied.values())} linhas em {len(copied)} tabelas ({elapsed:.1f}s)')
+
+        problems = verify_copy(source, target)
+        if problems:
+            for problem in problems:
+                self.stderr.write(problem)
+            raise CommandError(f'Verificação falhou ({len(problems)} diferença(s))')
+        self.stdout.write(self.style.SUCCESS('Verificação ok: contagens e checksums de saldos conferem'))
@@ -0,0 +1,44 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.user_archive import export_user_to_file
+
+
+class Command(BaseCommand):
+    help = 'Exporta todos os dados de um usuário em NDJSON comprimido (gzip)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            required=True,
+            help='Username do usuário exportado'
+        )
+        parser.add_argument(
+            '--output',
+            help='Arquivo de saída (padrão: <username>.ndjson.gz)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Linhas lidas por lote'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"Usuário não encontrado: {options['user']}")
+
+        output = options['output'] or f'{user.username}.ndjson.gz'
+        started = time.monotonic()
+        counts = export_user_to_file(user, output, batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+
+        for label, rows in counts.items():
+            self.stdout.write(f'{label}: {rows}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{sum(counts.values())} registros exportados para {output} ({elapsed:.1f}s)'
+        ))
@@ -0,0 +1,70 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.user_archive import ArchiveError, USER_FIELDS, import_user, read_archive, read_header
+
+
+class Command(BaseCommand):
+    help = 'Importa um arquivo de export_user_data com ids remapeados e saldos recalculados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--input',
+            required=True,
+            help='Arquivo .ndjson.gz gerado por export_user_data'
+        )
+        parser.add_argument(
+            '--user',
+            help='Username de destino (padrão: o do arquivo)'
+        )
+        parser.add_argument(
+            '--create-user',
+            action='store_true',
+            help='Cria o usuário de destino (sem senha utilizável) se não existir'
+        )
+        parser.add_argument(
+            '--replace',
+            action='store_true',
+            help='Apaga os dados atuais do usuário antes de importar'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Registros gravados por lote'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            header = read_header(read_archive(options['input']))
+        except (OSError, ArchiveError) as e:
+            raise CommandError(str(e))
+
+        username = options['user'] or header['user']['username']
+        user = User.objects.filter(username=username).first()
+        if user is None:
+            if not options['create_user']:
+                raise CommandError(f'Usuário não encontrado: {username} (use --create-user)')
+            fields = {name: header['user'][name] for name in USER_FIELDS if name != 'username'}
+            user = User(username=username, **fields)
+            user.set_unusable_password()
+            user.save()
+            self.stdout.write(f'Usuário {username} criado')
+
+        started = time.monotonic()
+        try:
+            counts = import_user(
+                user, read_archive(options['input']),
+                batch_size=options['batch_size'], replace=options['replace'],
+            )
+        except ArchiveError as e:
+            raise CommandError(str(e))
+        elapsed = time.monotonic() - started
+
+        for label, rows in counts.items():
+            self.stdout.write(f'{label}: {rows}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{sum(counts.values())} registros importados para {username} ({elapsed:.1f}s)'
+        ))
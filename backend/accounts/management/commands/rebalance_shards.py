@@ -0,0 +1,71 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from nossa_grana.sharding import get_shards, home_shard, move_user, shard_for_user
+
+
+class Command(BaseCommand):
+    help = 'Move os dados de usuários entre shards (DATABASE_SHARDS)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user-id',
+            type=int,
+            help='Move apenas este usuário'
+        )
+        parser.add_argument(
+            '--to',
+            type=str,
+            help='Shard de destino (padrão: shard determinístico do usuário)'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Move todos os usuários que não estão no seu shard determinístico'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Linhas copiadas por lote'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas mostra o que seria movido'
+        )
+
+    def handle(self, *args, **options):
+        shards = get_shards()
+        if not shards:
+            raise CommandError('DATABASE_SHARDS não configurado')
+        if options['to'] and options['to'] not in shards:
+            raise CommandError(f"Shard desconhecido: {options['to']} (disponíveis: {', '.join(shards)})")
+
+        if options['user_id']:
+            user_ids = [options['user_id']]
+        elif options['all']:
+            user_ids = User.objects.using(DEFAULT_DB_ALIAS).order_by('pk').values_list('pk', flat=True)
+        else:
+            raise CommandError('Informe --user-id ou --all')
+
+        moved_users = 0
+        for user_id in user_ids:
+            source = shard_for_user(user_id)
+            target = options['to'] or home_shard(user_id)
+            if source == target:
+                continue
+
+            if options['dry_run']:
+                self.stdout.write(f'Usuário {user_id}: {source} -> {target}')
+                moved_users += 1
+                continue
+
+            moved = move_user(user_id, target, batch_size=options['batch_size'])
+            rows = sum(moved.values())
+            self.stdout.write(f'Usuário {user_id}: {source} -> {target} ({rows} linhas)')
+            moved_users += 1
+
+        action = 'seriam movidos' if options['dry_run'] else 'movidos'
+        self.stdout.write(self.style.SUCCESS(f'{moved_users} usuário(s) {action}'))
@@ -21,6 +21,23 @@ class UserProfile(models.Model):
         return f'{self.user.get_full_name()} - {self.family_name}'
 
 
+class UserShard(models.Model):
+    """
+    Diretório de shards: em qual banco estão os dados de cada usuário
+    (ver nossa_grana.sharding)
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='shard')
+    alias = models.CharField(max_length=50, verbose_name='Alias do Banco')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Shard do Usuário'
+        verbose_name_plural = 'Shards dos Usuários'
+
+    def __str__(self):
+        return f'{self.user_id} -> {self.alias}'
+
+
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     """
@@ -7,4 +7,5 @@ urlpatterns = [
     path('login/', views.CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('profile/', views.ProfileView.as_view(), name='profile'),
+    path('export/', views.DataExportView.as_view(), name='data_export'),
 ]
\ No newline at end of file
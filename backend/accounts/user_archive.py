@@ -0,0 +1,391 @@
+"""
+Exportação e importação dos dados de um usuário (NDJSON comprimido)
+
+Usado para portabilidade (LGPD/GDPR) e para mover um usuário entre
+ambientes ou shards:
+
+    python manage.py export_user_data --user maria --output maria.ndjson.gz
+    python manage.py import_user_data --input maria.ndjson.gz --user maria --create-user
+
+Formato: um objeto JSON por linha, em gzip.
+- Cabeçalho: {"format": "nossa_grana.user_export", "version": 1, "user": {...}}
+- Registros: {"model": "financial_accounts.account", "id": 12, "fields": {...}},
+  na ordem de SHARDED_MODELS (pais antes dos filhos). FKs guardam o id
+  antigo; a FK para o dono é omitida. Categorias (globais) aparecem uma vez,
+  antes do primeiro registro que as usa, e são casadas pelo nome na
+  importação. As tags de cada transação vão embutidas em "tags".
+- Rodapé: {"end": true, "counts": {...}}; arquivo sem rodapé é rejeitado.
+
+Exportação e importação trabalham em lotes com geradores: a memória não
+cresce com o número de transações. Na importação só ficam em memória os
+mapas de id dos modelos referenciados por outros (contas, cartões, tags,
+orçamentos, metas...); os saldos de contas e limites de cartões são
+recalculados uma única vez no fim.
+"""
+import gzip
+import json
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, Iterator
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router, transaction
+from django.utils import timezone
+
+from financial_accounts import snapshots
+from nossa_grana.sharding import SHARDED_MODELS, _auto_datetime_fields, use_shard
+from transactions import ledger
+
+FORMAT = 'nossa_grana.user_export'
+VERSION = 1
+USER_FIELDS = ['username', 'email', 'first_name', 'last_name', 'date_joined']
+CATEGORY_LABEL = 'transactions.category'
+TAGS_THROUGH = 'transactions.transaction_tags'
+# Derivados das transações: recriados na importação, não exportados
+DERIVED_MODELS = ('transactions.posting', 'financial_accounts.balancesnapshot')
+TRANSACTION_LABEL = 'transactions.transaction'
+TAG_LABEL = 'transactions.tag'
+
+
+class ArchiveError(Exception):
+    pass
+
+
+class _Encoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder corta microssegundos; aqui o valor volta idêntico
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _dumps(data) -> str:
+    return json.dumps(data, cls=_Encoder, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def archive_models():
+    """(modelo, caminho até o dono) exportados; a tabela de tags vai embutida"""
+    return [
+        (apps.get_model(label), path) for label, path in SHARDED_MODELS
+        if label != TAGS_THROUGH and label not in DERIVED_MODELS
+    ]
+
+
+def user_database(user) -> str:
+    """Alias onde estão (ou serão gravados) os dados do usuário"""
+    Account = apps.get_model('financial_accounts', 'Account')
+    with use_shard(user):
+        return router.db_for_write(Account) or 'default'
+
+
+def _archived_fields(model):
+    """Campos concretos exportados (sem a PK e sem a FK para o dono)"""
+    return [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key and not (field.is_relation and field.related_model is User)
+    ]
+
+
+# ----------------------------------------------------------------------
+# Exportação
+# ----------------------------------------------------------------------
+
+def iter_export(user, batch_size: int = 2000) -> Iterator[str]:
+    """Gera as linhas NDJSON (texto) com todos os dados do usuário"""
+    Category = apps.get_model('transactions', 'Category')
+    Transaction = apps.get_model('transactions', 'Transaction')
+    through = Transaction.tags.through
+    alias = user_database(user)
+    seen_categories = set()
+    counts: Dict[str, int] = {}
+
+    yield _dumps({
+        'format': FORMAT,
+        'version': VERSION,
+        'exported_at': timezone.now(),
+        'user': {name: getattr(user, name) for name in USER_FIELDS},
+    })
+
+    for model, path in archive_models():
+        label = model._meta.label_lower
+        fields = _archived_fields(model)
+        category_fields = [f.attname for f in fields if f.is_relation and f.related_model is Category]
+        rows = (
+            model._base_manager.using(alias).filter(**{path: user.pk}).order_by('pk')
+            .values_list('pk', *(field.attname for field in fields)).iterator(chunk_size=batch_size)
+        )
+
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield from _export_batch(model, label, fields, category_fields, batch, alias,
+                                         through, seen_categories)
+                counts[label] = counts.get(label, 0) + len(batch)
+                batch = []
+        if batch:
+            yield from _export_batch(model, label, fields, category_fields, batch, alias,
+                                     through, seen_categories)
+            counts[label] = counts.get(label, 0) + len(batch)
+
+    yield _dumps({'end': True, 'counts': counts})
+
+
+def _export_batch(model, label, fields, category_fields, batch, alias, through, seen_categories):
+    Category = apps.get_model('transactions', 'Category')
+    names = [field.name for field in fields]
+    attnames = [field.attname for field in fields]
+
+    tags: Dict[int, list] = {}
+    if label == TRANSACTION_LABEL:
+        # Uma query por lote para as tags, em vez de uma por transação
+        pairs = (
+            through.objects.using(alias).filter(transaction_id__in=[row[0] for row in batch])
+            .order_by('pk').values_list('transaction_id', 'tag_id')
+        )
+        for transaction_id, tag_id in pairs:
+            tags.setdefault(transaction_id, []).append(tag_id)
+
+    missing = {
+        row[1 + attnames.index(attname)] for row in batch for attname in category_fields
+    } - seen_categories - {None}
+    if missing:
+        category_attnames = [f.attname for f in Category._meta.concrete_fields if not f.primary_key]
+        for category_id, *values in (
+            Category.objects.using(alias).filter(pk__in=missing).order_by('pk')
+            .values_list('pk', *category_attnames)
+        ):
+            seen_categories.add(category_id)
+            yield _dumps({
+                'model': CATEGORY_LABEL, 'id': category_id, 'fields': dict(zip(category_attnames, values)),
+            })
+
+    for pk, *values in batch:
+        record = {'model': label, 'id': pk, 'fields': dict(zip(names, values))}
+        if label == TRANSACTION_LABEL:
+            record['tags'] = tags.get(pk, [])
+        yield _dumps(record)
+
+
+def iter_gzip(lines: Iterable[str]) -> Iterator[bytes]:
+    """Comprime as linhas em gzip incrementalmente (para respostas em streaming)"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    buffer = []
+    size = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= 64 * 1024:
+            chunk = compressor.compress(b''.join(buffer))
+            buffer, size = [], 0
+            if chunk:
+                yield chunk
+    yield compressor.compress(b''.join(buffer)) + compressor.flush()
+
+
+def export_user_to_file(user, path, batch_size: int = 2000) -> Dict[str, int]:
+    """Grava o arquivo .ndjson.gz e devolve {modelo: registros}"""
+    counts = {}
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        for line in iter_export(user, batch_size):
+            f.write(line)
+            if line.startswith('{"end":'):
+                counts = json.loads(line)['counts']
+    return counts
+
+
+# ----------------------------------------------------------------------
+# Importação
+# ----------------------------------------------------------------------
+
+def read_archive(path) -> Iterator[dict]:
+    """Lê o arquivo linha a linha (gzip detectado pela extensão)"""
+    opener = gzip.open if str(path).endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    raise ArchiveError(f'Linha {number} inválida')
+
+
+def read_header(records: Iterator[dict]) -> dict:
+    header = next(records, None)
+    if not header or header.get('format') != FORMAT:
+        raise ArchiveError('Arquivo não é uma exportação do Nossa Grana')
+    if header.get('version') != VERSION:
+        raise ArchiveError(f"Versão de exportação não suportada: {header.get('version')}")
+    return header
+
+
+def user_has_data(user, alias=None) -> bool:
+    alias = alias or user_database(user)
+    return any(
+        model._base_manager.using(alias).filter(**{path: user.pk}).exists()
+        for model, path in archive_models()
+    )
+
+
+def delete_user_data(user, alias=None):
+    alias = alias or user_database(user)
+    for label, path in reversed(SHARDED_MODELS):
+        apps.get_model(label)._base_manager.using(alias).filter(**{path: user.pk}).delete()
+
+
+class _Importer:
+    def __init__(self, user, alias, batch_size):
+        self.user = user
+        self.alias = alias
+        self.batch_size = batch_size
+        self.models = {model._meta.label_lower: model for model, path in archive_models()}
+        # Só guarda mapas de id de modelos referenciados (FKs e tags), não de transações
+        self.referenced = {
+            field.related_model._meta.label_lower
+            for model in self.models.values() for field in _archived_fields(model)
+            if field.is_relation
+        } | {TAG_LABEL}
+        self.id_maps: Dict[str, Dict[int, int]] = {CATEGORY_LABEL: {}}
+        self.counts: Dict[str, int] = {}
+        self.label = None
+        self.batch = []
+
+    def add(self, record):
+        label = record.get('model')
+        if label == CATEGORY_LABEL:
+            self.add_category(record)
+            return
+        if label not in self.models:
+            raise ArchiveError(f'Modelo desconhecido no arquivo: {label}')
+        if label != self.label:
+            self.flush()
+            self.label = label
+        self.batch.append(record)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def add_category(self, record):
+        Category = apps.get_model('transactions', 'Category')
+        fields = {
+            field.attname: field.to_python(record['fields'][field.attname])
+            for field in Category._meta.concrete_fields
+            if field.attname in record['fields'] and not field.primary_key
+            and not getattr(field, 'auto_now_add', False)
+        }
+        # Categorias são globais: casa pelo nome (único) e cria as que faltam
+        category, _ = Category.objects.get_or_create(name=fields.pop('name'), defaults=fields)
+        self.id_maps[CATEGORY_LABEL][record['id']] = category.pk
+
+    def build(self, model, record):
+        obj = model()
+        for field in model._meta.concrete_fields:
+            if field.is_relation and field.related_model is User:
+                setattr(obj, field.attname, self.user.pk)
+        data = record['fields']
+        for field in _archived_fields(model):
+            if field.name not in data:
+                continue
+            value = data[field.name]
+            if field.is_relation:
+                if value is not None:
+                    try:
+                        value = self.id_maps[field.related_model._meta.label_lower][value]
+                    except KeyError:
+                        raise ArchiveError(
+                            f"{model._meta.label_lower} {record['id']}: referência inválida em {field.name}"
+                        )
+            else:
+                value = field.to_python(value)
+            setattr(obj, field.attname, value)
+        return obj
+
+    def flush(self):
+        if not self.batch:
+            return
+        model = self.models[self.label]
+        records, self.batch = self.batch, []
+        objs = [self.build(model, record) for record in records]
+        auto_fields = _auto_datetime_fields(model)
+        preserved = [{name: getattr(obj, name) for name in auto_fields} for obj in objs]
+
+        created = model._base_manager.using(self.alias).bulk_create(objs)
+        if auto_fields:
+            # bulk_create aplica auto_now/auto_now_add; restaura os do arquivo
+            for obj, values in zip(created, preserved):
+                for name, value in values.items():
+                    if value is not None:
+                        setattr(obj, name, value)
+            model._base_manager.using(self.alias).bulk_update(created, auto_fields)
+
+        if self.label in self.referenced:
+            self.id_maps.setdefault(self.label, {}).update(
+                (record['id'], obj.pk) for record, obj in zip(records, created)
+            )
+        if self.label == TRANSACTION_LABEL:
+            self.add_tags(model, records, created)
+        self.counts[self.label] = self.counts.get(self.label, 0) + len(created)
+
+    def add_tags(self, model, records, created):
+        through = model.tags.through
+        tag_map = self.id_maps.get(TAG_LABEL, {})
+        rows = []
+        for record, obj in zip(records, created):
+            for tag_id in record.get('tags', []):
+                if tag_id not in tag_map:
+                    raise ArchiveError(f"Transação {record['id']}: tag {tag_id} não está no arquivo")
+                rows.append(through(transaction_id=obj.pk, tag_id=tag_map[tag_id]))
+        if rows:
+            through.objects.using(self.alias).bulk_create(rows)
+
+    def recalculate_balances(self):
+        Account = apps.get_model('financial_accounts', 'Account')
+        CreditCard = apps.get_model('financial_accounts', 'CreditCard')
+        Transaction = apps.get_model('transactions', 'Transaction')
+        ledger.rebuild_postings(
+            self.alias, Transaction._base_manager.filter(user_id=self.user.pk), self.batch_size
+        )
+        snapshots.build_snapshots(self.alias, user_id=self.user.pk, batch_size=self.batch_size)
+        for account in Account.objects.using(self.alias).filter(user_id=self.user.pk):
+            account._update_balance(self.alias)
+        for card in CreditCard.objects.using(self.alias).filter(user_id=self.user.pk):
+            card._update_available_limit(self.alias)
+
+
+def import_user(user, records: Iterable[dict], batch_size: int = 2000, replace: bool = False) -> Dict[str, int]:
+    """
+    Carrega um arquivo exportado nos dados de `user`
+
+    Tudo roda em uma transação no banco do usuário: um arquivo truncado ou
+    com referências inválidas não deixa nada gravado. Sem replace=True o
+    usuário precisa estar sem dados. Retorna {modelo: registros criados}.
+    """
+    records = iter(records)
+    read_header(records)
+    alias = user_database(user)
+
+    with transaction.atomic(using=alias):
+        if replace:
+            delete_user_data(user, alias)
+        elif user_has_data(user, alias):
+            raise ArchiveError(f'O usuário {user.username} já tem dados (use --replace)')
+
+        importer = _Importer(user, alias, batch_size)
+        footer = None
+        for record in records:
+            if record.get('end'):
+                footer = record
+                break
+            importer.add(record)
+        importer.flush()
+
+        if footer is None:
+            raise ArchiveError('Arquivo incompleto: rodapé ausente')
+        expected = footer.get('counts', {})
+        if expected != importer.counts:
+            raise ArchiveError(f'Contagens não conferem: esperado {expected}, importado {importer.counts}')
+
+        importer.recalculate_balances()
+    return importer.counts
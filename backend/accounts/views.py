@@ -4,6 +4,9 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth.models import User
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from .user_archive import iter_export, iter_gzip
 from .serializers import RegisterSerializer, UserSerializer, ProfileUpdateSerializer, EmailLoginSerializer
 
 
@@ -85,4 +88,23 @@ class CustomTokenObtainPairView(generics.CreateAPIView):
         return Response({
             'refresh': str(refresh),
             'access': str(refresh.access_token),
-        }, status=status.HTTP_200_OK)
\ No newline at end of file
+        }, status=status.HTTP_200_OK)
+
+
+class DataExportView(generics.GenericAPIView):
+    """
+    Exportação dos dados do usuário autenticado (portabilidade LGPD/GDPR)
+
+    Resposta em streaming (NDJSON em gzip), no mesmo formato aceito por
+    `manage.py import_user_data`.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        filename = f"nossa_grana_{request.user.username}_{timezone.now():%Y%m%d}.ndjson.gz"
+        response = StreamingHttpResponse(
+            iter_gzip(iter_export(request.user)),
+            content_type='application/gzip',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
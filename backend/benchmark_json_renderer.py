@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+Benchmark - Renderização JSON de listas grandes
+
+Compara o caminho antigo (JSONRenderer do DRF + re-encode com indent=2 no
+UTF8EncodingMiddleware) com o FastJSONRenderer.
+
+Uso: python benchmark_json_renderer.py [quantidade_de_itens ...]
+"""
+import os
+import sys
+import json
+import time
+import django
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+# Configurar Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nossa_grana.settings')
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+django.setup()
+
+from rest_framework.renderers import JSONRenderer
+from utils.renderers import FastJSONRenderer
+
+
+def build_payload(size):
+    """Gera uma lista paginada no formato da API de transações"""
+    results = [
+        {
+            'id': i,
+            'type': 'expense' if i % 3 else 'income',
+            'amount': Decimal('123.45') + i,
+            'description': f'Compra no mercado São João nº {i}',
+            'date': date(2024, 1 + i % 12, 1 + i % 28),
+            'category': {'id': i % 20, 'name': 'Alimentação', 'color': '#ff0000'},
+            'account_name': 'Conta Corrente',
+            'tags': [{'id': 1, 'name': 'mercado'}, {'id': 2, 'name': 'família'}],
+            'created_at': datetime(2024, 1, 1, 12, 30, tzinfo=timezone.utc),
+        }
+        for i in range(size)
+    ]
+    return {'count': size, 'next': None, 'previous': None, 'results': results}
+
+
+def old_path(payload):
+    """Renderização do DRF seguida do re-encode feito pelo middleware antigo"""
+    content = JSONRenderer().render(payload)
+    data = json.loads(content.decode('utf-8'))
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def new_path(payload):
+    return FastJSONRenderer().render(payload)
+
+
+def measure(func, payload, rounds=5):
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        content = func(payload)
+        best = min(best, time.perf_counter() - start)
+    return best, len(content)
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000]
+
+    print(f"{'itens':>8} {'antigo (ms)':>12} {'novo (ms)':>10} {'ganho':>7} {'bytes antigo':>13} {'bytes novo':>11}")
+    for size in sizes:
+        payload = build_payload(size)
+        old_time, old_size = measure(old_path, payload)
+        new_time, new_size = measure(new_path, payload)
+        print(
+            f"{size:>8} {old_time * 1000:>12.1f} {new_time * 1000:>10.1f} "
+            f"{old_time / new_time:>6.1f}x {old_size:>13} {new_size:>11}"
+        )
+
+
+if __name__ == '__main__':
+    main()
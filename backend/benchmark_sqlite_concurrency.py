@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""
+Benchmark - Criação concorrente de transações no SQLite
+
+Compara o backend SQLite padrão do Django (BEGIN deferred, sem PRAGMAs,
+CONN_MAX_AGE=0) com o modo produção (nossa_grana.sqlite_backend).
+Cada thread simula requisições que criam transações (o save() recalcula o
+saldo da conta dentro de um atomic()).
+
+Uso: python benchmark_sqlite_concurrency.py [threads] [transacoes_por_thread]
+"""
+import os
+import sys
+import json
+import subprocess
+import tempfile
+import threading
+import time
+
+MODES = {
+    'padrao': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'OPTIONS': {'timeout': 30},
+        'CONN_MAX_AGE': 0,
+    },
+    'producao': {
+        'ENGINE': 'nossa_grana.sqlite_backend',
+        'OPTIONS': {'timeout': 30, 'transaction_mode': 'IMMEDIATE'},
+        'CONN_MAX_AGE': 600,
+    },
+}
+
+
+def run_mode(mode, threads, per_thread):
+    """Executa o cenário em um processo isolado (um engine por processo)"""
+    import django
+    from datetime import date
+    from decimal import Decimal
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nossa_grana.settings')
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+    from django.conf import settings
+    tmp = tempfile.mkdtemp()
+    settings.DATABASES = {'default': {**MODES[mode], 'NAME': os.path.join(tmp, 'bench.sqlite3')}}
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import OperationalError, close_old_connections, connection
+    from django.contrib.auth.models import User
+    from transactions.models import Transaction, Category
+    from financial_accounts.models import Account
+
+    call_command('migrate', verbosity=0)
+    user = User.objects.create_user(username='bench', password='bench')
+    category = Category.objects.create(name='Bench')
+    accounts = [
+        Account.objects.create(user=user, name=f'Conta {i}', type='checking', initial_balance=Decimal('1000'))
+        for i in range(4)
+    ]
+    connection.close()
+
+    errors = []
+    created = []
+
+    def worker(index):
+        for i in range(per_thread):
+            try:
+                Transaction.objects.create(
+                    user=user, type='expense', amount=Decimal('1.00'),
+                    description=f'Compra {index}-{i}', category=category,
+                    account=accounts[(index + i) % len(accounts)], date=date(2024, 1, 1),
+                )
+                created.append(1)
+            except OperationalError as e:
+                errors.append(str(e))
+            finally:
+                # Fim de "requisição": fecha a conexão conforme CONN_MAX_AGE
+                close_old_connections()
+        connection.close()
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'mode': mode,
+        'created': len(created),
+        'errors': len(errors),
+        'elapsed': elapsed,
+        'tps': len(created) / elapsed if elapsed else 0,
+    }
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--mode':
+        mode, threads, per_thread = sys.argv[2], int(sys.argv[3]), int(sys.argv[4])
+        print(json.dumps(run_mode(mode, threads, per_thread)))
+        return
+
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    print(f"{threads} threads x {per_thread} transações")
+    print(f"{'modo':>10} {'criadas':>8} {'erros':>6} {'tempo (s)':>10} {'tx/s':>8}")
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, __file__, '--mode', mode, str(threads), str(per_thread)],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip().splitlines()[-1]
+        result = json.loads(output)
+        print(
+            f"{result['mode']:>10} {result['created']:>8} {result['errors']:>6} "
+            f"{result['elapsed']:>10.2f} {result['tps']:>8.1f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
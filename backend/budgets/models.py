@@ -1,4 +1,4 @@
-from django.db import models, transaction
+from django.db import models, router, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from decimal import Decimal
@@ -6,6 +6,8 @@ from django.db.models import Sum
 from transactions.models import Category, Transaction
 from datetime import datetime, date
 
+from nossa_grana.sharding import ShardedManager
+
 
 class Budget(models.Model):
     """
@@ -23,6 +25,8 @@ class Budget(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ShardedManager()
+
     class Meta:
         verbose_name = 'Orçamento'
         verbose_name_plural = 'Orçamentos'
@@ -347,6 +351,8 @@ class BudgetAlert(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     resolved_at = models.DateTimeField(null=True, blank=True)
 
+    objects = ShardedManager()
+
     class Meta:
         verbose_name = 'Alerta de Orçamento'
         verbose_name_plural = 'Alertas de Orçamento'
@@ -392,13 +398,18 @@ class BudgetAlert(models.Model):
             )
 
     @classmethod
-    @transaction.atomic
     def check_and_create_alerts(cls, budget):
         """
         Verifica e cria alertas automáticos para um orçamento com lock
         """
+        using = router.db_for_write(Budget, instance=budget)
+        with transaction.atomic(using=using):
+            return cls._check_and_create_alerts(budget, using)
+
+    @classmethod
+    def _check_and_create_alerts(cls, budget, using):
         # Lock no orçamento para evitar criação duplicada de alertas
-        budget = Budget.objects.select_for_update().get(id=budget.id)
+        budget = Budget.objects.using(using).select_for_update().get(id=budget.id)
         alerts_created = []
 
         # Alerta de orçamento excedido
@@ -1,9 +1,8 @@
-import hashlib
 import secrets
 import base64
-from cryptography.fernet import Fernet
 from django.core.exceptions import ValidationError
-from django.conf import settings
+
+from utils import crypto
 
 
 class CryptoValidators:
@@ -30,53 +29,55 @@ class CryptoValidators:
     @staticmethod
     def encrypt_sensitive_data(data, key=None):
         """Criptografa dados sensíveis"""
-        if not key:
-            key = getattr(settings, 'ENCRYPTION_KEY', Fernet.generate_key())
-        
-        f = Fernet(key)
-        encrypted_data = f.encrypt(str(data).encode())
-        return base64.urlsafe_b64encode(encrypted_data).decode()
+        # Sem chave explícita usa o anel de chaves do processo (ENCRYPTION_KEYS)
+        try:
+            return crypto.encrypt(data, keys=[key] if key else None)
+        except crypto.KeyRingError as e:
+            raise ValidationError(str(e))
     
     @staticmethod
     def decrypt_sensitive_data(encrypted_data, key=None):
         """Descriptografa dados sensíveis"""
-        if not key:
-            key = getattr(settings, 'ENCRYPTION_KEY', None)
-            if not key:
-                raise ValidationError('Chave de criptografia não configurada')
-        
         try:
-            f = Fernet(key)
-            decoded_data = base64.urlsafe_b64decode(encrypted_data.encode())
-            decrypted_data = f.decrypt(decoded_data)
-            return decrypted_data.decode()
+            return crypto.decrypt(encrypted_data, keys=[key] if key else None)
+        except crypto.KeyRingError:
+            raise ValidationError('Chave de criptografia não configurada')
+        except Exception:
+            raise ValidationError('Erro ao descriptografar dados')
+    
+    @staticmethod
+    def encrypt_many(values):
+        """Criptografa um lote (exportações) com o anel de chaves"""
+        try:
+            return crypto.encrypt_many(values)
+        except crypto.KeyRingError as e:
+            raise ValidationError(str(e))
+    
+    @staticmethod
+    def decrypt_many(tokens):
+        """Descriptografa um lote com o anel de chaves"""
+        try:
+            return crypto.decrypt_many(tokens)
+        except crypto.KeyRingError:
+            raise ValidationError('Chave de criptografia não configurada')
         except Exception:
             raise ValidationError('Erro ao descriptografar dados')
     
     @staticmethod
     def hash_sensitive_field(value, salt=None):
         """Gera hash seguro para campos sensíveis"""
-        if not salt:
-            salt = secrets.token_hex(16)
-        
-        hash_obj = hashlib.pbkdf2_hmac('sha256', 
-                                      str(value).encode(), 
-                                      salt.encode(), 
-                                      100000)
-        return f"{salt}:{hash_obj.hex()}"
+        # PBKDF2 no pool limitado de threads (utils.crypto)
+        return crypto.get_kdf_pool().hash(value, salt)
+    
+    @staticmethod
+    def hash_many(values):
+        """Hash de vários campos em paralelo no pool de KDF"""
+        return crypto.get_kdf_pool().hash_many(values)
     
     @staticmethod
     def verify_hash(value, hashed_value):
         """Verifica hash de campo sensível"""
-        try:
-            salt, hash_hex = hashed_value.split(':')
-            hash_obj = hashlib.pbkdf2_hmac('sha256',
-                                          str(value).encode(),
-                                          salt.encode(),
-                                          100000)
-            return hash_obj.hex() == hash_hex
-        except Exception:
-            return False
+        return crypto.get_kdf_pool().verify(value, hashed_value)
     
     @staticmethod
     def tokenize_card_number(card_number):
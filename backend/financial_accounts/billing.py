@@ -0,0 +1,242 @@
+"""
+Faturas de cartão mantidas na gravação das transações
+
+- Cada transação de cartão aponta para a fatura do ciclo em que cai
+  (Transaction.bill): compras até o dia de fechamento entram na fatura do
+  mês; depois dele, na do mês seguinte. reference_month é o 1º dia do mês
+  de fechamento; a fatura cobre (fechamento anterior, closing_date].
+- total_amount é mantido por delta (UPDATE total_amount + x): despesas
+  somam, receitas no cartão (estornos) subtraem.
+- O limite disponível é o limite menos o saldo devedor das faturas não
+  pagas: O(faturas em aberto), sem reler o histórico do cartão.
+
+Transações anteriores ao campo `bill` são atribuídas pelo comando
+assign_card_bills. O status das faturas (open → closed → overdue/paid) e a
+fatura do ciclo seguinte ficam com o comando diário process_card_bills.
+"""
+import calendar
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Optional, Tuple
+
+from django.apps import apps
+from django.db import transaction as db_transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+ZERO = Decimal('0.00')
+UNPAID_STATUSES = ('open', 'closed', 'overdue')
+
+
+def _day_in_month(year: int, month: int, day: int) -> date:
+    return date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+
+def _next_month(year: int, month: int) -> Tuple[int, int]:
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def cycle_for(closing_day: int, due_day: int, on_date: date) -> Tuple[date, date, date]:
+    """(reference_month, closing_date, due_date) da fatura que recebe uma compra em `on_date`"""
+    year, month = on_date.year, on_date.month
+    if on_date > _day_in_month(year, month, closing_day):
+        year, month = _next_month(year, month)
+    closing_date = _day_in_month(year, month, closing_day)
+    due_year, due_month = (year, month) if due_day > closing_day else _next_month(year, month)
+    return date(year, month, 1), closing_date, _day_in_month(due_year, due_month, due_day)
+
+
+def cycle_at(closing_day: int, due_day: int, reference_month: date) -> Tuple[date, date, date]:
+    """Ciclo de um reference_month já conhecido (parcelas nos meses seguintes)"""
+    return cycle_for(closing_day, due_day, _day_in_month(reference_month.year, reference_month.month, 1))
+
+
+def signed_amount(type: str, amount) -> Decimal:
+    """Quanto a transação soma ao total da fatura"""
+    if type == 'expense':
+        return Decimal(amount)
+    if type == 'income':
+        return -Decimal(amount)
+    return ZERO
+
+
+def bill_for(card, on_date: date, using):
+    """Fatura do ciclo de `on_date` (criada se ainda não existe)"""
+    CreditCardBill = apps.get_model('financial_accounts', 'CreditCardBill')
+    reference_month, closing_date, due_date = cycle_for(card.closing_day, card.due_day, on_date)
+    bill, _ = CreditCardBill._base_manager.using(using).get_or_create(
+        credit_card_id=card.pk,
+        reference_month=reference_month,
+        defaults={
+            'closing_date': closing_date,
+            'due_date': due_date,
+            'status': 'open' if closing_date >= timezone.localdate() else 'closed',
+        },
+    )
+    return bill
+
+
+def bills_for(card, reference_months, using) -> Dict[date, object]:
+    """
+    Faturas de vários ciclos de um cartão, criando as que faltam
+
+    Uma leitura e um bulk_create, em vez de um get_or_create por ciclo.
+    """
+    CreditCardBill = apps.get_model('financial_accounts', 'CreditCardBill')
+    bills = CreditCardBill._base_manager.using(using).filter(credit_card_id=card.pk)
+    found = {bill.reference_month: bill for bill in bills.filter(reference_month__in=set(reference_months))}
+    today = timezone.localdate()
+    missing = []
+    for reference_month in sorted(set(reference_months) - set(found)):
+        _, closing_date, due_date = cycle_at(card.closing_day, card.due_day, reference_month)
+        missing.append(CreditCardBill(
+            credit_card_id=card.pk, reference_month=reference_month,
+            closing_date=closing_date, due_date=due_date,
+            status='open' if closing_date >= today else 'closed',
+        ))
+    if missing:
+        bills.bulk_create(missing, ignore_conflicts=True)
+        # ignore_conflicts não devolve pk: relê os ciclos criados
+        found.update(
+            (bill.reference_month, bill)
+            for bill in bills.filter(reference_month__in=[bill.reference_month for bill in missing])
+        )
+    return found
+
+
+def apply(using, bill_id: Optional[int], delta: Decimal):
+    """Soma `delta` ao total da fatura; uma fatura paga que voltou a dever reabre"""
+    if not bill_id or not delta:
+        return
+    CreditCardBill = apps.get_model('financial_accounts', 'CreditCardBill')
+    bills = CreditCardBill._base_manager.using(using).filter(pk=bill_id)
+    bills.update(total_amount=F('total_amount') + delta)
+    # Volta ao status que o ciclo teria: aberta até o fechamento
+    bills.filter(status='paid', paid_amount__lt=F('total_amount')).update(
+        status=Case(When(closing_date__gte=timezone.localdate(), then=Value('open')), default=Value('closed')),
+        updated_at=timezone.now(),
+    )
+
+
+def assign(transaction, using) -> Tuple[Optional[int], Decimal]:
+    """
+    Define transaction.bill antes de gravar
+
+    Devolve (fatura, valor) que a versão gravada da transação somava, para
+    `apply` desfazer depois do save.
+    """
+    Transaction = type(transaction)
+    previous = (None, ZERO)
+    if transaction.pk:
+        row = Transaction._base_manager.using(using).filter(pk=transaction.pk).values_list(
+            'bill_id', 'type', 'amount'
+        ).first()
+        if row and row[0]:
+            previous = (row[0], signed_amount(row[1], row[2]))
+
+    if transaction.installment_plan_id and transaction.bill_id:
+        pass  # parcela: a fatura foi escolhida pelo plano
+    elif transaction.credit_card_id and transaction.type != 'transfer':
+        transaction.bill = bill_for(transaction.credit_card, transaction.date, using)
+    else:
+        transaction.bill = None
+    return previous
+
+
+def backfill(using, card=None, batch_size: int = 2000) -> int:
+    """
+    Atribui fatura às transações de cartão sem `bill` e refaz totais e limites
+
+    Agrupa por (cartão, ciclo): um UPDATE por fatura em vez de um por
+    transação. Os totais das faturas tocadas são recalculados do zero.
+    Retorna o número de transações atribuídas.
+    """
+    Transaction = apps.get_model('transactions', 'Transaction')
+    CreditCard = apps.get_model('financial_accounts', 'CreditCard')
+    CreditCardBill = apps.get_model('financial_accounts', 'CreditCardBill')
+
+    pending = Transaction._base_manager.using(using).filter(
+        credit_card__isnull=False, bill__isnull=True
+    ).exclude(type='transfer')
+    if card is not None:
+        pending = pending.filter(credit_card=card)
+
+    cards = {}
+    cycles = {}
+    for pk, card_id, on_date in pending.order_by('pk').values_list('pk', 'credit_card_id', 'date').iterator(
+        chunk_size=batch_size
+    ):
+        if card_id not in cards:
+            cards[card_id] = CreditCard._base_manager.using(using).get(pk=card_id)
+        reference_month = cycle_for(cards[card_id].closing_day, cards[card_id].due_day, on_date)[0]
+        cycles.setdefault((card_id, reference_month), (on_date, []))[1].append(pk)
+
+    assigned = 0
+    touched = set()
+    for (card_id, _), (on_date, pks) in cycles.items():
+        bill = bill_for(cards[card_id], on_date, using)
+        touched.add(bill.pk)
+        for start in range(0, len(pks), batch_size):
+            assigned += Transaction._base_manager.using(using).filter(
+                pk__in=pks[start:start + batch_size]
+            ).update(bill=bill)
+
+    with db_transaction.atomic(using=using):
+        for bill in CreditCardBill._base_manager.using(using).filter(pk__in=touched):
+            bill.calculate_total(using)
+        for card_obj in cards.values():
+            card_obj._update_available_limit(using)
+    return assigned
+
+
+def run_bill_cycle(using, today: Optional[date] = None) -> Dict[str, int]:
+    """
+    Ciclo diário das faturas de todos os cartões, em poucos comandos SQL
+
+    - open → closed: fechamento já passou
+    - closed/overdue → paid: nada a pagar (fatura zerada ou estornada)
+    - open/closed → overdue: vencimento passou com saldo devedor
+    - cria, com bulk_create, a fatura do ciclo atual dos cartões ativos que
+      ainda não a têm (as compras de hoje já caem nela)
+
+    Assim os endpoints de faturas filtram só por status/vencimento.
+    Retorna quantas faturas mudaram em cada passo.
+    """
+    CreditCard = apps.get_model('financial_accounts', 'CreditCard')
+    CreditCardBill = apps.get_model('financial_accounts', 'CreditCardBill')
+    today = today or timezone.localdate()
+    now = timezone.now()
+    bills = CreditCardBill._base_manager.using(using)
+
+    result = {}
+    with db_transaction.atomic(using=using):
+        result['closed'] = bills.filter(status='open', closing_date__lt=today).update(
+            status='closed', updated_at=now
+        )
+        result['paid'] = bills.filter(
+            status__in=('closed', 'overdue'), total_amount__lte=F('paid_amount')
+        ).update(status='paid', updated_at=now)
+        result['overdue'] = bills.filter(
+            status__in=('open', 'closed'), due_date__lt=today, paid_amount__lt=F('total_amount')
+        ).update(status='overdue', updated_at=now)
+
+        cycles = {
+            card_id: cycle_for(closing_day, due_day, today)
+            for card_id, closing_day, due_day in CreditCard._base_manager.using(using)
+            .filter(is_active=True).values_list('pk', 'closing_day', 'due_day').iterator()
+        }
+        existing = set(
+            bills.filter(reference_month__in={cycle[0] for cycle in cycles.values()})
+            .values_list('credit_card_id', 'reference_month')
+        )
+        missing = [
+            CreditCardBill(
+                credit_card_id=card_id, reference_month=reference_month,
+                closing_date=closing_date, due_date=due_date, status='open',
+            )
+            for card_id, (reference_month, closing_date, due_date) in cycles.items()
+            if (card_id, reference_month) not in existing
+        ]
+        bills.bulk_create(missing, batch_size=1000, ignore_conflicts=True)
+        result['created'] = len(missing)
+    return result
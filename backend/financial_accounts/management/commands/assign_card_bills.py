@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from financial_accounts import billing
+from financial_accounts.models import CreditCard
+from nossa_grana.sharding import get_shards
+
+
+class Command(BaseCommand):
+    help = 'Atribui fatura às transações de cartão antigas e recalcula totais e limites'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            help='Alias do banco (padrão: todos os shards, ou default)'
+        )
+        parser.add_argument(
+            '--card-id',
+            type=int,
+            help='ID do cartão específico (opcional)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Transações por UPDATE'
+        )
+
+    def handle(self, *args, **options):
+        aliases = [options['database']] if options['database'] else (get_shards() or [DEFAULT_DB_ALIAS])
+        for alias in aliases:
+            card = None
+            if options['card_id']:
+                card = CreditCard._base_manager.using(alias).filter(pk=options['card_id']).first()
+                if card is None:
+                    if options['database']:
+                        raise CommandError(f"Cartão {options['card_id']} não encontrado")
+                    continue
+            assigned = billing.backfill(alias, card=card, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'{alias}: {assigned} transações atribuídas a faturas'))
@@ -0,0 +1,31 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from financial_accounts import billing
+from nossa_grana.sharding import get_shards
+
+
+class Command(BaseCommand):
+    help = 'Fecha faturas, marca as vencidas e cria as do ciclo atual (rodar diariamente, ex.: cron à 00:15)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            help='Alias do banco (padrão: todos os shards, ou default)'
+        )
+        parser.add_argument(
+            '--date',
+            type=date.fromisoformat,
+            help='Data de referência (AAAA-MM-DD). Padrão: hoje'
+        )
+
+    def handle(self, *args, **options):
+        aliases = [options['database']] if options['database'] else (get_shards() or [DEFAULT_DB_ALIAS])
+        for alias in aliases:
+            result = billing.run_bill_cycle(alias, today=options['date'])
+            self.stdout.write(self.style.SUCCESS(
+                f"{alias}: {result['closed']} fechadas, {result['overdue']} vencidas, "
+                f"{result['paid']} quitadas, {result['created']} criadas"
+            ))
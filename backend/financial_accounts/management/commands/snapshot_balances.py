@@ -0,0 +1,41 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from financial_accounts import snapshots
+from nossa_grana.sharding import get_shards
+
+
+class Command(BaseCommand):
+    help = 'Completa os saldos diários de contas e cartões (rodar uma vez por dia, ex.: cron às 00:30)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            help='Alias do banco (padrão: todos os shards, ou default)'
+        )
+        parser.add_argument(
+            '--until',
+            type=date.fromisoformat,
+            help='Último dia a gravar (AAAA-MM-DD). Padrão: hoje'
+        )
+        parser.add_argument(
+            '--user-id',
+            type=int,
+            help='ID do usuário específico (opcional)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Linhas por INSERT'
+        )
+
+    def handle(self, *args, **options):
+        aliases = [options['database']] if options['database'] else (get_shards() or [DEFAULT_DB_ALIAS])
+        for alias in aliases:
+            created = snapshots.build_snapshots(
+                alias, until=options['until'], user_id=options['user_id'], batch_size=options['batch_size']
+            )
+            self.stdout.write(self.style.SUCCESS(f'{alias}: {created} saldos diários gravados'))
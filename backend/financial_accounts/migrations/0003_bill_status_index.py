@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financial_accounts', '0002_balancesnapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='creditcardbill',
+            index=models.Index(fields=['status', 'due_date'], name='bill_status_due_idx'),
+        ),
+    ]
@@ -1,9 +1,14 @@
-from django.db import models, transaction
+from django.db import models, router, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
+from datetime import date
 from decimal import Decimal
-from django.db.models import Sum, Q
+from django.db.models import F, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from nossa_grana.sharding import ShardedManager
 
 
 class Account(models.Model):
@@ -37,6 +42,8 @@ class Account(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ShardedManager()
+
     class Meta:
         verbose_name = 'Conta Bancária'
         verbose_name_plural = 'Contas Bancárias'
@@ -49,38 +56,60 @@ class Account(models.Model):
         # Se é uma nova conta, definir saldo atual igual ao inicial
         if not self.pk:
             self.current_balance = self.initial_balance
-        super().save(*args, **kwargs)
+            super().save(*args, **kwargs)
+            return
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'initial_balance' not in update_fields:
+            super().save(*args, **kwargs)
+            return
+        
+        # Saldo inicial alterado: desloca saldo atual e saldos diários
+        using = kwargs.get('using') or router.db_for_write(Account, instance=self)
+        with transaction.atomic(using=using):
+            previous = Account.objects.using(using).filter(pk=self.pk).values_list(
+                'initial_balance', flat=True
+            ).first()
+            super().save(*args, **kwargs)
+            if previous is not None and previous != self.initial_balance:
+                from .snapshots import shift
+                
+                shift(using, self.pk, None, date.min, self.initial_balance - previous)
+                self._update_balance(using)
+                self.refresh_from_db(using=using, fields=['current_balance', 'updated_at'])
 
-    @transaction.atomic
     def update_balance(self):
         """
         Atualiza o saldo atual baseado nas transações com lock para evitar race conditions
         """
-        from transactions.models import Transaction
+        using = router.db_for_write(Account, instance=self)
+        with transaction.atomic(using=using):
+            self._update_balance(using)
+
+    def _update_balance(self, using):
+        from transactions.models import Posting
         
         # Lock na conta para evitar race conditions
-        account = Account.objects.select_for_update().get(id=self.id)
+        account = Account.objects.using(using).select_for_update().get(id=self.id)
         
-        # Uma única query otimizada para todos os cálculos
-        totals = Transaction.objects.filter(
-            Q(account=account) | Q(transfer_to_account=account) | Q(transfer_from_account=account)
-        ).aggregate(
-            income=Sum('amount', filter=Q(type='income', account=account)),
-            expense=Sum('amount', filter=Q(type='expense', account=account)),
-            transfers_in=Sum('amount', filter=Q(type='transfer', transfer_to_account=account)),
-            transfers_out=Sum('amount', filter=Q(type='transfer', transfer_from_account=account))
-        )
+        # Acumulado do último lançamento (receitas, despesas e transferências
+        # nos dois sentidos): uma busca no índice (account, date, transaction)
+        total = Posting.objects.using(using).filter(account=account).order_by(
+            '-date', '-transaction_id'
+        ).values_list('running_total', flat=True).first()
         
         # Calcular saldo atual
-        account.current_balance = (
-            account.initial_balance + 
-            (totals['income'] or Decimal('0.00')) - 
-            (totals['expense'] or Decimal('0.00')) + 
-            (totals['transfers_in'] or Decimal('0.00')) - 
-            (totals['transfers_out'] or Decimal('0.00'))
-        )
+        account.current_balance = account.initial_balance + (total or Decimal('0.00'))
         account.save(update_fields=['current_balance', 'updated_at'])
 
+    def balance_at(self, on_date):
+        """
+        Saldo da conta ao fim de uma data
+        """
+        from transactions import ledger
+
+        return ledger.balance_at(self, on_date)
+
     def can_debit(self, amount):
         """
         Verifica se é possível debitar um valor da conta
@@ -125,6 +154,8 @@ class CreditCard(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ShardedManager()
+
     class Meta:
         verbose_name = 'Cartão de Crédito'
         verbose_name_plural = 'Cartões de Crédito'
@@ -150,21 +181,27 @@ class CreditCard(models.Model):
                     'O dia de vencimento deve ser pelo menos 5 dias após o fechamento'
                 )
 
-    @transaction.atomic
     def update_available_limit(self):
         """
         Atualiza o limite disponível baseado nas transações não pagas com lock
         """
-        from transactions.models import Transaction
+        using = router.db_for_write(CreditCard, instance=self)
+        with transaction.atomic(using=using):
+            self._update_available_limit(using)
+
+    def _update_available_limit(self, using):
+        from .billing import UNPAID_STATUSES
         
         # Lock no cartão para evitar race conditions
-        card = CreditCard.objects.select_for_update().get(id=self.id)
+        card = CreditCard.objects.using(using).select_for_update().get(id=self.id)
         
-        # Somar gastos não pagos (transações do cartão)
-        used_limit = Transaction.objects.filter(
+        # Saldo devedor das faturas não pagas (O(faturas em aberto))
+        used_limit = CreditCardBill.objects.using(using).filter(
             credit_card=card,
-            type='expense'
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+            status__in=UNPAID_STATUSES
+        ).aggregate(
+            total=Sum(F('total_amount') - F('paid_amount'))
+        )['total'] or Decimal('0.00')
         
         # Calcular limite disponível
         card.available_limit = card.credit_limit - used_limit
@@ -247,36 +284,37 @@ class CreditCardBill(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ShardedManager()
+
     class Meta:
         verbose_name = 'Fatura de Cartão'
         verbose_name_plural = 'Faturas de Cartão'
         ordering = ['-reference_month']
         unique_together = ['credit_card', 'reference_month']
+        indexes = [
+            models.Index(fields=['status', 'due_date'], name='bill_status_due_idx'),
+        ]
 
     def __str__(self):
         return f'{self.credit_card.name} - {self.reference_month.strftime("%m/%Y")}'
 
-    def calculate_total(self):
+    def calculate_total(self, using=None):
         """
-        Calcula o total da fatura baseado nas transações do período
+        Recalcula o total da fatura a partir das transações atribuídas a ela
+        
+        O total já é mantido a cada gravação de transação; isto serve para
+        conferência e para o back-fill (assign_card_bills).
         """
         from transactions.models import Transaction
-        from datetime import datetime, timedelta
         
-        # Definir período da fatura (do fechamento anterior até o fechamento atual)
-        start_date = self.reference_month
-        end_date = self.closing_date
-        
-        # Somar transações do cartão no período
-        transactions_total = Transaction.objects.filter(
-            credit_card=self.credit_card,
-            type='expense',
-            date__gte=start_date,
-            date__lte=end_date
-        ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
+        using = using or router.db_for_write(CreditCardBill, instance=self)
+        totals = Transaction.objects.using(using).filter(bill=self).aggregate(
+            expense=models.Sum('amount', filter=models.Q(type='expense')),
+            refund=models.Sum('amount', filter=models.Q(type='income')),
+        )
         
-        self.total_amount = transactions_total
-        self.save(update_fields=['total_amount', 'updated_at'])
+        self.total_amount = (totals['expense'] or Decimal('0.00')) - (totals['refund'] or Decimal('0.00'))
+        self.save(using=using, update_fields=['total_amount', 'updated_at'])
 
     def pay(self, amount, payment_account=None):
         """
@@ -319,10 +357,9 @@ class CreditCardBill(models.Model):
     @property
     def is_overdue(self):
         """
-        Verifica se a fatura está vencida
+        Verifica se a fatura está vencida (status mantido pelo process_card_bills)
         """
-        from datetime import date
-        return date.today() > self.due_date and self.status != 'paid'
+        return self.status == 'overdue'
 
     @property
     def days_until_due(self):
@@ -337,4 +374,66 @@ class CreditCardBill(models.Model):
         """
         Retorna o total formatado em reais
         """
-        return f'R$ {self.total_amount:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
\ No newline at end of file
+        return f'R$ {self.total_amount:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
+
+class BalanceSnapshot(models.Model):
+    """
+    Saldo de uma conta (ou acumulado de um cartão) ao fim de um dia
+    
+    Preenchido pelo comando snapshot_balances e corrigido pelo razão quando
+    chegam lançamentos retroativos (ver financial_accounts.snapshots).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='balance_snapshots')
+    account = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='snapshots'
+    )
+    credit_card = models.ForeignKey(
+        CreditCard,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='snapshots'
+    )
+    date = models.DateField(verbose_name='Data')
+    balance = models.DecimalField(max_digits=14, decimal_places=2, verbose_name='Saldo')
+
+    objects = ShardedManager()
+
+    class Meta:
+        verbose_name = 'Saldo Diário'
+        verbose_name_plural = 'Saldos Diários'
+        ordering = ['date']
+        indexes = [
+            models.Index(fields=['user', 'date'], name='snapshot_user_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'date'], name='unique_account_snapshot'),
+            models.UniqueConstraint(fields=['credit_card', 'date'], name='unique_card_snapshot'),
+            models.CheckConstraint(
+                check=(
+                    models.Q(account__isnull=False, credit_card__isnull=True) |
+                    models.Q(account__isnull=True, credit_card__isnull=False)
+                ),
+                name='snapshot_account_xor_card',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.account or self.credit_card} {self.date}: {self.balance}'
+
+
+@receiver([post_save, post_delete], sender=Account, dispatch_uid='summaries.account_changed')
+@receiver([post_save, post_delete], sender=CreditCard, dispatch_uid='summaries.card_changed')
+def invalidate_summaries(sender, instance, using=None, raw=False, **kwargs):
+    """
+    Saldo, limite ou cadastro mudou: nova geração dos resumos do usuário
+    """
+    if raw:
+        return
+    from .summaries import invalidate
+    
+    invalidate(instance.user_id, using)
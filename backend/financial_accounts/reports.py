@@ -0,0 +1,133 @@
+"""
+Relatórios de conta e de cartão (endpoints report)
+
+- Totais e evolução mensal saem de uma única varredura do razão: um GROUP BY
+  mês com agregação condicional por tipo; os totais do período são a soma
+  dos meses, sem uma segunda consulta.
+- Totais e meses ficam em cache por (conta/cartão, período, geração de
+  contas do usuário). Toda transação atualiza saldo ou limite pelo save() da
+  conta/cartão, o que troca a geração (ver summaries): visitas repetidas não
+  varrem o razão até a próxima gravação.
+- Categorias e transações recentes mostram nome, cor e tags, que mudam sem
+  passar pela conta/cartão: são consultadas a cada visita (agregação por
+  categoria e as últimas linhas pelo índice de data).
+"""
+from datetime import date
+from typing import Dict, List, Optional
+
+from django.apps import apps
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from .summaries import cached
+
+RECENT_TRANSACTIONS = 10
+
+ACCOUNT_FLOWS = {
+    'income': Sum('amount', filter=Q(type='income')),
+    'expense': Sum(-F('amount'), filter=Q(type='expense')),
+    'transfers_in': Sum('amount', filter=Q(type='transfer', amount__gt=0)),
+    'transfers_out': Sum(-F('amount'), filter=Q(type='transfer', amount__lt=0)),
+    'transaction_count': Count('id'),
+}
+CARD_FLOWS = {
+    # Despesas no cartão são lançadas com sinal negativo
+    'total_spent': Sum(-F('amount'), filter=Q(type='expense')),
+    'expense_count': Count('id', filter=Q(type='expense')),
+    'transaction_count': Count('id'),
+}
+
+
+def _period(postings, date_from: Optional[date], date_to: Optional[date]):
+    if date_from:
+        postings = postings.filter(date__gte=date_from)
+    if date_to:
+        postings = postings.filter(date__lte=date_to)
+    return postings
+
+
+def _monthly(postings, flows: Dict) -> List[Dict]:
+    """Uma linha por mês com os fluxos condicionais (a única varredura)"""
+    return list(
+        postings.order_by().annotate(month=TruncMonth('date')).values('month').annotate(**flows).order_by('month')
+    )
+
+
+def _total(rows: List[Dict], name: str):
+    return sum(row[name] or 0 for row in rows)
+
+
+def _key(kind: str, pk, date_from, date_to) -> str:
+    return f'{kind}_report:{pk}:{date_from or ""}:{date_to or ""}'
+
+
+def _recent(transactions) -> List[Dict]:
+    from transactions.serializers import TransactionSerializer
+
+    recent = transactions.select_related('category').prefetch_related('tags').order_by(
+        '-date', '-created_at'
+    )[:RECENT_TRANSACTIONS]
+    return list(TransactionSerializer(recent, many=True).data)
+
+
+def _categories(transactions) -> List[Dict]:
+    return list(
+        transactions.filter(type='expense').values('category__name', 'category__color').annotate(
+            total=Sum('amount'),
+            count=Count('id')
+        ).order_by('-total')
+    )
+
+
+def account_report(account, date_from: Optional[date] = None, date_to: Optional[date] = None) -> Dict:
+    """Totais, evolução mensal, categorias e transações recentes de uma conta"""
+    from transactions import ledger
+    Transaction = apps.get_model('transactions', 'Transaction')
+
+    # Lançamentos da conta: varredura do índice (account, date), com as
+    # transferências dos dois lados
+    postings = ledger.account_postings(account, date_from, date_to)
+
+    def compute():
+        monthly = _monthly(postings, ACCOUNT_FLOWS)
+        totals = {name: _total(monthly, name) for name in ACCOUNT_FLOWS}
+        totals['net_flow'] = totals['income'] - totals['expense'] + totals['transfers_in'] - totals['transfers_out']
+        return {'totals': totals, 'monthly_evolution': monthly}
+
+    transactions = Transaction.objects.filter(postings__in=postings)
+    return {
+        **cached(account.user_id, _key('account', account.pk, date_from, date_to), compute),
+        'category_breakdown': _categories(transactions.filter(account=account)),
+        'recent_transactions': _recent(transactions),
+    }
+
+
+def card_report(card, date_from: Optional[date] = None, date_to: Optional[date] = None) -> Dict:
+    """Gastos, evolução mensal, categorias e transações recentes de um cartão"""
+    Posting = apps.get_model('transactions', 'Posting')
+    Transaction = apps.get_model('transactions', 'Transaction')
+
+    def compute():
+        # Varredura do índice (credit_card, date) do razão
+        postings = _period(Posting.objects.filter(credit_card=card), date_from, date_to)
+        rows = _monthly(postings, CARD_FLOWS)
+        total_spent = _total(rows, 'total_spent')
+        transaction_count = _total(rows, 'transaction_count')
+        return {
+            'totals': {
+                'total_spent': total_spent,
+                'transaction_count': transaction_count,
+                'average_transaction': total_spent / transaction_count if transaction_count > 0 else 0,
+            },
+            'monthly_evolution': [
+                {'month': row['month'], 'total_spent': row['total_spent'], 'transaction_count': row['expense_count']}
+                for row in rows if row['expense_count']
+            ],
+        }
+
+    transactions = _period(Transaction.objects.filter(credit_card=card), date_from, date_to)
+    return {
+        **cached(card.user_id, _key('card', card.pk, date_from, date_to), compute),
+        'category_breakdown': _categories(transactions),
+        'recent_transactions': _recent(transactions),
+    }
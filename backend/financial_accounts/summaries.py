@@ -0,0 +1,133 @@
+"""
+Resumos de contas e cartões do usuário (endpoints summary)
+
+- Cada resumo é uma única agregação no banco (GROUP BY type para contas),
+  sem carregar as linhas: custo constante para quem tem centenas de contas.
+- O resultado fica no cache sob a geração de contas do usuário. Qualquer
+  gravação ou exclusão de conta/cartão (inclusive a atualização de saldo e
+  de limite disponível) incrementa a geração; as chaves antigas deixam de ser
+  lidas e expiram sozinhas, sem varrer o cache.
+
+Os relatórios de conta/cartão (reports) usam a mesma geração.
+"""
+import time
+from decimal import Decimal
+from typing import Callable, Dict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+ZERO = Decimal('0.00')
+NEAR_LIMIT_RATIO = Decimal('0.2')
+
+
+def _generation_key(user_id) -> str:
+    return f'accounts:generation:{user_id}'
+
+
+def generation(user_id) -> int:
+    """Geração atual do cache de contas do usuário"""
+    key = _generation_key(user_id)
+    value = cache.get(key)
+    if value is None:
+        # Começa no relógio: se a chave for descartada, não volta a uma
+        # geração que já tem resumos gravados
+        cache.add(key, time.time_ns(), None)
+        value = cache.get(key)
+    return value
+
+
+def bump(user_id):
+    """Invalida os resumos do usuário"""
+    try:
+        cache.incr(_generation_key(user_id))
+    except ValueError:
+        cache.set(_generation_key(user_id), time.time_ns(), None)
+
+
+def invalidate(user_id, using=None):
+    """
+    Incrementa a geração agora e de novo no commit
+
+    O segundo incremento descarta um resumo calculado por outra requisição
+    enquanto a gravação ainda não estava visível.
+    """
+    bump(user_id)
+    transaction.on_commit(lambda: bump(user_id), using=using)
+
+
+def cached(user_id, name: str, compute: Callable[[], Dict]) -> Dict:
+    """Resultado de `compute` guardado sob a geração atual do usuário"""
+    key = f'accounts:{name}:{user_id}:{generation(user_id)}'
+    data = cache.get(key)
+    if data is None:
+        data = compute()
+        cache.set(key, data, getattr(settings, 'ACCOUNT_SUMMARY_CACHE_TIMEOUT', 1800))
+    return data
+
+
+def _format_brl(value) -> str:
+    return f'R$ {value:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def account_summary(user) -> Dict:
+    """Totais das contas ativas e por tipo (uma consulta agrupada)"""
+    Account = apps.get_model('financial_accounts', 'Account')
+
+    def compute():
+        rows = Account.objects.filter(user=user, is_active=True).order_by().values('type').annotate(
+            count=Count('id'),
+            total_balance=Sum('current_balance'),
+            net_worth=Sum('current_balance', filter=Q(current_balance__gt=0)),
+            total_debt=Sum(-F('current_balance'), filter=Q(current_balance__lt=0)),
+        )
+        labels = dict(Account.ACCOUNT_TYPES)
+        summary = {
+            'total_accounts': 0,
+            'total_balance': ZERO,
+            'net_worth': ZERO,
+            'total_debt': ZERO,
+            'accounts_by_type': {},
+        }
+        for row in sorted(rows, key=lambda row: row['type']):
+            summary['total_accounts'] += row['count']
+            summary['total_balance'] += row['total_balance'] or ZERO
+            summary['net_worth'] += row['net_worth'] or ZERO
+            summary['total_debt'] += row['total_debt'] or ZERO
+            summary['accounts_by_type'][labels.get(row['type'], row['type'])] = {
+                'count': row['count'],
+                'total_balance': row['total_balance'] or ZERO,
+            }
+        summary['total_balance_formatted'] = _format_brl(summary['total_balance'])
+        return summary
+
+    return cached(user.pk, 'account_summary', compute)
+
+
+def card_summary(user) -> Dict:
+    """Limites dos cartões ativos (uma agregação)"""
+    CreditCard = apps.get_model('financial_accounts', 'CreditCard')
+
+    def compute():
+        totals = CreditCard.objects.filter(user=user, is_active=True).aggregate(
+            total_cards=Count('id'),
+            total_limit=Sum('credit_limit'),
+            total_available=Sum('available_limit'),
+            cards_near_limit=Count('id', filter=Q(available_limit__lt=F('credit_limit') * NEAR_LIMIT_RATIO)),
+        )
+        total_limit = totals['total_limit'] or ZERO
+        total_available = totals['total_available'] or ZERO
+        total_used = total_limit - total_available
+        return {
+            'total_cards': totals['total_cards'],
+            'total_limit': total_limit,
+            'total_available': total_available,
+            'total_used': total_used,
+            'average_usage': (total_used / total_limit * 100) if total_limit > 0 else 0,
+            'cards_near_limit': totals['cards_near_limit'],
+        }
+
+    return cached(user.pk, 'card_summary', compute)
@@ -2,8 +2,8 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.db import transaction
-from django.db.models import F
 from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_date
 from .models import Account, CreditCard, CreditCardBill
 from .serializers import (
     AccountSerializer, AccountSummarySerializer,
@@ -11,6 +11,19 @@ from .serializers import (
     CreditCardBillSerializer, PayBillSerializer, TransferSerializer
 )
 
+STATEMENT_MAX_PAGE_SIZE = 200
+
+
+def _report_period(date_from, date_to):
+    """(date_from, date_to) dos relatórios; None se alguma data for inválida"""
+    try:
+        period = (parse_date(date_from or ''), parse_date(date_to or ''))
+    except ValueError:
+        return None
+    if (date_from and period[0] is None) or (date_to and period[1] is None):
+        return None
+    return period
+
 
 class AccountViewSet(viewsets.ModelViewSet):
     """
@@ -33,6 +46,26 @@ class AccountViewSet(viewsets.ModelViewSet):
         Retorna o saldo atual da conta
         """
         account = self.get_object()
+        
+        # Saldo em uma data (?date=AAAA-MM-DD): busca no razão, sem somar o histórico
+        on_date = request.query_params.get('date')
+        if on_date:
+            try:
+                parsed = parse_date(on_date)
+            except ValueError:
+                parsed = None
+            if parsed is None:
+                return Response(
+                    {'error': 'Data inválida. Use o formato AAAA-MM-DD.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            return Response({
+                'account_id': account.id,
+                'account_name': account.name,
+                'date': parsed,
+                'balance': account.balance_at(parsed),
+            })
+        
         account.update_balance()  # Atualizar saldo antes de retornar
         
         return Response({
@@ -43,15 +76,76 @@ class AccountViewSet(viewsets.ModelViewSet):
             'last_updated': account.updated_at
         })
 
+    @action(detail=True, methods=['get'])
+    def statement(self, request, pk=None):
+        """
+        Extrato da conta com o saldo após cada lançamento
+        
+        Paginação por cursor (?cursor=AAAA-MM-DD:id da última linha): cada
+        página custa o tamanho da página, em qualquer ponto do histórico.
+        """
+        from transactions import ledger
+        
+        account = self.get_object()
+        params = request.query_params
+        
+        try:
+            limit = min(max(int(params.get('page_size', 50)), 1), STATEMENT_MAX_PAGE_SIZE)
+        except ValueError:
+            limit = 50
+        
+        cursor = None
+        if params.get('cursor'):
+            on_date, _, transaction_id = params['cursor'].partition(':')
+            try:
+                parsed = parse_date(on_date)
+            except ValueError:
+                parsed = None
+            if parsed is None or not transaction_id.isdigit():
+                return Response({'error': 'Cursor inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+            cursor = (parsed, int(transaction_id))
+        
+        period = _report_period(params.get('date_from'), params.get('date_to'))
+        if period is None:
+            return Response(
+                {'error': 'Datas inválidas. Use o formato AAAA-MM-DD.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        postings, next_cursor = ledger.statement(account, cursor, *period, limit)
+        
+        lines = []
+        for posting in postings:
+            transaction_obj = posting.transaction
+            lines.append({
+                'date': posting.date,
+                'transaction_id': posting.transaction_id,
+                'description': transaction_obj.description,
+                'category': transaction_obj.category.name if transaction_obj.category_id else None,
+                'type': posting.type,
+                'amount': posting.amount,
+                'balance': account.initial_balance + posting.running_total,
+            })
+        
+        return Response({
+            'account_id': account.id,
+            'account_name': account.name,
+            'opening_balance': (lines[0]['balance'] - lines[0]['amount']) if lines else None,
+            'results': lines,
+            'next_cursor': f'{next_cursor[0].isoformat()}:{next_cursor[1]}' if next_cursor else None,
+        })
+
     @action(detail=True, methods=['get'])
     def transactions(self, request, pk=None):
         """
         Retorna as transações da conta
         """
+        from transactions.models import Transaction
         from transactions.serializers import TransactionSerializer
         
         account = self.get_object()
-        transactions = account.transaction_set.all().order_by('-date', '-created_at')
+        # Inclui transferências de e para a conta (via lançamentos)
+        transactions = Transaction.objects.filter(postings__account=account).order_by('-date', '-created_at')
         
         # Paginação
         page = self.paginate_queryset(transactions)
@@ -67,125 +161,75 @@ class AccountViewSet(viewsets.ModelViewSet):
         """
         Retorna resumo de todas as contas
         """
-        accounts = self.get_queryset().filter(is_active=True)
-        
-        # Calcular patrimônio líquido disponível (contas positivas)
-        net_worth = sum(account.current_balance for account in accounts if account.current_balance > 0)
+        from .summaries import account_summary
         
-        # Calcular passivo total (contas negativas)
-        total_debt = sum(abs(account.current_balance) for account in accounts if account.current_balance < 0)
-        
-        total_balance = sum(account.current_balance for account in accounts)
-        
-        summary_data = {
-            'total_accounts': accounts.count(),
-            'total_balance': total_balance,
-            'net_worth': net_worth,
-            'total_debt': total_debt,
-            'total_balance_formatted': f'R$ {total_balance:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.'),
-            'accounts_by_type': {}
-        }
+        # Uma agregação por tipo, em cache até a próxima gravação de conta
+        return Response(account_summary(request.user))
+
+    @action(detail=False, methods=['get'])
+    def net_worth_history(self, request):
+        """
+        Evolução do patrimônio (diária, semanal ou mensal) a partir dos saldos diários
         
-        # Agrupar por tipo
-        for account in accounts:
-            account_type = account.get_type_display()
-            if account_type not in summary_data['accounts_by_type']:
-                summary_data['accounts_by_type'][account_type] = {
-                    'count': 0,
-                    'total_balance': 0
-                }
-            
-            summary_data['accounts_by_type'][account_type]['count'] += 1
-            summary_data['accounts_by_type'][account_type]['total_balance'] += float(account.current_balance)
+        Parâmetros: date_from, date_to (AAAA-MM-DD; padrão: últimos 12 meses)
+        e interval (daily, weekly, monthly).
+        """
+        from datetime import timedelta
+        from django.utils import timezone
+        from .snapshots import INTERVALS, net_worth_series
+        
+        interval = request.query_params.get('interval', 'daily')
+        if interval not in INTERVALS:
+            return Response(
+                {'error': f"Intervalo inválido. Use: {', '.join(INTERVALS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        period = _report_period(request.query_params.get('date_from'), request.query_params.get('date_to'))
+        if period is not None:
+            date_to = period[1] or timezone.localdate()
+            date_from = period[0] or date_to - timedelta(days=365)
+        if period is None or date_from > date_to:
+            return Response(
+                {'error': 'Período inválido. Use date_from <= date_to no formato AAAA-MM-DD.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        return Response(summary_data)
+        return Response({
+            'date_from': date_from,
+            'date_to': date_to,
+            'interval': interval,
+            'series': net_worth_series(request.user, date_from, date_to, interval),
+        })
 
     @action(detail=True, methods=['get'])
     def report(self, request, pk=None):
         """
         Relatório detalhado de uma conta específica
         """
-        from transactions.models import Transaction
-        from django.db.models import Sum, Count, Q, F
-        from django.db.models.functions import TruncMonth
-        from datetime import datetime, timedelta
+        from .reports import account_report
         
         account = self.get_object()
         
         # Filtros de data
         date_from = request.query_params.get('date_from')
         date_to = request.query_params.get('date_to')
-        
-        # Query base para transações da conta
-        transactions_query = Transaction.objects.filter(
-            Q(account=account) |
-            Q(transfer_from_account=account) |
-            Q(transfer_to_account=account)
-        )
-        
-        if date_from:
-            transactions_query = transactions_query.filter(date__gte=date_from)
-        if date_to:
-            transactions_query = transactions_query.filter(date__lte=date_to)
-        
-        # Calcular totais por tipo
-        income_total = transactions_query.filter(
-            account=account, type='income'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        expense_total = transactions_query.filter(
-            account=account, type='expense'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        transfers_in = transactions_query.filter(
-            transfer_to_account=account, type='transfer'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        transfers_out = transactions_query.filter(
-            transfer_from_account=account, type='transfer'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        # Evolução mensal
-        monthly_data = transactions_query.annotate(
-            month=TruncMonth('date')
-        ).values('month').annotate(
-            income=Sum('amount', filter=Q(account=account, type='income')),
-            expense=Sum('amount', filter=Q(account=account, type='expense')),
-            transfers_in=Sum('amount', filter=Q(transfer_to_account=account, type='transfer')),
-            transfers_out=Sum('amount', filter=Q(transfer_from_account=account, type='transfer')),
-            transaction_count=Count('id')
-        ).order_by('month')
-        
-        # Gastos por categoria
-        category_breakdown = transactions_query.filter(
-            account=account, type='expense'
-        ).values('category__name', 'category__color').annotate(
-            total=Sum('amount'),
-            count=Count('id')
-        ).order_by('-total')
-        
-        # Transações recentes
-        recent_transactions = transactions_query.order_by('-date', '-created_at')[:10]
-        from transactions.serializers import TransactionSerializer
-        recent_serializer = TransactionSerializer(recent_transactions, many=True)
-        
+        period = _report_period(date_from, date_to)
+        if period is None:
+            return Response(
+                {'error': 'Datas inválidas. Use o formato AAAA-MM-DD.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Uma varredura do razão para totais e evolução mensal, em cache
+        # até a próxima gravação nas contas do usuário
         report_data = {
             'account': AccountSerializer(account).data,
             'period': {
                 'date_from': date_from,
                 'date_to': date_to
             },
-            'totals': {
-                'income': income_total,
-                'expense': expense_total,
-                'transfers_in': transfers_in,
-                'transfers_out': transfers_out,
-                'net_flow': income_total - expense_total + transfers_in - transfers_out,
-                'transaction_count': transactions_query.count()
-            },
-            'monthly_evolution': list(monthly_data),
-            'category_breakdown': list(category_breakdown),
-            'recent_transactions': recent_serializer.data
+            **account_report(account, *period)
         }
         
         return Response(report_data)
@@ -267,98 +311,48 @@ class CreditCardViewSet(viewsets.ModelViewSet):
         """
         Retorna resumo de todos os cartões
         """
-        cards = self.get_queryset().filter(is_active=True)
-        
-        total_limit = sum(card.credit_limit for card in cards)
-        total_available = sum(card.available_limit for card in cards)
-        total_used = total_limit - total_available
-        
-        summary_data = {
-            'total_cards': cards.count(),
-            'total_limit': total_limit,
-            'total_available': total_available,
-            'total_used': total_used,
-            'average_usage': (total_used / total_limit * 100) if total_limit > 0 else 0,
-            'cards_near_limit': cards.filter(available_limit__lt=F('credit_limit') * 0.2).count()
-        }
+        from .summaries import card_summary
         
-        return Response(summary_data)
+        # Uma agregação, em cache até a próxima gravação de cartão
+        return Response(card_summary(request.user))
 
     @action(detail=True, methods=['get'])
     def report(self, request, pk=None):
         """
         Relatório detalhado de um cartão específico
         """
-        from transactions.models import Transaction
-        from django.db.models import Sum, Count, Q
-        from django.db.models.functions import TruncMonth
-        from datetime import datetime, timedelta
+        from .reports import card_report
         
         card = self.get_object()
         
         # Filtros de data
         date_from = request.query_params.get('date_from')
         date_to = request.query_params.get('date_to')
-        
-        # Query base para transações do cartão
-        transactions_query = Transaction.objects.filter(credit_card=card)
-        
-        if date_from:
-            transactions_query = transactions_query.filter(date__gte=date_from)
-        if date_to:
-            transactions_query = transactions_query.filter(date__lte=date_to)
-        
-        # Calcular totais
-        total_spent = transactions_query.filter(
-            type='expense'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        # Evolução mensal de gastos
-        monthly_data = transactions_query.filter(
-            type='expense'
-        ).annotate(
-            month=TruncMonth('date')
-        ).values('month').annotate(
-            total_spent=Sum('amount'),
-            transaction_count=Count('id')
-        ).order_by('month')
-        
-        # Gastos por categoria
-        category_breakdown = transactions_query.filter(
-            type='expense'
-        ).values('category__name', 'category__color').annotate(
-            total=Sum('amount'),
-            count=Count('id')
-        ).order_by('-total')
-        
-        # Transações recentes
-        recent_transactions = transactions_query.order_by('-date', '-created_at')[:10]
-        from transactions.serializers import TransactionSerializer
-        recent_serializer = TransactionSerializer(recent_transactions, many=True)
-        
-        # Informações do limite
-        card.update_available_limit()
-        
+        period = _report_period(date_from, date_to)
+        if period is None:
+            return Response(
+                {'error': 'Datas inválidas. Use o formato AAAA-MM-DD.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # O limite disponível já é mantido a cada gravação (faturas)
+        report = card_report(card, *period)
         report_data = {
             'card': CreditCardSerializer(card).data,
             'period': {
                 'date_from': date_from,
                 'date_to': date_to
             },
-            'totals': {
-                'total_spent': total_spent,
-                'transaction_count': transactions_query.count(),
-                'average_transaction': total_spent / transactions_query.count() if transactions_query.count() > 0 else 0
-            },
+            'totals': report['totals'],
             'limit_info': {
                 'credit_limit': card.credit_limit,
                 'available_limit': card.available_limit,
                 'used_limit': card.used_limit,
                 'usage_percentage': card.usage_percentage
             },
-            'monthly_evolution': list(monthly_data),
-            'category_breakdown': list(category_breakdown),
-            'recent_transactions': recent_serializer.data
+            'monthly_evolution': report['monthly_evolution'],
+            'category_breakdown': report['category_breakdown'],
+            'recent_transactions': report['recent_transactions']
         }
         
         return Response(report_data)
@@ -455,12 +449,7 @@ class CreditCardBillViewSet(viewsets.ModelViewSet):
         """
         Retorna faturas vencidas
         """
-        from datetime import date
-        
-        overdue_bills = self.get_queryset().filter(
-            due_date__lt=date.today(),
-            status__in=['open', 'closed']
-        ).order_by('due_date')
+        overdue_bills = self.get_queryset().filter(status='overdue').order_by('due_date')
         
         serializer = self.get_serializer(overdue_bills, many=True)
         return Response(serializer.data)
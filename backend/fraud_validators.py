@@ -2,10 +2,12 @@ import re
 from decimal import Decimal
 from datetime import datetime, timedelta
 from django.core.exceptions import ValidationError
-from django.core.cache import cache
 from django.utils import timezone
 import logging
 
+from utils import risk_scoring
+from utils.fraud_profile import LOCATION_SUSPICIOUS, get_fraud_profile_store
+
 logger = logging.getLogger('fraud_detection')
 
 
@@ -15,167 +17,84 @@ class FraudValidators:
     @staticmethod
     def validate_velocity_check(user, amount, time_window=3600):
         """Verifica velocidade de transações (velocity check)"""
-        cache_key = f"velocity_{user.id}"
-        transactions = cache.get(cache_key, [])
-        
-        current_time = timezone.now().timestamp()
-        cutoff_time = current_time - time_window
-        
-        # Filtrar transações dentro da janela de tempo
-        recent_transactions = [
-            tx for tx in transactions 
-            if tx['timestamp'] > cutoff_time
-        ]
-        
-        # Adicionar transação atual
-        recent_transactions.append({
-            'amount': float(amount),
-            'timestamp': current_time
-        })
-        
-        # Verificar limites
-        total_amount = sum(tx['amount'] for tx in recent_transactions)
-        transaction_count = len(recent_transactions)
+        # Contadores por fatia da janela: custo constante por transação
+        result = get_fraud_profile_store().velocity(
+            user.id, float(amount), time_window,
+            max_count=50,  # 50 transações/hora
+            max_amount=20000,  # R$ 20.000/hora
+        )
         
         # Limites por hora
-        if total_amount > 20000:  # R$ 20.000/hora
+        if result.reason == 'amount':
             raise ValidationError('Limite de valor por hora excedido')
         
-        if transaction_count > 50:  # 50 transações/hora
+        if result.reason == 'count':
             raise ValidationError('Limite de transações por hora excedido')
         
-        # Salvar no cache
-        cache.set(cache_key, recent_transactions, time_window)
         return True
     
     @staticmethod
     def validate_geolocation_risk(user, request_ip, location_data=None):
         """Valida risco baseado em geolocalização"""
-        cache_key = f"geo_locations_{user.id}"
-        known_locations = cache.get(cache_key, [])
-        
-        current_location = {
-            'ip': request_ip,
-            'timestamp': timezone.now().timestamp(),
-            'country': location_data.get('country') if location_data else 'BR'
-        }
-        
-        # Verificar se é uma localização conhecida
-        is_known_location = any(
-            loc['ip'] == request_ip for loc in known_locations
+        country = location_data.get('country') if location_data else 'BR'
+        
+        # Localização nova só é registrada se não houver mudança suspeita:
+        # último local novo há menos de 1 hora e em outro país
+        result = get_fraud_profile_store().add_location(
+            user.id, request_ip, country, suspicious_within=3600
         )
         
-        if not is_known_location:
-            # Verificar se há mudança geográfica suspeita
-            if known_locations:
-                last_location = max(known_locations, key=lambda x: x['timestamp'])
-                time_diff = current_location['timestamp'] - last_location['timestamp']
-                
-                # Se última transação foi há menos de 1 hora e país diferente
-                if (time_diff < 3600 and 
-                    last_location.get('country') != current_location['country']):
-                    logger.warning(
-                        f"Suspicious location change for user {user.id}: "
-                        f"{last_location.get('country')} -> {current_location['country']}"
-                    )
-                    raise ValidationError('Mudança de localização suspeita detectada')
-            
-            # Adicionar nova localização
-            known_locations.append(current_location)
-            # Manter apenas últimas 10 localizações
-            known_locations = known_locations[-10:]
-            cache.set(cache_key, known_locations, 86400 * 30)  # 30 dias
+        if result.status == LOCATION_SUSPICIOUS:
+            logger.warning(
+                f"Suspicious location change for user {user.id}: "
+                f"{result.last_country} -> {country}"
+            )
+            raise ValidationError('Mudança de localização suspeita detectada')
         
         return True
     
     @staticmethod
     def validate_behavioral_pattern(user, transaction_data):
         """Valida padrões comportamentais do usuário"""
-        cache_key = f"behavior_{user.id}"
-        behavior_data = cache.get(cache_key, {
-            'avg_amount': 0,
-            'common_categories': [],
-            'usual_times': [],
-            'transaction_count': 0
-        })
-        
         amount = float(transaction_data.get('amount', 0))
         category = transaction_data.get('category', '')
         hour = timezone.now().hour
         
-        # Atualizar dados comportamentais
-        behavior_data['transaction_count'] += 1
-        
-        # Calcular média de valores
-        if behavior_data['transaction_count'] > 1:
-            current_avg = behavior_data['avg_amount']
-            new_avg = ((current_avg * (behavior_data['transaction_count'] - 1)) + amount) / behavior_data['transaction_count']
-            behavior_data['avg_amount'] = new_avg
-        else:
-            behavior_data['avg_amount'] = amount
-        
-        # Atualizar categorias comuns
-        if category not in behavior_data['common_categories']:
-            behavior_data['common_categories'].append(category)
-        
-        # Atualizar horários usuais
-        behavior_data['usual_times'].append(hour)
-        behavior_data['usual_times'] = behavior_data['usual_times'][-50:]  # Últimas 50
+        # Atualiza o perfil (EWMA, histograma de horas, categorias) e
+        # compara a transação com o estado anterior a ela
+        profile = get_fraud_profile_store().observe(user.id, amount, hour, category)
         
         # Verificar anomalias
-        if behavior_data['transaction_count'] > 10:
+        if profile.count >= 10:
             # Valor muito acima da média
-            if amount > behavior_data['avg_amount'] * 5:
-                logger.warning(f"Unusual amount for user {user.id}: {amount} vs avg {behavior_data['avg_amount']}")
+            zscore = profile.zscore(amount)
+            if amount > profile.mean * 5 or zscore > 4:
+                logger.warning(
+                    f"Unusual amount for user {user.id}: {amount} vs avg {profile.mean:.2f} (z={zscore:.1f})"
+                )
             
             # Horário incomum
-            common_hours = set(behavior_data['usual_times'])
-            if len(common_hours) > 5 and hour not in common_hours:
+            if profile.distinct_hours > 5 and not profile.hour_count:
                 logger.info(f"Unusual time for user {user.id}: {hour}h")
+            
+            # Categoria nunca usada
+            if not profile.category_count:
+                logger.info(f"Unusual category for user {user.id}: {category}")
         
-        cache.set(cache_key, behavior_data, 86400 * 7)  # 7 dias
         return True
     
     @staticmethod
     def validate_device_consistency(user, device_fingerprint):
         """Valida consistência do dispositivo"""
-        cache_key = f"device_consistency_{user.id}"
-        device_data = cache.get(cache_key, {})
-        
         if not device_fingerprint:
             return True
         
-        current_fp = str(device_fingerprint)
-        
-        if 'fingerprints' not in device_data:
-            device_data['fingerprints'] = []
-        
-        # Verificar se é um dispositivo conhecido
-        is_known = any(
-            fp['fingerprint'] == current_fp 
-            for fp in device_data['fingerprints']
-        )
+        # Mantém os últimos 5 dispositivos com o último acesso de cada um
+        is_new = get_fraud_profile_store().touch_device(user.id, str(device_fingerprint))
         
-        if not is_known:
-            # Novo dispositivo
-            device_data['fingerprints'].append({
-                'fingerprint': current_fp,
-                'first_seen': timezone.now().timestamp(),
-                'last_seen': timezone.now().timestamp()
-            })
-            
-            # Manter apenas últimos 5 dispositivos
-            device_data['fingerprints'] = device_data['fingerprints'][-5:]
-            
+        if is_new:
             logger.info(f"New device detected for user {user.id}")
-        else:
-            # Atualizar último acesso
-            for fp in device_data['fingerprints']:
-                if fp['fingerprint'] == current_fp:
-                    fp['last_seen'] = timezone.now().timestamp()
-                    break
         
-        cache.set(cache_key, device_data, 86400 * 30)  # 30 dias
         return True
     
     @staticmethod
@@ -186,23 +105,39 @@ class FraudValidators:
         
         amounts = [float(tx.get('amount', 0)) for tx in transactions_list]
         
-        # Verificar valores idênticos repetidos
-        identical_count = {}
-        for amount in amounts:
-            identical_count[amount] = identical_count.get(amount, 0) + 1
+        if risk_scoring.is_available():
+            identical_share, is_progression = risk_scoring.amount_pattern(amounts)
+        else:
+            # Verificar valores idênticos repetidos
+            identical_count = {}
+            for amount in amounts:
+                identical_count[amount] = identical_count.get(amount, 0) + 1
+            identical_share = max(identical_count.values()) / len(amounts)
+            
+            # Verificar progressão aritmética (possível teste de limites)
+            diffs = [amounts[i+1] - amounts[i] for i in range(len(amounts)-1)]
+            is_progression = len(amounts) >= 5 and len(set(diffs)) == 1 and diffs[0] > 0
         
-        max_identical = max(identical_count.values())
-        if max_identical > len(amounts) * 0.7:  # Mais de 70% iguais
+        if identical_share > 0.7:  # Mais de 70% iguais
             raise ValidationError('Padrão suspeito: muitos valores idênticos')
         
-        # Verificar progressão aritmética (possível teste de limites)
-        if len(amounts) >= 5:
-            diffs = [amounts[i+1] - amounts[i] for i in range(len(amounts)-1)]
-            if len(set(diffs)) == 1 and diffs[0] > 0:  # Progressão constante
-                logger.warning("Arithmetic progression detected in transactions")
+        if is_progression:  # Progressão constante
+            logger.warning("Arithmetic progression detected in transactions")
         
         return True
     
+    @staticmethod
+    def calculate_batch_risk_scores(user, amounts, timestamps=None, categories=None, context_data=None):
+        """
+        Score de risco vetorizado de um lote (importações/bulk_create)
+        
+        Recebe arrays de valores, timestamps (epoch) e categorias e devolve
+        o BatchRiskResult com scores 0-100, níveis e features por linha.
+        `context_data` soma os mesmos fatores de calculate_risk_score.
+        """
+        profile = get_fraud_profile_store().profile(user.id) if user is not None else None
+        return risk_scoring.score_batch(amounts, timestamps, categories, profile=profile, context=context_data)
+    
     @staticmethod
     def calculate_risk_score(user, transaction_data, context_data):
         """Calcula score de risco da transação"""
@@ -5,6 +5,8 @@ from decimal import Decimal
 from django.utils import timezone
 from datetime import datetime, timedelta
 
+from nossa_grana.sharding import ShardedManager
+
 
 class Goal(models.Model):
     """
@@ -32,6 +34,8 @@ class Goal(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ShardedManager()
+
     class Meta:
         verbose_name = 'Meta de Poupança'
         verbose_name_plural = 'Metas de Poupança'
@@ -128,6 +132,8 @@ class GoalContribution(models.Model):
     date = models.DateField(default=timezone.now, verbose_name='Data')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ShardedManager()
+
     class Meta:
         verbose_name = 'Contribuição para Meta'
         verbose_name_plural = 'Contribuições para Metas'
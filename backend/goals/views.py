@@ -5,6 +5,7 @@ from django.db.models import Sum, Count, Avg, Q
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
+from nossa_grana.db_router import read_replica
 from .models import Goal, GoalContribution
 from .serializers import (
     GoalSerializer, GoalContributionSerializer, GoalSummarySerializer,
@@ -236,6 +237,7 @@ class GoalViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
+    @read_replica
     def statistics(self, request):
         """
         Estatísticas detalhadas das metas
@@ -291,6 +293,7 @@ class GoalViewSet(viewsets.ModelViewSet):
         })
 
     @action(detail=True, methods=['get'])
+    @read_replica
     def progress_analysis(self, request, pk=None):
         """
         Análise detalhada de progresso de uma meta específica
@@ -347,6 +350,7 @@ class GoalViewSet(viewsets.ModelViewSet):
         })
 
     @action(detail=False, methods=['get'])
+    @read_replica
     def performance_dashboard(self, request):
         """
         Dashboard de performance geral das metas
@@ -2,6 +2,7 @@ from django.core.exceptions import ValidationError
 from .validators import SecurityValidators, ComplianceValidators
 from .crypto_validators import CryptoValidators
 from .fraud_validators import FraudValidators
+from utils import risk_scoring
 
 
 class MainValidator:
@@ -15,7 +16,7 @@ class MainValidator:
         self.crypto = CryptoValidators()
         self.fraud = FraudValidators()
     
-    def validate_transaction(self, transaction_data):
+    def validate_transaction(self, transaction_data, risk_score=None):
         """Validação completa de transação"""
         # Validações básicas de segurança
         amount = self.security.validate_amount(transaction_data['amount'])
@@ -29,13 +30,9 @@ class MainValidator:
         self.compliance.validate_audit_trail(transaction_data, self.user)
         self.compliance.validate_anti_money_laundering(transaction_data, self.user)
         
-        # Calcular score de risco
-        context = {
-            'new_device': self.request_data.get('new_device', False),
-            'new_location': self.request_data.get('new_location', False),
-            'high_frequency': self.request_data.get('high_frequency', False)
-        }
-        risk_score = self.fraud.calculate_risk_score(self.user, transaction_data, context)
+        # Calcular score de risco (em lote já vem calculado)
+        if risk_score is None:
+            risk_score = self.fraud.calculate_risk_score(self.user, transaction_data, self._risk_context())
         
         return {
             'valid': True,
@@ -44,6 +41,14 @@ class MainValidator:
             'risk_score': risk_score
         }
     
+    def _risk_context(self):
+        """Fatores de risco da requisição"""
+        return {
+            'new_device': self.request_data.get('new_device', False),
+            'new_location': self.request_data.get('new_location', False),
+            'high_frequency': self.request_data.get('high_frequency', False)
+        }
+    
     def validate_account_operation(self, operation_data):
         """Validação de operações em conta"""
         # Validar propriedade
@@ -105,15 +110,29 @@ class MainValidator:
         self.security.validate_sensitive_operation(self.user, operation_type)
         
         # Validar padrões suspeitos
+        risk_levels = None
         if operation_type == 'bulk_transactions':
             self.fraud.validate_transaction_pattern(operations_list)
+            
+            # Score de risco do lote inteiro de uma vez (vetorizado)
+            if operations_list and risk_scoring.is_available():
+                batch = self.fraud.calculate_batch_risk_scores(
+                    self.user,
+                    [float(op.get('amount', 0)) for op in operations_list],
+                    [risk_scoring.to_timestamp(op.get('timestamp')) for op in operations_list],
+                    [str(op.get('category', '')) for op in operations_list],
+                    self._risk_context(),
+                )
+                risk_levels = batch.levels.tolist()
         
         # Validar cada operação individualmente
         results = []
-        for operation in operations_list:
+        for index, operation in enumerate(operations_list):
             try:
                 if operation_type == 'bulk_transactions':
-                    result = self.validate_transaction(operation)
+                    result = self.validate_transaction(
+                        operation, risk_score=risk_levels[index] if risk_levels else None
+                    )
                 else:
                     result = self.validate_account_operation(operation)
                 results.append(result)
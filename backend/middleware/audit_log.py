@@ -1,9 +1,8 @@
-import json
 import logging
 from django.utils.deprecation import MiddlewareMixin
 from django.contrib.auth.models import AnonymousUser
 
-audit_logger = logging.getLogger('audit')
+from utils.audit import audit, sanitize_data
 
 class AuditLogMiddleware(MiddlewareMixin):
     """Middleware para logs de auditoria de transações financeiras"""
@@ -38,32 +37,31 @@ class AuditLogMiddleware(MiddlewareMixin):
         return response
     
     def log_audit_event(self, request, response):
+        """Enfileira o evento; parse, sanitização e gravação ocorrem em background"""
         try:
             audit_data = request._audit_data
+            user = audit_data['user']
+            is_anonymous = isinstance(user, AnonymousUser)
             
-            log_entry = {
-                'timestamp': self.get_timestamp(),
-                'user_id': audit_data['user'].id if not isinstance(audit_data['user'], AnonymousUser) else None,
-                'username': audit_data['user'].username if not isinstance(audit_data['user'], AnonymousUser) else 'anonymous',
-                'method': audit_data['method'],
-                'path': audit_data['path'],
-                'status_code': response.status_code,
-                'ip_address': audit_data['ip'],
-                'user_agent': audit_data['user_agent'][:200],  # Limitar tamanho
-            }
-            
-            # Adicionar dados do body para operações críticas
+            # Corpo bruto apenas para operações críticas bem-sucedidas
+            body = None
             if request.method in ['POST', 'PUT', 'PATCH'] and response.status_code < 400:
                 try:
-                    if hasattr(request, 'body') and request.body:
-                        body_data = json.loads(request.body.decode('utf-8'))
-                        # Remover dados sensíveis do log
-                        sanitized_data = self.sanitize_data(body_data)
-                        log_entry['request_data'] = sanitized_data
-                except:
+                    body = request.body or None
+                except Exception:
                     pass
             
-            audit_logger.info(json.dumps(log_entry, ensure_ascii=False))
+            audit(
+                'audit',
+                user_id=None if is_anonymous else user.id,
+                username='anonymous' if is_anonymous else user.username,
+                method=audit_data['method'],
+                path=audit_data['path'],
+                status_code=response.status_code,
+                ip_address=audit_data['ip'],
+                user_agent=audit_data['user_agent'][:200],  # Limitar tamanho
+                body=body,
+            )
             
         except Exception as e:
             # Não deve quebrar a aplicação se o log falhar
@@ -71,19 +69,7 @@ class AuditLogMiddleware(MiddlewareMixin):
     
     def sanitize_data(self, data):
         """Remove dados sensíveis dos logs"""
-        if isinstance(data, dict):
-            sanitized = {}
-            for key, value in data.items():
-                if key.lower() in ['password', 'token', 'secret', 'key']:
-                    sanitized[key] = '***REDACTED***'
-                elif isinstance(value, (dict, list)):
-                    sanitized[key] = self.sanitize_data(value)
-                else:
-                    sanitized[key] = value
-            return sanitized
-        elif isinstance(data, list):
-            return [self.sanitize_data(item) for item in data]
-        return data
+        return sanitize_data(data)
     
     def get_client_ip(self, request):
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -92,7 +78,3 @@ class AuditLogMiddleware(MiddlewareMixin):
         else:
             ip = request.META.get('REMOTE_ADDR')
         return ip
-    
-    def get_timestamp(self):
-        from datetime import datetime
-        return datetime.now().isoformat()
\ No newline at end of file
@@ -1,10 +1,14 @@
 from django.http import JsonResponse
 from django.urls import resolve
 from django.core.cache import cache
-from django.utils import timezone
+from django.conf import settings
 import logging
 import hashlib
-import json
+import time
+
+from utils.audit import audit
+from utils.rate_limit import TOKEN_BUCKET, get_rate_limiter
+from .injection_scanner import InjectionScanner
 
 logger = logging.getLogger('financial_security')
 
@@ -25,14 +29,18 @@ class FinancialSecurityMiddleware:
     def __call__(self, request):
         # Rate limiting por usuário
         if request.user.is_authenticated and self._is_financial_endpoint(request):
-            if not self._check_rate_limit(request):
+            rate_limit = self._check_rate_limit(request)
+            if not rate_limit.allowed:
                 logger.warning(
                     f"Rate limit exceeded: {request.user.id} from {self._get_client_ip(request)}"
                 )
-                return JsonResponse(
+                response = JsonResponse(
                     {'error': 'Muitas requisições. Tente novamente em alguns minutos.'}, 
                     status=429
                 )
+                for header, value in rate_limit.headers().items():
+                    response[header] = value
+                return response
             
             # Validar acesso a dados financeiros
             if not self._validate_financial_access(request):
@@ -60,16 +68,13 @@ class FinancialSecurityMiddleware:
         return ip
 
     def _check_rate_limit(self, request):
-        """Implementa rate limiting por usuário"""
-        user_id = request.user.id
-        cache_key = f"rate_limit_financial_{user_id}"
-        
-        current_requests = cache.get(cache_key, 0)
-        if current_requests >= self.max_requests_per_window:
-            return False
-        
-        cache.set(cache_key, current_requests + 1, self.rate_limit_window)
-        return True
+        """Implementa rate limiting por usuário (token bucket atômico)"""
+        return get_rate_limiter().hit(
+            f"financial:{request.user.id}",
+            limit=self.max_requests_per_window,
+            window=self.rate_limit_window,
+            algorithm=TOKEN_BUCKET,
+        )
 
     def _is_financial_endpoint(self, request):
         """Verifica se é um endpoint financeiro"""
@@ -156,16 +161,14 @@ class FinancialSecurityMiddleware:
         critical_operations = ['POST', 'PUT', 'PATCH', 'DELETE']
         
         if request.method in critical_operations:
-            log_data = {
-                'user_id': request.user.id,
-                'method': request.method,
-                'path': request.path,
-                'ip': self._get_client_ip(request),
-                'timestamp': timezone.now().isoformat(),
-                'user_agent': request.META.get('HTTP_USER_AGENT', '')[:200]
-            }
-            
-            logger.info(f"Financial operation: {json.dumps(log_data)}")
+            audit(
+                'financial_operation',
+                user_id=request.user.id,
+                method=request.method,
+                path=request.path,
+                ip=self._get_client_ip(request),
+                user_agent=request.META.get('HTTP_USER_AGENT', '')[:200],
+            )
 
 
 class SecurityAuditMiddleware:
@@ -175,11 +178,14 @@ class SecurityAuditMiddleware:
     
     def __init__(self, get_response):
         self.get_response = get_response
-        self.suspicious_patterns = [
-            'union select', 'drop table', 'delete from',
-            '<script', 'javascript:', 'eval(',
-            '../', '..\\', 'cmd.exe'
-        ]
+        self.scanner = InjectionScanner(
+            patterns=getattr(settings, 'SECURITY_SCAN_PATTERNS', None),
+            max_body_size=getattr(settings, 'SECURITY_SCAN_MAX_BODY_SIZE', 1048576),
+            sample_size=getattr(settings, 'SECURITY_SCAN_SAMPLE_SIZE', 65536),
+            oversize_mode=getattr(settings, 'SECURITY_SCAN_OVERSIZE_MODE', 'sample'),
+        )
+        self.suspicious_patterns = self.scanner.patterns
+        self.trusted_bulk_paths = getattr(settings, 'SECURITY_SCAN_TRUSTED_BULK_PATHS', [])
 
     def __call__(self, request):
         # Detectar tentativas de injeção
@@ -196,6 +202,13 @@ class SecurityAuditMiddleware:
             )
 
         response = self.get_response(request)
+
+        scan = getattr(request, '_injection_scan', None)
+        if scan is not None:
+            timing = f"injection-scan;dur={scan.duration_ms:.3f}"
+            if response.has_header('Server-Timing'):
+                timing = f"{response['Server-Timing']}, {timing}"
+            response['Server-Timing'] = timing
         return response
 
     def _get_client_ip(self, request):
@@ -207,25 +220,51 @@ class SecurityAuditMiddleware:
             ip = request.META.get('REMOTE_ADDR')
         return ip
 
+    def _is_trusted_bulk_request(self, request):
+        """Requisição autenticada para um endpoint de carga em lote confiável"""
+        if not any(request.path.startswith(path) for path in self.trusted_bulk_paths):
+            return False
+
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return True
+
+        # A API usa JWT, autenticado só na view: validar apenas o token (sem banco)
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if not header.startswith('Bearer '):
+            return False
+        try:
+            from rest_framework_simplejwt.authentication import JWTAuthentication
+            JWTAuthentication().get_validated_token(header.split(' ', 1)[1].encode())
+            return True
+        except Exception:
+            return False
+
     def _detect_injection_attempts(self, request):
         """Detecta tentativas de injeção SQL/XSS"""
         try:
-            # Verificar parâmetros GET
-            for key, value in request.GET.items():
-                if self._contains_suspicious_content(value.lower()):
-                    return True
+            start = time.perf_counter()
+            scan = self.scanner.scan_values(
+                [value for _, values in request.GET.lists() for value in values]
+            )
             
             # Verificar dados POST
-            if hasattr(request, 'body') and request.body:
-                body_str = request.body.decode('utf-8', errors='ignore').lower()
-                if self._contains_suspicious_content(body_str):
-                    return True
-            
-            return False
+            if not scan.detected and request.body:
+                body_scan = self.scanner.scan_body(
+                    request.body, trusted=self._is_trusted_bulk_request(request)
+                )
+                body_scan.scanned_bytes += scan.scanned_bytes
+                scan = body_scan
+
+            scan.duration_ms = (time.perf_counter() - start) * 1000
+            request._injection_scan = scan
+            return scan.detected
             
         except Exception:
             return False
 
     def _contains_suspicious_content(self, content):
         """Verifica se o conteúdo contém padrões suspeitos"""
-        return any(pattern in content for pattern in self.suspicious_patterns)
\ No newline at end of file
+        if isinstance(content, str):
+            content = content.encode('utf-8', errors='ignore')
+        return self.scanner.search(content) is not None
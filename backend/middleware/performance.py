@@ -1,11 +1,18 @@
+from django.conf import settings
 from django.core.cache import cache
 from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
 from django.db import connection
+import logging
+import random
 import time
 import json
 import hashlib
 
+from utils.performance import QueryMonitor, instrument_queries
+
+logger = logging.getLogger('nossa_grana.performance')
+
 class PerformanceMiddleware(MiddlewareMixin):
     """Middleware para otimização de performance"""
     
@@ -44,7 +51,8 @@ class PerformanceMiddleware(MiddlewareMixin):
             self._cache_response(request, response)
         
         # Adicionar headers de performance
-        response['X-DB-Queries'] = len(connection.queries)
+        monitor = getattr(request, '_query_monitor', None)
+        response['X-DB-Queries'] = monitor.query_count if monitor else len(connection.queries)
         
         return response
     
@@ -98,6 +106,11 @@ class DatabaseOptimizationMiddleware(MiddlewareMixin):
         return None
     
     def process_response(self, request, response):
+        # Com QueryInstrumentationMiddleware ativo, as queries lentas já são
+        # registradas pelo QueryMonitor (inclusive com DEBUG=False)
+        if hasattr(request, '_query_monitor'):
+            return response
+        
         # Log de queries lentas
         slow_queries = [
             query for query in connection.queries 
@@ -111,6 +124,62 @@ class DatabaseOptimizationMiddleware(MiddlewareMixin):
         
         return response
 
+class QueryInstrumentationMiddleware:
+    """
+    Instrumentação de SQL por requisição via connection.execute_wrapper
+
+    Funciona em produção (não depende de DEBUG). Toda requisição conta queries
+    e tempo total; uma amostra (SQL_INSTRUMENTATION_SAMPLE_RATE) também agrupa
+    statements normalizados para detectar N+1. Queries lentas são sempre
+    logadas. Usuários staff recebem os números em X-DB-Queries/Server-Timing.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'SQL_INSTRUMENTATION_SAMPLE_RATE', 1.0)
+        self.slow_threshold = getattr(settings, 'SQL_SLOW_QUERY_THRESHOLD', 0.1)
+        self.n_plus_one_threshold = getattr(settings, 'SQL_N_PLUS_ONE_THRESHOLD', 5)
+    
+    def __call__(self, request):
+        monitor = QueryMonitor(
+            slow_threshold=self.slow_threshold,
+            detailed=random.random() < self.sample_rate,
+        )
+        request._query_monitor = monitor
+        
+        with instrument_queries(monitor):
+            response = self.get_response(request)
+        
+        if monitor.detailed:
+            self._report_repeated_statements(request, monitor)
+        
+        user = getattr(request, 'user', None)
+        if user is not None and getattr(user, 'is_staff', False):
+            self._add_headers(response, monitor)
+        
+        return response
+    
+    def _report_repeated_statements(self, request, monitor):
+        """Loga statements idênticos repetidos (padrão N+1) com o nome da view"""
+        repeated = monitor.repeated_statements(self.n_plus_one_threshold)
+        if not repeated:
+            return
+        
+        match = getattr(request, 'resolver_match', None)
+        view_name = (match.view_name or match._func_path) if match else request.path
+        for statement in repeated:
+            logger.warning(
+                f"Possible N+1 in {view_name}: {statement['count']}x {statement['query'][:300]}"
+            )
+    
+    def _add_headers(self, response, monitor):
+        response['X-DB-Queries'] = monitor.query_count
+        timing = f'db;dur={monitor.total_time * 1000:.3f};desc="{monitor.query_count} queries"'
+        if response.has_header('Server-Timing'):
+            timing = f"{response['Server-Timing']}, {timing}"
+        response['Server-Timing'] = timing
+
+
 class CompressionMiddleware(MiddlewareMixin):
     """Middleware para compressão de respostas"""
     
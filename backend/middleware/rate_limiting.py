@@ -1,8 +1,8 @@
-import time
-from django.core.cache import cache
 from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
 
+from utils.rate_limit import SLIDING_WINDOW, get_rate_limiter
+
 class RateLimitMiddleware(MiddlewareMixin):
     """Middleware para rate limiting das APIs"""
     
@@ -25,16 +25,20 @@ class RateLimitMiddleware(MiddlewareMixin):
         client_ip = self.get_client_ip(request)
         
         # Verificar rate limit
-        if self.is_rate_limited(request.path, client_ip, request.method):
-            return JsonResponse({
+        result = self.check_rate_limit(request.path, client_ip, request.method)
+        if not result.allowed:
+            response = JsonResponse({
                 'error': 'Rate limit exceeded',
                 'message': 'Muitas requisições. Tente novamente mais tarde.',
-                'retry_after': 60
+                'retry_after': result.retry_after
             }, status=429)
+            for header, value in result.headers().items():
+                response[header] = value
+            return response
         
         return None
     
-    def is_rate_limited(self, path, client_ip, method):
+    def get_limit_config(self, path, method):
         # Aplicar rate limiting mais restritivo para métodos que modificam dados
         multiplier = 0.5 if method in ['POST', 'PUT', 'PATCH', 'DELETE'] else 1.0
         
@@ -50,29 +54,20 @@ class RateLimitMiddleware(MiddlewareMixin):
         
         # Aplicar multiplicador
         config['requests'] = int(config['requests'] * multiplier)
-        
-        # Chave do cache
-        cache_key = f'rate_limit:{client_ip}:{path}:{method}'
-        
-        # Obter dados do cache
-        current_time = int(time.time())
-        requests_data = cache.get(cache_key, [])
-        
-        # Filtrar requisições dentro da janela de tempo
-        window_start = current_time - config['window']
-        requests_data = [req_time for req_time in requests_data if req_time > window_start]
-        
-        # Verificar se excedeu o limite
-        if len(requests_data) >= config['requests']:
-            return True
-        
-        # Adicionar requisição atual
-        requests_data.append(current_time)
-        
-        # Salvar no cache
-        cache.set(cache_key, requests_data, config['window'])
-        
-        return False
+        return config
+    
+    def check_rate_limit(self, path, client_ip, method):
+        """Sliding window counter atômico: custo constante por requisição"""
+        config = self.get_limit_config(path, method)
+        return get_rate_limiter().hit(
+            f'{client_ip}:{path}:{method}',
+            limit=config['requests'],
+            window=config['window'],
+            algorithm=SLIDING_WINDOW,
+        )
+    
+    def is_rate_limited(self, path, client_ip, method):
+        return not self.check_rate_limit(path, client_ip, method).allowed
     
     def get_client_ip(self, request):
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
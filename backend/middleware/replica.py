@@ -0,0 +1,30 @@
+from django.conf import settings
+
+from nossa_grana.db_router import get_replica_alias, pin_to_primary
+
+
+class ReplicaPinningMiddleware:
+    """
+    Read-your-writes entre requisições
+
+    Após uma requisição de escrita bem-sucedida (POST/PUT/PATCH/DELETE), fixa
+    o usuário no primário por DATABASE_REPLICA_STICKY_SECONDS, para que o
+    relatório aberto logo em seguida já inclua a transação recém-criada.
+    O usuário é lido na resposta porque a autenticação JWT acontece na view.
+    """
+
+    UNSAFE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sticky_seconds = getattr(settings, 'DATABASE_REPLICA_STICKY_SECONDS', 15)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if request.method in self.UNSAFE_METHODS and response.status_code < 400 and get_replica_alias():
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_to_primary(user.pk, self.sticky_seconds)
+
+        return response
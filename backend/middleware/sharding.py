@@ -0,0 +1,38 @@
+from nossa_grana.sharding import get_shards, use_shard
+
+
+class ShardRoutingMiddleware:
+    """
+    Define o usuário da requisição para o roteamento de shards
+
+    Queries de modelos fragmentados sem dica de usuário (ex.:
+    `Account.objects.get(pk=...)`) vão para o shard deste usuário. Sem
+    DATABASE_SHARDS configurado não faz nada.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not get_shards():
+            return self.get_response(request)
+
+        with use_shard(self._get_user_id(request)):
+            return self.get_response(request)
+
+    def _get_user_id(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user.pk
+
+        # A API usa JWT, autenticado só na view: o id vem do token validado (sem banco)
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if not header.startswith('Bearer '):
+            return None
+        try:
+            from rest_framework_simplejwt.authentication import JWTAuthentication
+            from rest_framework_simplejwt.settings import api_settings
+            token = JWTAuthentication().get_validated_token(header.split(' ', 1)[1].encode())
+            return token.get(api_settings.USER_ID_CLAIM)
+        except Exception:
+            return None
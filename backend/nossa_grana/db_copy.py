@@ -0,0 +1,231 @@
+"""
+Cópia em streaming de um banco para outro (SQLite -> PostgreSQL)
+
+Usado pelo comando `copy_database` para migrar uma instalação que começou
+no SQLite para o Postgres do docker-compose.prod.yml:
+
+    DATABASE_URL=... python manage.py migrate --database postgres
+    python manage.py copy_database --source default --target postgres
+
+- As tabelas são copiadas em ordem de dependência (FKs antes), com leitura
+  em lotes (values_list().iterator()) e escrita com COPY FROM STDIN no
+  Postgres ou executemany nos demais bancos. Nenhum save() é chamado:
+  saldos, limites e sinais (recalculo de saldo, replicação de shards)
+  não rodam — os valores são copiados como estão na origem.
+- As PKs são preservadas e as sequências do destino são ajustadas no fim.
+- A verificação compara contagem de linhas por tabela e checksums dos
+  saldos de contas e limites de cartões entre origem e destino.
+"""
+import hashlib
+import io
+import json
+import time
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from typing import Dict, List
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.db import connections, router, transaction
+
+# Tabelas recriadas pelo `migrate` no destino (post_migrate); não contam
+# como "destino com dados"
+BOOTSTRAP_MODELS = {'contenttypes.contenttype', 'auth.permission'}
+
+BALANCE_FIELDS = [
+    ('financial_accounts.account', ['current_balance', 'initial_balance']),
+    ('financial_accounts.creditcard', ['available_limit', 'credit_limit']),
+    ('financial_accounts.creditcardbill', ['total_amount', 'paid_amount']),
+    ('transactions.transaction', ['amount']),
+]
+
+
+class CopyError(Exception):
+    pass
+
+
+def copy_order(target) -> List:
+    """Modelos concretos (inclusive tabelas M2M) com as dependências de FK antes"""
+    models = [
+        model for model in apps.get_models(include_auto_created=True)
+        if model._meta.managed and not model._meta.proxy
+        and router.allow_migrate_model(target, model)
+    ]
+    models.sort(key=lambda model: model._meta.label_lower)
+    pending = {model: {
+        field.related_model for field in model._meta.concrete_fields
+        if field.is_relation and field.related_model is not None
+        and field.related_model is not model and field.related_model in models
+    } for model in models}
+
+    ordered = []
+    while pending:
+        ready = [model for model, deps in pending.items() if not deps - set(ordered)]
+        if not ready:
+            raise CopyError(f"Dependência circular entre: {', '.join(m._meta.label for m in pending)}")
+        for model in ready:
+            ordered.append(model)
+            del pending[model]
+    return ordered
+
+
+def _copy_text(field, value):
+    """Valor no formato texto do COPY"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        text = 't' if value else 'f'
+    elif isinstance(value, (datetime, date, dt_time)):
+        text = value.isoformat()
+    elif isinstance(value, (bytes, memoryview)):
+        text = '\\x' + bytes(value).hex()
+    elif field.get_internal_type() == 'JSONField':
+        text = json.dumps(value, cls=field.encoder)
+    else:
+        text = str(value)
+    return text.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+class _Writer:
+    """Escrita em lote no destino: COPY no Postgres, executemany nos demais"""
+
+    def __init__(self, model, target):
+        self.connection = connections[target]
+        self.fields = model._meta.concrete_fields
+        quote = self.connection.ops.quote_name
+        self.table = quote(model._meta.db_table)
+        self.columns = ', '.join(quote(field.column) for field in self.fields)
+
+    def write(self, rows):
+        with self.connection.cursor() as cursor:
+            if self.connection.vendor == 'postgresql':
+                buffer = io.StringIO()
+                for row in rows:
+                    buffer.write('\t'.join(_copy_text(f, v) for f, v in zip(self.fields, row)))
+                    buffer.write('\n')
+                buffer.seek(0)
+                cursor.cursor.copy_expert(f'COPY {self.table} ({self.columns}) FROM STDIN', buffer)
+            else:
+                placeholders = ', '.join(['%s'] * len(self.fields))
+                cursor.executemany(
+                    f'INSERT INTO {self.table} ({self.columns}) VALUES ({placeholders})',
+                    [
+                        [f.get_db_prep_save(v, connection=self.connection) for f, v in zip(self.fields, row)]
+                        for row in rows
+                    ],
+                )
+
+
+def _count(model, alias):
+    return model._base_manager.using(alias).count()
+
+
+def check_target_empty(models, target):
+    """Modelos com linhas no destino (ignorando as tabelas do bootstrap)"""
+    return [
+        model._meta.label for model in models
+        if model._meta.label_lower not in BOOTSTRAP_MODELS and _count(model, target)
+    ]
+
+
+def truncate(models, target):
+    connection = connections[target]
+    tables = [model._meta.db_table for model in models]
+    statements = connection.ops.sql_flush(no_style(), tables, allow_cascade=True)
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def copy_model(model, source, target, batch_size=2000) -> int:
+    attnames = [field.attname for field in model._meta.concrete_fields]
+    writer = _Writer(model, target)
+    rows = model._base_manager.using(source).order_by('pk').values_list(*attnames).iterator(chunk_size=batch_size)
+
+    copied = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            writer.write(batch)
+            copied += len(batch)
+            batch = []
+    if batch:
+        writer.write(batch)
+        copied += len(batch)
+    return copied
+
+
+def reset_sequences(models, target):
+    connection = connections[target]
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def copy_database(source, target, batch_size=2000, truncate_target=False, stdout=None) -> Dict[str, int]:
+    """
+    Copia todas as tabelas de `source` para `target` (já migrado)
+
+    Roda em uma transação no destino. Com dados no destino exige
+    truncate_target=True. Retorna {label: linhas copiadas}.
+    """
+    if source == target:
+        raise CopyError('Origem e destino são o mesmo banco')
+    models = copy_order(target)
+
+    non_empty = check_target_empty(models, target)
+    if non_empty and not truncate_target:
+        raise CopyError(f"Destino já tem dados em: {', '.join(non_empty)} (use --truncate)")
+
+    copied = {}
+    with transaction.atomic(using=target):
+        truncate(models, target)
+        for model in models:
+            started = time.monotonic()
+            copied[model._meta.label] = rows = copy_model(model, source, target, batch_size)
+            if stdout is not None and rows:
+                elapsed = time.monotonic() - started
+                stdout.write(f'{model._meta.label}: {rows} linhas ({rows / max(elapsed, 1e-6):.0f}/s)')
+        reset_sequences(models, target)
+    return copied
+
+
+def balance_checksums(alias) -> Dict[str, Dict]:
+    """Contagem, soma e hash ordenado (pk, valores) dos campos monetários"""
+    checksums = {}
+    for label, fields in BALANCE_FIELDS:
+        model = apps.get_model(label)
+        digest = hashlib.sha256()
+        totals = {name: Decimal('0') for name in fields}
+        count = 0
+        rows = model._base_manager.using(alias).order_by('pk').values_list('pk', *fields).iterator(chunk_size=2000)
+        for pk, *values in rows:
+            count += 1
+            digest.update(f"{pk}:{':'.join(str(value) for value in values)}\n".encode())
+            for name, value in zip(fields, values):
+                totals[name] += value or 0
+        checksums[label] = {
+            'rows': count,
+            'totals': {name: str(total) for name, total in totals.items()},
+            'sha256': digest.hexdigest(),
+        }
+    return checksums
+
+
+def verify_copy(source, target) -> List[str]:
+    """Diferenças entre origem e destino (lista vazia = cópia íntegra)"""
+    problems = []
+    for model in copy_order(target):
+        source_rows, target_rows = _count(model, source), _count(model, target)
+        if source_rows != target_rows:
+            problems.append(f'{model._meta.label}: {source_rows} linhas na origem, {target_rows} no destino')
+
+    source_sums, target_sums = balance_checksums(source), balance_checksums(target)
+    for label, expected in source_sums.items():
+        actual = target_sums[label]
+        if expected != actual:
+            problems.append(f"{label}: checksum de saldos diferente (origem {expected['totals']}, destino {actual['totals']})")
+    return problems
@@ -0,0 +1,133 @@
+"""
+Roteamento de leituras analíticas para a réplica
+
+Somente código marcado explicitamente lê da réplica: views de relatório e
+estatística decoradas com @read_replica ou blocos `with use_replica(...)`.
+Todo o resto (inclusive toda escrita) continua no primário.
+
+Read-your-writes:
+- Após uma escrita, o usuário fica "fixado" no primário por
+  DATABASE_REPLICA_STICKY_SECONDS (marca no cache, compartilhada entre
+  workers), cobrindo o atraso de replicação.
+- Dentro de um bloco use_replica, qualquer escrita faz as leituras seguintes
+  do mesmo bloco irem para o primário.
+
+Sem o alias DATABASE_REPLICA_ALIAS em DATABASES (desenvolvimento), tudo é
+no-op e as leituras vão para o primário.
+"""
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+
+@dataclass
+class ReplicaState:
+    alias: Optional[str]
+    user_id: Optional[int] = None
+    wrote: bool = False
+
+
+_replica_state: ContextVar[Optional[ReplicaState]] = ContextVar('replica_state', default=None)
+
+
+def get_replica_alias() -> Optional[str]:
+    """Alias da réplica, ou None se não configurada"""
+    alias = getattr(settings, 'DATABASE_REPLICA_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def _pin_key(user_id) -> str:
+    return f'db_replica:pinned:{user_id}'
+
+
+def pin_to_primary(user_id, seconds: Optional[int] = None):
+    """Fixa o usuário no primário pela janela de read-your-writes"""
+    if user_id is None:
+        return
+    seconds = getattr(settings, 'DATABASE_REPLICA_STICKY_SECONDS', 15) if seconds is None else seconds
+    cache.set(_pin_key(user_id), 1, seconds)
+
+
+def is_pinned(user_id) -> bool:
+    return user_id is not None and bool(cache.get(_pin_key(user_id)))
+
+
+@contextmanager
+def use_replica(user=None):
+    """
+    Envia as leituras do bloco para a réplica
+
+    `user` (ou seu id) ativa a fixidez: se o usuário escreveu há pouco, o
+    bloco lê do primário.
+    """
+    user_id = getattr(user, 'pk', user)
+    if user_id is not None and not isinstance(user_id, int):
+        user_id = None  # AnonymousUser
+
+    alias = get_replica_alias()
+    if alias is not None and is_pinned(user_id):
+        alias = None
+
+    token = _replica_state.set(ReplicaState(alias=alias, user_id=user_id))
+    try:
+        yield alias or DEFAULT_DB_ALIAS
+    finally:
+        _replica_state.reset(token)
+
+
+def note_write():
+    """
+    Escrita dentro de use_replica: o resto do bloco e as próximas requisições
+    do usuário leem do primário. Chamada também pelo ShardRouter, que decide
+    as escritas antes deste router quando há shards.
+    """
+    state = _replica_state.get()
+    if state is not None:
+        state.wrote = True
+        pin_to_primary(state.user_id)
+
+
+def read_replica(view_func):
+    """
+    Decorator para views (função ou método) somente-leitura
+
+    Deve ficar abaixo do @action/@api_view, pois usa o request.user já
+    autenticado pelo DRF.
+    """
+    @functools.wraps(view_func)
+    def wrapper(*args, **kwargs):
+        request = next((arg for arg in args[:2] if hasattr(arg, 'user')), None)
+        with use_replica(getattr(request, 'user', None)):
+            return view_func(*args, **kwargs)
+    return wrapper
+
+
+class ReadReplicaRouter:
+    """Router ativado apenas dentro de use_replica/@read_replica"""
+
+    def db_for_read(self, model, **hints):
+        state = _replica_state.get()
+        if state is None or state.alias is None or state.wrote:
+            return None
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        note_write()
+        # Explícito: instâncias lidas da réplica também são salvas no primário
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplica e primário têm os mesmos dados
+        databases = {DEFAULT_DB_ALIAS, get_replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
@@ -12,6 +12,8 @@ from rest_framework.permissions import AllowAny
 from datetime import datetime
 import redis
 
+from nossa_grana.postgres_pool.pool import pool_stats
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def health_check(request):
@@ -56,6 +58,9 @@ def health_detailed(request):
             'status': 'healthy',
             'migrations': migration_count
         }
+        pools = pool_stats()
+        if pools:
+            results['database']['pools'] = pools
     except Exception as e:
         results['database'] = {
             'status': 'unhealthy',
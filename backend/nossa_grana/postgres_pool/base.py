@@ -0,0 +1,113 @@
+"""
+Backend PostgreSQL com pool de conexões no processo
+
+O Django 4.2 não tem pool nativo (o suporte a psycopg_pool só chega no 5.1
+e exige psycopg 3). Este backend estende o backend postgresql padrão:
+`get_new_connection` retira uma conexão do pool e `_close` a devolve, então
+com CONN_MAX_AGE=0 cada requisição/tarefa usa uma conexão já aberta em vez
+de pagar o handshake (TCP + autenticação) a cada vez.
+
+OPTIONS aceitas além das do postgresql:
+    'pool': {
+        'min_size': 1,          # conexões mantidas abertas
+        'max_size': 10,         # limite por processo
+        'timeout': 10,          # espera máxima por uma conexão livre (s)
+        'max_lifetime': 3600,   # recicla conexões antigas (s)
+        'max_idle': 600,        # fecha ociosas acima de min_size (s)
+        'check_interval': 30,   # SELECT 1 no checkout se ociosa há mais que isso (s)
+    }
+"""
+import functools
+import os
+
+from django.db.backends.postgresql import base
+
+from .pool import ConnectionPool, get_pool
+
+
+# Valores de connection.info.transaction_status (iguais no psycopg2 e psycopg 3)
+TRANSACTION_STATUS_IDLE = 0
+TRANSACTION_STATUS_INTRANS = 2
+TRANSACTION_STATUS_INERROR = 3
+
+POOL_DEFAULTS = {
+    'min_size': 1,
+    'max_size': 10,
+    'timeout': 10.0,
+    'max_lifetime': 3600.0,
+    'max_idle': 600.0,
+    'check_interval': 30.0,
+}
+
+
+def check_connection(conn):
+    """Health check no checkout: ida e volta mínima ao servidor"""
+    with conn.cursor() as cursor:
+        cursor.execute('SELECT 1')
+    if conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+        conn.rollback()
+
+
+def reset_connection(conn) -> bool:
+    """Desfaz transações abertas antes de devolver a conexão ao pool"""
+    status = conn.info.transaction_status
+    if status == TRANSACTION_STATUS_IDLE:
+        return True
+    if status in (TRANSACTION_STATUS_INTRANS, TRANSACTION_STATUS_INERROR):
+        conn.rollback()
+        return True
+    # ACTIVE (comando em andamento) ou UNKNOWN (conexão quebrada)
+    return False
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    pool = None
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        pool_options = conn_params.pop('pool', True)
+        self.pool_options = {**POOL_DEFAULTS, **(pool_options if isinstance(pool_options, dict) else {})}
+        return conn_params
+
+    def create_pool(self, conn_params):
+        options = self.pool_options
+        return ConnectionPool(
+            connect=functools.partial(super().get_new_connection, conn_params),
+            min_size=int(options['min_size']),
+            max_size=int(options['max_size']),
+            timeout=float(options['timeout']),
+            max_lifetime=float(options['max_lifetime']),
+            max_idle=float(options['max_idle']),
+            check_interval=float(options['check_interval']),
+            check=check_connection,
+            reset=reset_connection,
+            name=self.alias,
+        )
+
+    def get_new_connection(self, conn_params):
+        pool = get_pool(self.alias, functools.partial(self.create_pool, conn_params))
+        pool.open()
+        connection = pool.getconn()
+        self.pool = pool
+
+        # Mesmo valor que o backend padrão define ao conectar
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        self.isolation_level = (
+            base.IsolationLevel(isolation_level) if isolation_level is not None
+            else base.IsolationLevel.READ_COMMITTED
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool, self.pool = self.pool, None
+        if pool is None:
+            return super()._close()
+        if pool.pid != os.getpid():
+            # Conexão herdada do processo pai: não fechar nem devolver; o
+            # socket pertence ao pai
+            return
+        with self.wrap_database_errors:
+            pool.putconn(self.connection)
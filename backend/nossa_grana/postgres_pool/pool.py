@@ -0,0 +1,286 @@
+"""
+Pool de conexões thread-safe e independente de driver
+
+- Checkout LIFO: a conexão devolvida mais recentemente é reutilizada primeiro
+  (conexões quentes; as ociosas antigas expiram por `max_idle`).
+- Health check no checkout: conexões fechadas são descartadas e conexões
+  ociosas há mais de `check_interval` segundos passam por `check(conn)`
+  (ex.: SELECT 1) antes de serem entregues.
+- `max_lifetime` recicla conexões antigas na devolução/checkout.
+- Pools são por processo: após um fork (gunicorn/Celery prefork) o processo
+  filho cria um pool novo e nunca reutiliza sockets herdados do pai.
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+
+class PoolTimeout(Exception):
+    """Nenhuma conexão disponível dentro do timeout"""
+
+
+class ConnectionPool:
+    """Pool de conexões com tamanho mínimo/máximo e métricas"""
+
+    def __init__(self, connect: Callable[[], Any], min_size: int = 0, max_size: int = 10,
+                 timeout: float = 10.0, max_lifetime: float = 3600.0, max_idle: float = 600.0,
+                 check_interval: float = 30.0,
+                 check: Optional[Callable[[Any], None]] = None,
+                 reset: Optional[Callable[[Any], bool]] = None,
+                 close: Optional[Callable[[Any], None]] = None,
+                 name: str = 'default'):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError('Pool: exige 0 <= min_size <= max_size e max_size >= 1')
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check_interval = check_interval
+        self.check = check
+        self.reset = reset
+        self.close_conn = close or (lambda conn: conn.close())
+        self.name = name
+        self.pid = os.getpid()
+
+        self._idle = deque()  # (conn, criada_em, devolvida_em)
+        self._created_at: Dict[int, float] = {}
+        self._size = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self.stats = {
+            'connections_created': 0,
+            'connections_closed': 0,
+            'checkouts': 0,
+            'reused': 0,
+            'health_check_failures': 0,
+            'timeouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def open(self):
+        """Pré-aquece o pool até `min_size` conexões ociosas"""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            conn = self._create()
+            with self._cond:
+                self._idle.appendleft((conn, self._created_at[id(conn)], time.monotonic()))
+                self._cond.notify()
+
+    def getconn(self, timeout: Optional[float] = None):
+        """Retira uma conexão saudável do pool (ou cria uma, até `max_size`)"""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        while True:
+            entry = None
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeout(f'Pool {self.name} fechado')
+                waited = False
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats['timeouts'] += 1
+                        raise PoolTimeout(
+                            f'Pool {self.name}: nenhuma conexão livre em {timeout:.1f}s '
+                            f'({self._size}/{self.max_size} em uso)'
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+                if waited:
+                    self.stats['waits'] += 1
+                    self.stats['wait_time'] += time.monotonic() - start
+                if self._idle:
+                    entry = self._idle.pop()
+                else:
+                    self._size += 1
+
+            if entry is None:
+                conn = self._create()
+                self.stats['checkouts'] += 1
+                return conn
+
+            conn, created_at, returned_at = entry
+            if self._is_usable(conn, created_at, returned_at):
+                self.stats['checkouts'] += 1
+                self.stats['reused'] += 1
+                return conn
+            self._discard(conn)
+
+    def putconn(self, conn):
+        """Devolve a conexão; descarta se quebrada, em transação ou expirada"""
+        now = time.monotonic()
+        created_at = self._created_at.get(id(conn), now)
+
+        usable = not self._closed and not _is_closed(conn) and now - created_at < self.max_lifetime
+        if usable and self.reset is not None:
+            try:
+                usable = self.reset(conn)
+            except Exception:
+                usable = False
+
+        if not usable:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, created_at, now))
+            expired = self._pop_idle_expired(now)
+            self._cond.notify()
+        for old in expired:
+            self._discard(old)
+
+    def close(self):
+        """Fecha todas as conexões ociosas e impede novos checkouts"""
+        with self._cond:
+            self._closed = True
+            idle = [entry[0] for entry in self._idle]
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Métricas do pool (para health check e monitoramento)"""
+        with self._cond:
+            idle = len(self._idle)
+            size = self._size
+        stats = dict(self.stats)
+        waits = stats.pop('wait_time')
+        stats.update({
+            'name': self.name,
+            'pid': self.pid,
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+            'size': size,
+            'idle': idle,
+            'in_use': size - idle,
+            'avg_wait_ms': round(waits / stats['waits'] * 1000, 2) if stats['waits'] else 0.0,
+        })
+        return stats
+
+    # ------------------------------------------------------------------
+    # Internos
+    # ------------------------------------------------------------------
+
+    def _create(self):
+        """Cria uma conexão; a vaga já foi reservada em `_size`"""
+        try:
+            conn = self.connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        self._created_at[id(conn)] = time.monotonic()
+        self.stats['connections_created'] += 1
+        return conn
+
+    def _is_usable(self, conn, created_at, returned_at) -> bool:
+        now = time.monotonic()
+        if _is_closed(conn) or now - created_at >= self.max_lifetime:
+            return False
+        if self.check is not None and now - returned_at >= self.check_interval:
+            try:
+                self.check(conn)
+            except Exception:
+                self.stats['health_check_failures'] += 1
+                return False
+        return True
+
+    def _pop_idle_expired(self, now):
+        """Remove (sob o lock) ociosas antigas acima de `min_size`"""
+        expired = []
+        while self._idle and self._size - len(expired) > self.min_size:
+            conn, _, returned_at = self._idle[0]
+            if now - returned_at < self.max_idle:
+                break
+            self._idle.popleft()
+            expired.append(conn)
+        return expired
+
+    def _discard(self, conn):
+        self._created_at.pop(id(conn), None)
+        try:
+            self.close_conn(conn)
+        except Exception:
+            pass
+        self.stats['connections_closed'] += 1
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+
+def _is_closed(conn) -> bool:
+    closed = getattr(conn, 'closed', False)
+    return bool(closed)
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_pid = os.getpid()
+_inherited = []
+_pools_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    """
+    No processo filho descarta os pools herdados sem fechar as conexões:
+    os sockets pertencem ao processo pai e fechá-los aqui derrubaria as
+    conexões dele. As referências são mantidas para não disparar o close
+    no garbage collector.
+    """
+    global _pools, _pools_pid, _pools_lock
+    if _pools:
+        _inherited.append(_pools)
+    _pools = {}
+    _pools_pid = os.getpid()
+    _pools_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_pool(alias: str, factory: Callable[[], ConnectionPool]) -> ConnectionPool:
+    """Retorna o pool do processo atual para o alias, criando-o se necessário"""
+    if _pools_pid != os.getpid():
+        _reset_after_fork()
+
+    pool = _pools.get(alias)
+    if pool is not None:
+        return pool
+
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = factory()
+            _pools[alias] = pool
+    return pool
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Métricas de todos os pools do processo atual"""
+    if _pools_pid != os.getpid():
+        return {}
+    return {alias: pool.get_stats() for alias, pool in list(_pools.items())}
+
+
+def close_pools():
+    """Fecha os pools do processo atual (testes / shutdown)"""
+    global _pools
+    pools, _pools = _pools, {}
+    for pool in pools.values():
+        pool.close()
@@ -3,7 +3,7 @@ Django settings for nossa_grana project.
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 from datetime import timedelta
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -52,13 +52,15 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'middleware.security.SecurityHeadersMiddleware',  # Headers de segurança personalizados
     'middleware.encoding.UTF8EncodingMiddleware',
-    'middleware.encoding.JSONResponseMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'middleware.security.SSLRedirectMiddleware',  # SSL redirect personalizado
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'middleware.performance.QueryInstrumentationMiddleware',  # Queries por requisição/N+1
+    'middleware.replica.ReplicaPinningMiddleware',  # Read-your-writes com réplica
+    'middleware.sharding.ShardRoutingMiddleware',  # Shard do usuário da requisição
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -84,19 +86,41 @@ TEMPLATES = [
 WSGI_APPLICATION = 'nossa_grana.wsgi.application'
 
 # Database
+# SQLite em modo produção (nossa_grana.sqlite_backend): PRAGMAs por conexão,
+# conexões persistentes e BEGIN IMMEDIATE nas transações de escrita
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'nossa_grana.sqlite_backend',
         'NAME': BASE_DIR / 'db.sqlite3',
         'OPTIONS': {
             'timeout': 30,
+            'transaction_mode': 'IMMEDIATE',
         },
         'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
 # Database Transaction Settings
-DATABASE_ROUTERS = []
+# Leituras analíticas (@read_replica/use_replica) vão para a réplica quando o
+# alias DATABASE_REPLICA_ALIAS existe em DATABASES; após uma escrita o usuário
+# lê do primário por DATABASE_REPLICA_STICKY_SECONDS (read-your-writes)
+DATABASE_ROUTERS = [
+    'nossa_grana.sharding.ShardRouter',
+    'nossa_grana.db_router.ReadReplicaRouter',
+]
+DATABASE_REPLICA_ALIAS = 'replica'
+DATABASE_REPLICA_STICKY_SECONDS = config('DATABASE_REPLICA_STICKY_SECONDS', default=15, cast=int)
+
+# Sharding por usuário (nossa_grana.sharding): aliases de DATABASES que
+# guardam os dados dos usuários. Vazio = sharding desligado (tudo no default)
+DATABASE_SHARDS = config('DATABASE_SHARDS', default='', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()])
+
+# Particionamento da tabela de transações por data (transactions.partitioning):
+# 'year', 'month' ou vazio. Só tem efeito em PostgreSQL; partições futuras
+# são criadas pelo comando partition_transactions
+TRANSACTIONS_PARTITION_BY = config('TRANSACTIONS_PARTITION_BY', default='')
+TRANSACTIONS_PARTITIONS_AHEAD = config('TRANSACTIONS_PARTITIONS_AHEAD', default=3, cast=int)
 AUTOCOMMIT = True
 DATABASE_OPTIONS = {
     'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
@@ -166,7 +190,7 @@ REST_FRAMEWORK = {
     },
     'EXCEPTION_HANDLER': 'rest_framework.views.exception_handler',
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'utils.renderers.FastJSONRenderer',  # orjson, compacto; ?pretty=1 para formatar
     ],
     'UNICODE_JSON': True,
 }
@@ -260,6 +284,52 @@ CACHES = {
 SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
 SESSION_CACHE_ALIAS = 'sessions'
 
+# Scanner de injeção (middleware.financial_security.SecurityAuditMiddleware)
+# Corpos acima do limite enviados por usuários autenticados aos endpoints de
+# carga em lote abaixo são amostrados ('sample') ou ignorados ('skip').
+SECURITY_SCAN_MAX_BODY_SIZE = config('SECURITY_SCAN_MAX_BODY_SIZE', default=1048576, cast=int)  # 1MB
+SECURITY_SCAN_SAMPLE_SIZE = 65536
+SECURITY_SCAN_OVERSIZE_MODE = config('SECURITY_SCAN_OVERSIZE_MODE', default='sample')
+SECURITY_SCAN_TRUSTED_BULK_PATHS = [
+    '/api/transactions/transactions/bulk_create/',
+]
+
+# Rate limiting (utils.rate_limit): Redis com scripts atômicos quando
+# configurado; vazio usa o backend em memória do processo
+RATE_LIMIT_REDIS_URL = config('RATE_LIMIT_REDIS_URL', default='')
+
+# Perfis de fraude (utils.fraud_profile): mesmo esquema do rate limiting,
+# Redis com scripts atômicos ou backend em memória quando vazio
+FRAUD_PROFILE_REDIS_URL = config('FRAUD_PROFILE_REDIS_URL', default='')
+
+# Criptografia de dados sensíveis (utils.crypto): chaves Fernet separadas
+# por vírgula, a mais nova primeiro (as demais só decifram, para rotação)
+ENCRYPTION_KEYS = config('ENCRYPTION_KEYS', default='', cast=Csv())
+CRYPTO_KDF_WORKERS = config('CRYPTO_KDF_WORKERS', default=2, cast=int)
+
+# Auditoria assíncrona (utils.audit): fila em memória + thread de escrita
+# em lote num arquivo JSONL append-only
+AUDIT_LOG_PATH = config('AUDIT_LOG_PATH', default=str(BASE_DIR / 'logs' / 'audit.jsonl'))
+AUDIT_LOG_BATCH_SIZE = 200
+AUDIT_LOG_FLUSH_INTERVAL = 1.0  # segundos
+AUDIT_LOG_QUEUE_SIZE = 10000
+AUDIT_LOG_ENQUEUE_TIMEOUT = 0.05  # backpressure antes de descartar
+AUDIT_LOG_MAX_BODY_SIZE = 65536  # bytes por evento; acima disso só o tamanho
+
+# Backups do SQLite (utils.backup): API de backup online em lotes de páginas,
+# compressão em streaming e incrementais por diff de páginas. Um novo full a
+# cada BACKUP_FULL_EVERY backups da cadeia
+BACKUP_DIR = config('BACKUP_DIR', default=str(BASE_DIR / 'backups'))
+BACKUP_COMPRESSION = config('BACKUP_COMPRESSION', default='zstd')  # gzip se zstandard não estiver instalado
+BACKUP_FULL_EVERY = config('BACKUP_FULL_EVERY', default=7, cast=int)
+BACKUP_PAGES_PER_STEP = 1024
+BACKUP_STEP_SLEEP = 0.005  # segundos entre lotes (escritores avançam)
+
+# Instrumentação de SQL (middleware.performance.QueryInstrumentationMiddleware)
+SQL_INSTRUMENTATION_SAMPLE_RATE = config('SQL_INSTRUMENTATION_SAMPLE_RATE', default=1.0 if DEBUG else 0.1, cast=float)
+SQL_SLOW_QUERY_THRESHOLD = 0.1  # segundos
+SQL_N_PLUS_ONE_THRESHOLD = 5  # statements idênticos na mesma requisição
+
 # Logging Configuration
 LOGGING = {
     'version': 1,
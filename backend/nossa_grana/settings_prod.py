@@ -13,21 +13,47 @@ DEBUG = False
 ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='localhost,127.0.0.1', cast=lambda v: [s.strip() for s in v.split(',')])
 
 # Database PostgreSQL para produção
+# Pool de conexões por processo (nossa_grana.postgres_pool): com
+# CONN_MAX_AGE=0 a conexão volta ao pool no fim de cada requisição/tarefa,
+# com health check no checkout. Total de conexões no servidor <=
+# processos (workers gunicorn + filhos do Celery) x DB_POOL_MAX_SIZE.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'nossa_grana.postgres_pool',
         'NAME': config('POSTGRES_DB', default='nossa_grana_prod'),
         'USER': config('POSTGRES_USER', default='nossa_grana_user'),
         'PASSWORD': config('POSTGRES_PASSWORD'),
         'HOST': config('DB_HOST', default='db'),
         'PORT': config('DB_PORT', default='5432'),
         'OPTIONS': {
-            'connect_timeout': 60,
+            'connect_timeout': config('DB_CONNECT_TIMEOUT', default=10, cast=int),
+            'pool': {
+                'min_size': config('DB_POOL_MIN_SIZE', default=1, cast=int),
+                'max_size': config('DB_POOL_MAX_SIZE', default=4, cast=int),
+                'timeout': config('DB_POOL_TIMEOUT', default=10.0, cast=float),
+                'max_lifetime': config('DB_POOL_MAX_LIFETIME', default=3600.0, cast=float),
+                'max_idle': config('DB_POOL_MAX_IDLE', default=600.0, cast=float),
+                'check_interval': config('DB_POOL_CHECK_INTERVAL', default=30.0, cast=float),
+            },
         },
-        'CONN_MAX_AGE': 600,
+        'CONN_MAX_AGE': 0,
     }
 }
 
+# Shards de usuários: DB_SHARD_HOSTS=host1,host2 cria shard_1, shard_2 com as
+# mesmas credenciais; DATABASE_SHARDS escolhe quais aliases recebem usuários
+for index, host in enumerate(config('DB_SHARD_HOSTS', default='', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()]), start=1):
+    DATABASES[f'shard_{index}'] = {**DATABASES['default'], 'HOST': host}
+
+# Réplica de leitura (streaming replication) para relatórios e estatísticas
+if config('DB_REPLICA_HOST', default=''):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': config('DB_REPLICA_HOST'),
+        'PORT': config('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
 # Redis Cache para produção
 CACHES = {
     'default': {
@@ -56,6 +82,12 @@ CACHES = {
     }
 }
 
+# Rate limiting atômico compartilhado entre workers
+RATE_LIMIT_REDIS_URL = config('RATE_LIMIT_REDIS_URL', default='redis://redis:6379/4')
+
+# Perfis de fraude (velocidade/comportamento) compartilhados entre workers
+FRAUD_PROFILE_REDIS_URL = config('FRAUD_PROFILE_REDIS_URL', default='redis://redis:6379/5')
+
 # Configurações de sessão com Redis
 SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
 SESSION_CACHE_ALIAS = 'sessions'
@@ -258,6 +290,12 @@ LOGGING = {
     },
 }
 
+# Trilha de auditoria persistente junto aos demais logs
+AUDIT_LOG_PATH = config('AUDIT_LOG_PATH', default='/app/logs/audit.jsonl')
+
+# Instrumentação de SQL amostrada (contagem/tempo sempre; N+1 em 10% das requisições)
+SQL_INSTRUMENTATION_SAMPLE_RATE = config('SQL_INSTRUMENTATION_SAMPLE_RATE', default=0.1, cast=float)
+
 # Rate limiting mais restritivo para produção
 REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] = {
     'anon': '50/hour',
@@ -0,0 +1,378 @@
+"""
+Sharding por usuário
+
+Os dados de cada usuário (contas, cartões, transações, orçamentos, metas,
+tags e alertas) ficam inteiros em um único alias de DATABASE_SHARDS. O
+alias `default` continua sendo o banco global: usuários, categorias e o
+diretório de shards (accounts.UserShard).
+
+- Novos usuários são atribuídos ao shard `DATABASE_SHARDS[user_id % N]`
+  (determinístico) e a atribuição é gravada no diretório; usuários sem
+  registro (anteriores ao sharding) ficam no primeiro shard até serem
+  movidos por `manage.py rebalance_shards`.
+- Usuários e categorias são replicados em todos os shards, pois as FKs das
+  tabelas fragmentadas apontam para eles.
+- Roteamento: instâncias (e related managers) usam o shard do dono;
+  ShardedQuerySet roteia `filter(user=...)`, `filter(account=conta)` etc.;
+  queries sem dica usam o usuário da requisição (ShardRoutingMiddleware /
+  use_shard).
+
+Com DATABASE_SHARDS vazio o sharding fica desligado e tudo é no-op.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .db_router import note_write
+
+
+# Modelos fragmentados, em ordem de dependência (pais antes dos filhos), com
+# o caminho até o usuário dono
+SHARDED_MODELS = [
+    ('financial_accounts.account', 'user'),
+    ('financial_accounts.creditcard', 'user'),
+    ('financial_accounts.creditcardbill', 'credit_card__user'),
+    ('financial_accounts.balancesnapshot', 'user'),
+    ('transactions.tag', 'user'),
+    ('transactions.installmentplan', 'user'),
+    ('transactions.transaction', 'user'),
+    ('transactions.transaction_tags', 'transaction__user'),
+    ('transactions.posting', 'user'),
+    ('budgets.budget', 'user'),
+    ('budgets.budgetalert', 'budget__user'),
+    ('goals.goal', 'user'),
+    ('goals.goalcontribution', 'goal__user'),
+    ('reports.alert', 'user'),
+    ('reports.reminder', 'user'),
+]
+USER_PATHS = dict(SHARDED_MODELS)
+
+DIRECTORY_CACHE_TIMEOUT = 3600
+
+_shard_user: ContextVar[Optional[int]] = ContextVar('shard_user', default=None)
+
+
+def get_shards() -> List[str]:
+    return getattr(settings, 'DATABASE_SHARDS', None) or []
+
+
+def is_sharded(model) -> bool:
+    # Inclui tabelas intermediárias de M2M (ex.: transactions.transaction_tags)
+    return model._meta.label_lower in USER_PATHS
+
+
+def home_shard(user_id: int) -> str:
+    """Shard determinístico para um novo usuário"""
+    shards = get_shards()
+    return shards[user_id % len(shards)]
+
+
+def _directory_key(user_id) -> str:
+    return f'shard:user:{user_id}'
+
+
+def shard_for_user(user_id) -> Optional[str]:
+    """Alias onde estão os dados do usuário (diretório com cache)"""
+    shards = get_shards()
+    if not shards or user_id is None:
+        return None
+
+    alias = cache.get(_directory_key(user_id))
+    if alias is None:
+        from accounts.models import UserShard
+        alias = (
+            UserShard.objects.using(DEFAULT_DB_ALIAS)
+            .filter(user_id=user_id).values_list('alias', flat=True).first()
+        ) or shards[0]
+        cache.set(_directory_key(user_id), alias, DIRECTORY_CACHE_TIMEOUT)
+    return alias
+
+
+def assign_shard(user_id: int, alias: str):
+    """Grava a atribuição no diretório e invalida o cache"""
+    from accounts.models import UserShard
+    UserShard.objects.using(DEFAULT_DB_ALIAS).update_or_create(user_id=user_id, defaults={'alias': alias})
+    cache.delete(_directory_key(user_id))
+
+
+def shard_for_instance(instance) -> Optional[str]:
+    """Shard de um usuário ou de um objeto fragmentado"""
+    if isinstance(instance, User):
+        return shard_for_user(instance.pk)
+
+    model = type(instance)
+    if not is_sharded(model):
+        return None
+    if instance._state.db in get_shards():
+        return instance._state.db
+
+    user_id = getattr(instance, 'user_id', None)
+    if user_id is not None:
+        return shard_for_user(user_id)
+
+    # Filhos (ex.: BudgetAlert): usa o pai já carregado, sem nova query
+    parent = USER_PATHS.get(model._meta.label_lower, '').split('__')[0]
+    if parent and parent != 'user':
+        field = model._meta.get_field(parent)
+        if field.is_cached(instance):
+            return shard_for_instance(field.get_cached_value(instance))
+    return None
+
+
+@contextmanager
+def use_shard(user):
+    """Roteia queries sem dica para o shard do usuário"""
+    token = _shard_user.set(getattr(user, 'pk', user))
+    try:
+        yield shard_for_user(_shard_user.get())
+    finally:
+        _shard_user.reset(token)
+
+
+def _shard_from_lookups(kwargs: Dict, args) -> Optional[str]:
+    """Procura o dono nos argumentos de filter()/create()"""
+    for key, value in kwargs.items():
+        parts = [part for part in key.split('__') if part not in ('exact', 'id', 'pk')]
+        if parts and parts[-1] in ('user', 'user_id'):
+            user_id = value.pk if isinstance(value, models.Model) else value
+            if isinstance(user_id, int):
+                return shard_for_user(user_id)
+        elif isinstance(value, models.Model):
+            alias = shard_for_instance(value)
+            if alias:
+                return alias
+
+    for arg in args:
+        if isinstance(arg, models.Q):
+            children = [child for child in arg.children if isinstance(child, models.Q)]
+            lookups = dict(child for child in arg.children if isinstance(child, tuple))
+            alias = _shard_from_lookups(lookups, children)
+            if alias:
+                return alias
+    return None
+
+
+class ShardedQuerySet(models.QuerySet):
+    """QuerySet que escolhe o shard pelos filtros de usuário/objeto dono"""
+
+    def _routed(self, args, kwargs):
+        if self._db is None and get_shards():
+            alias = _shard_from_lookups(kwargs, args)
+            if alias:
+                return self.using(alias)
+        return self
+
+    def _filter_or_exclude(self, negate, args, kwargs):
+        queryset = self if negate else self._routed(args, kwargs)
+        return super(ShardedQuerySet, queryset)._filter_or_exclude(negate, args, kwargs)
+
+    def create(self, **kwargs):
+        return super(ShardedQuerySet, self._routed((), kwargs)).create(**kwargs)
+
+    def get_or_create(self, defaults=None, **kwargs):
+        return super(ShardedQuerySet, self._routed((), kwargs)).get_or_create(defaults, **kwargs)
+
+    def update_or_create(self, defaults=None, **kwargs):
+        return super(ShardedQuerySet, self._routed((), kwargs)).update_or_create(defaults, **kwargs)
+
+
+ShardedManager = models.Manager.from_queryset(ShardedQuerySet)
+
+
+class ShardRouter:
+    """
+    Router de shards; deve vir antes dos demais em DATABASE_ROUTERS.
+    Sem shards configurados devolve None e deixa os próximos decidirem.
+    Leituras de tabelas globais ou de usuários do shard default também
+    devolvem None, para a réplica de leitura (ReadReplicaRouter) decidir;
+    escritas continuam explícitas.
+    """
+
+    def _route(self, model, hints):
+        if not is_sharded(model):
+            return DEFAULT_DB_ALIAS
+
+        instance = hints.get('instance')
+        if instance is not None:
+            alias = shard_for_instance(instance)
+            if alias:
+                return alias
+        return shard_for_user(_shard_user.get())
+
+    def db_for_read(self, model, **hints):
+        if not get_shards():
+            return None
+        alias = self._route(model, hints)
+        return None if alias == DEFAULT_DB_ALIAS else alias
+
+    def db_for_write(self, model, **hints):
+        if not get_shards():
+            return None
+        # Os próximos routers não são consultados: marca a escrita para a réplica
+        note_write()
+        return self._route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if not get_shards():
+            return None
+        # Globais (usuário/categoria) existem em todos os shards
+        if not is_sharded(type(obj1)) or not is_sharded(type(obj2)):
+            return True
+        return obj1._state.db == obj2._state.db
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Todos os bancos têm o schema completo
+        return None
+
+
+# ----------------------------------------------------------------------
+# Replicação das tabelas globais
+# ----------------------------------------------------------------------
+
+def _copy_to_shards(instance):
+    model = type(instance)
+    for alias in get_shards():
+        if alias == DEFAULT_DB_ALIAS:
+            continue
+        values = {field.attname: getattr(instance, field.attname) for field in model._meta.concrete_fields}
+        updated = model._base_manager.using(alias).filter(pk=instance.pk).update(**values)
+        if not updated:
+            model._base_manager.using(alias).bulk_create([model(**values)], ignore_conflicts=True)
+
+
+@receiver(post_save, sender=User, dispatch_uid='sharding.user_saved')
+def replicate_user(sender, instance, created, raw=False, using=DEFAULT_DB_ALIAS,
+                   update_fields=None, **kwargs):
+    """Replica o usuário nos shards; novos usuários recebem o shard de origem"""
+    if raw or using != DEFAULT_DB_ALIAS or not get_shards():
+        return
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return  # login não altera nada de que os shards dependam
+    _copy_to_shards(instance)
+    if created:
+        assign_shard(instance.pk, home_shard(instance.pk))
+
+
+@receiver(post_save, sender='transactions.Category', dispatch_uid='sharding.category_saved')
+def replicate_category(sender, instance, raw=False, using=DEFAULT_DB_ALIAS, **kwargs):
+    if raw or using != DEFAULT_DB_ALIAS or not get_shards():
+        return
+    _copy_to_shards(instance)
+
+
+@receiver(post_delete, sender=User, dispatch_uid='sharding.user_deleted')
+@receiver(post_delete, sender='transactions.Category', dispatch_uid='sharding.category_deleted')
+def delete_replicas(sender, instance, using=DEFAULT_DB_ALIAS, **kwargs):
+    if using != DEFAULT_DB_ALIAS or not get_shards():
+        return
+    for alias in get_shards():
+        if alias != DEFAULT_DB_ALIAS:
+            # Cascata no shard remove os dados fragmentados do usuário
+            sender._base_manager.using(alias).filter(pk=instance.pk).delete()
+    if sender is User:
+        cache.delete(_directory_key(instance.pk))
+
+
+# ----------------------------------------------------------------------
+# Rebalanceamento
+# ----------------------------------------------------------------------
+
+def _sharded_model_list():
+    return [(apps.get_model(label), path) for label, path in SHARDED_MODELS]
+
+
+def _auto_datetime_fields(model):
+    return [
+        field.attname for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+
+
+def move_user(user_id: int, target: str, batch_size: int = 500, stdout=None) -> Dict[str, int]:
+    """
+    Move todas as linhas do usuário para o shard `target`
+
+    As PKs são remapeadas no destino (cada shard tem suas próprias
+    sequências) e as FKs entre tabelas fragmentadas seguem o mapeamento.
+    As linhas são copiadas com bulk_create (sem save()), então saldos e
+    limites são preservados sem recálculo. Ordem: copia no destino em uma
+    transação, atualiza o diretório e só então apaga a origem.
+    """
+    if target not in get_shards():
+        raise ValueError(f'Shard desconhecido: {target}')
+    source = shard_for_user(user_id)
+    if source == target:
+        return {}
+
+    model_list = _sharded_model_list()
+    moved: Dict[str, int] = {}
+    id_maps: Dict[str, Dict[int, int]] = {}
+
+    user = User.objects.using(DEFAULT_DB_ALIAS).get(pk=user_id)
+    _copy_to_shards(user)
+
+    with transaction.atomic(using=target):
+        # Sobras de uma execução interrompida
+        for model, path in reversed(model_list):
+            model._base_manager.using(target).filter(**{path: user_id}).delete()
+
+        for model, path in model_list:
+            label = model._meta.label_lower
+            fk_fields = [
+                field for field in model._meta.concrete_fields
+                if field.is_relation and field.related_model is not None
+                and is_sharded(field.related_model)
+            ]
+            auto_fields = _auto_datetime_fields(model)
+            id_map = id_maps.setdefault(label, {})
+            queryset = model._base_manager.using(source).filter(**{path: user_id}).order_by('pk')
+
+            batch = []
+            for obj in queryset.iterator(chunk_size=batch_size):
+                batch.append(obj)
+                if len(batch) >= batch_size:
+                    _copy_batch(model, batch, target, fk_fields, auto_fields, id_map, id_maps)
+                    batch = []
+            if batch:
+                _copy_batch(model, batch, target, fk_fields, auto_fields, id_map, id_maps)
+            moved[label] = len(id_map)
+
+    assign_shard(user_id, target)
+
+    with transaction.atomic(using=source):
+        for model, path in reversed(model_list):
+            model._base_manager.using(source).filter(**{path: user_id}).delete()
+
+    return moved
+
+
+def _copy_batch(model, batch, target, fk_fields, auto_fields, id_map, id_maps):
+    old_ids = [obj.pk for obj in batch]
+    preserved = [{name: getattr(obj, name) for name in auto_fields} for obj in batch]
+
+    for obj in batch:
+        for field in fk_fields:
+            value = getattr(obj, field.attname)
+            if value is not None:
+                setattr(obj, field.attname, id_maps[field.related_model._meta.label_lower][value])
+        obj.pk = None
+        obj._state.adding = True
+        obj._state.db = None
+
+    created = model._base_manager.using(target).bulk_create(batch)
+    id_map.update(zip(old_ids, (obj.pk for obj in created)))
+
+    if auto_fields:
+        # bulk_create aplica auto_now/auto_now_add; restaura os originais
+        for obj, values in zip(created, preserved):
+            for name, value in values.items():
+                setattr(obj, name, value)
+        model._base_manager.using(target).bulk_update(created, auto_fields)
@@ -0,0 +1,48 @@
+"""
+Backend SQLite para instalações self-hosted ("modo produção SQLite")
+
+- Transações de escrita começam com BEGIN IMMEDIATE: o lock de escrita é
+  obtido no início do atomic(), então escritas concorrentes esperam o
+  busy timeout em vez de falhar com "database is locked" ao tentar promover
+  um lock de leitura (select_for_update é no-op no SQLite).
+- Os PRAGMAs de performance (WAL, synchronous=NORMAL, mmap, cache) são
+  aplicados em toda nova conexão via sinal connection_created.
+
+OPTIONS aceitas além das do sqlite3:
+    'transaction_mode': 'IMMEDIATE' (padrão), 'DEFERRED' ou 'EXCLUSIVE'
+"""
+from django.db.backends.signals import connection_created
+from django.db.backends.sqlite3 import base
+
+from utils.performance import DatabaseOptimizer
+
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        mode = str(kwargs.pop('transaction_mode', 'IMMEDIATE')).upper()
+        if mode not in TRANSACTION_MODES:
+            mode = 'IMMEDIATE'
+        self.transaction_mode = mode
+        return kwargs
+
+    def _start_transaction_under_autocommit(self):
+        """Inicia a transação explicitamente com o modo configurado"""
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
+
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """Aplica os PRAGMAs em cada nova conexão"""
+    if connection.vendor == 'sqlite':
+        DatabaseOptimizer.optimize_sqlite(connection.connection)
+
+
+connection_created.connect(
+    configure_sqlite_connection,
+    sender=DatabaseWrapper,
+    dispatch_uid='nossa_grana.sqlite_backend.pragmas',
+)
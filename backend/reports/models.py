@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+from nossa_grana.sharding import ShardedManager
+
 
 class Alert(models.Model):
     """
@@ -29,6 +31,8 @@ class Alert(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     read_at = models.DateTimeField(null=True, blank=True, verbose_name='Data de Leitura')
 
+    objects = ShardedManager()
+
     class Meta:
         verbose_name = 'Alerta'
         verbose_name_plural = 'Alertas'
@@ -67,6 +71,8 @@ class Reminder(models.Model):
     last_sent = models.DateTimeField(null=True, blank=True, verbose_name='Último Envio')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ShardedManager()
+
     class Meta:
         verbose_name = 'Lembrete'
         verbose_name_plural = 'Lembretes'
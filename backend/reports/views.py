@@ -11,6 +11,7 @@ import calendar
 
 from transactions.models import Transaction, Category
 from budgets.models import Budget
+from nossa_grana.db_router import read_replica
 from .serializers import (
     FinancialSummarySerializer, CategoryBreakdownSerializer, 
     MonthlyTrendSerializer, SpendingPatternSerializer,
@@ -25,6 +26,7 @@ class SummaryReportView(APIView):
     """
     permission_classes = [IsAuthenticated]
 
+    @read_replica
     def get(self, request):
         # Parâmetros de filtro
         period = request.query_params.get('period', 'current_month')
@@ -186,6 +188,7 @@ class CategoryBreakdownView(APIView):
     """
     permission_classes = [IsAuthenticated]
 
+    @read_replica
     def get(self, request):
         # Parâmetros de filtro
         period = request.query_params.get('period', 'current_month')
@@ -319,6 +322,7 @@ class MonthlyTrendView(APIView):
     """
     permission_classes = [IsAuthenticated]
 
+    @read_replica
     def get(self, request):
         # Parâmetros
         months_back = int(request.query_params.get('months', 12))
@@ -396,6 +400,7 @@ class SpendingPatternsView(APIView):
     """
     permission_classes = [IsAuthenticated]
 
+    @read_replica
     def get(self, request):
         pattern_type = request.query_params.get('type', 'weekly')
         period = request.query_params.get('period', 'last_90_days')
@@ -0,0 +1,177 @@
+"""
+Testes dos resumos e relatórios de contas e cartões (financial_accounts.summaries, reports)
+"""
+
+import os
+import django
+from datetime import date
+from decimal import Decimal
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nossa_grana.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from financial_accounts import summaries
+from financial_accounts.models import Account, CreditCard
+from transactions.models import Category, Transaction
+
+
+class AccountSummaryTests(TestCase):
+    url = '/api/financial/accounts/summary/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='resumo', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_grouped_totals_in_one_query(self):
+        for index in range(30):
+            Account.objects.create(
+                user=self.user, name=f'Conta {index}', type='checking', initial_balance=Decimal('100.00')
+            )
+        Account.objects.create(user=self.user, name='Poupança', type='savings', initial_balance=Decimal('500.00'))
+        Account.objects.create(user=self.user, name='Cheque', type='checking', initial_balance=Decimal('-200.00'))
+        Account.objects.create(
+            user=self.user, name='Inativa', type='cash', initial_balance=Decimal('999.00'), is_active=False
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            summary = summaries.account_summary(self.user)
+        self.assertEqual(len([q for q in queries if 'financial_accounts_account' in q['sql']]), 1)
+
+        self.assertEqual(summary['total_accounts'], 32)
+        self.assertEqual(summary['total_balance'], Decimal('3300.00'))
+        self.assertEqual(summary['net_worth'], Decimal('3500.00'))
+        self.assertEqual(summary['total_debt'], Decimal('200.00'))
+        self.assertEqual(summary['total_balance_formatted'], 'R$ 3.300,00')
+        self.assertEqual(
+            summary['accounts_by_type'],
+            {
+                'Conta Corrente': {'count': 31, 'total_balance': Decimal('2800.00')},
+                'Poupança': {'count': 1, 'total_balance': Decimal('500.00')},
+            },
+        )
+
+        # Segunda leitura vem do cache
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        self.assertFalse([q for q in queries if 'financial_accounts_account' in q['sql']])
+
+    def test_writes_invalidate_cached_summary(self):
+        account = Account.objects.create(
+            user=self.user, name='Corrente', type='checking', initial_balance=Decimal('100.00')
+        )
+        self.assertEqual(self.client.get(self.url).json()['total_balance'], 100.0)
+
+        # Transação atualiza o saldo (Account.save) e troca a geração
+        Transaction.objects.create(
+            user=self.user, type='expense', amount=Decimal('30.00'), description='Mercado',
+            category=Category.objects.create(name='Mercado', color='#00ff00'),
+            account=account, date=date(2024, 3, 1),
+        )
+        self.assertEqual(self.client.get(self.url).json()['total_balance'], 70.0)
+
+        account.delete()
+        self.assertEqual(self.client.get(self.url).json()['total_accounts'], 0)
+
+        # Gravações de outro usuário não afetam este cache
+        generation = summaries.generation(self.user.pk)
+        Account.objects.create(user=User.objects.create_user(username='outro', password='x'), name='Outra', type='cash')
+        self.assertEqual(summaries.generation(self.user.pk), generation)
+
+
+class CardSummaryTests(TestCase):
+    url = '/api/financial/credit-cards/summary/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='resumo_cartao', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_card_totals_follow_limit_updates(self):
+        empty = self.client.get(self.url).json()
+        self.assertEqual(empty['total_cards'], 0)
+        self.assertEqual(empty['average_usage'], 0)
+
+        card = CreditCard.objects.create(
+            user=self.user, name='Cartão', credit_limit=Decimal('1000.00'), closing_day=5, due_day=15,
+        )
+        CreditCard.objects.create(
+            user=self.user, name='Reserva', credit_limit=Decimal('1000.00'), closing_day=10, due_day=20,
+        )
+        Transaction.objects.create(
+            user=self.user, type='expense', amount=Decimal('900.00'), description='Viagem',
+            category=Category.objects.create(name='Viagem', color='#ff0000'),
+            credit_card=card, date=date(2024, 3, 1),
+        )
+
+        summary = self.client.get(self.url).json()
+        self.assertEqual(summary['total_cards'], 2)
+        self.assertEqual(summary['total_limit'], 2000.0)
+        self.assertEqual(summary['total_used'], 900.0)
+        self.assertEqual(summary['average_usage'], 45.0)
+        self.assertEqual(summary['cards_near_limit'], 1)
+
+    def test_card_report_single_scan_and_cache(self):
+        card = CreditCard.objects.create(
+            user=self.user, name='Cartão', credit_limit=Decimal('1000.00'), closing_day=5, due_day=15,
+        )
+        category = Category.objects.create(name='Lazer', color='#ff00ff')
+        for amount, on_date, type in (
+            ('100.00', date(2024, 2, 10), 'expense'),
+            ('50.00', date(2024, 3, 2), 'expense'),
+            ('20.00', date(2024, 3, 3), 'income'),
+        ):
+            Transaction.objects.create(
+                user=self.user, type=type, amount=Decimal(amount), description=f'{type} {amount}',
+                category=category, credit_card=card, date=on_date,
+            )
+        url = f'/api/financial/credit-cards/{card.pk}/report/'
+
+        with CaptureQueriesContext(connection) as queries:
+            report = self.client.get(url, {'date_from': '2024-01-01', 'date_to': '2024-12-31'}).data
+        self.assertEqual(report['totals']['total_spent'], Decimal('150.00'))
+        self.assertEqual(report['totals']['transaction_count'], 3)
+        self.assertEqual(report['totals']['average_transaction'], Decimal('50.00'))
+        self.assertEqual(
+            [(row['month'], row['total_spent'], row['transaction_count']) for row in report['monthly_evolution']],
+            [(date(2024, 2, 1), Decimal('100.00'), 1), (date(2024, 3, 1), Decimal('50.00'), 1)],
+        )
+        self.assertEqual(report['limit_info']['available_limit'], Decimal('870.00'))
+        self.assertEqual(len([q for q in queries if 'SUM(' in q['sql'] and 'transactions_posting' in q['sql']]), 1)
+
+        # Segunda visita: totais e meses vêm do cache, sem varrer o razão
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {'date_from': '2024-01-01', 'date_to': '2024-12-31'})
+        self.assertFalse([q for q in queries if 'transactions_posting' in q['sql']])
+
+    def test_report_shows_category_and_tag_edits(self):
+        card = CreditCard.objects.create(
+            user=self.user, name='Cartão', credit_limit=Decimal('1000.00'), closing_day=5, due_day=15,
+        )
+        category = Category.objects.create(name='Lazer', color='#ff00ff')
+        transaction = Transaction.objects.create(
+            user=self.user, type='expense', amount=Decimal('80.00'), description='Cinema',
+            category=category, credit_card=card, date=date(2024, 3, 2),
+        )
+        url = f'/api/financial/credit-cards/{card.pk}/report/'
+        self.client.get(url)
+
+        # Nem a categoria nem as tags passam pelo save() do cartão
+        category.name = 'Cultura'
+        category.save()
+        transaction.add_tags(['cinema'])
+
+        report = self.client.get(url).data
+        self.assertEqual(report['category_breakdown'][0]['category__name'], 'Cultura')
+        self.assertEqual(report['recent_transactions'][0]['category_name'], 'Cultura')
+        self.assertEqual([tag['name'] for tag in report['recent_transactions'][0]['tags_list']], ['cinema'])
@@ -0,0 +1,100 @@
+"""
+Testes do pipeline assíncrono de auditoria
+"""
+
+import os
+import json
+import tempfile
+import django
+from pathlib import Path
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nossa_grana.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import TestCase, SimpleTestCase, RequestFactory
+from unittest.mock import patch
+
+from middleware.audit_log import AuditLogMiddleware
+from utils.audit import AuditLogWriter
+
+
+class AuditLogWriterTests(SimpleTestCase):
+    """Testes do AuditLogWriter"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / 'audit.jsonl'
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_lines(self):
+        return [json.loads(line) for line in self.path.read_text(encoding='utf-8').splitlines()]
+
+    def test_batches_and_sanitizes_in_background(self):
+        writer = AuditLogWriter(self.path, batch_size=10, flush_interval=60, fsync=False)
+        body = json.dumps({'amount': '10.00', 'password': 'segredo'}).encode()
+        for i in range(25):
+            writer.submit({'event': 'audit', 'ts': 0, 'seq': i, 'body': body})
+
+        self.assertTrue(writer.flush())
+        writer.stop()
+
+        lines = self.read_lines()
+        self.assertEqual([line['seq'] for line in lines], list(range(25)))
+        self.assertEqual(lines[0]['request_data'], {'amount': '10.00', 'password': '***REDACTED***'})
+        self.assertEqual(writer.stats['written'], 25)
+        self.assertGreaterEqual(writer.stats['batches'], 3)
+
+    def test_large_body_is_not_queued(self):
+        writer = AuditLogWriter(self.path, fsync=False, max_body_size=16)
+        body = json.dumps({'note': 'x' * 100}).encode()
+        writer.submit({'event': 'audit', 'ts': 0, 'body': b'{"a": 1}'})
+        writer.submit({'event': 'audit', 'ts': 0, 'body': body})
+
+        self.assertTrue(writer.flush())
+        writer.stop()
+
+        small, large = self.read_lines()
+        self.assertEqual(small['request_data'], {'a': 1})
+        self.assertNotIn('request_data', large)
+        self.assertEqual(large['body_size'], len(body))
+
+    def test_time_trigger(self):
+        writer = AuditLogWriter(self.path, batch_size=1000, flush_interval=0.05, fsync=False)
+        writer.submit({'event': 'audit', 'ts': 0})
+        writer._thread.join(0.5)
+        self.assertEqual(len(self.read_lines()), 1)
+        writer.stop()
+
+    def test_backpressure_drops_when_full(self):
+        writer = AuditLogWriter(self.path, queue_size=1, enqueue_timeout=0.01)
+        writer._thread = object()  # Thread de escrita parada: a fila não esvazia
+        self.assertTrue(writer.submit({'event': 'a', 'ts': 0}))
+        self.assertFalse(writer.submit({'event': 'b', 'ts': 0}))
+        self.assertEqual(writer.stats['dropped'], 1)
+
+
+class AuditLogMiddlewareTests(TestCase):
+    """O middleware apenas enfileira o registro"""
+
+    def test_enqueues_raw_body(self):
+        user = User.objects.create_user(username='auditor', password='testpass123')
+        request = RequestFactory().post(
+            '/api/transactions/', data={'amount': '5.00'}, content_type='application/json'
+        )
+        request.user = user
+        middleware = AuditLogMiddleware(lambda request: HttpResponse(status=201))
+
+        with patch('middleware.audit_log.audit') as audit:
+            middleware(request)
+
+        event, = audit.call_args.args
+        fields = audit.call_args.kwargs
+        self.assertEqual(event, 'audit')
+        self.assertEqual(fields['user_id'], user.id)
+        self.assertEqual(fields['status_code'], 201)
+        self.assertEqual(json.loads(fields['body']), {'amount': '5.00'})
@@ -0,0 +1,225 @@
+"""
+Testes do backup online do SQLite (utils.backup)
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nossa_grana.settings')
+django.setup()
+
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.backup_views import BackupView
+from utils.backup import SQLiteBackup
+
+
+class BackupTestMixin:
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='nossa_grana_backup_')
+        self.db_path = os.path.join(self.tmpdir, 'db.sqlite3')
+        self.backup_dir = os.path.join(self.tmpdir, 'backups')
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE lancamento (id INTEGER PRIMARY KEY, descricao TEXT, valor REAL)')
+        conn.executemany(
+            'INSERT INTO lancamento (descricao, valor) VALUES (?, ?)',
+            [(f'Lançamento {i} ' + 'x' * 200, i * 1.5) for i in range(5000)],
+        )
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def engine(self, **kwargs):
+        kwargs.setdefault('compression', 'gzip')
+        return SQLiteBackup(self.db_path, self.backup_dir, **kwargs)
+
+    def execute(self, sql, params=()):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(sql, params)
+        conn.commit()
+        conn.close()
+
+    def rows(self, path):
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute('SELECT id, descricao, valor FROM lancamento ORDER BY id').fetchall()
+        finally:
+            conn.close()
+
+
+class SQLiteBackupTests(BackupTestMixin, SimpleTestCase):
+    def test_full_backup_is_compressed_and_restorable(self):
+        engine = self.engine()
+        manifest = engine.create()
+
+        self.assertEqual(manifest['kind'], 'full')
+        self.assertTrue(manifest['filename'].endswith('.sqlite3.gz'))
+        path = os.path.join(self.backup_dir, manifest['filename'])
+        self.assertEqual(manifest['size'], os.path.getsize(path))
+        self.assertLess(manifest['size'], manifest['database_size'])
+        self.assertGreater(manifest['duration_ms'], 0)
+
+        restored = os.path.join(self.tmpdir, 'restored.sqlite3')
+        engine.restore(manifest['name'], restored)
+        self.assertEqual(self.rows(restored), self.rows(self.db_path))
+
+    def test_backup_includes_uncheckpointed_wal(self):
+        # Escrita que ainda está só no -wal: copiar o arquivo principal a perderia
+        writer = sqlite3.connect(self.db_path)
+        writer.execute('PRAGMA wal_autocheckpoint=0')
+        writer.execute("INSERT INTO lancamento (descricao, valor) VALUES ('só no WAL', 1)")
+        writer.commit()
+
+        engine = self.engine()
+        manifest = engine.create()
+        restored = os.path.join(self.tmpdir, 'restored.sqlite3')
+        engine.restore(manifest['name'], restored)
+        writer.close()
+        self.assertIn('só no WAL', [row[1] for row in self.rows(restored)])
+
+    def test_incremental_stores_only_changed_pages(self):
+        engine = self.engine()
+        full = engine.create()
+        self.execute("UPDATE lancamento SET valor = -1 WHERE id = 4000")
+        incremental = engine.create()
+
+        self.assertEqual(incremental['kind'], 'incremental')
+        self.assertEqual(incremental['parent'], full['name'])
+        self.assertLess(incremental['pages_written'], incremental['page_count'] // 10)
+        self.assertLess(incremental['size'], full['size'])
+
+        self.execute("DELETE FROM lancamento WHERE id > 2500")
+        self.execute('VACUUM')
+        last = engine.create()
+        self.assertEqual(last['chain_length'], 3)
+        self.assertLess(last['page_count'], incremental['page_count'])
+
+        restored = os.path.join(self.tmpdir, 'restored.sqlite3')
+        engine.restore(last['name'], restored)
+        self.assertEqual(self.rows(restored), self.rows(self.db_path))
+
+        engine.restore(incremental['name'], restored)
+        self.assertEqual(len(self.rows(restored)), 5000)
+        self.assertEqual(dict((row[0], row[2]) for row in self.rows(restored))[4000], -1)
+
+    def test_new_full_after_full_every(self):
+        engine = self.engine(full_every=2)
+        kinds = [engine.create()['kind'] for _ in range(3)]
+        self.assertEqual(kinds, ['full', 'incremental', 'full'])
+        self.assertEqual(engine.create(incremental=False)['kind'], 'full')
+
+    def test_verify_detects_corruption(self):
+        engine = self.engine()
+        engine.create()
+        self.execute("UPDATE lancamento SET valor = 0 WHERE id = 1")
+        manifest = engine.create()
+
+        result = engine.verify(restore=True)
+        self.assertTrue(result['ok'])
+        self.assertEqual(result['integrity_check'], 'ok')
+
+        path = os.path.join(self.backup_dir, manifest['filename'])
+        with open(path, 'r+b') as f:
+            f.seek(20)
+            f.write(b'\x00\x01\x02')
+        result = engine.verify(manifest['name'], restore=True)
+        self.assertFalse(result['ok'])
+        self.assertIn('checksum', result['errors'][0])
+
+    def test_writers_progress_during_backup(self):
+        engine = self.engine(pages_per_step=8, step_sleep=0.001)
+        inserted = []
+        stop = threading.Event()
+
+        def writer():
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            while not stop.is_set():
+                conn.execute("INSERT INTO lancamento (descricao, valor) VALUES ('concorrente', 0)")
+                conn.commit()
+                inserted.append(1)
+            conn.close()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            manifest = engine.create()
+        finally:
+            stop.set()
+            thread.join()
+
+        self.assertGreater(len(inserted), 0)
+        self.assertTrue(engine.verify(manifest['name'], restore=True)['ok'])
+
+    def test_cleanup_removes_old_chains_only(self):
+        engine = self.engine(full_every=1)
+        old = engine.create()
+        current = engine.create()
+
+        manifest_path = os.path.join(self.backup_dir, old['name'] + '.json')
+        with open(manifest_path) as f:
+            data = json.load(f)
+        data['created_at'] = '2020-01-01T00:00:00'
+        with open(manifest_path, 'w') as f:
+            json.dump(data, f)
+
+        self.assertEqual(engine.cleanup(keep_days=30), [old['name']])
+        self.assertEqual([m['name'] for m in engine.list_backups()], [current['name']])
+        self.assertFalse(os.path.exists(os.path.join(self.backup_dir, old['filename'])))
+
+
+class BackupEndpointTests(BackupTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='backup', password='testpass123')
+        patcher = patch('accounts.backup_views.get_backup_engine', return_value=self.engine())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, method, data=None):
+        request = getattr(APIRequestFactory(), method)('/api/backup/', data or {}, format='json')
+        SessionMiddleware(lambda r: None).process_request(request)
+        force_authenticate(request, user=self.user)
+        return BackupView.as_view()(request)
+
+    def test_post_reports_real_size_and_duration(self):
+        response = self.request('post', {'type': 'full'})
+
+        self.assertEqual(response.status_code, 200)
+        path = os.path.join(self.backup_dir, response.data['filename'])
+        self.assertEqual(response.data['size_bytes'], os.path.getsize(path))
+        self.assertEqual(response.data['kind'], 'full')
+        self.assertGreater(response.data['duration_ms'], 0)
+
+        response = self.request('post')
+        self.assertEqual(response.data['kind'], 'incremental')
+
+    def test_get_reads_latest_manifest(self):
+        self.assertIsNone(self.request('get').data['last_backup'])
+        manifest = self.engine().create()
+        last_backup = self.request('get').data['last_backup']
+        self.assertEqual(last_backup['filename'], manifest['filename'])
+        self.assertEqual(last_backup['type'], 'automatic')
+
+    def test_backup_command(self):
+        out = StringIO()
+        with patch('accounts.management.commands.backup_database.get_backup_engine', return_value=self.engine()):
+            call_command('backup_database', stdout=out)
+            call_command('backup_database', verify='', stdout=out)
+        self.assertIn('Backup full criado', out.getvalue())
+        self.assertIn('verificado', out.getvalue())
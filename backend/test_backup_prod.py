@@ -0,0 +1,209 @@
+"""
+Testes do scripts/backup_prod.py
+
+Os testes de integração rodam pg_dump/pg_restore locais contra um Postgres
+quando POSTGRES_TEST_HOST está definido, por exemplo com o serviço `db` do
+docker-compose.yml:
+
+    docker compose up -d db
+    POSTGRES_TEST_HOST=localhost python -m pytest test_backup_prod.py
+"""
+
+import importlib.util
+import io
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest.mock import patch
+
+SCRIPT = Path(__file__).resolve().parent.parent / 'scripts' / 'backup_prod.py'
+spec = importlib.util.spec_from_file_location('backup_prod', SCRIPT)
+backup_prod = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(backup_prod)
+
+
+class BackupScriptTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='nossa_grana_backup_prod_')
+        self.backup_dir = Path(self.tmpdir) / 'backups'
+        env = patch.dict(os.environ, {'BACKUP_DIR': str(self.backup_dir)})
+        env.start()
+        self.addCleanup(env.stop)
+        self.addCleanup(shutil.rmtree, self.tmpdir, True)
+
+    def make_backup(self, **kwargs):
+        with redirect_stdout(io.StringIO()):
+            return backup_prod.ProductionBackup(**kwargs)
+
+
+class StreamingTests(BackupScriptTestCase):
+    producer = [sys.executable, '-c', 'import sys; sys.stdout.buffer.write(b"dump " * 200000)']
+
+    def test_stdout_is_compressed_without_temp_file(self):
+        path = self.backup_dir / 'db_backup_teste.dump.gz'
+        self.backup_dir.mkdir()
+        success, stderr = backup_prod.stream_command_to_file(self.producer, path)
+
+        self.assertTrue(success)
+        self.assertEqual(os.listdir(self.backup_dir), [path.name])
+        self.assertLess(path.stat().st_size, 1000000)
+        with backup_prod.open_compressed(path, 'r') as f:
+            self.assertEqual(f.read(), b'dump ' * 200000)
+
+    def test_failed_dump_removes_partial_file(self):
+        path = Path(self.tmpdir) / 'falha.dump.gz'
+        command = [sys.executable, '-c', 'import sys; sys.stdout.write("x"); sys.stderr.write("erro"); sys.exit(3)']
+        success, stderr = backup_prod.stream_command_to_file(command, path)
+
+        self.assertFalse(success)
+        self.assertIn('erro', stderr)
+        self.assertFalse(path.exists())
+
+    def test_restore_streams_decompressed_archive(self):
+        path = Path(self.tmpdir) / 'arquivo.dump.gz'
+        backup_prod.stream_command_to_file(self.producer, path)
+        output = Path(self.tmpdir) / 'saida'
+        consumer = [sys.executable, '-c', f'import sys, shutil; shutil.copyfileobj(sys.stdin.buffer, open({str(output)!r}, "wb"))']
+
+        success, stderr = backup_prod.stream_file_to_command(path, consumer)
+        self.assertTrue(success)
+        self.assertEqual(output.read_bytes(), b'dump ' * 200000)
+
+
+class ProductionBackupTests(BackupScriptTestCase):
+    def test_parallel_directory_dump_command(self):
+        backup = self.make_backup(jobs=6)
+        with patch.object(backup, 'run_command', return_value=(False, '')) as run, redirect_stdout(io.StringIO()):
+            backup.backup_database()
+
+        command = run.call_args[0][0]
+        self.assertEqual(command[:6], ['docker-compose', '-f', 'docker-compose.prod.yml', 'exec', '-T', 'db'])
+        self.assertIn('-Fd', command)
+        self.assertEqual(command[command.index('-j') + 1], '6')
+        self.assertTrue(command[command.index('-f', 6) + 1].startswith('/backups/db_backup_'))
+        self.assertIn('pg_dump', backup.timings)
+
+    def test_local_mode_uses_host_paths(self):
+        with patch.dict(os.environ, {'BACKUP_PG_HOST': 'db.local', 'BACKUP_PG_PORT': '5433'}):
+            backup = self.make_backup()
+        command = backup.pg_command(['pg_restore', '-l'])
+        self.assertEqual(command[:5], ['pg_restore', '-h', 'db.local', '-p', '5433'])
+        self.assertEqual(backup.pg_backup_dir, str(self.backup_dir.absolute()))
+
+    def test_parallel_restore_of_directory_backup(self):
+        backup = self.make_backup(jobs=3)
+        (self.backup_dir / 'db_backup_20240101_000000').mkdir()
+        with patch.object(backup, 'run_command', return_value=(True, '')) as run, redirect_stdout(io.StringIO()):
+            self.assertTrue(backup.restore_database('db_backup_20240101_000000', 'restaurado'))
+
+        command = run.call_args[0][0]
+        self.assertEqual(command[command.index('-j') + 1], '3')
+        self.assertEqual(command[command.index('-d') + 1], 'restaurado')
+        self.assertEqual(command[-1], '/backups/db_backup_20240101_000000')
+
+    def test_cleanup_removes_old_directory_backups(self):
+        backup = self.make_backup()
+        backup.max_backups = 1
+        for index in range(3):
+            path = self.backup_dir / f'db_backup_2024010{index}_000000'
+            path.mkdir()
+            (path / 'toc.dat').write_bytes(b'x')
+            os.utime(path, (index, index))
+
+        with redirect_stdout(io.StringIO()):
+            backup.cleanup_old_backups()
+        self.assertEqual([p.name for p in self.backup_dir.iterdir()], ['db_backup_20240102_000000'])
+
+    def test_prepare_pitr_writes_recovery_settings(self):
+        backup = self.make_backup()
+        base = self.backup_dir / 'base_backup_20240101_000000'
+        base.mkdir()
+        source = Path(self.tmpdir) / 'PG_VERSION'
+        source.write_text('15\n')
+        with tarfile.open(base / 'base.tar.gz', 'w:gz') as tar:
+            tar.add(source, arcname='PG_VERSION')
+
+        data_dir = Path(self.tmpdir) / 'pgdata'
+        with redirect_stdout(io.StringIO()):
+            backup.prepare_pitr(base.name, data_dir, '2024-01-01 12:00:00-03')
+
+        self.assertEqual((data_dir / 'PG_VERSION').read_text(), '15\n')
+        self.assertTrue((data_dir / 'recovery.signal').exists())
+        config = (data_dir / 'postgresql.auto.conf').read_text()
+        self.assertIn("restore_command = 'gunzip -c /backups/wal/%f.gz > %p'", config)
+        self.assertIn("recovery_target_time = '2024-01-01 12:00:00-03'", config)
+
+
+@unittest.skipUnless(
+    os.environ.get('POSTGRES_TEST_HOST') and shutil.which('pg_dump'),
+    'POSTGRES_TEST_HOST não definido ou pg_dump ausente',
+)
+class PostgresBackupIntegrationTests(BackupScriptTestCase):
+    restore_db = 'nossa_grana_restore_test'
+
+    def setUp(self):
+        super().setUp()
+        import psycopg2
+
+        self.params = {
+            'dbname': os.environ.get('POSTGRES_TEST_DB', 'nossa_grana'),
+            'user': os.environ.get('POSTGRES_TEST_USER', 'postgres'),
+            'password': os.environ.get('POSTGRES_TEST_PASSWORD', 'postgres'),
+            'host': os.environ['POSTGRES_TEST_HOST'],
+            'port': os.environ.get('POSTGRES_TEST_PORT', '5432'),
+        }
+        env = patch.dict(os.environ, {
+            'BACKUP_PG_HOST': self.params['host'], 'BACKUP_PG_PORT': self.params['port'],
+            'POSTGRES_USER': self.params['user'], 'POSTGRES_DB': self.params['dbname'],
+            'PGPASSWORD': self.params['password'],
+        })
+        env.start()
+        self.addCleanup(env.stop)
+
+        self.admin = psycopg2.connect(**self.params)
+        self.admin.autocommit = True
+        self.addCleanup(self.admin.close)
+        with self.admin.cursor() as cursor:
+            cursor.execute(f'DROP DATABASE IF EXISTS {self.restore_db}')
+            for table in ('backup_a', 'backup_b'):
+                cursor.execute(f'DROP TABLE IF EXISTS {table}')
+                cursor.execute(f'CREATE TABLE {table} AS SELECT g AS id, md5(g::text) AS hash FROM generate_series(1, 20000) g')
+        self.addCleanup(self.drop_objects)
+
+    def drop_objects(self):
+        with self.admin.cursor() as cursor:
+            cursor.execute(f'DROP DATABASE IF EXISTS {self.restore_db}')
+            cursor.execute('DROP TABLE IF EXISTS backup_a, backup_b')
+
+    def restored_count(self, table):
+        import psycopg2
+
+        conn = psycopg2.connect(**{**self.params, 'dbname': self.restore_db})
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f'SELECT COUNT(*) FROM {table}')
+                return cursor.fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_directory_dump_and_parallel_restore(self):
+        backup = self.make_backup(jobs=2)
+        with redirect_stdout(io.StringIO()):
+            path = backup.backup_database()
+            self.assertIsNotNone(path)
+            self.assertTrue(backup.restore_database(path.name, self.restore_db, create=True))
+        self.assertEqual(self.restored_count('backup_b'), 20000)
+        self.assertIn('pg_restore', backup.timings)
+
+    def test_single_file_dump_and_restore(self):
+        backup = self.make_backup()
+        with redirect_stdout(io.StringIO()):
+            path = backup.backup_database(single_file=True)
+            self.assertIsNotNone(path)
+            self.assertTrue(backup.restore_database(path.name, self.restore_db, create=True))
+        self.assertEqual(self.restored_count('backup_a'), 20000)
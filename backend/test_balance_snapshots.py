@@ -0,0 +1,164 @@
+"""
+Testes dos saldos diários (financial_accounts.snapshots) e da série de patrimônio
+"""
+
+import os
+import django
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nossa_grana.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from financial_accounts import snapshots
+from financial_accounts.models import Account, BalanceSnapshot, CreditCard
+from transactions.models import Category, Transaction
+
+END = date(2024, 3, 31)
+
+
+class BalanceSnapshotTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='patrimonio', password='testpass123')
+        self.category = Category.objects.create(name='Geral', color='#00ff00')
+        self.checking = Account.objects.create(
+            user=self.user, name='Corrente', type='checking', initial_balance=Decimal('1000.00')
+        )
+        self.savings = Account.objects.create(user=self.user, name='Poupança', type='savings')
+        self.card = CreditCard.objects.create(
+            user=self.user, name='Cartão', credit_limit=Decimal('2000.00'), closing_day=5, due_day=15,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, type, amount, day, **kwargs):
+        return Transaction.objects.create(
+            user=self.user, type=type, amount=Decimal(amount), description=f'{type} {amount}',
+            category=self.category, date=date(2024, 3, day), **kwargs
+        )
+
+    def balance(self, owner, day):
+        return BalanceSnapshot.objects.get(date=date(2024, 3, day), **owner).balance
+
+    def test_build_fills_each_day_once(self):
+        self.create('income', '500.00', 5, account=self.checking)
+        self.create('expense', '100.00', 5, account=self.checking)
+        self.create('transfer', '200.00', 10, transfer_from_account=self.checking, transfer_to_account=self.savings)
+        self.create('expense', '300.00', 12, credit_card=self.card)
+
+        created = snapshots.build_snapshots('default', until=END)
+        # Corrente e cartão começam no 1º lançamento; poupança na transferência
+        self.assertEqual(created, 27 + 22 + 20)
+        self.assertEqual(snapshots.build_snapshots('default', until=END), 0)
+
+        checking = {'account': self.checking}
+        self.assertEqual(self.balance(checking, 5), Decimal('1400.00'))
+        self.assertEqual(self.balance(checking, 9), Decimal('1400.00'))
+        self.assertEqual(self.balance(checking, 31), Decimal('1200.00'))
+        self.assertEqual(self.balance({'account': self.savings}, 10), Decimal('200.00'))
+        self.assertEqual(self.balance({'credit_card': self.card}, 12), Decimal('-300.00'))
+
+        # Dias seguintes entram na próxima execução
+        self.assertEqual(snapshots.build_snapshots('default', until=date(2024, 4, 2)), 6)
+
+    def test_back_dated_writes_correct_existing_days(self):
+        self.create('income', '500.00', 10, account=self.checking)
+        snapshots.build_snapshots('default', until=END)
+        checking = {'account': self.checking}
+
+        expense = self.create('expense', '50.00', 20, account=self.checking)
+        self.assertEqual(self.balance(checking, 19), Decimal('1500.00'))
+        self.assertEqual(self.balance(checking, 20), Decimal('1450.00'))
+
+        expense.amount = Decimal('80.00')
+        expense.save()
+        self.assertEqual(self.balance(checking, 31), Decimal('1420.00'))
+        expense.delete()
+        self.assertEqual(self.balance(checking, 31), Decimal('1500.00'))
+
+        # Antes do primeiro dia gravado: os dias existentes são corrigidos e
+        # a próxima execução completa o começo
+        self.create('expense', '100.00', 2, account=self.checking)
+        self.assertEqual(self.balance(checking, 10), Decimal('1400.00'))
+        self.assertEqual(snapshots.build_snapshots('default', until=END), 8)
+        self.assertEqual(self.balance(checking, 2), Decimal('900.00'))
+        self.assertEqual(self.balance(checking, 9), Decimal('900.00'))
+
+    def test_initial_balance_change_shifts_history(self):
+        self.create('income', '500.00', 10, account=self.checking)
+        snapshots.build_snapshots('default', until=END)
+
+        self.checking.initial_balance = Decimal('2000.00')
+        self.checking.save()
+        self.assertEqual(self.balance({'account': self.checking}, 31), Decimal('2500.00'))
+        self.assertEqual(self.checking.current_balance, Decimal('2500.00'))
+
+    def test_net_worth_history_endpoint(self):
+        self.create('income', '500.00', 1, account=self.checking)
+        self.create('expense', '1600.00', 10, account=self.checking)
+        self.create('income', '300.00', 15, account=self.savings)
+        self.create('expense', '300.00', 20, credit_card=self.card)
+        call_command('snapshot_balances', until=END, stdout=StringIO())
+
+        url = '/api/financial/accounts/net_worth_history/'
+        data = self.client.get(url, {'date_from': '2024-03-01', 'date_to': '2024-03-31'}).data
+        self.assertEqual(len(data['series']), 31)
+        last = data['series'][-1]
+        self.assertEqual(last['total_balance'], Decimal('200.00'))
+        self.assertEqual(last['net_worth'], Decimal('300.00'))
+        self.assertEqual(last['total_debt'], Decimal('100.00'))
+        self.assertEqual(last['credit_cards'], Decimal('-300.00'))
+
+        weekly = self.client.get(url, {'date_from': '2024-03-01', 'date_to': '2024-03-31', 'interval': 'weekly'})
+        self.assertEqual(
+            [point['date'] for point in weekly.data['series']],
+            [date(2024, 3, 3), date(2024, 3, 10), date(2024, 3, 17), date(2024, 3, 24), date(2024, 3, 31)],
+        )
+        self.assertEqual(weekly.data['series'][1]['total_balance'], Decimal('-100.00'))
+
+        monthly = self.client.get(url, {'date_from': '2024-01-01', 'date_to': '2024-03-31', 'interval': 'monthly'})
+        self.assertEqual([point['date'] for point in monthly.data['series']], [date(2024, 3, 31)])
+
+        self.assertEqual(self.client.get(url, {'interval': 'hourly'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'date_from': '2024-04-01', 'date_to': '2024-03-01'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'date_from': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'date_to': '2024-13-01'}).status_code, 400)
+
+        # Conta inativa sai da série, como no resumo de contas
+        self.savings.is_active = False
+        self.savings.save()
+        last = self.client.get(url, {'date_from': '2024-03-31', 'date_to': '2024-03-31'}).data['series'][-1]
+        summary = self.client.get('/api/financial/accounts/summary/').data
+        self.assertEqual(last['total_balance'], Decimal('-100.00'))
+        self.assertEqual(last['total_balance'], summary['total_balance'])
+
+        # Outro usuário não vê estes saldos
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='outro', password='testpass123'))
+        self.assertEqual(other.get(url, {'date_from': '2024-03-01', 'date_to': '2024-03-31'}).data['series'], [])
+
+
+class PeriodEndsTests(SimpleTestCase):
+    def test_weekly_and_monthly(self):
+        self.assertEqual(
+            snapshots.period_ends(date(2024, 1, 31), date(2024, 4, 10), 'monthly'),
+            [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 10)],
+        )
+        self.assertEqual(
+            snapshots.period_ends(date(2024, 12, 1), date(2025, 1, 31), 'monthly'),
+            [date(2024, 12, 31), date(2025, 1, 31)],
+        )
+        self.assertEqual(
+            snapshots.period_ends(date(2024, 3, 4), date(2024, 3, 17), 'weekly'),
+            [date(2024, 3, 10), date(2024, 3, 17)],
+        )
+        # Cinco anos mensais: 60 pontos
+        self.assertEqual(len(snapshots.period_ends(date(2020, 1, 1), date(2024, 12, 31), 'monthly')), 60)
+        self.assertEqual(len(snapshots.period_ends(date(2020, 1, 6), date(2020, 1, 6) + timedelta(days=6), 'weekly')), 1)
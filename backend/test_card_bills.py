@@ -0,0 +1,211 @@
+"""
+Testes da atribuição de faturas na gravação (financial_accounts.billing)
+"""
+
+import os
+import django
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nossa_grana.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from financial_accounts import billing
+from financial_accounts.models import CreditCard, CreditCardBill
+from transactions.models import Category, Transaction
+
+
+class CycleTests(SimpleTestCase):
+    def test_purchase_lands_in_closing_month(self):
+        self.assertEqual(
+            billing.cycle_for(5, 15, date(2024, 3, 5)),
+            (date(2024, 3, 1), date(2024, 3, 5), date(2024, 3, 15)),
+        )
+        self.assertEqual(
+            billing.cycle_for(5, 15, date(2024, 3, 6)),
+            (date(2024, 4, 1), date(2024, 4, 5), date(2024, 4, 15)),
+        )
+
+    def test_short_months_and_year_rollover(self):
+        # Fechamento no dia 31 vira o último dia de fevereiro
+        self.assertEqual(billing.cycle_for(31, 10, date(2024, 2, 20))[1], date(2024, 2, 29))
+        # Vencimento antes do fechamento cai no mês seguinte
+        self.assertEqual(
+            billing.cycle_for(25, 5, date(2024, 12, 26)),
+            (date(2025, 1, 1), date(2025, 1, 25), date(2025, 2, 5)),
+        )
+
+
+class CardBillTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='fatura', password='testpass123')
+        self.category = Category.objects.create(name='Compras', color='#0000ff')
+        self.card = CreditCard.objects.create(
+            user=self.user, name='Cartão', bank='Banco', credit_limit=Decimal('2000.00'), closing_day=5, due_day=15,
+        )
+
+    def create(self, amount, on_date, type='expense'):
+        return Transaction.objects.create(
+            user=self.user, type=type, amount=Decimal(amount), description=f'Compra {amount}',
+            category=self.category, credit_card=self.card, date=on_date,
+        )
+
+    def bill(self, month):
+        return CreditCardBill.objects.get(credit_card=self.card, reference_month=date(2024, month, 1))
+
+    def test_bill_totals_follow_writes(self):
+        first = self.create('100.00', date(2024, 3, 2))
+        self.create('50.00', date(2024, 3, 5))
+        self.create('30.00', date(2024, 3, 6))
+        self.create('20.00', date(2024, 3, 3), type='income')
+
+        self.assertEqual(first.bill, self.bill(3))
+        self.assertEqual(self.bill(3).total_amount, Decimal('130.00'))
+        self.assertEqual(self.bill(3).closing_date, date(2024, 3, 5))
+        self.assertEqual(self.bill(4).total_amount, Decimal('30.00'))
+
+        first.amount = Decimal('150.00')
+        first.date = date(2024, 3, 20)
+        first.save()
+        self.assertEqual(self.bill(3).total_amount, Decimal('30.00'))
+        self.assertEqual(self.bill(4).total_amount, Decimal('180.00'))
+
+        first.delete()
+        self.assertEqual(self.bill(4).total_amount, Decimal('30.00'))
+
+        for bill in CreditCardBill.objects.filter(credit_card=self.card):
+            expected = bill.total_amount
+            bill.calculate_total()
+            self.assertEqual(bill.total_amount, expected)
+
+    def test_available_limit_uses_unpaid_bills(self):
+        self.create('300.00', date(2024, 3, 2))
+        self.create('200.00', date(2024, 3, 10))
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.available_limit, Decimal('1500.00'))
+
+        bill = self.bill(3)
+        bill.pay(Decimal('100.00'))
+        self.card.update_available_limit()
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.available_limit, Decimal('1600.00'))
+
+        bill.pay(Decimal('200.00'))
+        self.card.update_available_limit()
+        self.card.refresh_from_db()
+        self.assertEqual(self.bill(3).status, 'paid')
+        self.assertEqual(self.card.available_limit, Decimal('1800.00'))
+
+        # Compra retroativa numa fatura paga reabre a fatura
+        self.create('40.00', date(2024, 3, 1))
+        self.assertEqual(self.bill(3).status, 'closed')
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.available_limit, Decimal('1760.00'))
+
+    def test_paid_bill_before_closing_reopens_as_open(self):
+        closing_date = timezone.localdate() + timedelta(days=3)
+        bill = CreditCardBill.objects.create(
+            credit_card=self.card, reference_month=closing_date.replace(day=1), closing_date=closing_date,
+            due_date=closing_date + timedelta(days=10), total_amount=Decimal('50.00'),
+            paid_amount=Decimal('50.00'), status='paid',
+        )
+        # Pagamento antecipado e nova compra no mesmo ciclo: a fatura segue aberta
+        billing.apply('default', bill.pk, Decimal('20.00'))
+        bill.refresh_from_db()
+        self.assertEqual(bill.status, 'open')
+        self.assertEqual(bill.total_amount, Decimal('70.00'))
+
+    def test_backfill_command(self):
+        for day in (1, 4, 6, 20):
+            self.create('10.00', date(2024, 3, day))
+        # Estado anterior ao campo: sem fatura e sem totais
+        Transaction.objects.filter(credit_card=self.card).update(bill=None)
+        CreditCardBill.objects.filter(credit_card=self.card).delete()
+        CreditCard.objects.filter(pk=self.card.pk).update(available_limit=Decimal('2000.00'))
+
+        out = StringIO()
+        call_command('assign_card_bills', stdout=out)
+        self.assertIn('4 transações', out.getvalue())
+
+        self.assertEqual(self.bill(3).total_amount, Decimal('20.00'))
+        self.assertEqual(self.bill(4).total_amount, Decimal('20.00'))
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.available_limit, Decimal('1960.00'))
+
+        call_command('assign_card_bills', stdout=out)
+        self.assertEqual(CreditCardBill.objects.filter(credit_card=self.card).count(), 2)
+
+
+class BillCycleTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='ciclo', password='testpass123')
+        self.category = Category.objects.create(name='Compras', color='#0000ff')
+        self.card = CreditCard.objects.create(
+            user=self.user, name='Cartão', bank='Banco', credit_limit=Decimal('2000.00'), closing_day=5, due_day=15,
+        )
+        self.other = CreditCard.objects.create(
+            user=self.user, name='Outro', bank='Banco', credit_limit=Decimal('500.00'), closing_day=25, due_day=5,
+        )
+
+    def bill(self, card, month):
+        return CreditCardBill.objects.get(credit_card=card, reference_month=date(2024, month, 1))
+
+    def test_lifecycle_transitions_and_next_bills(self):
+        Transaction.objects.create(
+            user=self.user, type='expense', amount=Decimal('80.00'), description='Compra março',
+            category=self.category, credit_card=self.card, date=date(2024, 3, 2),
+        )
+        CreditCardBill.objects.filter(credit_card=self.card).update(status='open')
+
+        # Depois do fechamento (5/3): fecha a de março e cria a de abril
+        result = billing.run_bill_cycle('default', today=date(2024, 3, 6))
+        self.assertEqual(result['closed'], 1)
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(self.bill(self.card, 3).status, 'closed')
+        self.assertEqual(self.bill(self.card, 4).status, 'open')
+        self.assertEqual(self.bill(self.other, 3).closing_date, date(2024, 3, 25))
+
+        # Idempotente no mesmo dia
+        self.assertEqual(
+            billing.run_bill_cycle('default', today=date(2024, 3, 6)),
+            {'closed': 0, 'paid': 0, 'overdue': 0, 'created': 0},
+        )
+
+        # Vencimento (15/3) sem pagamento: vencida. A de março do cartão
+        # 'Outro' fecha zerada em 25/3 e fica quitada
+        out = StringIO()
+        call_command('process_card_bills', date=date(2024, 3, 16), stdout=out)
+        self.assertIn('1 vencidas', out.getvalue())
+        self.assertEqual(self.bill(self.card, 3).status, 'overdue')
+
+        call_command('process_card_bills', date=date(2024, 3, 26), stdout=out)
+        self.assertEqual(self.bill(self.other, 3).status, 'paid')
+        self.assertEqual(self.bill(self.other, 4).status, 'open')
+
+    def test_bill_endpoints_filter_by_status(self):
+        from rest_framework.test import APIClient
+
+        CreditCardBill.objects.create(
+            credit_card=self.card, reference_month=date(2024, 1, 1), closing_date=date(2024, 1, 5),
+            due_date=date(2024, 1, 15), total_amount=Decimal('50.00'), status='overdue',
+        )
+        CreditCardBill.objects.create(
+            credit_card=self.card, reference_month=date(2024, 2, 1), closing_date=date(2024, 2, 5),
+            due_date=date(2024, 2, 15), total_amount=Decimal('50.00'), paid_amount=Decimal('50.00'), status='paid',
+        )
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        overdue = client.get('/api/financial/credit-card-bills/overdue/').data
+        self.assertEqual([bill['reference_month'] for bill in overdue], ['2024-01-01'])
+        self.assertEqual([bill['is_overdue'] for bill in overdue], [True])
+        # Vencida e paga: não é atrasada
+        self.assertFalse(CreditCardBill.objects.get(reference_month=date(2024, 2, 1)).is_overdue)
+        self.assertEqual(client.get('/api/financial/credit-card-bills/upcoming/').data, [])
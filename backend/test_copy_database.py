@@ -0,0 +1,107 @@
+"""
+Testes da cópia de banco em streaming (nossa_grana.db_copy)
+
+O destino é um segundo banco SQLite (escrita com executemany); em um
+destino PostgreSQL o mesmo fluxo escreve com COPY FROM STDIN.
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+import django
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nossa_grana.settings')
+django.setup()
+
+from django.conf import settings
+from django.db import connections
+
+COPY_DIR = tempfile.mkdtemp(prefix='nossa_grana_copy_')
+atexit.register(shutil.rmtree, COPY_DIR, True)
+if 'copy_target' not in settings.DATABASES:
+    settings.DATABASES['copy_target'] = {
+        **settings.DATABASES['default'],
+        'NAME': os.path.join(COPY_DIR, 'copy_target.sqlite3'),
+        'TEST': {'NAME': os.path.join(COPY_DIR, 'test_copy_target.sqlite3')},
+    }
+    connections.configure_settings(settings.DATABASES)
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from financial_accounts.models import Account, CreditCard
+from nossa_grana.db_copy import copy_order, verify_copy
+from transactions.models import Category, Tag, Transaction
+
+
+class CopyDatabaseTests(TestCase):
+    databases = {'default', 'copy_target'}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='migrante', password='testpass123')
+        self.category = Category.objects.create(name='Mercado')
+        self.account = Account.objects.create(
+            user=self.user, name='Conta Corrente', type='checking', initial_balance=Decimal('1000.00')
+        )
+        self.card = CreditCard.objects.create(
+            user=self.user, name='Cartão', credit_limit=Decimal('5000.00'),
+            closing_day=5, due_day=15,
+        )
+        for day in range(1, 21):
+            transaction = Transaction.objects.create(
+                user=self.user, type='expense', amount=Decimal('10.50'), description=f'Compra {day}\tcom tab',
+                category=self.category, account=self.account, date=date(2024, 1, day),
+            )
+        transaction.add_tags(['feira', 'mensal'])
+
+    def copy(self, **options):
+        out = StringIO()
+        call_command('copy_database', target='copy_target', batch_size=7, stdout=out, stderr=StringIO(), **options)
+        return out.getvalue()
+
+    def test_dependency_order(self):
+        order = [model._meta.label for model in copy_order('copy_target')]
+        self.assertLess(order.index('auth.User'), order.index('financial_accounts.Account'))
+        self.assertLess(order.index('financial_accounts.Account'), order.index('transactions.Transaction'))
+        self.assertLess(order.index('transactions.Transaction'), order.index('transactions.Transaction_tags'))
+
+    def test_copies_rows_preserving_ids_and_balances(self):
+        # Saldo deliberadamente diferente do recalculado: a cópia não pode chamar save()
+        Account.objects.filter(pk=self.account.pk).update(current_balance=Decimal('123.45'))
+
+        output = self.copy(truncate=True)
+        self.assertIn('Verificação ok', output)
+
+        copied = Account.objects.using('copy_target').get(pk=self.account.pk)
+        self.assertEqual(copied.current_balance, Decimal('123.45'))
+        self.assertEqual(copied.created_at, Account.objects.get(pk=self.account.pk).created_at)
+        self.assertEqual(Transaction.objects.using('copy_target').filter(user_id=self.user.pk).count(), 20)
+        last = Transaction.objects.using('copy_target').order_by('pk').last()
+        self.assertEqual(last.description, 'Compra 20\tcom tab')
+        self.assertEqual(sorted(last.tags.using('copy_target').values_list('name', flat=True)), ['feira', 'mensal'])
+        self.assertEqual(
+            CreditCard.objects.using('copy_target').get(pk=self.card.pk).available_limit,
+            self.card.available_limit,
+        )
+
+    def test_refuses_non_empty_target_without_truncate(self):
+        self.copy(truncate=True)
+        with self.assertRaisesMessage(CommandError, '--truncate'):
+            self.copy()
+
+    def test_verify_detects_balance_drift(self):
+        self.copy(truncate=True)
+        Account.objects.using('copy_target').filter(pk=self.account.pk).update(current_balance=Decimal('0.01'))
+        Tag.objects.using('copy_target').filter(name='feira').delete()
+
+        problems = verify_copy('default', 'copy_target')
+        self.assertTrue(any('financial_accounts.account' in p for p in problems))
+        self.assertTrue(any(p.startswith('transactions.Tag:') for p in problems))
+        with self.assertRaisesMessage(CommandError, 'Verificação falhou'):
+            self.copy(verify_only=True)
@@ -0,0 +1,164 @@
+"""
+Testes dos perfis de fraude (backend em memória) e de FraudValidators
+"""
+
+import os
+import threading
+import django
+from unittest.mock import patch
+
+import redis
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nossa_grana.settings')
+django.setup()
+
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase
+
+from fraud_validators import FraudValidators
+from utils.fraud_profile import (
+    FraudProfileStore, HISTOGRAM_CAP, LOCATION_ADDED, LOCATION_KNOWN, LOCATION_SUSPICIOUS,
+    MAX_DEVICES, MAX_LOCATIONS, VELOCITY_BUCKETS,
+)
+
+
+class VelocityTests(SimpleTestCase):
+    def setUp(self):
+        self.store = FraudProfileStore()
+
+    def test_rejected_transaction_is_not_counted(self):
+        for i in range(3):
+            self.assertTrue(self.store.velocity(1, 100, 3600, max_count=3, max_amount=1000, now=i).allowed)
+
+        result = self.store.velocity(1, 100, 3600, max_count=3, max_amount=1000, now=10)
+        self.assertFalse(result.allowed)
+        self.assertEqual((result.count, result.reason), (4, 'count'))
+
+        result = self.store.velocity(1, 900, 3600, max_count=10, max_amount=1000, now=11)
+        self.assertEqual((result.allowed, result.reason, result.total), (False, 'amount', 1200.0))
+        self.assertTrue(self.store.velocity(1, 700, 3600, max_count=10, max_amount=1000, now=12).allowed)
+
+    def test_old_buckets_leave_the_window(self):
+        bucket = 3600 / VELOCITY_BUCKETS
+        self.store.velocity(1, 500, 3600, max_count=50, max_amount=1000, now=0)
+        self.store.velocity(1, 400, 3600, max_count=50, max_amount=1000, now=bucket * 6)
+
+        self.assertFalse(self.store.velocity(1, 200, 3600, max_count=50, max_amount=1000, now=3599).allowed)
+        # A fatia da primeira transação saiu da janela; a de 400 continua
+        result = self.store.velocity(1, 200, 3600, max_count=50, max_amount=1000, now=3600)
+        self.assertEqual((result.allowed, result.count, result.total), (True, 2, 600.0))
+
+
+class BehaviorTests(SimpleTestCase):
+    def setUp(self):
+        self.store = FraudProfileStore()
+
+    def test_ewma_and_previous_snapshot(self):
+        first = self.store.observe(1, 100, 10, 'Mercado', now=0)
+        self.assertEqual((first.count, first.mean, first.category_count), (0, 0.0, 0))
+
+        self.store.observe(1, 200, 10, 'Mercado', now=1)
+        snapshot = self.store.observe(1, 100, 11, 'Lazer', now=2)
+        # mean = 100 + 0.1 * 100; var = 0.9 * (0 + 0.1 * 100²)
+        self.assertEqual(snapshot.count, 2)
+        self.assertAlmostEqual(snapshot.mean, 110.0)
+        self.assertAlmostEqual(snapshot.variance, 900.0)
+        self.assertEqual((snapshot.hour_count, snapshot.distinct_hours, snapshot.category_count), (0, 1, 0))
+        self.assertAlmostEqual(snapshot.zscore(200), 3.0)
+
+    def test_hour_histogram_is_bounded(self):
+        for i in range(HISTOGRAM_CAP + 10):
+            self.store.observe(1, 10, i % 2, 'x', now=i)
+        snapshot = self.store.observe(1, 10, 0, 'x', now=HISTOGRAM_CAP + 10)
+        self.assertLessEqual(snapshot.hour_count, HISTOGRAM_CAP)
+        self.assertEqual(snapshot.count, HISTOGRAM_CAP + 10)
+
+    def test_concurrent_updates_are_atomic(self):
+        def worker():
+            for _ in range(100):
+                self.store.observe(1, 10, 12, 'x', now=0)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.store.observe(1, 10, 12, 'x', now=0).count, 800)
+
+
+class DeviceAndLocationTests(SimpleTestCase):
+    def setUp(self):
+        self.store = FraudProfileStore()
+
+    def test_devices_keep_most_recent(self):
+        for i in range(MAX_DEVICES):
+            self.assertTrue(self.store.touch_device(1, f'fp{i}', now=i))
+        self.assertFalse(self.store.touch_device(1, 'fp0', now=10))
+
+        self.assertTrue(self.store.touch_device(1, 'novo', now=11))
+        # fp1 era o acesso mais antigo e foi removido; fp0 foi renovado
+        self.assertFalse(self.store.touch_device(1, 'fp0', now=12))
+        self.assertTrue(self.store.touch_device(1, 'fp1', now=13))
+
+    def test_suspicious_country_change(self):
+        self.assertEqual(self.store.add_location(1, '1.1.1.1', 'BR', now=0).status, LOCATION_ADDED)
+        self.assertEqual(self.store.add_location(1, '1.1.1.1', 'BR', now=10).status, LOCATION_KNOWN)
+
+        result = self.store.add_location(1, '2.2.2.2', 'US', now=600)
+        self.assertEqual((result.status, result.last_country), (LOCATION_SUSPICIOUS, 'BR'))
+        self.assertEqual(self.store.add_location(1, '2.2.2.2', 'US', now=3600).status, LOCATION_ADDED)
+
+        for i in range(MAX_LOCATIONS):
+            self.store.add_location(1, f'10.0.0.{i}', 'US', now=4000 + i)
+        self.assertEqual(self.store.add_location(1, '1.1.1.1', 'US', now=5000).status, LOCATION_ADDED)
+
+
+class FraudValidatorsTests(SimpleTestCase):
+    def setUp(self):
+        patcher = patch('fraud_validators.get_fraud_profile_store', return_value=FraudProfileStore())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = type('User', (), {'id': 42})()
+
+    def test_velocity_limits(self):
+        FraudValidators.validate_velocity_check(self.user, 15000)
+        with self.assertRaisesMessage(ValidationError, 'Limite de valor por hora excedido'):
+            FraudValidators.validate_velocity_check(self.user, 6000)
+
+        for _ in range(49):
+            FraudValidators.validate_velocity_check(self.user, 1)
+        with self.assertRaisesMessage(ValidationError, 'Limite de transações por hora excedido'):
+            FraudValidators.validate_velocity_check(self.user, 1)
+
+    def test_geolocation_and_behavior(self):
+        FraudValidators.validate_geolocation_risk(self.user, '1.1.1.1')
+        with self.assertRaisesMessage(ValidationError, 'Mudança de localização suspeita'):
+            FraudValidators.validate_geolocation_risk(self.user, '2.2.2.2', {'country': 'PT'})
+
+        for _ in range(10):
+            FraudValidators.validate_behavioral_pattern(self.user, {'amount': '50.00', 'category': 'Mercado'})
+        with self.assertLogs('fraud_detection', level='WARNING') as logs:
+            FraudValidators.validate_behavioral_pattern(self.user, {'amount': '900.00', 'category': 'Mercado'})
+        self.assertIn('Unusual amount', logs.output[0])
+
+
+class _DownRedisBackend:
+    """Backend cujas operações falham como um Redis que caiu após o boot"""
+
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise redis.ConnectionError('Connection refused')
+        return fail
+
+
+class RedisFailureTests(SimpleTestCase):
+    def test_checks_are_skipped_not_raised(self):
+        user = type('User', (), {'id': 7})()
+        with patch('fraud_validators.get_fraud_profile_store', return_value=FraudProfileStore(_DownRedisBackend())):
+            with self.assertLogs('nossa_grana', level='WARNING') as logs:
+                self.assertTrue(FraudValidators.validate_velocity_check(user, 50000))
+                self.assertTrue(FraudValidators.validate_geolocation_risk(user, '1.1.1.1', {'country': 'PT'}))
+                self.assertTrue(FraudValidators.validate_behavioral_pattern(user, {'amount': '10.00'}))
+                self.assertTrue(FraudValidators.validate_device_consistency(user, 'abc'))
+        self.assertEqual(len(logs.output), 4)
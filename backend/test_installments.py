@@ -0,0 +1,172 @@
+"""
+Testes das compras parceladas (transactions.installments)
+"""
+
+import os
+import django
+from datetime import date
+from decimal import Decimal
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nossa_grana.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from budgets.models import Budget
+from financial_accounts.models import CreditCard, CreditCardBill
+from transactions import installments, ledger
+from transactions.models import Category, InstallmentPlan, Posting, Transaction
+
+
+class SplitTests(SimpleTestCase):
+    def test_remainder_goes_to_first_installment(self):
+        parts = installments.split_amount(Decimal('1000.00'), 12)
+        self.assertEqual(parts[0], Decimal('83.37'))
+        self.assertEqual(set(parts[1:]), {Decimal('83.33')})
+        self.assertEqual(sum(parts), Decimal('1000.00'))
+
+    def test_add_months_clamps_day(self):
+        self.assertEqual(installments.add_months(date(2024, 1, 31), 1), date(2024, 2, 29))
+        self.assertEqual(installments.add_months(date(2024, 11, 30), 3), date(2025, 2, 28))
+
+
+class InstallmentPlanTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='parcelas', password='testpass123')
+        self.category = Category.objects.create(name='Eletrônicos', color='#0000ff')
+        self.card = CreditCard.objects.create(
+            user=self.user, name='Cartão', bank='Banco', credit_limit=Decimal('5000.00'), closing_day=5, due_day=15,
+        )
+
+    def create_plan(self, total='1200.00', count=12, purchase_date=date(2024, 1, 10)):
+        return installments.create_plan(
+            self.user, self.card, self.category, 'Notebook', Decimal(total), count, purchase_date,
+        )
+
+    def test_each_installment_lands_in_its_bill(self):
+        plan = self.create_plan()
+        parts = list(plan.parts.order_by('installment_number'))
+        self.assertEqual(len(parts), 12)
+        self.assertEqual(parts[0].description, 'Notebook (1/12)')
+        self.assertEqual(parts[11].date, date(2024, 12, 10))
+
+        # Compra depois do fechamento (5/1): a 1ª parcela vai na fatura de fevereiro
+        bills = CreditCardBill.objects.filter(credit_card=self.card).order_by('reference_month')
+        self.assertEqual(
+            [bill.reference_month for bill in bills],
+            [date(2024, month, 1) for month in range(2, 13)] + [date(2025, 1, 1)],
+        )
+        self.assertEqual([part.bill for part in parts], list(bills))
+        for bill in bills:
+            self.assertEqual(bill.total_amount, Decimal('100.00'))
+            bill.calculate_total()
+            self.assertEqual(bill.total_amount, Decimal('100.00'))
+
+        # O limite reserva o valor total
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.available_limit, Decimal('3800.00'))
+        self.assertEqual(
+            Posting.objects.filter(credit_card=self.card).order_by('date').last().running_total,
+            Decimal('-1200.00'),
+        )
+
+    def test_installments_share_bills_with_regular_purchases(self):
+        Transaction.objects.create(
+            user=self.user, type='expense', amount=Decimal('50.00'), description='Mercado',
+            category=self.category, credit_card=self.card, date=date(2024, 3, 1),
+        )
+        self.create_plan(total='300.00', count=3, purchase_date=date(2024, 2, 20))
+        march = CreditCardBill.objects.get(credit_card=self.card, reference_month=date(2024, 3, 1))
+        self.assertEqual(march.total_amount, Decimal('150.00'))
+        self.assertEqual(march.transactions.count(), 2)
+
+        # Razão: parcela anterior à compra avulsa corrige o acumulado dela
+        later = Posting.objects.get(credit_card=self.card, transaction__description='Mercado')
+        self.assertEqual(later.running_total, Decimal('-150.00'))
+
+    def test_budget_sees_monthly_installment(self):
+        self.create_plan()
+        budget = Budget.objects.create(
+            user=self.user, category=self.category, amount=Decimal('500.00'), month=date(2024, 6, 1)
+        )
+        self.assertEqual(budget.spent_amount, Decimal('100.00'))
+
+    def test_paying_a_bill_releases_its_installment(self):
+        self.create_plan()
+        bill = CreditCardBill.objects.get(credit_card=self.card, reference_month=date(2024, 2, 1))
+        bill.pay(Decimal('100.00'))
+        self.card.update_available_limit()
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.available_limit, Decimal('3900.00'))
+
+    def test_overlapping_plans_keep_running_totals(self):
+        self.create_plan(total='300.00', count=3, purchase_date=date(2024, 1, 10))
+        self.create_plan(total='300.00', count=3, purchase_date=date(2024, 1, 11))
+        postings = Posting.objects.filter(credit_card=self.card).order_by('date', 'transaction_id')
+        self.assertEqual(
+            list(postings.values_list('running_total', flat=True)),
+            [Decimal(value) for value in ('-100.00', '-200.00', '-300.00', '-400.00', '-500.00', '-600.00')],
+        )
+        self.assertEqual(ledger.recompute_running_totals(Posting, 'default'), 0)
+
+    def test_delete_plan_restores_bills_and_limit(self):
+        plan = self.create_plan()
+        plan.delete()
+        self.assertFalse(Transaction.objects.filter(credit_card=self.card).exists())
+        self.assertFalse(Posting.objects.filter(credit_card=self.card).exists())
+        self.assertEqual(
+            set(CreditCardBill.objects.filter(credit_card=self.card).values_list('total_amount', flat=True)),
+            {Decimal('0.00')},
+        )
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.available_limit, Decimal('5000.00'))
+
+
+class InstallmentPlanAPITests(TestCase):
+    url = '/api/transactions/installment-plans/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='parcelas_api', password='testpass123')
+        self.category = Category.objects.create(name='Móveis', color='#00ff00')
+        self.card = CreditCard.objects.create(
+            user=self.user, name='Cartão', bank='Banco', credit_limit=Decimal('1000.00'), closing_day=5, due_day=15,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def payload(self, **overrides):
+        data = {
+            'description': 'Sofá', 'total_amount': '900.00', 'installments': 3,
+            'purchase_date': '2024-01-03', 'credit_card': self.card.pk, 'category': self.category.pk,
+        }
+        data.update(overrides)
+        return data
+
+    def test_create_list_and_delete(self):
+        response = self.client.post(self.url, self.payload(), format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual([part['installment_number'] for part in response.data['installment_list']], [1, 2, 3])
+        self.assertEqual(response.data['installment_list'][0]['bill_reference_month'], '2024-01-01')
+
+        listed = self.client.get(self.url).data
+        plans = listed['results'] if isinstance(listed, dict) else listed
+        self.assertEqual(len(plans), 1)
+
+        response = self.client.delete(f"{self.url}{response.data['id']}/")
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(InstallmentPlan.objects.exists())
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.available_limit, Decimal('1000.00'))
+
+    def test_rejects_over_limit_and_foreign_card(self):
+        response = self.client.post(self.url, self.payload(total_amount='1500.00'), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post(self.url, self.payload(installments=1), format='json').status_code, 400)
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='intruso', password='testpass123'))
+        self.assertEqual(other.post(self.url, self.payload(), format='json').status_code, 400)
+        self.assertFalse(Transaction.objects.exists())
@@ -0,0 +1,71 @@
+"""
+Testes do renderer JSON da API e do UTF8EncodingMiddleware
+"""
+
+import os
+import json
+import django
+from datetime import date
+from decimal import Decimal
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nossa_grana.settings')
+django.setup()
+
+from django.http import HttpResponse, JsonResponse
+from django.test import SimpleTestCase, RequestFactory
+from rest_framework.request import Request
+
+from middleware.encoding import UTF8EncodingMiddleware
+from utils.renderers import FastJSONRenderer, dumps
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """Testes do FastJSONRenderer"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.renderer = FastJSONRenderer()
+
+    def render(self, data, path='/api/transactions/'):
+        request = Request(self.factory.get(path))
+        return self.renderer.render(data, renderer_context={'request': request})
+
+    def test_compact_utf8_output(self):
+        content = self.render({'descricao': 'Alimentação', 'valores': [1, 2]})
+        self.assertEqual(content, '{"descricao":"Alimentação","valores":[1,2]}'.encode('utf-8'))
+
+    def test_decimal_and_date_support(self):
+        content = self.render({'amount': Decimal('10.50'), 'date': date(2024, 3, 1)})
+        self.assertEqual(json.loads(content), {'amount': 10.5, 'date': '2024-03-01'})
+
+    def test_pretty_is_opt_in(self):
+        content = self.render({'a': 1}, path='/api/transactions/?pretty=1')
+        self.assertEqual(content, b'{\n  "a": 1\n}')
+
+    def test_none_renders_empty_body(self):
+        self.assertEqual(self.renderer.render(None), b'')
+
+    def test_line_separators_are_escaped(self):
+        self.assertEqual(dumps('a\u2028b'), b'"a\\u2028b"')
+
+
+class UTF8EncodingMiddlewareTests(SimpleTestCase):
+    """O middleware ajusta apenas o charset, sem re-serializar o corpo"""
+
+    def setUp(self):
+        self.request = RequestFactory().get('/api/')
+
+    def process(self, response):
+        return UTF8EncodingMiddleware(lambda request: response)(self.request)
+
+    def test_json_body_untouched(self):
+        response = JsonResponse({'a': 1})
+        original = response.content
+        response = self.process(response)
+        self.assertEqual(response.content, original)
+        self.assertEqual(response['Content-Type'], 'application/json; charset=utf-8')
+
+    def test_text_charset_added(self):
+        response = self.process(HttpResponse('ok', content_type='text/csv'))
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
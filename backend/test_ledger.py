@@ -0,0 +1,276 @@
+"""
+Testes do razão de lançamentos (transactions.Posting / transactions.ledger)
+"""
+
+import os
+import django
+from datetime import date
+from decimal import Decimal
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nossa_grana.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from financial_accounts.models import Account, CreditCard
+from transactions import ledger
+from transactions.models import Category, Posting, Transaction
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='razao', password='testpass123')
+        self.category = Category.objects.create(name='Geral', color='#00ff00')
+        self.checking = Account.objects.create(
+            user=self.user, name='Corrente', type='checking', initial_balance=Decimal('1000.00')
+        )
+        self.savings = Account.objects.create(user=self.user, name='Poupança', type='savings')
+        self.card = CreditCard.objects.create(
+            user=self.user, name='Cartão', credit_limit=Decimal('2000.00'), closing_day=5, due_day=15,
+        )
+
+    def create(self, type, amount, day=1, month=3, **kwargs):
+        return Transaction.objects.create(
+            user=self.user, type=type, amount=Decimal(amount), description=f'{type} {amount}',
+            category=self.category, date=date(2024, month, day), **kwargs
+        )
+
+    def postings(self, transaction):
+        return sorted(
+            Posting.objects.filter(transaction=transaction).values_list('account_id', 'credit_card_id', 'amount'),
+            key=lambda row: row[2],
+        )
+
+    def test_signed_postings_per_transaction_type(self):
+        income = self.create('income', '500.00', account=self.checking)
+        expense = self.create('expense', '80.00', account=self.checking)
+        transfer = self.create(
+            'transfer', '200.00', transfer_from_account=self.checking, transfer_to_account=self.savings
+        )
+        purchase = self.create('expense', '300.00', credit_card=self.card)
+
+        self.assertEqual(self.postings(income), [(self.checking.pk, None, Decimal('500.00'))])
+        self.assertEqual(self.postings(expense), [(self.checking.pk, None, Decimal('-80.00'))])
+        self.assertEqual(self.postings(transfer), [
+            (self.checking.pk, None, Decimal('-200.00')),
+            (self.savings.pk, None, Decimal('200.00')),
+        ])
+        self.assertEqual(self.postings(purchase), [(None, self.card.pk, Decimal('-300.00'))])
+
+        self.checking.refresh_from_db()
+        self.savings.refresh_from_db()
+        self.card.refresh_from_db()
+        self.assertEqual(self.checking.current_balance, Decimal('1220.00'))
+        self.assertEqual(self.savings.current_balance, Decimal('200.00'))
+        self.assertEqual(self.card.available_limit, Decimal('1700.00'))
+
+    def test_moving_transaction_updates_old_account(self):
+        expense = self.create('expense', '100.00', account=self.checking)
+        expense.account = self.savings
+        expense.save()
+
+        self.checking.refresh_from_db()
+        self.savings.refresh_from_db()
+        self.assertEqual(self.checking.current_balance, Decimal('1000.00'))
+        self.assertEqual(self.savings.current_balance, Decimal('-100.00'))
+        self.assertEqual(self.postings(expense), [(self.savings.pk, None, Decimal('-100.00'))])
+
+    def test_delete_removes_postings(self):
+        expense = self.create('expense', '100.00', account=self.checking)
+        pk = expense.pk
+        expense.delete()
+
+        self.assertFalse(Posting.objects.filter(transaction_id=pk).exists())
+        self.checking.refresh_from_db()
+        self.assertEqual(self.checking.current_balance, Decimal('1000.00'))
+
+    def test_rebuild_matches_incremental_postings(self):
+        self.create('income', '500.00', account=self.checking)
+        self.create('transfer', '200.00', transfer_from_account=self.checking, transfer_to_account=self.savings)
+        expected = sorted(Posting.objects.values_list('transaction_id', 'account_id', 'credit_card_id', 'amount'))
+
+        Posting.objects.all().delete()
+        self.assertEqual(ledger.rebuild_postings('default'), 3)
+        self.assertEqual(
+            sorted(Posting.objects.values_list('transaction_id', 'account_id', 'credit_card_id', 'amount')),
+            expected,
+        )
+
+    def test_partial_rebuild_fixes_previous_owner(self):
+        moved = self.create('expense', '100.00', day=1, account=self.checking)
+        self.create('income', '300.00', day=2, account=self.checking)
+
+        # Mudança de conta sem passar pelo save(): o razão ficou na conta antiga
+        Transaction.objects.filter(pk=moved.pk).update(account=self.savings)
+        self.assertEqual(ledger.rebuild_postings('default', Transaction.objects.filter(pk=moved.pk)), 1)
+
+        self.assertEqual(self.postings(moved), [(self.savings.pk, None, Decimal('-100.00'))])
+        # O acumulado da conta antiga também foi recalculado
+        self.assertEqual(ledger.recompute_running_totals(Posting, 'default'), 0)
+
+    def test_account_views_include_both_sides_of_transfers(self):
+        self.create('income', '500.00', day=5, month=2, account=self.checking)
+        self.create('expense', '80.00', day=6, month=2, account=self.checking)
+        self.create('transfer', '200.00', day=7, month=3, transfer_from_account=self.checking,
+                    transfer_to_account=self.savings)
+        self.create('transfer', '50.00', day=8, month=3, transfer_from_account=self.savings,
+                    transfer_to_account=self.checking)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get(f'/api/financial/accounts/{self.checking.pk}/transactions/')
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual(len(results), 4)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(f'/api/financial/accounts/{self.checking.pk}/report/', {'date_from': '2024-01-01'})
+        self.assertEqual(response.status_code, 200)
+        totals = response.data['totals']
+        self.assertEqual(totals['income'], Decimal('500.00'))
+        self.assertEqual(totals['expense'], Decimal('80.00'))
+        self.assertEqual(totals['transfers_in'], Decimal('50.00'))
+        self.assertEqual(totals['transfers_out'], Decimal('200.00'))
+        self.assertEqual(totals['net_flow'], Decimal('270.00'))
+        self.assertEqual(totals['transaction_count'], 4)
+
+        monthly = {row['month'].month: row for row in response.data['monthly_evolution']}
+        self.assertEqual(monthly[2]['income'], Decimal('500.00'))
+        self.assertEqual(monthly[3]['transfers_out'], Decimal('200.00'))
+
+        # Totais e evolução mensal: uma varredura do razão, sem OR entre colunas
+        aggregates = [
+            q['sql'] for q in queries.captured_queries
+            if 'SUM(' in q['sql'] and 'transactions_transaction' not in q['sql']
+        ]
+        self.assertEqual(len(aggregates), 1)
+        for sql in aggregates:
+            self.assertIn('FROM "transactions_posting"', sql)
+            self.assertNotIn(' OR ', sql)
+
+        # Visita repetida: totais vêm do cache; uma nova transação troca a geração
+        with CaptureQueriesContext(connection) as queries:
+            cached = client.get(f'/api/financial/accounts/{self.checking.pk}/report/', {'date_from': '2024-01-01'})
+        self.assertEqual(cached.data['totals'], response.data['totals'])
+        self.assertFalse([
+            q for q in queries.captured_queries
+            if 'SUM(' in q['sql'] and 'transactions_transaction' not in q['sql']
+        ])
+
+        self.create('income', '10.00', day=9, month=3, account=self.checking)
+        response = client.get(f'/api/financial/accounts/{self.checking.pk}/report/', {'date_from': '2024-01-01'})
+        self.assertEqual(response.data['totals']['income'], Decimal('510.00'))
+        self.assertEqual(
+            client.get(f'/api/financial/accounts/{self.checking.pk}/report/', {'date_from': '2024-13-01'}).status_code,
+            400,
+        )
+
+
+class RunningBalanceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='extrato', password='testpass123')
+        self.category = Category.objects.create(name='Geral', color='#00ff00')
+        self.checking = Account.objects.create(
+            user=self.user, name='Corrente', type='checking', initial_balance=Decimal('1000.00')
+        )
+        self.savings = Account.objects.create(user=self.user, name='Poupança', type='savings')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, type, amount, day, **kwargs):
+        kwargs.setdefault('account', self.checking)
+        return Transaction.objects.create(
+            user=self.user, type=type, amount=Decimal(amount), description=f'{type} {amount}',
+            category=self.category, date=date(2024, 3, day), **kwargs
+        )
+
+    def balances(self, account=None):
+        account = account or self.checking
+        return [
+            account.initial_balance + total
+            for total in Posting.objects.filter(account=account).order_by('date', 'transaction_id')
+            .values_list('running_total', flat=True)
+        ]
+
+    def assert_consistent(self):
+        before = list(Posting.objects.order_by('pk').values_list('pk', 'running_total'))
+        self.assertEqual(ledger.recompute_running_totals(Posting, 'default'), 0)
+        self.assertEqual(list(Posting.objects.order_by('pk').values_list('pk', 'running_total')), before)
+
+    def test_back_dated_insert_edit_and_delete_repair_suffix(self):
+        self.create('income', '500.00', 1)
+        self.create('expense', '100.00', 10)
+        back_dated = self.create('expense', '50.00', 5)
+        self.assertEqual(self.balances(), [Decimal('1500.00'), Decimal('1450.00'), Decimal('1350.00')])
+
+        back_dated.amount = Decimal('70.00')
+        back_dated.date = date(2024, 3, 15)
+        back_dated.save()
+        self.assertEqual(self.balances(), [Decimal('1500.00'), Decimal('1400.00'), Decimal('1330.00')])
+
+        self.create('transfer', '200.00', 2, account=None,
+                    transfer_from_account=self.checking, transfer_to_account=self.savings)
+        self.assertEqual(self.balances(self.savings), [Decimal('200.00')])
+        self.assertEqual(self.balances()[-1], Decimal('1130.00'))
+
+        Transaction.objects.get(description='income 500.00').delete()
+        self.assertEqual(self.balances(), [Decimal('800.00'), Decimal('700.00'), Decimal('630.00')])
+
+        self.checking.refresh_from_db()
+        self.assertEqual(self.checking.current_balance, Decimal('630.00'))
+        self.assert_consistent()
+
+    def test_non_financial_edit_does_not_touch_ledger(self):
+        expense = self.create('expense', '100.00', 1)
+        expense.description = 'Mercado do mês'
+        with CaptureQueriesContext(connection) as queries:
+            expense.save()
+        self.assertFalse([q for q in queries.captured_queries if 'UPDATE "transactions_posting"' in q['sql']])
+
+    def test_balance_at_date(self):
+        self.create('income', '500.00', 1)
+        self.create('expense', '100.00', 10)
+
+        url = f'/api/financial/accounts/{self.checking.pk}/balance/'
+        self.assertEqual(self.client.get(url, {'date': '2024-02-28'}).data['balance'], Decimal('1000.00'))
+        self.assertEqual(self.client.get(url, {'date': '2024-03-09'}).data['balance'], Decimal('1500.00'))
+        self.assertEqual(self.client.get(url, {'date': '2024-03-10'}).data['balance'], Decimal('1400.00'))
+        self.assertEqual(self.client.get(url, {'date': '2024-02-30'}).status_code, 400)
+
+    def test_statement_pages_with_cursor(self):
+        for day in range(1, 8):
+            self.create('expense', '10.00', day)
+        url = f'/api/financial/accounts/{self.checking.pk}/statement/'
+
+        lines = []
+        cursor = None
+        while True:
+            params = {'page_size': 3}
+            if cursor:
+                params['cursor'] = cursor
+            with CaptureQueriesContext(connection) as queries:
+                data = self.client.get(url, params).data
+            posting_queries = [q for q in queries.captured_queries if 'transactions_posting' in q['sql']]
+            self.assertEqual(len(posting_queries), 1)
+            lines.extend(data['results'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual(len(lines), 7)
+        self.assertEqual(lines[0]['balance'], Decimal('990.00'))
+        self.assertEqual(lines[-1]['balance'], Decimal('930.00'))
+        self.assertEqual([line['amount'] for line in lines], [Decimal('-10.00')] * 7)
+
+        self.assertEqual(self.client.get(url, {'cursor': 'x'}).status_code, 400)
+        self.assertEqual(len(self.client.get(url, {'date_from': '2024-03-05'}).data['results']), 3)
+        self.assertEqual(self.client.get(url, {'date_from': '2024-13-01'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'date_to': 'abc'}).status_code, 400)
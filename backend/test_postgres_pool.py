@@ -0,0 +1,246 @@
+"""
+Testes do pool de conexões PostgreSQL
+
+Os testes unitários usam uma conexão fake. Os testes de integração rodam
+contra um Postgres local quando POSTGRES_TEST_HOST está definido, por exemplo
+com o serviço `db` do docker-compose.yml:
+
+    docker compose up -d db
+    POSTGRES_TEST_HOST=localhost python -m pytest test_postgres_pool.py
+"""
+
+import os
+import threading
+import unittest
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nossa_grana.settings')
+django.setup()
+
+from django.test import SimpleTestCase, TestCase
+from unittest.mock import MagicMock, patch
+
+from nossa_grana.postgres_pool import pool as pool_module
+from nossa_grana.postgres_pool.pool import ConnectionPool, PoolTimeout, get_pool
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.healthy = True
+        self.checks = 0
+
+    def close(self):
+        self.closed = 1
+
+
+def check(conn):
+    conn.checks += 1
+    if not conn.healthy:
+        raise RuntimeError('server closed the connection unexpectedly')
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Checkout, devolução, health check e limites"""
+
+    def make_pool(self, **kwargs):
+        self.connections = []
+
+        def connect():
+            conn = FakeConnection()
+            self.connections.append(conn)
+            return conn
+
+        return ConnectionPool(connect, check=check, **kwargs)
+
+    def test_reuses_returned_connection(self):
+        pool = self.make_pool(max_size=2)
+        conn = pool.getconn()
+        pool.putconn(conn)
+
+        self.assertIs(pool.getconn(), conn)
+        stats = pool.get_stats()
+        self.assertEqual(stats['connections_created'], 1)
+        self.assertEqual(stats['reused'], 1)
+        self.assertEqual(stats['in_use'], 1)
+
+    def test_open_prefills_min_size(self):
+        pool = self.make_pool(min_size=2, max_size=4)
+        pool.open()
+        self.assertEqual(pool.get_stats()['idle'], 2)
+
+    def test_timeout_when_exhausted(self):
+        pool = self.make_pool(max_size=1, timeout=0.05)
+        pool.getconn()
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+        self.assertEqual(pool.get_stats()['timeouts'], 1)
+
+    def test_waiter_gets_returned_connection(self):
+        pool = self.make_pool(max_size=1, timeout=2)
+        conn = pool.getconn()
+        received = []
+
+        waiter = threading.Thread(target=lambda: received.append(pool.getconn()))
+        waiter.start()
+        pool.putconn(conn)
+        waiter.join(2)
+
+        self.assertEqual(received, [conn])
+        self.assertEqual(pool.get_stats()['waits'], 1)
+
+    def test_health_check_on_checkout_discards_broken(self):
+        pool = self.make_pool(max_size=2, check_interval=0)
+        broken = pool.getconn()
+        pool.putconn(broken)
+        broken.healthy = False
+
+        conn = pool.getconn()
+        self.assertIsNot(conn, broken)
+        self.assertEqual(broken.closed, 1)
+        self.assertEqual(pool.get_stats()['health_check_failures'], 1)
+        self.assertEqual(pool.get_stats()['size'], 1)
+
+    def test_recently_used_connection_skips_check(self):
+        pool = self.make_pool(check_interval=60)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        pool.getconn()
+        self.assertEqual(conn.checks, 0)
+
+    def test_reset_failure_and_lifetime_discard(self):
+        pool = self.make_pool(max_lifetime=0)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        self.assertEqual(conn.closed, 1)
+
+        pool = self.make_pool()
+        pool.reset = lambda conn: False  # ex.: conexão em estado desconhecido
+        conn = pool.getconn()
+        pool.putconn(conn)
+        self.assertEqual(pool.get_stats()['size'], 0)
+
+    def test_idle_above_min_size_expires(self):
+        pool = self.make_pool(min_size=1, max_size=3, max_idle=0)
+        first, second = pool.getconn(), pool.getconn()
+        pool.putconn(first)
+        pool.putconn(second)
+        self.assertEqual(pool.get_stats()['size'], 1)
+
+    def test_new_pool_after_fork(self):
+        created = get_pool('fork-test', lambda: self.make_pool())
+        self.assertIs(get_pool('fork-test', lambda: self.make_pool()), created)
+
+        pool_module._pools_pid = -1  # simula o processo filho
+        try:
+            self.assertIsNot(get_pool('fork-test', lambda: self.make_pool()), created)
+        finally:
+            pool_module.close_pools()
+
+
+def postgres_settings(**overrides):
+    settings_dict = {
+        'ENGINE': 'nossa_grana.postgres_pool',
+        'NAME': os.environ.get('POSTGRES_TEST_DB', 'nossa_grana'),
+        'USER': os.environ.get('POSTGRES_TEST_USER', 'postgres'),
+        'PASSWORD': os.environ.get('POSTGRES_TEST_PASSWORD', 'postgres'),
+        'HOST': os.environ.get('POSTGRES_TEST_HOST', 'localhost'),
+        'PORT': os.environ.get('POSTGRES_TEST_PORT', '5432'),
+        'OPTIONS': {'pool': {'min_size': 1, 'max_size': 2, 'check_interval': 0}},
+        'ATOMIC_REQUESTS': False, 'AUTOCOMMIT': True, 'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': False, 'TIME_ZONE': None, 'TEST': {},
+    }
+    settings_dict.update(overrides)
+    return settings_dict
+
+
+class PooledBackendTests(TestCase):
+    """DatabaseWrapper com o driver substituído por um mock"""
+
+    # Conectar um DatabaseWrapper dispara sinais e validações que podem
+    # tocar o handler de conexões real; declarado para não depender da ordem
+    databases = {'default'}
+
+    def tearDown(self):
+        pool_module.close_pools()
+
+    def fake_connect(self, **params):
+        conn = MagicMock(closed=0)
+        conn.info.transaction_status = 0
+        conn.info.server_version = 150000
+        conn.info.parameter_status.return_value = 'UTC'
+        return conn
+
+    def test_close_returns_connection_to_pool(self):
+        from nossa_grana.postgres_pool.base import DatabaseWrapper
+
+        with patch('django.db.backends.postgresql.base.Database.connect', side_effect=self.fake_connect) as connect, \
+                patch('django.db.backends.postgresql.base.psycopg2.extras.register_default_jsonb'):
+            wrapper = DatabaseWrapper(postgres_settings(), alias='mocked')
+            wrapper.connect()
+            first = wrapper.connection
+            wrapper.close()
+            wrapper.connect()
+            second = wrapper.connection
+            wrapper.close()
+
+        self.assertIs(first, second)
+        self.assertEqual(connect.call_count, 1)
+        first.close.assert_not_called()
+        self.assertEqual(pool_module.pool_stats()['mocked']['idle'], 1)
+
+
+@unittest.skipUnless(os.environ.get('POSTGRES_TEST_HOST'), 'POSTGRES_TEST_HOST não definido')
+class PostgresPoolIntegrationTests(SimpleTestCase):
+    """Backend nossa_grana.postgres_pool contra um Postgres real"""
+
+    def setUp(self):
+        from nossa_grana.postgres_pool.base import DatabaseWrapper
+
+        self.settings_dict = postgres_settings()
+        self.wrapper_class = DatabaseWrapper
+
+    def tearDown(self):
+        pool_module.close_pools()
+
+    def backend_pid(self, wrapper):
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            return cursor.fetchone()[0]
+
+    def test_connection_is_reused_across_requests(self):
+        wrapper = self.wrapper_class(self.settings_dict, alias='pool_test')
+        first = self.backend_pid(wrapper)
+        wrapper.close()
+        second = self.backend_pid(wrapper)
+        wrapper.close()
+
+        self.assertEqual(first, second)
+        stats = pool_module.pool_stats()['pool_test']
+        self.assertEqual(stats['connections_created'], 1)
+
+    def test_open_transaction_rolled_back_on_return(self):
+        wrapper = self.wrapper_class(self.settings_dict, alias='pool_test')
+        wrapper.connect()
+        wrapper.set_autocommit(False)
+        wrapper.cursor().execute('SELECT 1')
+        wrapper.close()
+
+        wrapper.connect()
+        self.assertEqual(wrapper.connection.info.transaction_status, 0)
+        wrapper.close()
+
+    def test_terminated_backend_is_replaced(self):
+        wrapper = self.wrapper_class(self.settings_dict, alias='pool_test')
+        killer = self.wrapper_class(self.settings_dict, alias='pool_killer')
+        victim = self.backend_pid(wrapper)
+        wrapper.close()
+
+        with killer.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [victim])
+        killer.close()
+
+        self.assertNotEqual(self.backend_pid(wrapper), victim)
+        wrapper.close()
+        self.assertEqual(pool_module.pool_stats()['pool_test']['health_check_failures'], 1)
@@ -0,0 +1,66 @@
+"""
+Testes da instrumentação de SQL por requisição
+"""
+
+import os
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nossa_grana.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory, override_settings
+
+from middleware.performance import QueryInstrumentationMiddleware
+from utils.performance import normalize_sql
+
+
+def n_plus_one_view(request):
+    for user in User.objects.all():
+        User.objects.filter(id=user.id).exists()
+    return HttpResponse('ok')
+
+
+@override_settings(DEBUG=False, SQL_INSTRUMENTATION_SAMPLE_RATE=1.0, SQL_N_PLUS_ONE_THRESHOLD=3)
+class QueryInstrumentationMiddlewareTests(TestCase):
+    """Contagem de queries, N+1 e headers para staff"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.staff = User.objects.create_user(username='staff', password='x', is_staff=True)
+        for i in range(4):
+            User.objects.create_user(username=f'user{i}', password='x')
+
+    def call(self, user):
+        request = self.factory.get('/api/reports/')
+        request.user = user
+        return request, QueryInstrumentationMiddleware(n_plus_one_view)(request)
+
+    def test_counts_queries_without_debug(self):
+        expected = User.objects.count() + 1
+        request, response = self.call(self.staff)
+        self.assertEqual(request._query_monitor.query_count, expected)
+        self.assertEqual(response['X-DB-Queries'], str(expected))
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+    def test_headers_only_for_staff(self):
+        _, response = self.call(User.objects.get(username='user0'))
+        self.assertFalse(response.has_header('X-DB-Queries'))
+
+    def test_logs_repeated_statements(self):
+        with self.assertLogs('nossa_grana.performance', level='WARNING') as logs:
+            self.call(self.staff)
+        self.assertIn('Possible N+1', logs.output[0])
+        self.assertIn(f'{User.objects.count()}x', logs.output[0])
+
+
+class NormalizeSQLTests(TestCase):
+    """Normalização de SQL para agrupamento"""
+
+    def test_literals_and_in_lists(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE id IN (%s, %s)  AND name = 'x' LIMIT 21"),
+            'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?'
+        )
@@ -0,0 +1,105 @@
+"""
+Testes da engine de rate limiting (backend em memória)
+"""
+
+import os
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nossa_grana.settings')
+django.setup()
+
+from django.test import SimpleTestCase, RequestFactory
+from unittest.mock import patch
+
+import redis
+
+from middleware.rate_limiting import RateLimitMiddleware
+from utils.rate_limit import RateLimiter, RedisRateLimitBackend, TOKEN_BUCKET
+
+
+class SlidingWindowTests(SimpleTestCase):
+    """Sliding window counter"""
+
+    def setUp(self):
+        self.limiter = RateLimiter()
+
+    def test_blocks_after_limit_with_retry_after(self):
+        for i in range(5):
+            self.assertTrue(self.limiter.hit('ip', 5, 60, now=120 + i).allowed)
+
+        result = self.limiter.hit('ip', 5, 60, now=130)
+        self.assertFalse(result.allowed)
+        self.assertEqual(result.remaining, 0)
+        # Janela atual termina em 180s; 5 * (1 - e/60) + 1 <= 5 exige e >= 12s
+        self.assertEqual(result.retry_after, 62)
+        self.assertEqual(result.headers()['Retry-After'], '62')
+
+    def test_previous_window_is_weighted(self):
+        for i in range(10):
+            self.limiter.hit('ip', 10, 60, now=60 + i)
+
+        # Metade da janela seguinte: 10 * 0.5 + esta requisição = 6 estimadas
+        self.assertEqual(self.limiter.hit('ip', 10, 60, now=150).remaining, 4)
+        self.assertTrue(self.limiter.hit('ip', 10, 60, now=240).allowed)
+
+    def test_keys_are_isolated(self):
+        self.limiter.hit('a', 1, 60, now=0)
+        self.assertFalse(self.limiter.hit('a', 1, 60, now=1).allowed)
+        self.assertTrue(self.limiter.hit('b', 1, 60, now=1).allowed)
+
+
+class TokenBucketTests(SimpleTestCase):
+    """Token bucket"""
+
+    def setUp(self):
+        self.limiter = RateLimiter()
+
+    def test_refill(self):
+        for _ in range(3):
+            self.assertTrue(self.limiter.hit('u', 3, 30, TOKEN_BUCKET, now=0).allowed)
+
+        blocked = self.limiter.hit('u', 3, 30, TOKEN_BUCKET, now=0)
+        self.assertFalse(blocked.allowed)
+        self.assertEqual(blocked.retry_after, 10)
+
+        self.assertTrue(self.limiter.hit('u', 3, 30, TOKEN_BUCKET, now=10).allowed)
+        self.assertFalse(self.limiter.hit('u', 3, 30, TOKEN_BUCKET, now=10).allowed)
+
+
+class _DownRedis:
+    """Cliente cujos scripts falham como um Redis que caiu após o boot"""
+
+    def register_script(self, script):
+        def run(keys, args):
+            raise redis.ConnectionError('Connection refused')
+        return run
+
+
+class RedisFailureTests(SimpleTestCase):
+    """Redis fora do ar depois da inicialização"""
+
+    def test_falls_back_to_memory(self):
+        limiter = RateLimiter(RedisRateLimitBackend(_DownRedis()))
+        with self.assertLogs('nossa_grana', level='WARNING') as logs:
+            for i in range(3):
+                self.assertTrue(limiter.hit('ip', 3, 60, now=i).allowed)
+            self.assertFalse(limiter.hit('ip', 3, 60, now=4).allowed)
+            self.assertTrue(limiter.hit('u', 2, 30, TOKEN_BUCKET, now=0).allowed)
+        self.assertEqual(len(logs.output), 1)
+
+
+class RateLimitMiddlewareTests(SimpleTestCase):
+    """Resposta 429 com Retry-After"""
+
+    def test_429_has_retry_after(self):
+        middleware = RateLimitMiddleware(lambda request: None)
+        factory = RequestFactory()
+
+        with patch('middleware.rate_limiting.get_rate_limiter', return_value=RateLimiter()):
+            for _ in range(5):
+                self.assertIsNone(middleware.process_request(factory.get('/api/auth/login/')))
+            response = middleware.process_request(factory.get('/api/auth/login/'))
+
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
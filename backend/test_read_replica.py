@@ -0,0 +1,134 @@
+"""
+Testes do roteamento para réplica de leitura
+
+Usa dois aliases locais: 'default' e 'replica' (bancos SQLite de teste
+separados, então a "réplica" nunca recebe as escritas — equivale a um atraso
+de replicação infinito e deixa o roteamento visível nos dados).
+"""
+
+import os
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nossa_grana.settings')
+django.setup()
+
+from django.conf import settings
+from django.db import connections
+
+if 'replica' not in settings.DATABASES:
+    settings.DATABASES['replica'] = {**settings.DATABASES['default'], 'TEST': {}}
+    connections.configure_settings(settings.DATABASES)
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import router
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from middleware.replica import ReplicaPinningMiddleware
+from nossa_grana.db_router import pin_to_primary, use_replica
+from nossa_grana.sharding import _directory_key
+from transactions.models import Category, Transaction
+
+
+class ReadReplicaRouterTests(TestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='leitor', password='testpass123')
+
+    def test_primary_outside_replica_block(self):
+        self.assertEqual(router.db_for_read(User), 'default')
+        self.assertTrue(User.objects.filter(pk=self.user.pk).exists())
+
+    def test_reads_go_to_replica(self):
+        with use_replica(self.user) as alias:
+            self.assertEqual(alias, 'replica')
+            self.assertEqual(router.db_for_read(User), 'replica')
+            # A réplica ainda não recebeu o usuário
+            self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+
+    def test_write_inside_block_reads_primary_afterwards(self):
+        with use_replica(self.user):
+            category = Category.objects.create(name='Mercado')
+            self.assertEqual(category._state.db, 'default')
+            self.assertTrue(Category.objects.filter(pk=category.pk).exists())
+
+        # E o usuário fica fixado no primário nas próximas requisições
+        with use_replica(self.user) as alias:
+            self.assertEqual(alias, 'default')
+
+    def test_pinned_user_reads_primary(self):
+        pin_to_primary(self.user.pk)
+        with use_replica(self.user) as alias:
+            self.assertEqual(alias, 'default')
+            self.assertTrue(User.objects.filter(pk=self.user.pk).exists())
+
+        other = User.objects.create_user(username='outro', password='testpass123')
+        cache.clear()
+        with use_replica(other) as alias:
+            self.assertEqual(alias, 'replica')
+
+
+class ReadReplicaViewTests(TestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='analista', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def replica_queries(self, url):
+        with CaptureQueriesContext(connections['replica']) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_report_reads_from_replica_until_user_writes(self):
+        self.assertGreater(self.replica_queries('/api/reports/summary/'), 0)
+
+        request = RequestFactory().post('/api/transactions/categories/')
+        request.user = self.user
+        ReplicaPinningMiddleware(lambda request: HttpResponse(status=201))(request)
+
+        self.assertEqual(self.replica_queries('/api/reports/summary/'), 0)
+
+    def test_failed_write_does_not_pin(self):
+        request = RequestFactory().post('/api/transactions/categories/')
+        request.user = self.user
+        ReplicaPinningMiddleware(lambda request: HttpResponse(status=400))(request)
+
+        self.assertGreater(self.replica_queries('/api/goals/goals/statistics/'), 0)
+
+
+@override_settings(DATABASE_SHARDS=['default'])
+class ReplicaWithShardingTests(TestCase):
+    """Sharding ligado não pode desativar a réplica (ShardRouter vem antes)"""
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='fragmentado', password='testpass123')
+
+    def test_reads_still_reach_replica(self):
+        with use_replica(self.user):
+            # Tabela global e dado fragmentado de usuário do shard default
+            self.assertEqual(router.db_for_read(Category), 'replica')
+            self.assertEqual(router.db_for_read(Transaction, instance=Transaction(user_id=self.user.pk)), 'replica')
+            self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertEqual(router.db_for_read(Category), 'default')
+
+    def test_other_shards_and_writes_keep_their_alias(self):
+        other_id = self.user.pk + 1
+        cache.set(_directory_key(other_id), 'shard_x')  # diretório sem tocar no banco
+        with self.settings(DATABASE_SHARDS=['default', 'shard_x']), use_replica(self.user):
+            self.assertEqual(router.db_for_read(Transaction, instance=Transaction(user_id=other_id)), 'shard_x')
+            self.assertEqual(router.db_for_write(Category), 'default')
+        # A escrita no bloco fixa o usuário no primário
+        with use_replica(self.user) as alias:
+            self.assertEqual(alias, 'default')
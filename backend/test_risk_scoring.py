@@ -0,0 +1,122 @@
+"""
+Testes do score de risco vetorizado (utils.risk_scoring)
+"""
+
+import os
+import time
+import unittest
+import django
+from datetime import datetime
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nossa_grana.settings')
+django.setup()
+
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase
+
+from fraud_validators import FraudValidators
+from utils import risk_scoring
+from utils.fraud_profile import BehaviorSnapshot, FraudProfileStore
+
+SAO_PAULO = ZoneInfo('America/Sao_Paulo')
+
+
+def ts(hour, minute=0, second=0):
+    return datetime(2024, 3, 10, hour, minute, second, tzinfo=SAO_PAULO).timestamp()
+
+
+@unittest.skipUnless(risk_scoring.is_available(), 'numpy não instalado')
+class ScoreBatchTests(SimpleTestCase):
+    def score(self, amounts, timestamps=None, categories=None, profile=None):
+        return risk_scoring.score_batch(amounts, timestamps, categories, profile=profile, tz=SAO_PAULO)
+
+    def test_amount_tiers_and_profile_zscore(self):
+        profile = BehaviorSnapshot(count=50, mean=100.0, variance=400.0)
+        result = self.score([150, 1500, 6000], profile=profile)
+
+        self.assertEqual(result.features['amount_medium'].tolist(), [False, True, False])
+        self.assertEqual(result.features['amount_high'].tolist(), [False, False, True])
+        # z = (150 - 100) / 20 = 2.5 fica abaixo do limite
+        self.assertEqual(result.features['unusual_amount'].tolist(), [False, True, True])
+        self.assertEqual(result.scores.tolist(), [0, 35, 45])
+        self.assertEqual(result.levels.tolist(), ['LOW', 'LOW', 'MEDIUM'])
+
+    def test_off_hours_use_local_time(self):
+        result = self.score([10, 20, 30], [ts(3), ts(12), ts(23, 30)])
+        self.assertEqual(result.features['off_hours'].tolist(), [True, False, True])
+        # Sem horário conhecido não pontua
+        self.assertFalse(self.score([10], [float('nan')]).features['off_hours'].any())
+
+    def test_bursts_are_detected_regardless_of_input_order(self):
+        stamps = [ts(12, 0, s) for s in (50, 0, 10, 20, 30)] + [ts(15)]
+        result = self.score([11, 12, 13, 14, 15, 16], stamps)
+        self.assertEqual(result.features['burst'].tolist(), [True, False, False, False, False, False])
+
+    def test_repeated_amounts_per_category(self):
+        result = self.score(
+            [49.9, 49.9, 49.9, 49.9, 49.9, 10],
+            categories=['Loja', 'Loja', 'Loja', 'Mercado', 'Mercado', 'Loja'],
+        )
+        self.assertEqual(result.features['repeated_amount'].tolist(), [True, True, True, False, False, False])
+
+    def test_progression_in_time_order(self):
+        amounts = [30, 10, 50, 20, 40, 999, 7]
+        stamps = [ts(12, 3), ts(12, 1), ts(12, 5), ts(12, 2), ts(12, 4), ts(12, 6), ts(12, 0)]
+        result = self.score(amounts, stamps)
+        self.assertEqual(result.features['progression'].tolist(), [True, True, True, True, True, False, False])
+
+    def test_ten_thousand_rows_in_milliseconds(self):
+        import numpy as np
+
+        rng = np.random.default_rng(42)
+        amounts = rng.gamma(2.0, 80.0, 10000).round(2)
+        stamps = ts(0) + np.sort(rng.uniform(0, 86400 * 30, 10000))
+        categories = rng.choice(['Mercado', 'Lazer', 'Transporte', 'Saúde'], 10000)
+
+        started = time.perf_counter()
+        result = self.score(amounts, stamps, categories)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(result.scores.shape, (10000,))
+        self.assertLess(elapsed, 0.5)
+
+
+@unittest.skipUnless(risk_scoring.is_available(), 'numpy não instalado')
+class FraudValidatorsBatchTests(SimpleTestCase):
+    def setUp(self):
+        self.store = FraudProfileStore()
+        patcher = patch('fraud_validators.get_fraud_profile_store', return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = type('User', (), {'id': 7})()
+
+    def test_batch_uses_user_profile(self):
+        for _ in range(20):
+            self.store.observe(self.user.id, 100, 12, 'Mercado')
+        result = FraudValidators.calculate_batch_risk_scores(self.user, [100, 900, 100])
+        # Perfil sem variância: z-score não se aplica; o lote também não decide
+        self.assertEqual(result.scores.tolist(), [0, 0, 0])
+
+        self.store.observe(self.user.id, 300, 12, 'Mercado')
+        result = FraudValidators.calculate_batch_risk_scores(self.user, [100, 900, 100])
+        self.assertEqual(result.features['unusual_amount'].tolist(), [False, True, False])
+
+    def test_batch_adds_request_context(self):
+        context = {'new_device': True, 'new_location': True, 'high_frequency': False}
+        result = FraudValidators.calculate_batch_risk_scores(self.user, [6000, 50], context_data=context)
+        self.assertEqual(result.scores.tolist(), [75, 55])
+        self.assertEqual(result.levels.tolist(), ['HIGH', 'MEDIUM'])
+        # Mesmo nível do cálculo por transação
+        self.assertEqual(
+            FraudValidators.calculate_risk_score(self.user, {'amount': 6000}, context), result.levels[0]
+        )
+
+    def test_transaction_pattern(self):
+        with self.assertRaisesMessage(ValidationError, 'muitos valores idênticos'):
+            FraudValidators.validate_transaction_pattern([{'amount': '10.00'}] * 4 + [{'amount': '5'}])
+
+        with self.assertLogs('fraud_detection', level='WARNING'):
+            FraudValidators.validate_transaction_pattern([{'amount': str(v)} for v in (1, 2, 3, 4, 5)])
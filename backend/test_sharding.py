@@ -0,0 +1,144 @@
+"""
+Testes do sharding por usuário
+
+Os shards são arquivos SQLite locais (shard_1, shard_2) além do banco
+global 'default'.
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+import django
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nossa_grana.settings')
+django.setup()
+
+from django.conf import settings
+from django.db import connections
+
+SHARD_DIR = tempfile.mkdtemp(prefix='nossa_grana_shards_')
+atexit.register(shutil.rmtree, SHARD_DIR, True)
+for _alias in ('shard_1', 'shard_2'):
+    if _alias not in settings.DATABASES:
+        settings.DATABASES[_alias] = {
+            **settings.DATABASES['default'],
+            'NAME': os.path.join(SHARD_DIR, f'{_alias}.sqlite3'),
+            'TEST': {'NAME': os.path.join(SHARD_DIR, f'test_{_alias}.sqlite3')},
+        }
+connections.configure_settings(settings.DATABASES)
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory, override_settings
+
+from accounts.models import UserShard
+from financial_accounts.models import Account
+from middleware.sharding import ShardRoutingMiddleware
+from nossa_grana.sharding import home_shard, shard_for_user
+from transactions.models import Category, Tag, Transaction
+
+SHARDS = ['shard_1', 'shard_2']
+
+
+@override_settings(DATABASE_SHARDS=SHARDS)
+class ShardingTests(TestCase):
+    databases = {'default', 'shard_1', 'shard_2'}
+
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', password='testpass123')
+        self.bob = User.objects.create_user(username='bob', password='testpass123')
+        self.category = Category.objects.create(name='Mercado')
+
+    def other_shard(self, user):
+        return next(alias for alias in SHARDS if alias != shard_for_user(user.pk))
+
+    def create_account_with_expense(self, user):
+        account = Account.objects.create(
+            user=user, name='Conta Corrente', type='checking', initial_balance=Decimal('100.00')
+        )
+        transaction = Transaction.objects.create(
+            user=user, type='expense', amount=Decimal('30.00'), description='Compra mercado',
+            category=self.category, account=account, date=date(2024, 1, 10),
+        )
+        return account, transaction
+
+    def test_new_users_get_deterministic_shard(self):
+        for user in (self.alice, self.bob):
+            self.assertEqual(shard_for_user(user.pk), SHARDS[user.pk % 2])
+            self.assertEqual(UserShard.objects.get(user=user).alias, home_shard(user.pk))
+            # Usuários e categorias existem em todos os shards (alvos de FK)
+            for alias in SHARDS:
+                self.assertTrue(User.objects.using(alias).filter(pk=user.pk).exists())
+                self.assertTrue(Category.objects.using(alias).filter(pk=self.category.pk).exists())
+
+    def test_rows_live_on_owner_shard(self):
+        account, _ = self.create_account_with_expense(self.alice)
+        home = shard_for_user(self.alice.pk)
+
+        self.assertEqual(account._state.db, home)
+        self.assertTrue(Account.objects.using(home).filter(pk=account.pk).exists())
+        self.assertFalse(Account.objects.using(self.other_shard(self.alice)).filter(user=self.alice).exists())
+        self.assertFalse(Account.objects.using('default').filter(user=self.alice).exists())
+
+        # filter(user=...), related managers e filtros por objeto dono são roteados
+        self.assertEqual(Transaction.objects.filter(user=self.alice).count(), 1)
+        self.assertEqual(self.alice.accounts.get().current_balance, Decimal('70.00'))
+        self.assertEqual(Transaction.objects.filter(account=account).count(), 1)
+        self.assertEqual(Transaction.objects.filter(user=self.bob).count(), 0)
+
+    def test_unscoped_queries_use_request_user(self):
+        account, _ = self.create_account_with_expense(self.alice)
+        request = RequestFactory().get('/api/accounts/')
+        request.user = self.alice
+
+        def view(request):
+            balance = Account.objects.get(pk=account.pk).current_balance
+            return HttpResponse(str(balance))
+
+        response = ShardRoutingMiddleware(view)(request)
+        self.assertEqual(response.content, b'70.00')
+
+    def test_rebalance_moves_rows_and_remaps_ids(self):
+        account, transaction = self.create_account_with_expense(self.alice)
+        transaction.add_tags(['feira'])
+        source, target = shard_for_user(self.alice.pk), self.other_shard(self.alice)
+        created_at = transaction.created_at
+
+        out = StringIO()
+        call_command('rebalance_shards', user_id=self.alice.pk, to=target, stdout=out)
+
+        self.assertIn(f'{source} -> {target}', out.getvalue())
+        self.assertEqual(shard_for_user(self.alice.pk), target)
+        self.assertFalse(Transaction.objects.using(source).filter(user=self.alice).exists())
+        self.assertFalse(Tag.objects.using(source).filter(user=self.alice).exists())
+
+        moved = Transaction.objects.filter(user=self.alice).get()
+        self.assertEqual(moved._state.db, target)
+        self.assertEqual(moved.account.current_balance, Decimal('70.00'))
+        self.assertEqual(moved.account.user_id, self.alice.pk)
+        self.assertEqual([tag.name for tag in moved.tags.all()], ['feira'])
+        self.assertEqual(moved.created_at, created_at)
+
+        # Novas escritas vão para o shard de destino
+        Transaction.objects.create(
+            user=self.alice, type='income', amount=Decimal('10.00'), description='Reembolso',
+            category=self.category, account=moved.account, date=date(2024, 1, 11),
+        )
+        self.assertEqual(Account.objects.filter(user=self.alice).get().current_balance, Decimal('80.00'))
+
+    def test_rebalance_all_dry_run(self):
+        UserShard.objects.filter(user=self.bob).update(alias=self.other_shard(self.bob))
+        cache.clear()
+
+        out = StringIO()
+        call_command('rebalance_shards', all=True, dry_run=True, stdout=out)
+        self.assertIn(f'Usuário {self.bob.pk}:', out.getvalue())
+        self.assertNotIn(f'Usuário {self.alice.pk}:', out.getvalue())
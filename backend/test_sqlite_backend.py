@@ -0,0 +1,38 @@
+"""
+Testes do backend SQLite em modo produção
+"""
+
+import os
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nossa_grana.settings')
+django.setup()
+
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+
+
+class SQLiteProductionModeTests(TransactionTestCase):
+    """PRAGMAs por conexão e BEGIN IMMEDIATE"""
+
+    def test_pragmas_applied_on_new_connection(self):
+        connection.close()
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA temp_store')
+            self.assertEqual(cursor.fetchone()[0], 2)  # MEMORY
+
+    def test_atomic_begins_immediate(self):
+        statements = []
+
+        def capture(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            with transaction.atomic():
+                pass
+
+        self.assertEqual(statements[0], 'BEGIN IMMEDIATE')
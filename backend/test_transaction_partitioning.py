@@ -0,0 +1,231 @@
+"""
+Testes do particionamento por data das transações
+
+O cálculo de períodos roda em qualquer banco. A conversão e a poda de
+partições (EXPLAIN) precisam de um Postgres, usado quando
+POSTGRES_TEST_HOST está definido:
+
+    docker compose up -d db
+    POSTGRES_TEST_HOST=localhost python -m pytest test_transaction_partitioning.py
+"""
+
+import os
+import unittest
+import django
+from datetime import date
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nossa_grana.settings')
+django.setup()
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase
+
+from transactions import partitioning
+
+
+class PartitionPeriodTests(SimpleTestCase):
+    def test_monthly_periods_cross_year(self):
+        periods = list(partitioning.iter_periods(date(2023, 11, 15), date(2024, 1, 3), 'month'))
+        self.assertEqual(periods, [
+            (date(2023, 11, 1), date(2023, 12, 1)),
+            (date(2023, 12, 1), date(2024, 1, 1)),
+            (date(2024, 1, 1), date(2024, 2, 1)),
+        ])
+
+    def test_yearly_periods_and_names(self):
+        periods = list(partitioning.iter_periods(date(2022, 6, 1), date(2023, 1, 1), 'year'))
+        self.assertEqual(periods, [
+            (date(2022, 1, 1), date(2023, 1, 1)),
+            (date(2023, 1, 1), date(2024, 1, 1)),
+        ])
+        self.assertEqual(partitioning.partition_name(date(2022, 1, 1), 'year'), 'transactions_transaction_y2022')
+        self.assertEqual(partitioning.partition_name(date(2024, 3, 1), 'month'), 'transactions_transaction_p2024_03')
+
+    def test_next_period(self):
+        self.assertEqual(partitioning.next_period(date(2024, 11, 1), 'month', 3), date(2025, 2, 1))
+        self.assertEqual(partitioning.next_period(date(2024, 1, 1), 'year', 2), date(2026, 1, 1))
+
+    def test_invalid_granularity(self):
+        with self.settings(TRANSACTIONS_PARTITION_BY='week'):
+            with self.assertRaises(ValueError):
+                partitioning.get_granularity()
+        with self.settings(TRANSACTIONS_PARTITION_BY=''):
+            self.assertEqual(partitioning.get_granularity(), '')
+
+
+class PartitionCommandTests(TestCase):
+    def test_command_requires_postgres(self):
+        with self.assertRaisesMessage(CommandError, 'PostgreSQL'):
+            call_command('partition_transactions')
+
+
+def postgres_connection():
+    from django.db.backends.postgresql.base import DatabaseWrapper
+
+    return DatabaseWrapper({
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('POSTGRES_TEST_DB', 'nossa_grana'),
+        'USER': os.environ.get('POSTGRES_TEST_USER', 'postgres'),
+        'PASSWORD': os.environ.get('POSTGRES_TEST_PASSWORD', 'postgres'),
+        'HOST': os.environ.get('POSTGRES_TEST_HOST', 'localhost'),
+        'PORT': os.environ.get('POSTGRES_TEST_PORT', '5432'),
+        'OPTIONS': {}, 'ATOMIC_REQUESTS': False, 'AUTOCOMMIT': True, 'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': False, 'TIME_ZONE': None, 'TEST': {},
+    }, alias='partition_test')
+
+
+@unittest.skipUnless(os.environ.get('POSTGRES_TEST_HOST'), 'POSTGRES_TEST_HOST não definido')
+class PostgresPartitioningTests(SimpleTestCase):
+    """Conversão de uma tabela com o mesmo formato da de transações"""
+
+    table = 'pt_transaction'
+    today = date(2024, 6, 15)
+
+    def setUp(self):
+        self.connection = postgres_connection()
+        self.cleanup()
+        with self.connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE pt_user (id bigint PRIMARY KEY)')
+            cursor.execute('INSERT INTO pt_user VALUES (1)')
+            cursor.execute(f"""
+                CREATE TABLE {self.table} (
+                    id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                    user_id bigint NOT NULL REFERENCES pt_user (id) DEFERRABLE INITIALLY DEFERRED,
+                    amount numeric(12, 2) NOT NULL CHECK (amount > 0),
+                    date date NOT NULL
+                )
+            """)
+            cursor.execute(f'CREATE INDEX pt_transaction_user_date ON {self.table} (user_id, date)')
+            cursor.execute(f"""
+                CREATE TABLE pt_transaction_tags (
+                    id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                    transaction_id bigint NOT NULL REFERENCES {self.table} (id),
+                    tag_id bigint NOT NULL
+                )
+            """)
+            cursor.execute(f"""
+                INSERT INTO {self.table} (user_id, amount, date)
+                SELECT 1, 10, d::date FROM generate_series('2022-01-01'::date, '2024-06-01', '1 week') d
+            """)
+            cursor.execute(f'INSERT INTO pt_transaction_tags (transaction_id, tag_id) SELECT id, 1 FROM {self.table}')
+
+    def tearDown(self):
+        self.cleanup()
+        self.connection.close()
+
+    def cleanup(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS pt_transaction_tags, {self.table}, pt_user CASCADE')
+            # Partições desanexadas viram tabelas soltas
+            cursor.execute(
+                "SELECT relname FROM pg_class WHERE relname LIKE %s AND relkind = 'r'",
+                [self.table.replace('_', '\\_') + '\\_%'],
+            )
+            for (name,) in cursor.fetchall():
+                cursor.execute(f'DROP TABLE IF EXISTS {name}')
+
+    def convert(self, granularity='year'):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*), SUM(id) FROM {self.table}')
+            before = cursor.fetchone()
+        partitioning.convert_to_partitioned(
+            self.connection, granularity, table=self.table, ahead=1, today=self.today
+        )
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*), SUM(id) FROM {self.table}')
+            self.assertEqual(cursor.fetchone(), before)
+
+    def explain(self, sql, params=()):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}', params)
+            return '\n'.join(row[0] for row in cursor.fetchall())
+
+    def test_convert_creates_partitions(self):
+        self.convert()
+        self.assertTrue(partitioning.is_partitioned(self.connection, self.table))
+        names = [p['name'] for p in partitioning.list_partitions(self.connection, self.table)]
+        self.assertEqual(names, [
+            'pt_transaction_y2022', 'pt_transaction_y2023', 'pt_transaction_y2024',
+            'pt_transaction_y2025', 'pt_transaction_default',
+        ])
+
+        with self.connection.cursor() as cursor:
+            # Identity continua depois do maior id e as FKs de saída foram recriadas
+            cursor.execute(f'SELECT MAX(id) FROM {self.table}')
+            last_id = cursor.fetchone()[0]
+            cursor.execute(
+                f"INSERT INTO {self.table} (user_id, amount, date) VALUES (1, 5, '2024-06-10') RETURNING id"
+            )
+            self.assertGreater(cursor.fetchone()[0], last_id)
+            cursor.execute(
+                "SELECT COUNT(*) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+                [self.table],
+            )
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute(
+                "SELECT COUNT(*) FROM pg_constraint WHERE conrelid = 'pt_transaction_tags'::regclass AND contype = 'f'"
+            )
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_date_filter_prunes_partitions(self):
+        self.convert()
+        plan = self.explain(
+            f'SELECT * FROM {self.table} WHERE user_id = 1 AND date >= %s AND date < %s',
+            [date(2023, 3, 1), date(2023, 4, 1)],
+        )
+        self.assertIn('pt_transaction_y2023', plan)
+        self.assertNotIn('pt_transaction_y2022', plan)
+        self.assertNotIn('pt_transaction_y2024', plan)
+        self.assertNotIn('pt_transaction_default', plan)
+
+    def test_monthly_prunes_to_single_month(self):
+        self.convert('month')
+        plan = self.explain(f"SELECT SUM(amount) FROM {self.table} WHERE date BETWEEN '2024-02-01' AND '2024-02-29'")
+        self.assertIn('pt_transaction_p2024_02', plan)
+        self.assertNotIn('pt_transaction_p2024_01', plan)
+        self.assertNotIn('pt_transaction_p2024_03', plan)
+
+    def test_future_partitions_take_rows_from_default(self):
+        self.convert()
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {self.table} (user_id, amount, date) VALUES (1, 7, '2027-05-01')")
+
+        created = partitioning.ensure_future_partitions(
+            self.connection, 'year', ahead=3, table=self.table, today=self.today
+        )
+        self.assertEqual(created, ['pt_transaction_y2026', 'pt_transaction_y2027'])
+        with self.connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM pt_transaction_y2027')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('SELECT COUNT(*) FROM pt_transaction_default')
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+        self.assertEqual(
+            partitioning.ensure_future_partitions(self.connection, 'year', ahead=3, table=self.table, today=self.today),
+            [],
+        )
+
+    def test_archive_detaches_old_partitions(self):
+        self.convert()
+        archived = partitioning.archive_partitions(
+            self.connection, date(2023, 1, 1), table=self.table, detach=True
+        )
+        self.assertEqual(archived, ['pt_transaction_y2022'])
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {self.table} WHERE date < '2023-01-01'")
+            self.assertEqual(cursor.fetchone()[0], 0)
+            cursor.execute('SELECT COUNT(*) FROM pt_transaction_y2022')
+            self.assertGreater(cursor.fetchone()[0], 0)
+
+    def test_revert_restores_plain_table(self):
+        self.convert()
+        partitioning.revert_partitioning(
+            self.connection, table=self.table, references=[('pt_transaction_tags', 'transaction_id')]
+        )
+        self.assertFalse(partitioning.is_partitioned(self.connection, self.table))
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM pg_constraint WHERE conrelid = 'pt_transaction_tags'::regclass AND contype = 'f'"
+            )
+            self.assertEqual(cursor.fetchone()[0], 1)
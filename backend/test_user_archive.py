@@ -0,0 +1,127 @@
+"""
+Testes da exportação/importação de dados por usuário (accounts.user_archive)
+"""
+
+import gzip
+import os
+import shutil
+import tempfile
+import django
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nossa_grana.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts.user_archive import ArchiveError, import_user, iter_export, read_archive
+from budgets.models import Budget
+from financial_accounts.models import Account, CreditCard
+from goals.models import Goal, GoalContribution
+from transactions.models import Category, Tag, Transaction
+
+
+class UserArchiveTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='nossa_grana_archive_')
+        self.addCleanup(shutil.rmtree, self.tmpdir, True)
+        self.path = os.path.join(self.tmpdir, 'export.ndjson.gz')
+
+        self.user = User.objects.create_user(username='exportado', password='testpass123', email='e@x.com')
+        self.category = Category.objects.create(name='Lazer', color='#ff0000')
+        self.account = Account.objects.create(
+            user=self.user, name='Conta Corrente', type='checking', initial_balance=Decimal('1000.00')
+        )
+        self.savings = Account.objects.create(user=self.user, name='Poupança', type='savings')
+        self.card = CreditCard.objects.create(
+            user=self.user, name='Cartão', credit_limit=Decimal('3000.00'), closing_day=5, due_day=15,
+        )
+        for day in range(1, 8):
+            transaction = Transaction.objects.create(
+                user=self.user, type='expense', amount=Decimal('10.00'), description=f'Cinema {day}',
+                category=self.category, account=self.account, date=date(2024, 2, day),
+            )
+        transaction.add_tags(['filmes', 'fds'])
+        Transaction.objects.create(
+            user=self.user, type='transfer', amount=Decimal('100.00'), description='Reserva',
+            category=self.category, transfer_from_account=self.account, transfer_to_account=self.savings,
+            date=date(2024, 2, 10),
+        )
+        Transaction.objects.create(
+            user=self.user, type='expense', amount=Decimal('250.00'), description='Show',
+            category=self.category, credit_card=self.card, date=date(2024, 2, 12),
+        )
+        Budget.objects.create(user=self.user, category=self.category, amount=Decimal('500.00'), month=date(2024, 2, 1))
+        goal = Goal.objects.create(
+            user=self.user, name='Viagem', target_amount=Decimal('5000.00'), target_date=date(2099, 1, 1)
+        )
+        GoalContribution.objects.create(goal=goal, amount=Decimal('300.00'), date=date(2024, 2, 1))
+
+    def test_roundtrip_remaps_ids_and_recalculates_balances(self):
+        call_command('export_user_data', user='exportado', output=self.path, batch_size=3, stdout=StringIO())
+        # Saldo errado na origem não é copiado: a importação recalcula
+        Account.objects.filter(pk=self.account.pk).update(current_balance=Decimal('0.00'))
+        call_command('export_user_data', user='exportado', output=self.path, batch_size=3, stdout=StringIO())
+
+        call_command('import_user_data', input=self.path, user='copia', create_user=True,
+                     batch_size=4, stdout=StringIO())
+
+        copy = User.objects.get(username='copia')
+        self.assertEqual(copy.email, 'e@x.com')
+        self.assertFalse(copy.has_usable_password())
+
+        account = Account.objects.get(user=copy, name='Conta Corrente')
+        self.assertNotEqual(account.pk, self.account.pk)
+        self.assertEqual(account.current_balance, Decimal('830.00'))
+        self.assertEqual(Account.objects.get(user=copy, name='Poupança').current_balance, Decimal('100.00'))
+        self.assertEqual(CreditCard.objects.get(user=copy).available_limit, Decimal('2750.00'))
+        self.assertEqual(account.created_at, Account.objects.get(pk=self.account.pk).created_at)
+
+        transactions = Transaction.objects.filter(user=copy)
+        self.assertEqual(transactions.count(), 9)
+        self.assertEqual(set(transactions.values_list('category_id', flat=True)), {self.category.pk})
+        tagged = transactions.get(description='Cinema 7')
+        self.assertEqual(sorted(tagged.tags.values_list('name', flat=True)), ['fds', 'filmes'])
+        self.assertEqual(set(tagged.tags.values_list('user_id', flat=True)), {copy.pk})
+        self.assertEqual(Category.objects.filter(name='Lazer').count(), 1)
+
+        contribution = GoalContribution.objects.get(goal__user=copy)
+        self.assertEqual(contribution.goal.name, 'Viagem')
+        self.assertEqual(Budget.objects.get(user=copy).category, self.category)
+
+    def test_refuses_user_with_data_unless_replace(self):
+        call_command('export_user_data', user='exportado', output=self.path, stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, '--replace'):
+            call_command('import_user_data', input=self.path, stdout=StringIO())
+
+        call_command('import_user_data', input=self.path, replace=True, stdout=StringIO())
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 9)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_truncated_archive_rolls_back(self):
+        lines = list(iter_export(self.user, batch_size=2))
+        with gzip.open(self.path, 'wt', encoding='utf-8') as f:
+            f.writelines(lines[:-3])
+
+        other = User.objects.create_user(username='outro', password='testpass123')
+        with self.assertRaisesMessage(ArchiveError, 'rodapé ausente'):
+            import_user(other, read_archive(self.path))
+        self.assertFalse(Account.objects.filter(user=other).exists())
+
+    def test_export_endpoint_streams_gzip(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.get('/api/auth/export/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('attachment', response['Content-Disposition'])
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertIn('"format":"nossa_grana.user_export"', lines[0])
+        self.assertIn('"end":true', lines[-1])
+        self.assertEqual(sum('"model":"transactions.transaction"' in line for line in lines), 9)
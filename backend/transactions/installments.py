@@ -0,0 +1,89 @@
+"""
+Compras parceladas no cartão (transactions.InstallmentPlan)
+
+- Na criação do plano, as N parcelas viram transações comuns de uma vez:
+  a parcela k tem a data da compra + k meses e fica na fatura do ciclo da
+  compra + k meses. Faturas futuras que faltam são criadas num bulk_create.
+- Totais das faturas, razão e limite do cartão são atualizados por delta,
+  como em Transaction.save(), mas com um INSERT por tabela para o plano.
+- Orçamentos e relatórios filtram transações por data: cada parcela entra
+  no seu mês sem que as consultas conheçam os planos.
+
+O limite fica reservado pelo valor total (faturas futuras não pagas) e é
+liberado conforme cada fatura é paga.
+"""
+import calendar
+from datetime import date
+from decimal import ROUND_DOWN, Decimal
+from typing import List
+
+from django.db import router, transaction as db_transaction
+
+from financial_accounts import billing
+
+from . import ledger
+
+CENT = Decimal('0.01')
+MAX_INSTALLMENTS = 48
+
+
+def split_amount(total, installments: int) -> List[Decimal]:
+    """Valor de cada parcela; os centavos que sobram vão na primeira"""
+    total = Decimal(total)
+    share = (total / installments).quantize(CENT, rounding=ROUND_DOWN)
+    return [total - share * (installments - 1)] + [share] * (installments - 1)
+
+
+def add_months(on_date: date, months: int) -> date:
+    """Mesma data `months` meses depois (dia 31 vira o último dia do mês)"""
+    year, month = divmod(on_date.month - 1 + months, 12)
+    year += on_date.year
+    month += 1
+    return date(year, month, min(on_date.day, calendar.monthrange(year, month)[1]))
+
+
+def create_plan(user, credit_card, category, description, total_amount, installments, purchase_date, using=None):
+    """
+    Cria o plano e as parcelas com as faturas de cada mês
+
+    Retorna o InstallmentPlan gravado.
+    """
+    from .models import InstallmentPlan, Transaction
+
+    plan = InstallmentPlan(
+        user=user, credit_card=credit_card, category=category, description=description,
+        total_amount=total_amount, installments=installments, purchase_date=purchase_date,
+    )
+    plan.full_clean()
+    using = using or router.db_for_write(InstallmentPlan, instance=plan)
+
+    first_cycle = billing.cycle_for(credit_card.closing_day, credit_card.due_day, purchase_date)[0]
+    cycles = [add_months(first_cycle, k) for k in range(installments)]
+    label = description[:190]
+
+    with db_transaction.atomic(using=using):
+        plan.save(using=using)
+        bills = billing.bills_for(credit_card, cycles, using)
+        parts = [
+            Transaction(
+                user=user, type='expense', amount=amount,
+                description=f'{label} ({number}/{installments})',
+                category=category, credit_card=credit_card,
+                date=add_months(purchase_date, number - 1),
+                bill=bills[cycle], installment_plan=plan, installment_number=number,
+            )
+            for number, (amount, cycle) in enumerate(zip(split_amount(total_amount, installments), cycles), start=1)
+        ]
+        Transaction._base_manager.using(using).bulk_create(parts)
+
+        ledger.add_postings(parts, using)
+        for part in parts:
+            billing.apply(using, part.bill_id, part.amount)
+        credit_card._update_available_limit(using)
+    return plan
+
+
+def remove_installments(plan, using):
+    """Apaga as parcelas (desfaz faturas, razão e limite de cada uma)"""
+    for part in plan.parts.using(using).order_by('-installment_number'):
+        part.delete()
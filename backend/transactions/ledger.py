@@ -0,0 +1,331 @@
+"""
+Razão de lançamentos (transactions.Posting)
+
+Cada transação gera lançamentos assinados nas contas/cartões que movimenta:
+
+- receita: +valor na conta (ou no cartão, como estorno)
+- despesa: -valor na conta ou no cartão
+- transferência: -valor na conta origem e +valor na conta destino
+
+Os lançamentos são mantidos em Transaction.save()/delete(). Saldo,
+histórico e fluxo mensal de uma conta passam a ser uma varredura do índice
+(account, date) em vez de OR entre account/transfer_from/transfer_to.
+
+Saldo acumulado: cada lançamento guarda `running_total`, a soma dos
+lançamentos da conta (ou cartão) até ele, na ordem (date, transaction_id).
+O saldo após a linha é initial_balance + running_total. Inserir ou remover
+um lançamento corrige só o sufixo com um UPDATE somando/subtraindo o valor;
+no caso comum (transação do dia) o sufixo é vazio. Os saldos diários
+(financial_accounts.snapshots) recebem a mesma correção.
+
+Escritas em massa que não passam por save() (importações, cópias) chamam
+`rebuild_postings` para o conjunto de transações afetado.
+"""
+from decimal import Decimal
+from typing import List, Optional, Set, Tuple
+
+from django.apps import apps
+from django.db.models import F, Q
+
+from financial_accounts import snapshots
+
+ZERO = Decimal('0.00')
+
+
+POSTING_FIELDS = ('type', 'amount', 'account_id', 'credit_card_id', 'transfer_from_account_id', 'transfer_to_account_id')
+
+
+def posting_rows(type, amount, account_id, credit_card_id, from_id, to_id) -> List[Tuple]:
+    """[(account_id, credit_card_id, valor assinado)] de uma transação"""
+    amount = Decimal(amount)
+    if type == 'transfer':
+        rows = []
+        if from_id:
+            rows.append((from_id, None, -amount))
+        if to_id:
+            rows.append((to_id, None, amount))
+        return rows
+
+    signed = amount if type == 'income' else -amount
+    if account_id:
+        return [(account_id, None, signed)]
+    if credit_card_id:
+        return [(None, credit_card_id, signed)]
+    return []
+
+
+def build_postings(Posting, user_id, transaction_id, date, values) -> list:
+    """Instâncias de Posting para uma transação (valores na ordem de POSTING_FIELDS)"""
+    return [
+        Posting(
+            user_id=user_id, transaction_id=transaction_id, type=values[0], date=date,
+            account_id=account_id, credit_card_id=credit_card_id, amount=amount,
+        )
+        for account_id, credit_card_id, amount in posting_rows(*values)
+    ]
+
+
+def _owner(account_id, credit_card_id) -> dict:
+    return {'account_id': account_id} if account_id else {'credit_card_id': credit_card_id}
+
+
+def _before(date, transaction_id) -> Q:
+    return Q(date__lt=date) | Q(date=date, transaction_id__lt=transaction_id)
+
+
+def _after(date, transaction_id) -> Q:
+    return Q(date__gt=date) | Q(date=date, transaction_id__gt=transaction_id)
+
+
+def _total_before(postings, date, transaction_id) -> Decimal:
+    """running_total do lançamento anterior à chave (date, transaction_id)"""
+    total = (
+        postings.filter(_before(date, transaction_id))
+        .order_by('-date', '-transaction_id')
+        .values_list('running_total', flat=True)
+        .first()
+    )
+    return total if total is not None else ZERO
+
+
+def _shift_suffix(postings, date, transaction_id, delta):
+    """Soma `delta` ao running_total dos lançamentos depois da chave"""
+    postings.filter(_after(date, transaction_id)).update(running_total=F('running_total') + delta)
+
+
+def _lock_owners(using, account_ids, card_ids):
+    """Serializa escritas no razão das mesmas contas/cartões"""
+    Account = apps.get_model('financial_accounts', 'Account')
+    CreditCard = apps.get_model('financial_accounts', 'CreditCard')
+    if account_ids:
+        list(Account._base_manager.using(using).select_for_update().filter(pk__in=account_ids).values_list('pk'))
+    if card_ids:
+        list(CreditCard._base_manager.using(using).select_for_update().filter(pk__in=card_ids).values_list('pk'))
+
+
+def sync_postings(transaction, using) -> Tuple[Set[int], Set[int]]:
+    """
+    Regrava os lançamentos da transação e corrige o saldo acumulado
+
+    Devolve (contas, cartões) que tinham lançamentos antes: se a transação
+    mudou de conta, a conta antiga também precisa ter o saldo atualizado.
+    Edições que não mexem em valor, data ou conta não escrevem no razão.
+    """
+    Posting = apps.get_model('transactions', 'Posting')
+    manager = Posting._base_manager.using(using)
+    existing = list(
+        manager.filter(transaction_id=transaction.pk).values_list('account_id', 'credit_card_id', 'date', 'amount')
+    )
+    previous = (
+        {account_id for account_id, _, _, _ in existing if account_id},
+        {card_id for _, card_id, _, _ in existing if card_id},
+    )
+
+    values = [getattr(transaction, name) for name in POSTING_FIELDS]
+    postings = build_postings(Posting, transaction.user_id, transaction.pk, transaction.date, values)
+    current = [(p.account_id, p.credit_card_id, p.date, p.amount) for p in postings]
+    if sorted(existing, key=str) == sorted(current, key=str):
+        return previous
+
+    _lock_owners(
+        using,
+        previous[0] | {p.account_id for p in postings if p.account_id},
+        previous[1] | {p.credit_card_id for p in postings if p.credit_card_id},
+    )
+
+    for account_id, card_id, date, amount in existing:
+        _shift_suffix(manager.filter(**_owner(account_id, card_id)), date, transaction.pk, -amount)
+        snapshots.shift(using, account_id, card_id, date, -amount)
+    manager.filter(transaction_id=transaction.pk).delete()
+
+    _insert(manager, postings, using)
+    return previous
+
+
+def _insert(manager, postings, using):
+    """
+    Grava lançamentos novos com o running_total certo
+
+    Primeiro calcula todos os acumulados sobre o razão ainda intacto: o do
+    banco antes de cada chave mais os novos anteriores do mesmo dono. Só
+    depois desloca os sufixos gravados; deslocar antes faria o próximo
+    lançamento ler um acumulado que já inclui os novos. Um bulk_create no fim.
+    """
+    ordered = sorted(postings, key=lambda p: (p.date, p.transaction_id))
+    earlier = {}
+    for posting in ordered:
+        owner = (posting.account_id, posting.credit_card_id)
+        before = _total_before(manager.filter(**_owner(*owner)), posting.date, posting.transaction_id)
+        earlier[owner] = earlier.get(owner, ZERO) + posting.amount
+        posting.running_total = before + earlier[owner]
+    for posting in ordered:
+        owner_postings = manager.filter(**_owner(posting.account_id, posting.credit_card_id))
+        _shift_suffix(owner_postings, posting.date, posting.transaction_id, posting.amount)
+        snapshots.shift(using, posting.account_id, posting.credit_card_id, posting.date, posting.amount)
+    manager.bulk_create(postings)
+
+
+def add_postings(transactions, using):
+    """Lançamentos de transações gravadas com bulk_create (ex.: parcelas)"""
+    Posting = apps.get_model('transactions', 'Posting')
+    postings = []
+    for transaction in transactions:
+        values = [getattr(transaction, name) for name in POSTING_FIELDS]
+        postings.extend(build_postings(Posting, transaction.user_id, transaction.pk, transaction.date, values))
+    _lock_owners(
+        using,
+        {p.account_id for p in postings if p.account_id},
+        {p.credit_card_id for p in postings if p.credit_card_id},
+    )
+    _insert(Posting._base_manager.using(using), postings, using)
+
+
+def remove_postings(transaction, using):
+    """Apaga os lançamentos da transação, corrigindo o sufixo de cada conta"""
+    Posting = apps.get_model('transactions', 'Posting')
+    manager = Posting._base_manager.using(using)
+    existing = list(
+        manager.filter(transaction_id=transaction.pk).values_list('account_id', 'credit_card_id', 'date', 'amount')
+    )
+    _lock_owners(using, {row[0] for row in existing if row[0]}, {row[1] for row in existing if row[1]})
+    for account_id, card_id, date, amount in existing:
+        _shift_suffix(manager.filter(**_owner(account_id, card_id)), date, transaction.pk, -amount)
+        snapshots.shift(using, account_id, card_id, date, -amount)
+    manager.filter(transaction_id=transaction.pk).delete()
+
+
+def recompute_running_totals(Posting, using, postings=None, batch_size: int = 2000) -> int:
+    """
+    Recalcula running_total do zero (`postings`: filtro Q das contas/cartões)
+
+    Uma leitura ordenada por dono e chave, gravando só as linhas que mudam.
+    Recebe o modelo para servir também às migrações. Retorna as linhas
+    corrigidas.
+    """
+    manager = Posting._base_manager.using(using)
+    queryset = manager.filter(postings) if postings is not None else manager.all()
+    rows = queryset.order_by('account_id', 'credit_card_id', 'date', 'transaction_id').values_list(
+        'pk', 'account_id', 'credit_card_id', 'amount', 'running_total'
+    )
+
+    owner = None
+    total = ZERO
+    changed = []
+    fixed = 0
+    for pk, account_id, card_id, amount, running_total in rows.iterator(chunk_size=batch_size):
+        if (account_id, card_id) != owner:
+            owner = (account_id, card_id)
+            total = ZERO
+        total += amount
+        if running_total != total:
+            changed.append(Posting(pk=pk, running_total=total))
+        if len(changed) >= batch_size:
+            manager.bulk_update(changed, ['running_total'])
+            fixed += len(changed)
+            changed = []
+    if changed:
+        manager.bulk_update(changed, ['running_total'])
+        fixed += len(changed)
+    return fixed
+
+
+def rebuild_postings(using, transactions=None, batch_size: int = 2000) -> int:
+    """
+    Recria os lançamentos de `transactions` (queryset; padrão: todas)
+
+    Lê as transações em lotes e grava com bulk_create; depois recalcula o
+    saldo acumulado das contas/cartões afetados e descarta os saldos diários
+    deles (os saldos atuais não são recalculados). Retorna o número de
+    lançamentos criados.
+    """
+    Transaction = apps.get_model('transactions', 'Transaction')
+    Posting = apps.get_model('transactions', 'Posting')
+    full = transactions is None
+    if full:
+        transactions = Transaction._base_manager.all()
+    transactions = transactions.using(using)
+
+    # Donos dos lançamentos antigos também são afetados (a transação pode ter
+    # mudado de conta/cartão desde que eles foram gravados)
+    stale = Posting._base_manager.using(using).filter(transaction_id__in=transactions.values('pk'))
+    account_ids, card_ids = set(), set()
+    if not full:
+        for account_id, card_id in stale.order_by().values_list('account_id', 'credit_card_id').distinct():
+            if account_id:
+                account_ids.add(account_id)
+            if card_id:
+                card_ids.add(card_id)
+    stale.delete()
+
+    created = 0
+    batch = []
+    rows = transactions.order_by('pk').values_list('pk', 'user_id', 'date', *POSTING_FIELDS)
+    for pk, user_id, date, *values in rows.iterator(chunk_size=batch_size):
+        batch.extend(build_postings(Posting, user_id, pk, date, values))
+        if len(batch) >= batch_size:
+            Posting._base_manager.using(using).bulk_create(batch)
+            created += len(batch)
+            account_ids.update(p.account_id for p in batch if p.account_id)
+            card_ids.update(p.credit_card_id for p in batch if p.credit_card_id)
+            batch = []
+    if batch:
+        Posting._base_manager.using(using).bulk_create(batch)
+        created += len(batch)
+        account_ids.update(p.account_id for p in batch if p.account_id)
+        card_ids.update(p.credit_card_id for p in batch if p.credit_card_id)
+
+    # Saldos diários dos donos afetados voltam no próximo snapshot_balances
+    BalanceSnapshot = apps.get_model('financial_accounts', 'BalanceSnapshot')
+    if full:
+        recompute_running_totals(Posting, using, batch_size=batch_size)
+        BalanceSnapshot._base_manager.using(using).all().delete()
+    elif account_ids or card_ids:
+        owners = Q(account_id__in=account_ids) | Q(credit_card_id__in=card_ids)
+        recompute_running_totals(Posting, using, owners, batch_size)
+        BalanceSnapshot._base_manager.using(using).filter(owners).delete()
+    return created
+
+
+def account_postings(account, date_from=None, date_to=None):
+    """Lançamentos de uma conta no período (varredura de (account, date))"""
+    Posting = apps.get_model('transactions', 'Posting')
+    postings = Posting.objects.filter(account=account)
+    if date_from:
+        postings = postings.filter(date__gte=date_from)
+    if date_to:
+        postings = postings.filter(date__lte=date_to)
+    return postings
+
+
+def balance_at(account, on_date, using=None) -> Decimal:
+    """Saldo da conta ao fim de `on_date` (uma busca no índice da conta)"""
+    Posting = apps.get_model('transactions', 'Posting')
+    manager = Posting.objects.using(using) if using else Posting.objects
+    total = (
+        manager.filter(account=account, date__lte=on_date)
+        .order_by('-date', '-transaction_id')
+        .values_list('running_total', flat=True)
+        .first()
+    )
+    return account.initial_balance + (total if total is not None else ZERO)
+
+
+def statement(account, cursor: Optional[Tuple] = None, date_from=None, date_to=None, limit: int = 50):
+    """
+    Página de extrato (ordem cronológica) a partir de `cursor`
+
+    `cursor` é a chave (date, transaction_id) da última linha da página
+    anterior: a página é uma busca no índice seguida de `limit` linhas,
+    qualquer que seja a profundidade. Retorna (lançamentos, próximo cursor).
+    """
+    postings = account_postings(account, date_from, date_to).select_related(
+        'transaction', 'transaction__category'
+    )
+    if cursor is not None:
+        postings = postings.filter(_after(*cursor))
+    page = list(postings.order_by('date', 'transaction_id')[:limit + 1])
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = (page[-1].date, page[-1].transaction_id)
+    return page, next_cursor
@@ -0,0 +1,95 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from transactions import partitioning
+
+
+class Command(BaseCommand):
+    help = 'Cria partições futuras da tabela de transações e arquiva as antigas (PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='Alias do banco (padrão: default)'
+        )
+        parser.add_argument(
+            '--ahead',
+            type=int,
+            default=getattr(settings, 'TRANSACTIONS_PARTITIONS_AHEAD', 3),
+            help='Períodos futuros que devem ter partição'
+        )
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            help='Converte a tabela em particionada se ainda não for (TRANSACTIONS_PARTITION_BY)'
+        )
+        parser.add_argument(
+            '--archive-before',
+            type=date.fromisoformat,
+            help='Arquiva partições que terminam até esta data (AAAA-MM-DD)'
+        )
+        parser.add_argument(
+            '--tablespace',
+            help='Tablespace de destino das partições arquivadas'
+        )
+        parser.add_argument(
+            '--detach',
+            action='store_true',
+            help='Desanexa as partições arquivadas (as transações saem da aplicação)'
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='Apenas lista as partições existentes'
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if not partitioning.supports_partitioning(connection):
+            raise CommandError('Particionamento só é suportado em PostgreSQL')
+        try:
+            granularity = partitioning.get_granularity()
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['archive_before'] and not (options['tablespace'] or options['detach']):
+            raise CommandError('--archive-before exige --tablespace e/ou --detach')
+
+        if not partitioning.is_partitioned(connection):
+            if not options['convert']:
+                raise CommandError('Tabela de transações não é particionada (use --convert)')
+            if not granularity:
+                raise CommandError('Defina TRANSACTIONS_PARTITION_BY para converter')
+            with transaction.atomic(using=options['database']):
+                partitioning.convert_to_partitioned(connection, granularity, ahead=options['ahead'])
+            self.stdout.write(self.style.SUCCESS(f'Tabela {partitioning.TABLE} convertida ({granularity})'))
+
+        if options['list']:
+            for partition in partitioning.list_partitions(connection):
+                bounds = 'DEFAULT' if partition['default'] else f"{partition['start']} .. {partition['end']}"
+                tablespace = partition['tablespace'] or 'pg_default'
+                self.stdout.write(f"{partition['name']}: {bounds} [{tablespace}]")
+            return
+
+        if not granularity:
+            self.stdout.write(self.style.WARNING('TRANSACTIONS_PARTITION_BY vazio: nenhuma partição futura criada'))
+        else:
+            with transaction.atomic(using=options['database']):
+                created = partitioning.ensure_future_partitions(connection, granularity, ahead=options['ahead'])
+            for name in created:
+                self.stdout.write(f'Criada: {name}')
+            self.stdout.write(self.style.SUCCESS(f'{len(created)} partição(ões) criada(s)'))
+
+        if options['archive_before']:
+            with transaction.atomic(using=options['database']):
+                archived = partitioning.archive_partitions(
+                    connection, options['archive_before'],
+                    tablespace=options['tablespace'], detach=options['detach'],
+                )
+            for name in archived:
+                self.stdout.write(f'Arquivada: {name}')
+            self.stdout.write(self.style.SUCCESS(f'{len(archived)} partição(ões) arquivada(s)'))
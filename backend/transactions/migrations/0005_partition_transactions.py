@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.db import migrations
+
+from transactions import partitioning
+
+
+def partition_transactions(apps, schema_editor):
+    connection = schema_editor.connection
+    granularity = partitioning.get_granularity()
+    if not granularity or not partitioning.supports_partitioning(connection):
+        return
+    if partitioning.is_partitioned(connection):
+        return
+    partitioning.convert_to_partitioned(
+        connection, granularity, ahead=getattr(settings, 'TRANSACTIONS_PARTITIONS_AHEAD', 3)
+    )
+
+
+def unpartition_transactions(apps, schema_editor):
+    connection = schema_editor.connection
+    if not partitioning.supports_partitioning(connection) or not partitioning.is_partitioned(connection):
+        return
+    tags = apps.get_model('transactions', 'Transaction')._meta.get_field('tags')
+    partitioning.revert_partitioning(
+        connection, references=[(tags.remote_field.through._meta.db_table, tags.m2m_column_name())]
+    )
+
+
+class Migration(migrations.Migration):
+    """
+    Converte transactions_transaction em tabela particionada por data
+
+    Só age em PostgreSQL com TRANSACTIONS_PARTITION_BY definido; nos demais
+    casos é um no-op. Ligar a opção depois desta migração: rodar
+    `manage.py partition_transactions --convert`.
+    """
+
+    dependencies = [
+        ('transactions', '0004_tag_is_active'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_transactions, unpartition_transactions),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from transactions import ledger
+
+
+def backfill_postings(apps, schema_editor):
+    """Gera os lançamentos das transações existentes"""
+    Transaction = apps.get_model('transactions', 'Transaction')
+    Posting = apps.get_model('transactions', 'Posting')
+    alias = schema_editor.connection.alias
+
+    batch = []
+    rows = Transaction.objects.using(alias).order_by('pk').values_list('pk', 'user_id', 'date', *ledger.POSTING_FIELDS)
+    for pk, user_id, date, *values in rows.iterator(chunk_size=2000):
+        batch.extend(ledger.build_postings(Posting, user_id, pk, date, values))
+        if len(batch) >= 2000:
+            Posting.objects.using(alias).bulk_create(batch)
+            batch = []
+    if batch:
+        Posting.objects.using(alias).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('financial_accounts', '0001_initial'),
+        ('transactions', '0005_partition_transactions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Posting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('income', 'Receita'), ('expense', 'Despesa'), ('transfer', 'Transferência')], max_length=10, verbose_name='Tipo')),
+                ('date', models.DateField(verbose_name='Data')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Valor (com sinal)')),
+                ('account', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='financial_accounts.account')),
+                ('credit_card', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='financial_accounts.creditcard')),
+                ('transaction', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='transactions.transaction')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Lançamento',
+                'verbose_name_plural': 'Lançamentos',
+                'ordering': ['date', 'id'],
+                'indexes': [models.Index(fields=['account', 'date'], name='posting_account_date_idx'), models.Index(fields=['credit_card', 'date'], name='posting_card_date_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='posting',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('account__isnull', False), ('credit_card__isnull', True)), models.Q(('account__isnull', True), ('credit_card__isnull', False)), _connector='OR'), name='posting_account_xor_card'),
+        ),
+        migrations.RunPython(backfill_postings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:37
+
+from decimal import Decimal
+from django.db import migrations, models
+
+from transactions import ledger
+
+
+def fill_running_totals(apps, schema_editor):
+    Posting = apps.get_model('transactions', 'Posting')
+    ledger.recompute_running_totals(Posting, schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0006_posting'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='posting',
+            options={'ordering': ['date', 'transaction_id'], 'verbose_name': 'Lançamento', 'verbose_name_plural': 'Lançamentos'},
+        ),
+        migrations.RemoveIndex(
+            model_name='posting',
+            name='posting_account_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='posting',
+            name='posting_card_date_idx',
+        ),
+        migrations.AddField(
+            model_name='posting',
+            name='running_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Acumulado'),
+        ),
+        migrations.AddIndex(
+            model_name='posting',
+            index=models.Index(fields=['account', 'date', 'transaction'], name='posting_account_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='posting',
+            index=models.Index(fields=['credit_card', 'date', 'transaction'], name='posting_card_key_idx'),
+        ),
+        migrations.RunPython(fill_running_totals, migrations.RunPython.noop),
+    ]
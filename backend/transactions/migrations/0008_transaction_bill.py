@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financial_accounts', '0002_balancesnapshot'),
+        ('transactions', '0007_posting_running_total'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='bill',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='financial_accounts.creditcardbill', verbose_name='Fatura'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:49
+
+from decimal import Decimal
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financial_accounts', '0003_bill_status_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('transactions', '0008_transaction_bill'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='installment_number',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Parcela'),
+        ),
+        migrations.CreateModel(
+            name='InstallmentPlan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description', models.CharField(max_length=200, verbose_name='Descrição')),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))], verbose_name='Valor Total')),
+                ('installments', models.PositiveSmallIntegerField(verbose_name='Parcelas')),
+                ('purchase_date', models.DateField(verbose_name='Data da Compra')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='transactions.category', verbose_name='Categoria')),
+                ('credit_card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='installment_plans', to='financial_accounts.creditcard', verbose_name='Cartão de Crédito')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='installment_plans', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Compra Parcelada',
+                'verbose_name_plural': 'Compras Parceladas',
+                'ordering': ['-purchase_date', '-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='installment_plan',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='parts', to='transactions.installmentplan', verbose_name='Parcelamento'),
+        ),
+    ]
@@ -1,9 +1,13 @@
-from django.db import models, transaction
+from django.db import models, router, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from django.utils import timezone
 
+from financial_accounts import billing
+from nossa_grana.sharding import ShardedManager
+from . import ledger
+
 
 class Category(models.Model):
     """
@@ -38,6 +42,8 @@ class Tag(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ShardedManager()
+
     class Meta:
         verbose_name = 'Tag'
         verbose_name_plural = 'Tags'
@@ -208,6 +214,25 @@ class Transaction(models.Model):
         blank=True,
         verbose_name='Cartão de Crédito'
     )
+    # Fatura do ciclo (definida na gravação; ver financial_accounts.billing)
+    bill = models.ForeignKey(
+        'financial_accounts.CreditCardBill',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='transactions',
+        verbose_name='Fatura'
+    )
+    # Parcela de uma compra parcelada (ver transactions.installments)
+    installment_plan = models.ForeignKey(
+        'InstallmentPlan',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='parts',
+        verbose_name='Parcelamento'
+    )
+    installment_number = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name='Parcela')
     
     # Para transferências entre contas
     transfer_to_account = models.ForeignKey(
@@ -230,6 +255,8 @@ class Transaction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ShardedManager()
+
     class Meta:
         verbose_name = 'Transação'
         verbose_name_plural = 'Transações'
@@ -245,7 +272,8 @@ class Transaction(models.Model):
         from django.core.exceptions import ValidationError
         
         # Data não pode ser futura
-        if self.date and self.date > timezone.now().date():
+        # Parcelas futuras de uma compra parcelada são a exceção
+        if self.date and self.date > timezone.now().date() and not self.installment_plan_id:
             raise ValidationError({'date': 'A data não pode ser futura.'})
         
         # Descrição deve ter pelo menos 3 caracteres
@@ -282,18 +310,29 @@ class Transaction(models.Model):
         if self.transfer_to_account and self.transfer_to_account.user != self.user:
             raise ValidationError('A conta destino não pertence ao usuário.')
 
-    @transaction.atomic
     def save(self, *args, **kwargs):
         self.full_clean()
         
         # Verificar se é uma nova transação
         is_new = self.pk is None
         
-        # Salvar a transação
-        super().save(*args, **kwargs)
-        
-        # Atualizar saldos após salvar (tanto para nova quanto para atualização)
-        self.update_account_balances()
+        # Transação no banco onde a linha é gravada (shard do usuário)
+        using = kwargs.get('using') or router.db_for_write(Transaction, instance=self)
+        with transaction.atomic(using=using):
+            # Fatura do ciclo (compras de cartão); o total anterior é desfeito abaixo
+            previous_bill, previous_amount = billing.assign(self, using)
+            
+            # Salvar a transação
+            super().save(*args, **kwargs)
+            
+            billing.apply(using, previous_bill, -previous_amount)
+            billing.apply(using, self.bill_id, billing.signed_amount(self.type, self.amount))
+            
+            # Regravar os lançamentos no razão (contas antigas, se mudou de conta)
+            previous_accounts, previous_cards = ledger.sync_postings(self, using)
+            
+            # Atualizar saldos após salvar (tanto para nova quanto para atualização)
+            self.update_account_balances(previous_accounts, previous_cards)
 
     def add_tags(self, tag_names):
         """
@@ -394,7 +433,6 @@ class Transaction(models.Model):
         """
         return ', '.join([tag.formatted_name for tag in self.tags.all()])
 
-    @transaction.atomic
     def delete(self, *args, **kwargs):
         # Salvar referências antes de deletar
         account = self.account
@@ -402,23 +440,32 @@ class Transaction(models.Model):
         transfer_from = self.transfer_from_account
         transfer_to = self.transfer_to_account
         
-        # Deletar a transação
-        super().delete(*args, **kwargs)
-        
-        # Atualizar saldos após deletar
-        if account:
-            account.update_balance()
-        if credit_card:
-            credit_card.update_available_limit()
-        if transfer_from:
-            transfer_from.update_balance()
-        if transfer_to:
-            transfer_to.update_balance()
-
-    def update_account_balances(self):
+        using = kwargs.get('using') or router.db_for_write(Transaction, instance=self)
+        with transaction.atomic(using=using):
+            # Tirar os lançamentos do razão (corrige o saldo acumulado)
+            ledger.remove_postings(self, using)
+            billing.apply(using, self.bill_id, -billing.signed_amount(self.type, self.amount))
+            
+            # Deletar a transação
+            result = super().delete(*args, **kwargs)
+            
+            # Atualizar saldos após deletar
+            if account:
+                account.update_balance()
+            if credit_card:
+                credit_card.update_available_limit()
+            if transfer_from:
+                transfer_from.update_balance()
+            if transfer_to:
+                transfer_to.update_balance()
+        return result
+
+    def update_account_balances(self, previous_accounts=(), previous_cards=()):
         """
         Atualiza os saldos das contas relacionadas
         """
+        from financial_accounts.models import Account, CreditCard
+        
         if self.account:
             self.account.update_balance()
         if self.credit_card:
@@ -427,6 +474,13 @@ class Transaction(models.Model):
             self.transfer_from_account.update_balance()
         if self.transfer_to_account:
             self.transfer_to_account.update_balance()
+        
+        # Contas/cartões que a transação deixou de movimentar
+        current = {self.account_id, self.transfer_from_account_id, self.transfer_to_account_id}
+        for account in Account.objects.filter(user_id=self.user_id, pk__in=set(previous_accounts) - current):
+            account.update_balance()
+        for card in CreditCard.objects.filter(user_id=self.user_id, pk__in=set(previous_cards) - {self.credit_card_id}):
+            card.update_available_limit()
 
     @property
     def payment_method_display(self):
@@ -439,4 +493,113 @@ class Transaction(models.Model):
             return f"Cartão: {self.credit_card.name}"
         elif self.type == 'transfer':
             return f"Transferência: {self.transfer_from_account.name} → {self.transfer_to_account.name}"
-        return "Não informado"
\ No newline at end of file
+        return "Não informado"
+
+
+class InstallmentPlan(models.Model):
+    """
+    Compra parcelada no cartão
+    
+    As parcelas são transações comuns (uma por mês, cada uma na sua fatura),
+    criadas de uma vez por transactions.installments.create_plan.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='installment_plans')
+    credit_card = models.ForeignKey(
+        'financial_accounts.CreditCard',
+        on_delete=models.CASCADE,
+        related_name='installment_plans',
+        verbose_name='Cartão de Crédito'
+    )
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, verbose_name='Categoria')
+    description = models.CharField(max_length=200, verbose_name='Descrição')
+    total_amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        validators=[MinValueValidator(Decimal('0.01'))],
+        verbose_name='Valor Total'
+    )
+    installments = models.PositiveSmallIntegerField(verbose_name='Parcelas')
+    purchase_date = models.DateField(verbose_name='Data da Compra')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ShardedManager()
+
+    class Meta:
+        verbose_name = 'Compra Parcelada'
+        verbose_name_plural = 'Compras Parceladas'
+        ordering = ['-purchase_date', '-created_at']
+
+    def __str__(self):
+        return f'{self.description} ({self.installments}x)'
+
+    def delete(self, *args, **kwargs):
+        # Parcelas saem pelo Transaction.delete (razão, faturas e limite)
+        from . import installments
+        
+        using = kwargs.get('using') or router.db_for_write(InstallmentPlan, instance=self)
+        with transaction.atomic(using=using):
+            installments.remove_installments(self, using)
+            return super().delete(*args, **kwargs)
+
+
+class Posting(models.Model):
+    """
+    Lançamento assinado de uma transação em uma conta ou cartão (razão)
+    
+    Mantido por Transaction.save()/delete() (ver transactions.ledger).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='postings')
+    # Sem constraint no banco: a tabela de transações pode ser particionada
+    # (PK composta), e o PostgreSQL não aceita FK para ela
+    transaction = models.ForeignKey(
+        Transaction,
+        on_delete=models.CASCADE,
+        related_name='postings',
+        db_constraint=False,
+    )
+    account = models.ForeignKey(
+        'financial_accounts.Account',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='postings'
+    )
+    credit_card = models.ForeignKey(
+        'financial_accounts.CreditCard',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='postings'
+    )
+    # Tipo e data copiados da transação: relatórios leem só o razão
+    type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPES, verbose_name='Tipo')
+    date = models.DateField(verbose_name='Data')
+    amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name='Valor (com sinal)')
+    # Soma dos lançamentos da conta/cartão até este, na ordem (date, transaction)
+    running_total = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name='Acumulado'
+    )
+
+    objects = ShardedManager()
+
+    class Meta:
+        verbose_name = 'Lançamento'
+        verbose_name_plural = 'Lançamentos'
+        ordering = ['date', 'transaction_id']
+        # (dono, date, transaction) é a chave do saldo acumulado e do extrato
+        indexes = [
+            models.Index(fields=['account', 'date', 'transaction'], name='posting_account_key_idx'),
+            models.Index(fields=['credit_card', 'date', 'transaction'], name='posting_card_key_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=(
+                    models.Q(account__isnull=False, credit_card__isnull=True) |
+                    models.Q(account__isnull=True, credit_card__isnull=False)
+                ),
+                name='posting_account_xor_card',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.date} {self.amount:+} ({self.transaction_id})'
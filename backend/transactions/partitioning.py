@@ -0,0 +1,337 @@
+"""
+Particionamento por data da tabela de transações (PostgreSQL)
+
+Opcional: com TRANSACTIONS_PARTITION_BY = 'year' ou 'month' a migração
+0005 converte `transactions_transaction` em uma tabela particionada por
+RANGE ("date"), uma partição por período mais uma partição DEFAULT para
+datas fora dos intervalos criados. Em SQLite (ou com a opção vazia) nada
+muda.
+
+Restrições do Postgres que afetam o esquema:
+
+- a chave primária de uma tabela particionada precisa conter a chave de
+  partição, então a PK passa a ser (id, date). O `id` continua vindo da
+  mesma sequência/identity e o ORM segue usando só ele;
+- nenhuma FK pode apontar para a tabela particionada (não há índice único
+  só em `id`), então as FKs de entrada (tabela M2M de tags) são removidas
+  na conversão. O CASCADE continua sendo feito pelo ORM.
+
+Partições futuras são criadas pelo comando `partition_transactions`
+(agendar no cron); partições antigas podem ir para um tablespace mais
+barato ou ser desanexadas pelo mesmo comando.
+"""
+
+import re
+from datetime import date
+
+from django.conf import settings
+
+TABLE = 'transactions_transaction'
+PARTITION_KEY = 'date'
+GRANULARITIES = ('year', 'month')
+
+_BOUND_RE = re.compile(r"FROM \('([\d-]+)'\) TO \('([\d-]+)'\)")
+
+
+def get_granularity():
+    """Granularidade configurada ('year', 'month') ou '' se desligado"""
+    granularity = (getattr(settings, 'TRANSACTIONS_PARTITION_BY', '') or '').strip().lower()
+    if granularity and granularity not in GRANULARITIES:
+        raise ValueError(
+            f"TRANSACTIONS_PARTITION_BY inválido: {granularity!r} (use {', '.join(GRANULARITIES)} ou vazio)"
+        )
+    return granularity
+
+
+def supports_partitioning(connection):
+    return connection.vendor == 'postgresql'
+
+
+def period_start(day, granularity):
+    if granularity == 'year':
+        return date(day.year, 1, 1)
+    return date(day.year, day.month, 1)
+
+
+def next_period(start, granularity, periods=1):
+    if granularity == 'year':
+        return date(start.year + periods, 1, 1)
+    months = start.year * 12 + start.month - 1 + periods
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def iter_periods(start, end, granularity):
+    """Intervalos [início, fim) que cobrem de `start` até `end` (inclusive)"""
+    current = period_start(start, granularity)
+    while current <= end:
+        following = next_period(current, granularity)
+        yield current, following
+        current = following
+
+
+def partition_name(start, granularity, table=TABLE):
+    if granularity == 'year':
+        return f'{table}_y{start.year}'
+    return f'{table}_p{start.year}_{start.month:02d}'
+
+
+def is_partitioned(connection, table=TABLE):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT 1 FROM pg_partitioned_table pt
+            JOIN pg_class c ON c.oid = pt.partrelid
+            WHERE c.relname = %s AND pg_table_is_visible(c.oid)
+            """,
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(connection, table=TABLE):
+    """
+    Partições anexadas, ordenadas pelo início do intervalo
+
+    Cada item: {'name', 'start', 'end', 'tablespace', 'default'}; a partição
+    DEFAULT vem por último, com start/end None.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid), ts.spcname
+            FROM pg_inherits inh
+            JOIN pg_class parent ON parent.oid = inh.inhparent
+            JOIN pg_class child ON child.oid = inh.inhrelid
+            LEFT JOIN pg_tablespace ts ON ts.oid = child.reltablespace
+            WHERE parent.relname = %s AND pg_table_is_visible(parent.oid)
+            """,
+            [table],
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound, tablespace in rows:
+        match = _BOUND_RE.search(bound or '')
+        partitions.append({
+            'name': name,
+            'start': date.fromisoformat(match.group(1)) if match else None,
+            'end': date.fromisoformat(match.group(2)) if match else None,
+            'tablespace': tablespace,
+            'default': bound == 'DEFAULT',
+        })
+    partitions.sort(key=lambda p: (p['start'] is None, p['start'] or date.min))
+    return partitions
+
+
+def create_partitions(connection, start, end, granularity, table=TABLE):
+    """
+    Cria as partições que faltam para cobrir `start`..`end`
+
+    Cada partição é criada fora da tabela, recebe as linhas do período que
+    estavam na DEFAULT e só então é anexada — assim criar um período que já
+    tem dados na DEFAULT não falha. Retorna os nomes criados.
+    """
+    quote = connection.ops.quote_name
+    partitions = list_partitions(connection, table)
+    ranges = [(p['start'], p['end']) for p in partitions if not p['default']]
+    default = f'{table}_default'
+    has_default = any(p['default'] for p in partitions)
+
+    created = []
+    with connection.cursor() as cursor:
+        for lower, upper in iter_periods(start, end, granularity):
+            if any(first <= lower < last for first, last in ranges):
+                continue
+            name = partition_name(lower, granularity, table)
+            cursor.execute(
+                f'CREATE TABLE {quote(name)} '
+                f'(LIKE {quote(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE)'
+            )
+            if has_default:
+                cursor.execute(
+                    f'WITH moved AS (DELETE FROM {quote(default)} '
+                    f'WHERE {quote(PARTITION_KEY)} >= %s AND {quote(PARTITION_KEY)} < %s RETURNING *) '
+                    f'INSERT INTO {quote(name)} SELECT * FROM moved',
+                    [lower, upper],
+                )
+            cursor.execute(
+                f'ALTER TABLE {quote(table)} ATTACH PARTITION {quote(name)} '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                [lower, upper],
+            )
+            created.append(name)
+    return created
+
+
+def ensure_future_partitions(connection, granularity, ahead=3, table=TABLE, today=None):
+    """Garante partições do período atual até `ahead` períodos à frente"""
+    today = today or date.today()
+    current = period_start(today, granularity)
+    last = next_period(current, granularity, ahead)
+    return create_partitions(connection, current, last, granularity, table)
+
+
+def archive_partitions(connection, before, table=TABLE, tablespace=None, detach=False):
+    """
+    Move (e opcionalmente desanexa) as partições que terminam até `before`
+
+    SET TABLESPACE mantém os dados consultáveis em armazenamento mais
+    barato. DETACH tira as linhas da tabela de transações — saldos
+    recalculados deixam de considerá-las — e a partição vira uma tabela
+    comum, pronta para dump/arquivamento. Retorna os nomes afetados.
+    """
+    quote = connection.ops.quote_name
+    affected = []
+    with connection.cursor() as cursor:
+        for partition in list_partitions(connection, table):
+            if partition['default'] or partition['end'] > before:
+                continue
+            name = quote(partition['name'])
+            if tablespace and partition['tablespace'] != tablespace:
+                cursor.execute(f'ALTER TABLE {name} SET TABLESPACE {quote(tablespace)}')
+            if detach:
+                cursor.execute(f'ALTER TABLE {quote(table)} DETACH PARTITION {name}')
+            affected.append(partition['name'])
+    return affected
+
+
+def _index_definitions(cursor, table):
+    cursor.execute(
+        """
+        SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i
+        WHERE i.indrelid = %s::regclass AND NOT i.indisprimary AND NOT i.indisunique
+        ORDER BY i.indexrelid
+        """,
+        [table],
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _outgoing_foreign_keys(cursor, table):
+    cursor.execute(
+        """
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype = 'f' AND confrelid <> conrelid
+        ORDER BY conname
+        """,
+        [table],
+    )
+    return cursor.fetchall()
+
+
+def _incoming_foreign_keys(cursor, table):
+    cursor.execute(
+        """
+        SELECT conrelid::regclass::text, conname FROM pg_constraint
+        WHERE confrelid = %s::regclass AND contype = 'f'
+        ORDER BY conname
+        """,
+        [table],
+    )
+    return cursor.fetchall()
+
+
+def _rebuild_table(connection, table, partition_by=None, primary_key=('id',), before_copy=None):
+    """
+    Recria `table` com a mesma estrutura e copia as linhas
+
+    A tabela antiga é renomeada, a nova é criada com LIKE (defaults,
+    identity, checks) e, depois da cópia, recebe PK, índices e FKs de
+    saída. FKs de outras tabelas para a antiga são removidas; quem chama
+    decide se as recria.
+    """
+    quote = connection.ops.quote_name
+    old = f'{table}_old'
+    with connection.cursor() as cursor:
+        indexes = _index_definitions(cursor, table)
+        foreign_keys = _outgoing_foreign_keys(cursor, table)
+        cursor.execute(
+            "SELECT pg_get_serial_sequence(%s, 'id'), attidentity FROM pg_attribute "
+            "WHERE attrelid = %s::regclass AND attname = 'id'",
+            [table, table],
+        )
+        sequence, identity = cursor.fetchone()
+
+        cursor.execute(f'ALTER TABLE {quote(table)} RENAME TO {quote(old)}')
+        cursor.execute(
+            f'CREATE TABLE {quote(table)} (LIKE {quote(old)} INCLUDING DEFAULTS INCLUDING IDENTITY '
+            f'INCLUDING CONSTRAINTS INCLUDING STORAGE INCLUDING COMMENTS)'
+            + (f' PARTITION BY RANGE ({quote(partition_by)})' if partition_by else '')
+        )
+        if sequence and not identity:
+            # Coluna serial: o default continua apontando para a sequência antiga
+            cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {quote(table)}.{quote("id")}')
+
+        if before_copy:
+            before_copy(cursor, old)
+        cursor.execute(f'INSERT INTO {quote(table)} OVERRIDING SYSTEM VALUE SELECT * FROM {quote(old)}')
+
+        for referencing, name in _incoming_foreign_keys(cursor, old):
+            cursor.execute(f'ALTER TABLE {referencing} DROP CONSTRAINT {quote(name)}')
+        cursor.execute(f'DROP TABLE {quote(old)}')
+
+        columns = ', '.join(quote(column) for column in primary_key)
+        cursor.execute(f'ALTER TABLE {quote(table)} ADD PRIMARY KEY ({columns})')
+        for definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}')
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX({quote('id')}), 0) + 1, false) "
+            f'FROM {quote(table)}',
+            [table],
+        )
+
+
+def convert_to_partitioned(connection, granularity, table=TABLE, ahead=3, today=None):
+    """
+    Converte a tabela comum em particionada por RANGE ("date")
+
+    Cria partições do período da transação mais antiga até `ahead`
+    períodos à frente de hoje, mais a DEFAULT, e copia os dados. Roda em
+    uma transação só (DDL do Postgres é transacional) e bloqueia a tabela
+    durante a cópia. Retorna a lista de partições.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'Granularidade inválida: {granularity!r}')
+    quote = connection.ops.quote_name
+    today = today or date.today()
+
+    def create_partitions_for(cursor, old):
+        cursor.execute(f'SELECT MIN({quote(PARTITION_KEY)}), MAX({quote(PARTITION_KEY)}) FROM {quote(old)}')
+        first, last = cursor.fetchone()
+        first = min(first or today, today)
+        last = max(last or today, next_period(period_start(today, granularity), granularity, ahead))
+        cursor.execute(f'CREATE TABLE {quote(table + "_default")} PARTITION OF {quote(table)} DEFAULT')
+        # Criadas direto (sem ATTACH): a DEFAULT ainda está vazia
+        for lower, upper in iter_periods(first, last, granularity):
+            cursor.execute(
+                f'CREATE TABLE {quote(partition_name(lower, granularity, table))} '
+                f'PARTITION OF {quote(table)} FOR VALUES FROM (%s) TO (%s)',
+                [lower, upper],
+            )
+
+    _rebuild_table(
+        connection, table, partition_by=PARTITION_KEY,
+        primary_key=('id', PARTITION_KEY), before_copy=create_partitions_for,
+    )
+    return [p['name'] for p in list_partitions(connection, table)]
+
+
+def revert_partitioning(connection, table=TABLE, references=()):
+    """
+    Volta para uma tabela comum com PK em `id`
+
+    `references` lista (tabela, coluna) cujas FKs para `id` devem ser
+    recriadas. Partições já desanexadas não voltam.
+    """
+    quote = connection.ops.quote_name
+    _rebuild_table(connection, table)
+    with connection.cursor() as cursor:
+        for referencing, column in references:
+            cursor.execute(
+                f'ALTER TABLE {quote(referencing)} ADD CONSTRAINT '
+                f'{quote(f"{referencing}_{column}_fk")} '
+                f'FOREIGN KEY ({quote(column)}) REFERENCES {quote(table)} ({quote("id")}) '
+                f'DEFERRABLE INITIALLY DEFERRED'
+            )
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from django.utils import timezone
 from django.db import transaction as db_transaction
-from .models import Category, Tag, Transaction
+from .models import Category, InstallmentPlan, Tag, Transaction
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -198,9 +198,10 @@ class TransactionSerializer(serializers.ModelSerializer):
             'account', 'account_name', 'credit_card', 'credit_card_name',
             'transfer_from_account', 'transfer_from_account_name',
             'transfer_to_account', 'transfer_to_account_name',
-            'payment_method_display', 'created_at', 'updated_at'
+            'payment_method_display', 'installment_plan', 'installment_number',
+            'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'user', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'user', 'installment_plan', 'installment_number', 'created_at', 'updated_at']
 
     def validate_date(self, value):
         """
@@ -521,6 +522,91 @@ class TransferSerializer(serializers.Serializer):
         return transaction_obj
 
 
+class InstallmentSerializer(serializers.ModelSerializer):
+    """
+    Parcela de uma compra parcelada (leitura)
+    """
+    bill_reference_month = serializers.DateField(source='bill.reference_month', read_only=True)
+
+    class Meta:
+        model = Transaction
+        fields = ['id', 'installment_number', 'amount', 'date', 'bill', 'bill_reference_month']
+        read_only_fields = fields
+
+
+class InstallmentPlanSerializer(serializers.ModelSerializer):
+    """
+    Compra parcelada no cartão; as parcelas são criadas junto com o plano
+    """
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    credit_card_name = serializers.CharField(source='credit_card.name', read_only=True)
+    installment_list = serializers.SerializerMethodField()
+
+    class Meta:
+        model = InstallmentPlan
+        fields = [
+            'id', 'description', 'total_amount', 'installments', 'purchase_date',
+            'credit_card', 'credit_card_name', 'category', 'category_name',
+            'installment_list', 'created_at'
+        ]
+        read_only_fields = ['id', 'created_at']
+
+    def get_installment_list(self, obj):
+        # Ordena em memória: aproveita o prefetch da listagem
+        parts = sorted(obj.parts.all(), key=lambda part: part.installment_number)
+        return InstallmentSerializer(parts, many=True).data
+
+    def validate_description(self, value):
+        """
+        Valida se a descrição tem pelo menos 3 caracteres
+        """
+        if len(value.strip()) < 3:
+            raise serializers.ValidationError("A descrição deve ter pelo menos 3 caracteres.")
+        return value.strip()
+
+    def validate_installments(self, value):
+        """
+        Valida o número de parcelas
+        """
+        from .installments import MAX_INSTALLMENTS
+        
+        if value < 2 or value > MAX_INSTALLMENTS:
+            raise serializers.ValidationError(f"O número de parcelas deve estar entre 2 e {MAX_INSTALLMENTS}.")
+        return value
+
+    def validate_purchase_date(self, value):
+        """
+        Valida se a data da compra não é futura
+        """
+        if value > timezone.now().date():
+            raise serializers.ValidationError("A data não pode ser futura.")
+        return value
+
+    def validate(self, data):
+        """
+        Cartão do usuário, ativo e com limite para o valor total
+        """
+        credit_card = data['credit_card']
+        if credit_card.user != self.context['request'].user:
+            raise serializers.ValidationError("O cartão selecionado não pertence ao usuário.")
+        if not credit_card.is_active:
+            raise serializers.ValidationError("O cartão selecionado não está ativo.")
+        if not credit_card.can_charge(data['total_amount']):
+            raise serializers.ValidationError(
+                f"Limite insuficiente no cartão {credit_card.name}. "
+                f"Limite disponível: R$ {credit_card.available_limit:.2f}"
+            )
+        return data
+
+    def create(self, validated_data):
+        """
+        Cria o plano e as parcelas de uma vez
+        """
+        from .installments import create_plan
+        
+        return create_plan(user=self.context['request'].user, **validated_data)
+
+
 class TransactionFilterSerializer(serializers.Serializer):
     """
     Serializer para filtros de transações
@@ -6,6 +6,7 @@ router = DefaultRouter()
 router.register(r'transactions', views.TransactionViewSet, basename='transaction')
 router.register(r'categories', views.CategoryViewSet, basename='category')
 router.register(r'tags', views.TagViewSet, basename='tag')
+router.register(r'installment-plans', views.InstallmentPlanViewSet, basename='installment-plan')
 
 urlpatterns = [
     path('', include(router.urls)),
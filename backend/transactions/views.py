@@ -3,12 +3,13 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Sum
+from django.db.models import Prefetch, Q, Sum
 from decimal import Decimal
-from .models import Category, Tag, Transaction
+from .models import Category, InstallmentPlan, Tag, Transaction
 from .serializers import (
     CategorySerializer, TagSerializer, TransactionSerializer,
-    TransactionSummarySerializer, TransactionFilterSerializer, TransferSerializer
+    TransactionSummarySerializer, TransactionFilterSerializer, TransferSerializer,
+    InstallmentPlanSerializer
 )
 
 
@@ -621,4 +622,26 @@ class TransactionViewSet(viewsets.ModelViewSet):
             return self.get_paginated_response(serializer.data)
 
         serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+
+class InstallmentPlanViewSet(viewsets.ModelViewSet):
+    """
+    Compras parceladas no cartão
+
+    Criar gera todas as parcelas (uma transação por mês, cada uma na sua
+    fatura); excluir remove as parcelas e devolve o limite.
+    """
+    serializer_class = InstallmentPlanSerializer
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['get', 'post', 'delete', 'head', 'options']
+
+    def get_queryset(self):
+        """
+        Retorna apenas os planos do usuário autenticado
+        """
+        return InstallmentPlan.objects.filter(
+            user=self.request.user
+        ).select_related('category', 'credit_card').prefetch_related(
+            Prefetch('parts', queryset=Transaction.objects.select_related('bill'))
+        )
@@ -0,0 +1,201 @@
+"""
+Pipeline assíncrono de auditoria
+
+O middleware apenas enfileira um registro leve (sem parse, sanitização ou
+serialização). Uma thread em background agrupa os registros, serializa e
+grava em lote num arquivo JSONL append-only, por tamanho de lote ou por
+intervalo de tempo. Com a fila cheia, o produtor aguarda até
+`enqueue_timeout` (backpressure) e depois descarta, contabilizando a perda.
+Corpos acima de `max_body_size` não entram na fila (só o tamanho), o que
+limita a memória da fila a queue_size * max_body_size.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+
+from utils.renderers import dumps
+
+
+logger = logging.getLogger('nossa_grana')
+
+SENSITIVE_KEYS = ['password', 'token', 'secret', 'key']
+
+
+def sanitize_data(data):
+    """Remove dados sensíveis dos logs"""
+    if isinstance(data, dict):
+        sanitized = {}
+        for key, value in data.items():
+            if key.lower() in SENSITIVE_KEYS:
+                sanitized[key] = '***REDACTED***'
+            elif isinstance(value, (dict, list)):
+                sanitized[key] = sanitize_data(value)
+            else:
+                sanitized[key] = value
+        return sanitized
+    elif isinstance(data, list):
+        return [sanitize_data(item) for item in data]
+    return data
+
+
+def serialize_record(record: Dict[str, Any]) -> bytes:
+    """Serializa um registro (executado na thread de escrita)"""
+    record['timestamp'] = datetime.fromtimestamp(record.pop('ts'), tz=dt_timezone.utc).isoformat()
+    body = record.pop('body', None)
+    if body:
+        try:
+            record['request_data'] = sanitize_data(json.loads(body))
+        except (ValueError, UnicodeDecodeError):
+            pass
+    return dumps(record)
+
+
+class AuditLogWriter:
+    """Escritor de auditoria em lote com thread em background"""
+
+    _STOP = object()
+
+    def __init__(self, path, batch_size: int = 200, flush_interval: float = 1.0,
+                 queue_size: int = 10000, enqueue_timeout: float = 0.05,
+                 fsync: bool = True, max_body_size: int = 65536):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.fsync = fsync
+        self.max_body_size = max_body_size
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stats = {'enqueued': 0, 'written': 0, 'dropped': 0, 'batches': 0, 'errors': 0}
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name: str, amount: int = 1):
+        # Produtores e a thread de escrita atualizam os contadores
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._thread = threading.Thread(
+                    target=self._run, name='audit-log-writer', daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        """Enfileira um registro; retorna False se foi descartado"""
+        if self._thread is None:
+            self.start()
+        body = record.get('body')
+        if body and len(body) > self.max_body_size:
+            # Corpo truncado não seria JSON válido: registra só o tamanho
+            record['body'] = None
+            record['body_size'] = len(body)
+        try:
+            self.queue.put(record, timeout=self.enqueue_timeout)
+        except queue.Full:
+            self._count('dropped')
+            return False
+        self._count('enqueued')
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Aguarda a gravação de tudo que foi enfileirado até agora"""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self.queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.put(self._STOP)
+            self._thread.join(timeout)
+
+    def _run(self):
+        batch: List[Dict[str, Any]] = []
+        deadline = time.monotonic() + self.flush_interval
+
+        while True:
+            try:
+                item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, dict):
+                batch.append(item)
+                if len(batch) < self.batch_size and time.monotonic() < deadline:
+                    continue
+
+            self._write(batch)
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is self._STOP:
+                return
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        if not batch:
+            return
+        try:
+            lines = [serialize_record(record) for record in batch]
+            with open(self.path, 'ab') as fp:
+                fp.write(b'\n'.join(lines) + b'\n')
+                fp.flush()
+                if self.fsync:
+                    os.fsync(fp.fileno())
+            self._count('written', len(batch))
+            self._count('batches')
+        except Exception as e:
+            # Não deve derrubar a thread de escrita
+            self._count('errors')
+            logger.error(f'Erro ao gravar audit log: {e}')
+
+
+_audit_writer: Optional[AuditLogWriter] = None
+_audit_writer_lock = threading.Lock()
+
+
+def get_audit_writer() -> AuditLogWriter:
+    """Retorna o AuditLogWriter do processo, configurado pelos settings AUDIT_LOG_*"""
+    global _audit_writer
+    if _audit_writer is not None:
+        return _audit_writer
+
+    with _audit_writer_lock:
+        if _audit_writer is None:
+            writer = AuditLogWriter(
+                path=getattr(settings, 'AUDIT_LOG_PATH', Path(settings.BASE_DIR) / 'logs' / 'audit.jsonl'),
+                batch_size=getattr(settings, 'AUDIT_LOG_BATCH_SIZE', 200),
+                flush_interval=getattr(settings, 'AUDIT_LOG_FLUSH_INTERVAL', 1.0),
+                queue_size=getattr(settings, 'AUDIT_LOG_QUEUE_SIZE', 10000),
+                enqueue_timeout=getattr(settings, 'AUDIT_LOG_ENQUEUE_TIMEOUT', 0.05),
+                fsync=getattr(settings, 'AUDIT_LOG_FSYNC', True),
+                max_body_size=getattr(settings, 'AUDIT_LOG_MAX_BODY_SIZE', 65536),
+            )
+            atexit.register(writer.stop)
+            _audit_writer = writer
+    return _audit_writer
+
+
+def audit(event: str, **fields) -> bool:
+    """Enfileira um evento de auditoria"""
+    fields['event'] = event
+    fields['ts'] = time.time()
+    return get_audit_writer().submit(fields)
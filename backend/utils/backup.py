@@ -0,0 +1,456 @@
+"""
+Backups consistentes do banco SQLite
+
+- A cópia usa a API de backup online do SQLite (Connection.backup) em lotes
+  de páginas com uma pausa entre eles: o lock de leitura é solto a cada
+  lote, então escritores não esperam a cópia inteira, e o resultado é um
+  snapshot consistente mesmo em modo WAL (copiar o arquivo .sqlite3 pode
+  pegar o banco sem o conteúdo do -wal).
+- O snapshot é comprimido em streaming (zstd quando `zstandard` está
+  instalado, senão gzip) com o SHA-256 calculado na mesma passada.
+- Backups incrementais guardam só as páginas que mudaram desde o backup
+  anterior da cadeia, comparando hashes de página.
+- Cada backup tem um manifesto JSON com tamanhos, duração e checksums;
+  verify() confere os arquivos e, opcionalmente, restaura a cadeia e roda
+  PRAGMA integrity_check.
+
+Arquivos de um backup `backup_<timestamp>` em BACKUP_DIR:
+    .json               manifesto
+    .sqlite3.gz/.zst    imagem completa (backup full)
+    .pages.gz/.zst      páginas alteradas (backup incremental)
+    .hashes             hash de 8 bytes de cada página da imagem resultante
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard é opcional
+    zstandard = None
+
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+PAGE_HASH_SIZE = 8
+DIFF_MAGIC = b'NGPD1'
+DIFF_HEADER = struct.Struct('>II')  # tamanho da página, total de páginas
+PAGE_NUMBER = struct.Struct('>I')
+
+EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+
+_create_lock = threading.Lock()
+
+
+class BackupError(Exception):
+    pass
+
+
+def format_size(size):
+    """Tamanho legível (mesmo formato exibido pela BackupView)"""
+    if size < 1024 * 1024:
+        return f'{size / 1024:.1f} KB'
+    return f'{size / (1024 * 1024):.1f} MB'
+
+
+def available_compression(preferred):
+    """zstd só se o pacote estiver instalado; gzip sempre existe"""
+    if preferred == 'zstd' and zstandard is None:
+        return 'gzip'
+    if preferred not in EXTENSIONS:
+        raise BackupError(f'Compressão desconhecida: {preferred}')
+    return preferred
+
+
+class _HashingWriter:
+    """Arquivo de saída que conta bytes e calcula SHA-256 do que é escrito"""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.fileobj.write(data)
+
+    def flush(self):
+        self.fileobj.flush()
+
+
+class _CompressedWriter:
+    def __init__(self, path, compression, level=None):
+        self.raw = open(path, 'wb')
+        self.output = _HashingWriter(self.raw)
+        if compression == 'zstd':
+            compressor = zstandard.ZstdCompressor(level=level or 3, threads=-1)
+            self.stream = compressor.stream_writer(self.output, closefd=False)
+        else:
+            self.stream = gzip.GzipFile(fileobj=self.output, mode='wb', compresslevel=level or 6, mtime=0)
+
+    def write(self, data):
+        self.stream.write(data)
+
+    def close(self):
+        self.stream.close()
+        self.raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _open_compressed(path, compression):
+    raw = open(path, 'rb')
+    if compression == 'zstd':
+        if zstandard is None:
+            raw.close()
+            raise BackupError('Backup em zstd exige o pacote zstandard')
+        return zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    return gzip.GzipFile(fileobj=raw, mode='rb')
+
+
+def _read_exact(stream, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return bytes(data)
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SQLiteBackup:
+    """
+    Cria, lista, verifica e restaura backups de um arquivo SQLite
+
+    Um novo backup full é feito quando não há backup anterior ou quando a
+    cadeia de incrementais já tem `full_every` elementos.
+    """
+
+    def __init__(self, database_path, backup_dir, compression='zstd', pages_per_step=1024,
+                 step_sleep=0.005, full_every=7, compression_level=None):
+        self.database_path = str(database_path)
+        self.backup_dir = str(backup_dir)
+        self.compression = available_compression(compression)
+        self.pages_per_step = pages_per_step
+        self.step_sleep = step_sleep
+        self.full_every = max(1, full_every)
+        self.compression_level = compression_level
+
+    # Manifestos
+
+    def _path(self, name, suffix):
+        return os.path.join(self.backup_dir, name + suffix)
+
+    def list_backups(self):
+        """Manifestos ordenados do mais antigo para o mais novo"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        manifests = []
+        for filename in os.listdir(self.backup_dir):
+            if filename.startswith('backup_') and filename.endswith('.json'):
+                try:
+                    with open(os.path.join(self.backup_dir, filename)) as f:
+                        manifests.append(json.load(f))
+                except (OSError, ValueError):
+                    logger.warning('Manifesto de backup ilegível: %s', filename)
+        return sorted(manifests, key=lambda m: m['name'])
+
+    def latest(self):
+        backups = self.list_backups()
+        return backups[-1] if backups else None
+
+    def get(self, name):
+        try:
+            with open(self._path(name, '.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise BackupError(f'Backup não encontrado: {name}')
+
+    def chain(self, name):
+        """Backups necessários para restaurar `name`: o full e os incrementais até ele"""
+        chain = [self.get(name)]
+        while chain[0]['parent']:
+            chain.insert(0, self.get(chain[0]['parent']))
+        return chain
+
+    # Criação
+
+    def _snapshot(self, destination):
+        """Cópia consistente via API de backup, `pages_per_step` páginas por vez"""
+        if not os.path.exists(self.database_path):
+            raise BackupError(f'Banco de dados não encontrado: {self.database_path}')
+        source = sqlite3.connect(self.database_path, timeout=30)
+        target = sqlite3.connect(destination)
+        try:
+            source.backup(target, pages=self.pages_per_step, sleep=self.step_sleep)
+            page_size = target.execute('PRAGMA page_size').fetchone()[0]
+        finally:
+            target.close()
+            source.close()
+        return page_size
+
+    def _page_hashes(self, snapshot, page_size):
+        hashes = bytearray()
+        with open(snapshot, 'rb') as f:
+            for page in iter(lambda: f.read(page_size), b''):
+                hashes += hashlib.blake2b(page, digest_size=PAGE_HASH_SIZE).digest()
+        return bytes(hashes)
+
+    def create(self, incremental=None):
+        """
+        Cria um backup e retorna seu manifesto
+
+        incremental=None decide sozinho (incremental se houver cadeia aberta);
+        True sem backup anterior compatível também gera um full.
+        """
+        with _create_lock:
+            os.makedirs(self.backup_dir, exist_ok=True)
+            started = time.monotonic()
+            name = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+
+            fd, snapshot = tempfile.mkstemp(prefix='.snapshot_', suffix='.sqlite3', dir=self.backup_dir)
+            os.close(fd)
+            try:
+                page_size = self._snapshot(snapshot)
+                snapshot_seconds = time.monotonic() - started
+                hashes = self._page_hashes(snapshot, page_size)
+
+                parent = self._parent_for(incremental, page_size)
+                if parent:
+                    manifest = self._write_incremental(name, snapshot, page_size, hashes, parent)
+                else:
+                    manifest = self._write_full(name, snapshot, len(hashes) // PAGE_HASH_SIZE)
+            finally:
+                os.remove(snapshot)
+
+            with open(self._path(name, '.hashes'), 'wb') as f:
+                f.write(hashes)
+
+            manifest.update({
+                'name': name,
+                'created_at': datetime.now().isoformat(),
+                'database': self.database_path,
+                'compression': self.compression,
+                'page_size': page_size,
+                'page_count': len(hashes) // PAGE_HASH_SIZE,
+                'snapshot_ms': round(snapshot_seconds * 1000, 1),
+                'duration_ms': round((time.monotonic() - started) * 1000, 1),
+            })
+            with open(self._path(name, '.json'), 'w') as f:
+                json.dump(manifest, f, indent=2)
+
+            logger.info(
+                'Backup %s (%s) criado: %s em %.0f ms', name, manifest['kind'],
+                format_size(manifest['size']), manifest['duration_ms'],
+            )
+            return manifest
+
+    def _parent_for(self, incremental, page_size):
+        if incremental is False:
+            return None
+        latest = self.latest()
+        if not latest or latest['page_size'] != page_size or latest['compression'] != self.compression:
+            return None
+        if not os.path.exists(self._path(latest['name'], '.hashes')):
+            return None
+        if incremental is None and latest['chain_length'] >= self.full_every:
+            return None
+        return latest
+
+    def _write_full(self, name, snapshot, page_count):
+        path = self._path(name, '.sqlite3' + EXTENSIONS[self.compression])
+        image_sha256 = hashlib.sha256()
+        with _CompressedWriter(path, self.compression, self.compression_level) as writer:
+            with open(snapshot, 'rb') as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    image_sha256.update(chunk)
+                    writer.write(chunk)
+        return {
+            'kind': 'full',
+            'parent': None,
+            'base': name,
+            'chain_length': 1,
+            'filename': os.path.basename(path),
+            'size': writer.output.size,
+            'sha256': writer.output.sha256.hexdigest(),
+            'database_size': os.path.getsize(snapshot),
+            'image_sha256': image_sha256.hexdigest(),
+            'pages_written': page_count,
+        }
+
+    def _write_incremental(self, name, snapshot, page_size, hashes, parent):
+        with open(self._path(parent['name'], '.hashes'), 'rb') as f:
+            parent_hashes = f.read()
+
+        path = self._path(name, '.pages' + EXTENSIONS[self.compression])
+        page_count = len(hashes) // PAGE_HASH_SIZE
+        image_sha256 = hashlib.sha256()
+        written = 0
+        with _CompressedWriter(path, self.compression, self.compression_level) as writer:
+            writer.write(DIFF_MAGIC + DIFF_HEADER.pack(page_size, page_count))
+            with open(snapshot, 'rb') as f:
+                for number in range(page_count):
+                    page = f.read(page_size)
+                    image_sha256.update(page)
+                    offset = number * PAGE_HASH_SIZE
+                    if hashes[offset:offset + PAGE_HASH_SIZE] != parent_hashes[offset:offset + PAGE_HASH_SIZE]:
+                        writer.write(PAGE_NUMBER.pack(number) + page)
+                        written += 1
+        return {
+            'kind': 'incremental',
+            'parent': parent['name'],
+            'base': parent['base'],
+            'chain_length': parent['chain_length'] + 1,
+            'filename': os.path.basename(path),
+            'size': writer.output.size,
+            'sha256': writer.output.sha256.hexdigest(),
+            'database_size': os.path.getsize(snapshot),
+            'image_sha256': image_sha256.hexdigest(),
+            'pages_written': written,
+        }
+
+    # Restauração e verificação
+
+    def restore(self, name, destination):
+        """Reconstrói a imagem do banco em `destination` e confere o SHA-256"""
+        chain = self.chain(name)
+        tmp = destination + '.restoring'
+        with open(tmp, 'wb') as out:
+            for manifest in chain:
+                path = os.path.join(self.backup_dir, manifest['filename'])
+                if manifest['kind'] == 'full':
+                    with _open_compressed(path, manifest['compression']) as stream:
+                        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                            out.write(chunk)
+                else:
+                    self._apply_diff(path, manifest['compression'], out)
+
+        target = chain[-1]
+        if _file_sha256(tmp) != target['image_sha256']:
+            os.remove(tmp)
+            raise BackupError(f'Checksum da imagem restaurada não confere: {name}')
+        os.replace(tmp, destination)
+        return destination
+
+    def _apply_diff(self, path, compression, out):
+        with _open_compressed(path, compression) as stream:
+            header = _read_exact(stream, len(DIFF_MAGIC) + DIFF_HEADER.size)
+            if not header.startswith(DIFF_MAGIC):
+                raise BackupError(f'Arquivo incremental inválido: {os.path.basename(path)}')
+            page_size, page_count = DIFF_HEADER.unpack(header[len(DIFF_MAGIC):])
+            while True:
+                number = _read_exact(stream, PAGE_NUMBER.size)
+                if not number:
+                    break
+                page = _read_exact(stream, page_size)
+                if len(number) != PAGE_NUMBER.size or len(page) != page_size:
+                    raise BackupError(f'Arquivo incremental truncado: {os.path.basename(path)}')
+                out.seek(PAGE_NUMBER.unpack(number)[0] * page_size)
+                out.write(page)
+            out.truncate(page_count * page_size)
+
+    def verify(self, name=None, restore=False):
+        """
+        Confere o SHA-256 dos arquivos da cadeia; com restore=True também
+        reconstrói a imagem e roda PRAGMA integrity_check
+        """
+        manifest = self.get(name) if name else self.latest()
+        if manifest is None:
+            raise BackupError('Nenhum backup encontrado')
+
+        errors = []
+        for item in self.chain(manifest['name']):
+            path = os.path.join(self.backup_dir, item['filename'])
+            if not os.path.exists(path):
+                errors.append(f"{item['filename']}: arquivo ausente")
+            elif _file_sha256(path) != item['sha256']:
+                errors.append(f"{item['filename']}: checksum não confere")
+
+        integrity = None
+        if restore and not errors:
+            fd, tmp = tempfile.mkstemp(prefix='.verify_', suffix='.sqlite3', dir=self.backup_dir)
+            os.close(fd)
+            try:
+                self.restore(manifest['name'], tmp)
+                conn = sqlite3.connect(tmp)
+                try:
+                    integrity = conn.execute('PRAGMA integrity_check').fetchone()[0]
+                finally:
+                    conn.close()
+                if integrity != 'ok':
+                    errors.append(f'integrity_check: {integrity}')
+            except BackupError as e:
+                errors.append(str(e))
+            finally:
+                os.remove(tmp)
+
+        return {'name': manifest['name'], 'ok': not errors, 'errors': errors, 'integrity_check': integrity}
+
+    # Retenção
+
+    def cleanup(self, keep_days):
+        """
+        Remove cadeias inteiras cujo backup mais novo tem mais de `keep_days`
+        dias; nunca remove a cadeia atual. Retorna os nomes removidos.
+        """
+        backups = self.list_backups()
+        if not backups:
+            return []
+        chains = {}
+        for manifest in backups:
+            chains.setdefault(manifest['base'], []).append(manifest)
+
+        limit = time.time() - keep_days * 24 * 60 * 60
+        current_base = backups[-1]['base']
+        removed = []
+        for base, members in chains.items():
+            newest = datetime.fromisoformat(members[-1]['created_at']).timestamp()
+            if base == current_base or newest > limit:
+                continue
+            for manifest in members:
+                for filename in (manifest['filename'], manifest['name'] + '.hashes', manifest['name'] + '.json'):
+                    try:
+                        os.remove(os.path.join(self.backup_dir, filename))
+                    except FileNotFoundError:
+                        pass
+                removed.append(manifest['name'])
+        return removed
+
+
+def get_backup_engine(alias='default'):
+    """Engine configurada para o banco SQLite `alias` (BACKUP_* nos settings)"""
+    database = settings.DATABASES[alias]
+    if 'sqlite' not in database['ENGINE']:
+        raise BackupError('Backup online disponível apenas para SQLite; em PostgreSQL use scripts/backup_prod.py')
+    return SQLiteBackup(
+        database['NAME'],
+        getattr(settings, 'BACKUP_DIR', os.path.join(settings.BASE_DIR, 'backups')),
+        compression=getattr(settings, 'BACKUP_COMPRESSION', 'zstd'),
+        pages_per_step=getattr(settings, 'BACKUP_PAGES_PER_STEP', 1024),
+        step_sleep=getattr(settings, 'BACKUP_STEP_SLEEP', 0.005),
+        full_every=getattr(settings, 'BACKUP_FULL_EVERY', 7),
+    )
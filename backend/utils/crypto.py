@@ -0,0 +1,176 @@
+"""
+Serviço de criptografia de dados sensíveis
+
+- Anel de chaves: MultiFernet montado uma vez por processo a partir de
+  ENCRYPTION_KEYS (a primeira cifra; todas decifram) e do antigo
+  ENCRYPTION_KEY. Rotação: colocar a chave nova na frente da lista e
+  passar os tokens existentes por `rotate_many`; depois de tudo rotacionado
+  a chave antiga pode sair. O anel é refeito quando os settings mudam.
+- Sem chave configurada nada é cifrado (KeyRingError): uma chave aleatória
+  por chamada tornaria os dados irrecuperáveis.
+- Tokens são o próprio token Fernet (urlsafe base64). Tokens antigos, com
+  base64 duplicado, continuam sendo aceitos na decifragem.
+- PBKDF2 (hash_sensitive_field/verify_hash) roda num pool de threads com
+  CRYPTO_KDF_WORKERS workers: o hashlib libera o GIL durante o KDF, então
+  lotes rodam em paralelo e requisições simultâneas não disputam mais que
+  esse número de núcleos.
+"""
+import base64
+import hashlib
+import hmac
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+KDF_ITERATIONS = 100000
+KEY_SETTINGS = ('ENCRYPTION_KEYS', 'ENCRYPTION_KEY')
+
+
+class KeyRingError(Exception):
+    pass
+
+
+def configured_keys() -> List[bytes]:
+    keys = [key for key in (getattr(settings, 'ENCRYPTION_KEYS', None) or []) if key]
+    legacy = getattr(settings, 'ENCRYPTION_KEY', None)
+    if legacy and legacy not in keys:
+        keys.append(legacy)
+    return [key.encode() if isinstance(key, str) else key for key in keys]
+
+
+_key_ring = None
+_key_ring_lock = threading.Lock()
+
+
+def get_key_ring() -> MultiFernet:
+    """MultiFernet do processo (montado uma vez)"""
+    global _key_ring
+    if _key_ring is not None:
+        return _key_ring
+
+    with _key_ring_lock:
+        if _key_ring is None:
+            keys = configured_keys()
+            if not keys:
+                raise KeyRingError('Chave de criptografia não configurada (ENCRYPTION_KEYS)')
+            try:
+                _key_ring = MultiFernet([Fernet(key) for key in keys])
+            except ValueError:
+                raise KeyRingError('Chave de criptografia inválida em ENCRYPTION_KEYS')
+    return _key_ring
+
+
+def _ring(keys=None) -> MultiFernet:
+    if keys:
+        return MultiFernet([Fernet(key) for key in keys])
+    return get_key_ring()
+
+
+@receiver(setting_changed, dispatch_uid='crypto.reset_key_ring')
+def reset_key_ring(setting=None, **kwargs):
+    global _key_ring
+    if setting is None or setting in KEY_SETTINGS:
+        with _key_ring_lock:
+            _key_ring = None
+
+
+def _decode_token(token) -> bytes:
+    return token.encode() if isinstance(token, str) else token
+
+
+def _decrypt(ring: MultiFernet, token) -> str:
+    token = _decode_token(token)
+    try:
+        return ring.decrypt(token).decode()
+    except InvalidToken:
+        # Formato antigo: token Fernet codificado em base64 mais uma vez
+        try:
+            legacy = base64.urlsafe_b64decode(token)
+        except (ValueError, TypeError):
+            raise InvalidToken
+        return ring.decrypt(legacy).decode()
+
+
+def encrypt(value, keys=None) -> str:
+    return _ring(keys).encrypt(str(value).encode()).decode()
+
+
+def decrypt(token, keys=None) -> str:
+    """Decifra um token (InvalidToken se nenhuma chave do anel servir)"""
+    return _decrypt(_ring(keys), token)
+
+
+def encrypt_many(values: Iterable, keys=None) -> List[str]:
+    """Cifra um lote reutilizando o mesmo anel (exportações)"""
+    ring = _ring(keys)
+    return [ring.encrypt(str(value).encode()).decode() for value in values]
+
+
+def decrypt_many(tokens: Iterable, keys=None) -> List[str]:
+    ring = _ring(keys)
+    return [_decrypt(ring, token) for token in tokens]
+
+
+def rotate_many(tokens: Iterable, keys=None) -> List[str]:
+    """Recifra tokens com a chave principal do anel"""
+    ring = _ring(keys)
+    return [ring.rotate(_decode_token(token)).decode() for token in tokens]
+
+
+# ----------------------------------------------------------------------
+# KDF
+# ----------------------------------------------------------------------
+
+def _pbkdf2(value, salt: str) -> str:
+    return hashlib.pbkdf2_hmac('sha256', str(value).encode(), salt.encode(), KDF_ITERATIONS).hex()
+
+
+class KDFPool:
+    """Pool de threads limitado para o PBKDF2"""
+
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='kdf')
+
+    def hash(self, value, salt: Optional[str] = None) -> str:
+        salt = salt or secrets.token_hex(16)
+        return f"{salt}:{self._executor.submit(_pbkdf2, value, salt).result()}"
+
+    def hash_many(self, values: Iterable, salts: Optional[Iterable[str]] = None) -> List[str]:
+        values = list(values)
+        salts = list(salts) if salts is not None else [secrets.token_hex(16) for _ in values]
+        digests = self._executor.map(_pbkdf2, values, salts)
+        return [f'{salt}:{digest}' for salt, digest in zip(salts, digests)]
+
+    def verify(self, value, hashed_value: str) -> bool:
+        try:
+            salt, hash_hex = hashed_value.split(':')
+        except (AttributeError, ValueError):
+            return False
+        digest = self._executor.submit(_pbkdf2, value, salt).result()
+        return hmac.compare_digest(digest, hash_hex)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+_kdf_pool = None
+_kdf_pool_lock = threading.Lock()
+
+
+def get_kdf_pool() -> KDFPool:
+    global _kdf_pool
+    if _kdf_pool is not None:
+        return _kdf_pool
+
+    with _kdf_pool_lock:
+        if _kdf_pool is None:
+            _kdf_pool = KDFPool(getattr(settings, 'CRYPTO_KDF_WORKERS', 2))
+    return _kdf_pool
@@ -0,0 +1,478 @@
+"""
+Perfis de velocidade e comportamento para detecção de fraude
+
+Cada perfil tem tamanho fixo, e cada transação faz uma única operação
+atômica de custo constante:
+- velocidade: contadores (quantidade e soma) em VELOCITY_BUCKETS fatias da
+  janela, num anel; a soma da janela percorre só as fatias
+- comportamento: média e variância exponencialmente ponderadas (EWMA) dos
+  valores, histograma de 24 horas (reduzido à metade ao atingir
+  HISTOGRAM_CAP) e contadores de categoria em CATEGORY_SLOTS posições
+  (hash do nome)
+- dispositivos e localizações: hash fingerprint/IP -> visto por último,
+  limitado a MAX_DEVICES / MAX_LOCATIONS (remove o mais antigo)
+
+Como em utils.rate_limit, no Redis cada operação é um script Lua; sem Redis
+configurado é usado um backend em memória com lock (testes/dev). Um erro do
+Redis depois da inicialização não derruba a transação: a fachada registra o
+erro e pula aquela verificação (resultado neutro).
+"""
+import math
+import threading
+import time
+import logging
+import zlib
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+
+try:
+    import redis
+except ImportError:  # opcional: só necessário com FRAUD_PROFILE_REDIS_URL
+    redis = None
+
+REDIS_ERRORS = (redis.RedisError,) if redis is not None else ()
+
+logger = logging.getLogger('nossa_grana')
+
+VELOCITY_BUCKETS = 12
+EWMA_ALPHA = 0.1
+HOURS = 24
+HISTOGRAM_CAP = 1000
+CATEGORY_SLOTS = 32
+MAX_DEVICES = 5
+MAX_LOCATIONS = 10
+
+BEHAVIOR_TTL = 86400 * 7
+DEVICE_TTL = 86400 * 30
+LOCATION_TTL = 86400 * 30
+
+LOCATION_KNOWN = 'known'
+LOCATION_ADDED = 'added'
+LOCATION_SUSPICIOUS = 'suspicious'
+
+
+@dataclass
+class VelocityResult:
+    """Janela de velocidade incluindo a transação avaliada"""
+    allowed: bool
+    count: int
+    total: float
+    reason: str = ''  # 'amount' ou 'count' quando recusada
+
+
+@dataclass
+class BehaviorSnapshot:
+    """Perfil comportamental *antes* da transação observada"""
+    count: int = 0
+    mean: float = 0.0
+    variance: float = 0.0
+    hour_count: int = 0
+    distinct_hours: int = 0
+    category_count: int = 0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(max(self.variance, 0.0))
+
+    def zscore(self, amount: float) -> float:
+        std = self.std
+        return (amount - self.mean) / std if std else 0.0
+
+
+@dataclass
+class LocationResult:
+    status: str
+    last_country: Optional[str] = None
+
+
+def category_slot(category) -> int:
+    return zlib.crc32(str(category).encode('utf-8')) % CATEGORY_SLOTS
+
+
+def _ewma(count, mean, variance, amount, alpha):
+    if count == 0:
+        return amount, 0.0
+    diff = amount - mean
+    return mean + alpha * diff, (1 - alpha) * (variance + alpha * diff * diff)
+
+
+def _velocity_decision(count, total, amount, max_count, max_amount):
+    count, total = count + 1, total + amount
+    if total > max_amount:
+        return VelocityResult(False, count, total, 'amount')
+    if count > max_count:
+        return VelocityResult(False, count, total, 'count')
+    return VelocityResult(True, count, total)
+
+
+class MemoryFraudProfileBackend:
+    """Backend em memória do processo (testes e desenvolvimento)"""
+
+    MAX_ENTRIES = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def _prune(self, now):
+        """Remove perfis expirados quando o dicionário cresce demais"""
+        if len(self._data) < self.MAX_ENTRIES:
+            return
+        expired = [key for key, (expires, _) in self._data.items() if expires < now]
+        for key in expired:
+            del self._data[key]
+
+    def _get(self, key, now, factory):
+        expires, value = self._data.get(key, (0, None))
+        return value if value is not None and expires >= now else factory()
+
+    def velocity(self, key, amount, window, max_count, max_amount, now):
+        index = int(now // (window / VELOCITY_BUCKETS))
+
+        with self._lock:
+            self._prune(now)
+            slots = self._get(key, now, lambda: [[-1, 0, 0.0] for _ in range(VELOCITY_BUCKETS)])
+            count = total = 0
+            for slot_index, slot_count, slot_total in slots:
+                if slot_index > index - VELOCITY_BUCKETS:
+                    count += slot_count
+                    total += slot_total
+
+            result = _velocity_decision(count, total, amount, max_count, max_amount)
+            if result.allowed:
+                slot = slots[index % VELOCITY_BUCKETS]
+                if slot[0] != index:
+                    slot[:] = [index, 0, 0.0]
+                slot[1] += 1
+                slot[2] += amount
+            self._data[key] = (now + window, slots)
+        return result
+
+    def observe(self, key, amount, hour, slot, now):
+        with self._lock:
+            self._prune(now)
+            profile = self._get(key, now, lambda: {
+                'n': 0, 'mean': 0.0, 'var': 0.0, 'hours': [0] * HOURS, 'cats': [0] * CATEGORY_SLOTS,
+            })
+            hours = profile['hours']
+            snapshot = BehaviorSnapshot(
+                profile['n'], profile['mean'], profile['var'],
+                hours[hour], sum(1 for h in hours if h), profile['cats'][slot],
+            )
+
+            profile['mean'], profile['var'] = _ewma(profile['n'], profile['mean'], profile['var'], amount, EWMA_ALPHA)
+            profile['n'] += 1
+            if sum(hours) + 1 > HISTOGRAM_CAP:
+                profile['hours'] = hours = [h // 2 for h in hours]
+            hours[hour] += 1
+            profile['cats'][slot] += 1
+            self._data[key] = (now + BEHAVIOR_TTL, profile)
+        return snapshot
+
+    def profile(self, key, now):
+        with self._lock:
+            expires, profile = self._data.get(key, (0, None))
+        if profile is None or expires < now:
+            return BehaviorSnapshot()
+        return BehaviorSnapshot(profile['n'], profile['mean'], profile['var'])
+
+    def _touch(self, key, member, now, limit, ttl):
+        """Marca `member` como visto; devolve se já era conhecido"""
+        members = self._get(key, now, dict)
+        known = member in members
+        members[member] = now
+        if len(members) > limit:
+            del members[min(members, key=members.get)]
+        self._data[key] = (now + ttl, members)
+        return known
+
+    def touch_device(self, key, fingerprint, now):
+        with self._lock:
+            self._prune(now)
+            return not self._touch(key, fingerprint, now, MAX_DEVICES, DEVICE_TTL)
+
+    def add_location(self, key, ip, country, suspicious_within, now):
+        with self._lock:
+            self._prune(now)
+            locations = self._get(key, now, lambda: {'ips': {}, 'last': None})
+            if ip in locations['ips']:
+                return LocationResult(LOCATION_KNOWN)
+
+            last = locations['last']
+            if last and now - last[1] < suspicious_within and last[0] != country:
+                return LocationResult(LOCATION_SUSPICIOUS, last[0])
+
+            ips = locations['ips']
+            ips[ip] = now
+            if len(ips) > MAX_LOCATIONS:
+                del ips[min(ips, key=ips.get)]
+            locations['last'] = (country, now)
+            self._data[key] = (now + LOCATION_TTL, locations)
+            return LocationResult(LOCATION_ADDED, last[0] if last else None)
+
+
+class RedisFraudProfileBackend:
+    """Backend Redis: cada operação é um único EVALSHA atômico"""
+
+    VELOCITY_SCRIPT = """
+    local buckets = tonumber(ARGV[1])
+    local index = tonumber(ARGV[2])
+    local amount = tonumber(ARGV[3])
+    local max_count = tonumber(ARGV[4])
+    local max_amount = tonumber(ARGV[5])
+    local ttl = tonumber(ARGV[6])
+    local fields = {}
+    for i = 0, buckets - 1 do
+        fields[#fields + 1] = 'i' .. i
+        fields[#fields + 1] = 'c' .. i
+        fields[#fields + 1] = 's' .. i
+    end
+    local values = redis.call('HMGET', KEYS[1], unpack(fields))
+    local count, total = 1, amount
+    for i = 0, buckets - 1 do
+        local slot_index = tonumber(values[i * 3 + 1] or '-1')
+        if slot_index > index - buckets then
+            count = count + tonumber(values[i * 3 + 2] or '0')
+            total = total + tonumber(values[i * 3 + 3] or '0')
+        end
+    end
+    local reason = ''
+    if total > max_amount then
+        reason = 'amount'
+    elseif count > max_count then
+        reason = 'count'
+    else
+        local slot = index % buckets
+        local slot_count, slot_total = 0, 0
+        if tonumber(values[slot * 3 + 1] or '-1') == index then
+            slot_count = tonumber(values[slot * 3 + 2] or '0')
+            slot_total = tonumber(values[slot * 3 + 3] or '0')
+        end
+        redis.call('HSET', KEYS[1], 'i' .. slot, index, 'c' .. slot, slot_count + 1,
+                   's' .. slot, tostring(slot_total + amount))
+        redis.call('EXPIRE', KEYS[1], ttl)
+    end
+    return {count, tostring(total), reason}
+    """
+
+    OBSERVE_SCRIPT = """
+    local alpha = tonumber(ARGV[1])
+    local amount = tonumber(ARGV[2])
+    local hour = tonumber(ARGV[3])
+    local slot = tonumber(ARGV[4])
+    local cap = tonumber(ARGV[5])
+    local ttl = tonumber(ARGV[6])
+    local state = redis.call('HMGET', KEYS[1], 'n', 'mean', 'var', 'c' .. slot)
+    local n = tonumber(state[1] or '0')
+    local mean = tonumber(state[2] or '0')
+    local var = tonumber(state[3] or '0')
+    local category_count = tonumber(state[4] or '0')
+    local fields = {}
+    for h = 0, 23 do fields[#fields + 1] = 'h' .. h end
+    local hours = redis.call('HMGET', KEYS[1], unpack(fields))
+    local hour_total, distinct = 0, 0
+    for h = 1, 24 do
+        hours[h] = tonumber(hours[h] or '0')
+        hour_total = hour_total + hours[h]
+        if hours[h] > 0 then distinct = distinct + 1 end
+    end
+    local hour_count = hours[hour + 1]
+
+    local new_mean, new_var = amount, 0
+    if n > 0 then
+        local diff = amount - mean
+        new_mean = mean + alpha * diff
+        new_var = (1 - alpha) * (var + alpha * diff * diff)
+    end
+    if hour_total + 1 > cap then
+        local halved = {}
+        for h = 1, 24 do
+            halved[#halved + 1] = 'h' .. (h - 1)
+            halved[#halved + 1] = math.floor(hours[h] / 2)
+        end
+        redis.call('HSET', KEYS[1], unpack(halved))
+    end
+    redis.call('HSET', KEYS[1], 'n', n + 1, 'mean', tostring(new_mean), 'var', tostring(new_var))
+    redis.call('HINCRBY', KEYS[1], 'h' .. hour, 1)
+    redis.call('HINCRBY', KEYS[1], 'c' .. slot, 1)
+    redis.call('EXPIRE', KEYS[1], ttl)
+    return {n, tostring(mean), tostring(var), hour_count, distinct, category_count}
+    """
+
+    TOUCH_SCRIPT = """
+    local limit = tonumber(ARGV[2])
+    local known = redis.call('HEXISTS', KEYS[1], ARGV[1])
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[3])
+    if redis.call('HLEN', KEYS[1]) > limit then
+        local entries = redis.call('HGETALL', KEYS[1])
+        local oldest, oldest_ts = nil, nil
+        for i = 1, #entries, 2 do
+            local ts = tonumber(entries[i + 1])
+            if oldest_ts == nil or ts < oldest_ts then
+                oldest, oldest_ts = entries[i], ts
+            end
+        end
+        redis.call('HDEL', KEYS[1], oldest)
+    end
+    redis.call('EXPIRE', KEYS[1], tonumber(ARGV[4]))
+    return known
+    """
+
+    LOCATION_SCRIPT = """
+    local ip, country = ARGV[1], ARGV[2]
+    local now = tonumber(ARGV[3])
+    local within = tonumber(ARGV[4])
+    local limit = tonumber(ARGV[5])
+    if redis.call('HEXISTS', KEYS[1], ip) == 1 then
+        return {'known', false}
+    end
+    local last = redis.call('HMGET', KEYS[2], 'country', 'ts')
+    if last[2] and now - tonumber(last[2]) < within and last[1] ~= country then
+        return {'suspicious', last[1]}
+    end
+    redis.call('HSET', KEYS[1], ip, ARGV[3])
+    if redis.call('HLEN', KEYS[1]) > limit then
+        local entries = redis.call('HGETALL', KEYS[1])
+        local oldest, oldest_ts = nil, nil
+        for i = 1, #entries, 2 do
+            local ts = tonumber(entries[i + 1])
+            if oldest_ts == nil or ts < oldest_ts then
+                oldest, oldest_ts = entries[i], ts
+            end
+        end
+        redis.call('HDEL', KEYS[1], oldest)
+    end
+    redis.call('HSET', KEYS[2], 'country', country, 'ts', ARGV[3])
+    redis.call('EXPIRE', KEYS[1], tonumber(ARGV[6]))
+    redis.call('EXPIRE', KEYS[2], tonumber(ARGV[6]))
+    return {'added', last[1]}
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._velocity = client.register_script(self.VELOCITY_SCRIPT)
+        self._observe = client.register_script(self.OBSERVE_SCRIPT)
+        self._touch = client.register_script(self.TOUCH_SCRIPT)
+        self._location = client.register_script(self.LOCATION_SCRIPT)
+
+    def velocity(self, key, amount, window, max_count, max_amount, now):
+        index = int(now // (window / VELOCITY_BUCKETS))
+        count, total, reason = self._velocity(
+            keys=[key],
+            args=[VELOCITY_BUCKETS, index, amount, max_count, max_amount, math.ceil(window)],
+        )
+        reason = reason.decode() if isinstance(reason, bytes) else reason
+        return VelocityResult(not reason, int(count), float(total), reason)
+
+    def observe(self, key, amount, hour, slot, now):
+        n, mean, variance, hour_count, distinct, category_count = self._observe(
+            keys=[key], args=[EWMA_ALPHA, amount, hour, slot, HISTOGRAM_CAP, BEHAVIOR_TTL],
+        )
+        return BehaviorSnapshot(
+            int(n), float(mean), float(variance), int(hour_count), int(distinct), int(category_count)
+        )
+
+    def profile(self, key, now):
+        n, mean, variance = self.client.hmget(key, 'n', 'mean', 'var')
+        return BehaviorSnapshot(int(n or 0), float(mean or 0), float(variance or 0))
+
+    def touch_device(self, key, fingerprint, now):
+        return not self._touch(keys=[key], args=[fingerprint, MAX_DEVICES, now, DEVICE_TTL])
+
+    def add_location(self, key, ip, country, suspicious_within, now):
+        status, last_country = self._location(
+            keys=[f'{key}:ips', f'{key}:last'],
+            args=[ip, country, now, suspicious_within, MAX_LOCATIONS, LOCATION_TTL],
+        )
+        decode = lambda value: value.decode() if isinstance(value, bytes) else value
+        return LocationResult(decode(status), decode(last_country) or None)
+
+
+class FraudProfileStore:
+    """Fachada dos perfis de fraude usada por FraudValidators"""
+
+    def __init__(self, backend=None, prefix='fraud'):
+        self.backend = backend or MemoryFraudProfileBackend()
+        self.prefix = prefix
+
+    def _call(self, check, skipped, method, *args):
+        """Executa no backend; com o Redis fora do ar, pula a verificação"""
+        try:
+            return method(*args)
+        except REDIS_ERRORS as e:
+            logger.warning(f"Perfis de fraude: erro no Redis em {check} ({e}), verificação ignorada")
+            return skipped
+
+    def velocity(self, user_id, amount: float, window: int, max_count: int, max_amount: float,
+                 now: Optional[float] = None) -> VelocityResult:
+        """Conta a transação na janela se ela couber nos limites"""
+        now = time.time() if now is None else now
+        return self._call(
+            'velocity', VelocityResult(True, 0, 0.0), self.backend.velocity,
+            f'{self.prefix}:velocity:{window}:{user_id}', float(amount), window, max_count, max_amount, now
+        )
+
+    def observe(self, user_id, amount: float, hour: int, category,
+                now: Optional[float] = None) -> BehaviorSnapshot:
+        """Atualiza o perfil comportamental e devolve o estado anterior"""
+        now = time.time() if now is None else now
+        return self._call(
+            'observe', BehaviorSnapshot(), self.backend.observe,
+            f'{self.prefix}:behavior:{user_id}', float(amount), hour, category_slot(category), now
+        )
+
+    def profile(self, user_id, now: Optional[float] = None) -> BehaviorSnapshot:
+        """Média/variância atuais dos valores, sem atualizar o perfil"""
+        now = time.time() if now is None else now
+        return self._call('profile', BehaviorSnapshot(), self.backend.profile, f'{self.prefix}:behavior:{user_id}', now)
+
+    def touch_device(self, user_id, fingerprint: str, now: Optional[float] = None) -> bool:
+        """Registra o dispositivo; True se ele é novo"""
+        now = time.time() if now is None else now
+        return self._call(
+            'touch_device', False, self.backend.touch_device, f'{self.prefix}:devices:{user_id}', fingerprint, now
+        )
+
+    def add_location(self, user_id, ip: str, country: str, suspicious_within: int = 3600,
+                     now: Optional[float] = None) -> LocationResult:
+        """
+        Registra um IP novo; se o último IP novo for de outro país e mais
+        recente que `suspicious_within`, devolve 'suspicious' sem registrar
+        """
+        now = time.time() if now is None else now
+        return self._call(
+            'add_location', LocationResult(LOCATION_KNOWN), self.backend.add_location,
+            f'{self.prefix}:geo:{user_id}', ip, country, suspicious_within, now
+        )
+
+
+_profile_store = None
+_profile_store_lock = threading.Lock()
+
+
+def get_fraud_profile_store() -> FraudProfileStore:
+    """
+    Retorna o FraudProfileStore do processo
+
+    Usa Redis quando FRAUD_PROFILE_REDIS_URL está configurado e acessível;
+    caso contrário, o backend em memória.
+    """
+    global _profile_store
+    if _profile_store is not None:
+        return _profile_store
+
+    with _profile_store_lock:
+        if _profile_store is None:
+            backend = None
+            redis_url = getattr(settings, 'FRAUD_PROFILE_REDIS_URL', None)
+            if redis_url and redis is not None:
+                try:
+                    client = redis.Redis.from_url(redis_url, socket_timeout=0.5)
+                    client.ping()
+                    backend = RedisFraudProfileBackend(client)
+                except Exception as e:
+                    logger.warning(f"Perfis de fraude: Redis indisponível ({e}), usando memória")
+            _profile_store = FraudProfileStore(backend)
+    return _profile_store
@@ -1,6 +1,9 @@
-from django.db import connection
+from django.db import connection, connections
 from django.conf import settings
-from functools import wraps
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache, wraps
+import re
 import time
 import logging
 from typing import Dict, List, Any
@@ -12,6 +15,14 @@ logger = logging.getLogger('nossa_grana.performance')
 class DatabaseOptimizer:
     """Otimizações específicas do banco de dados"""
     
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': 10000,
+        'temp_store': 'MEMORY',
+        'mmap_size': 268435456,  # 256MB
+    }
+    
     @staticmethod
     def get_db_stats() -> Dict[str, Any]:
         """Estatísticas do banco de dados"""
@@ -23,55 +34,117 @@ class DatabaseOptimizer:
             }
     
     @staticmethod
-    def optimize_sqlite():
-        """Otimizações específicas para SQLite"""
-        with connection.cursor() as cursor:
-            # Configurações de performance para SQLite
-            cursor.execute("PRAGMA journal_mode=WAL")
-            cursor.execute("PRAGMA synchronous=NORMAL")
-            cursor.execute("PRAGMA cache_size=10000")
-            cursor.execute("PRAGMA temp_store=MEMORY")
-            cursor.execute("PRAGMA mmap_size=268435456")  # 256MB
+    def optimize_sqlite(db_connection=None):
+        """
+        Otimizações específicas para SQLite
+        
+        Recebe a conexão sqlite3 crua (usado pelo backend nossa_grana.sqlite_backend
+        a cada nova conexão); sem argumento usa a conexão padrão do Django.
+        PRAGMAs podem ser sobrescritos em settings.SQLITE_PRAGMAS.
+        """
+        pragmas = getattr(settings, 'SQLITE_PRAGMAS', DatabaseOptimizer.SQLITE_PRAGMAS)
+        
+        if db_connection is None:
+            connection.ensure_connection()
+            db_connection = connection.connection
+        
+        for name, value in pragmas.items():
+            db_connection.execute(f"PRAGMA {name}={value}")
+
+
+_SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SQL_IN_LISTS = re.compile(r"\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)", re.IGNORECASE)
+_SQL_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql: str) -> str:
+    """Normaliza SQL para agrupamento: literais viram ? e listas IN (...) colapsam"""
+    sql = _SQL_LITERALS.sub('?', sql)
+    sql = _SQL_IN_LISTS.sub('IN (...)', sql)
+    return _SQL_WHITESPACE.sub(' ', sql).strip()
 
 
 class QueryMonitor:
-    """Monitor de queries para identificar gargalos"""
+    """
+    Monitor de queries para identificar gargalos
+
+    Funciona como execute_wrapper do Django (connection.execute_wrapper), então
+    não depende de DEBUG=True/connection.queries. Com `detailed=False` apenas
+    conta queries e tempo total (custo mínimo); com `detailed=True` também
+    agrupa statements idênticos para detectar padrões N+1.
+    """
     
-    def __init__(self):
+    def __init__(self, slow_threshold: float = 0.5, detailed: bool = True):
+        self.slow_threshold = slow_threshold
+        self.detailed = detailed
         self.slow_queries = []
         self.query_count = 0
+        self.total_time = 0.0
+        self.statements = Counter()
+    
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.log_query(sql, time.perf_counter() - start)
     
     def log_query(self, query: str, duration: float):
         self.query_count += 1
-        if duration > 0.5:  # Queries > 500ms
+        self.total_time += duration
+        if self.detailed:
+            self.statements[query] += 1
+        if duration > self.slow_threshold:
+            normalized = normalize_sql(query)
             self.slow_queries.append({
-                'query': query[:200],
+                'query': normalized[:200],
                 'duration': duration,
                 'timestamp': time.time()
             })
-            logger.warning(f"Slow query: {duration:.3f}s - {query[:100]}")
+            logger.warning(f"Slow query: {duration:.3f}s - {normalized[:300]}")
+    
+    def repeated_statements(self, threshold: int = 5) -> List[Dict[str, Any]]:
+        """Statements (normalizados) executados `threshold` vezes ou mais"""
+        grouped = Counter()
+        for query, count in self.statements.items():
+            grouped[normalize_sql(query)] += count
+        return [
+            {'query': query, 'count': count}
+            for query, count in grouped.most_common()
+            if count >= threshold
+        ]
     
     def get_stats(self) -> Dict[str, Any]:
         return {
             'total_queries': self.query_count,
+            'total_time': self.total_time,
             'slow_queries': len(self.slow_queries),
             'recent_slow': self.slow_queries[-5:] if self.slow_queries else []
         }
 
 
+@contextmanager
+def instrument_queries(monitor: QueryMonitor):
+    """Instala o monitor em todas as conexões configuradas"""
+    with ExitStack() as stack:
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(monitor))
+        yield monitor
+
+
 def monitor_queries(func):
     """Decorator para monitorar queries de uma função"""
     @wraps(func)
     def wrapper(*args, **kwargs):
-        initial_queries = len(connection.queries)
         start_time = time.time()
         
-        result = func(*args, **kwargs)
+        with instrument_queries(QueryMonitor(detailed=False)) as monitor:
+            result = func(*args, **kwargs)
         
         end_time = time.time()
-        final_queries = len(connection.queries)
         
-        query_count = final_queries - initial_queries
+        query_count = monitor.query_count
         duration = end_time - start_time
         
         if query_count > 10 or duration > 1.0:
@@ -0,0 +1,266 @@
+"""
+Engine de rate limiting com custo constante por requisição
+
+Algoritmos:
+- token bucket: capacidade `limit`, reposição contínua de `limit / window`
+  tokens por segundo
+- sliding window counter: contador da janela atual + contador da janela
+  anterior ponderado pelo tempo restante
+
+No Redis cada verificação é um único script Lua (atômico entre workers);
+sem Redis configurado é usado um backend em memória com lock (testes/dev).
+Se o Redis cair depois da inicialização, as verificações passam para a
+memória do processo até ele voltar, em vez de derrubar as requisições.
+"""
+import math
+import threading
+import time
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+
+try:
+    import redis
+except ImportError:  # opcional: só necessário com RATE_LIMIT_REDIS_URL
+    redis = None
+
+logger = logging.getLogger('nossa_grana')
+
+TOKEN_BUCKET = 'token_bucket'
+SLIDING_WINDOW = 'sliding_window'
+
+
+@dataclass
+class RateLimitResult:
+    """Resultado de uma verificação de rate limit"""
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: int = 0  # segundos até a próxima requisição ser aceita
+
+    def headers(self):
+        """Headers HTTP padrão para a resposta"""
+        headers = {
+            'X-RateLimit-Limit': str(self.limit),
+            'X-RateLimit-Remaining': str(self.remaining),
+        }
+        if not self.allowed:
+            headers['Retry-After'] = str(self.retry_after)
+        return headers
+
+
+def _sliding_window_result(limit, window, elapsed, previous, current, allowed):
+    """Calcula remaining e retry_after a partir dos contadores da janela"""
+    weight = (window - elapsed) / window
+    estimated = previous * weight + current
+    remaining = max(0, int(limit - estimated))
+
+    if allowed:
+        return RateLimitResult(True, limit, remaining)
+
+    if current + 1 > limit:
+        # Só libera na próxima janela, quando o contador atual vira "anterior"
+        # e decai o suficiente: current * (1 - e / window) + 1 <= limit
+        decay = window * (1 - (limit - 1) / current) if current else 0
+        wait = (window - elapsed) + decay
+    else:
+        # Aguarda o peso da janela anterior cair: previous * w + current + 1 <= limit
+        wait = (window - elapsed) - window * (limit - 1 - current) / previous
+
+    return RateLimitResult(False, limit, remaining, max(1, math.ceil(wait)))
+
+
+def _token_bucket_result(limit, window, tokens, allowed, cost=1):
+    rate = limit / window
+    if allowed:
+        return RateLimitResult(True, limit, int(tokens))
+    return RateLimitResult(False, limit, int(tokens), max(1, math.ceil((cost - tokens) / rate)))
+
+
+class MemoryRateLimitBackend:
+    """Backend em memória do processo (testes e desenvolvimento)"""
+
+    MAX_ENTRIES = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def _prune(self, now):
+        """Remove entradas expiradas quando o dicionário cresce demais"""
+        if len(self._data) < self.MAX_ENTRIES:
+            return
+        expired = [key for key, value in self._data.items() if value[-1] < now]
+        for key in expired:
+            del self._data[key]
+
+    def sliding_window(self, key, limit, window, now):
+        index = int(now // window)
+        elapsed = now - index * window
+
+        with self._lock:
+            self._prune(now)
+            stored_index, previous, current, _ = self._data.get(key, (index, 0, 0, 0))
+            if stored_index != index:
+                previous = current if stored_index == index - 1 else 0
+                current = 0
+
+            allowed = previous * ((window - elapsed) / window) + current + 1 <= limit
+            if allowed:
+                current += 1
+            self._data[key] = (index, previous, current, now + 2 * window)
+
+        return allowed, previous, current, elapsed
+
+    def token_bucket(self, key, limit, window, now, cost=1):
+        rate = limit / window
+
+        with self._lock:
+            self._prune(now)
+            tokens, updated_at, _ = self._data.get(key, (limit, now, 0))
+            tokens = min(limit, tokens + max(0, now - updated_at) * rate)
+
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._data[key] = (tokens, now, now + window)
+
+        return allowed, tokens
+
+
+class RedisRateLimitBackend:
+    """Backend Redis: cada verificação é um único EVALSHA atômico"""
+
+    SLIDING_WINDOW_SCRIPT = """
+    local limit = tonumber(ARGV[1])
+    local window = tonumber(ARGV[2])
+    local elapsed = tonumber(ARGV[3])
+    local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+    local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+    local allowed = 0
+    if previous * ((window - elapsed) / window) + current + 1 <= limit then
+        current = redis.call('INCR', KEYS[1])
+        if current == 1 then
+            redis.call('EXPIRE', KEYS[1], math.ceil(window * 2))
+        end
+        allowed = 1
+    end
+    return {allowed, previous, current}
+    """
+
+    TOKEN_BUCKET_SCRIPT = """
+    local limit = tonumber(ARGV[1])
+    local window = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local cost = tonumber(ARGV[4])
+    local rate = limit / window
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or limit
+    local updated_at = tonumber(state[2]) or now
+    tokens = math.min(limit, tokens + math.max(0, now - updated_at) * rate)
+    local allowed = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(window))
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._sliding_window = client.register_script(self.SLIDING_WINDOW_SCRIPT)
+        self._token_bucket = client.register_script(self.TOKEN_BUCKET_SCRIPT)
+        self._fallback = MemoryRateLimitBackend()
+        self._failing = False
+
+    def _failed(self, error):
+        # Loga só a transição, não uma linha por requisição
+        if not self._failing:
+            logger.warning(f"Rate limit: erro no Redis ({error}), usando memória do processo")
+        self._failing = True
+
+    def _recovered(self):
+        if self._failing:
+            logger.info("Rate limit: Redis de volta")
+        self._failing = False
+
+    def sliding_window(self, key, limit, window, now):
+        index = int(now // window)
+        elapsed = now - index * window
+        try:
+            allowed, previous, current = self._sliding_window(
+                keys=[f'{key}:{index}', f'{key}:{index - 1}'],
+                args=[limit, window, elapsed],
+            )
+        except redis.RedisError as e:
+            self._failed(e)
+            return self._fallback.sliding_window(key, limit, window, now)
+        self._recovered()
+        return bool(allowed), int(previous), int(current), elapsed
+
+    def token_bucket(self, key, limit, window, now, cost=1):
+        try:
+            allowed, tokens = self._token_bucket(keys=[key], args=[limit, window, now, cost])
+        except redis.RedisError as e:
+            self._failed(e)
+            return self._fallback.token_bucket(key, limit, window, now, cost)
+        self._recovered()
+        return bool(allowed), float(tokens)
+
+
+class RateLimiter:
+    """Fachada única de rate limiting usada pelos middlewares"""
+
+    def __init__(self, backend=None, prefix='rl'):
+        self.backend = backend or MemoryRateLimitBackend()
+        self.prefix = prefix
+
+    def hit(self, key: str, limit: int, window: int, algorithm: str = SLIDING_WINDOW,
+            now: Optional[float] = None) -> RateLimitResult:
+        """Registra uma requisição para `key` e informa se ela é permitida"""
+        now = time.time() if now is None else now
+        key = f'{self.prefix}:{algorithm}:{key}'
+
+        if limit <= 0:
+            return RateLimitResult(False, limit, 0, int(window))
+
+        if algorithm == TOKEN_BUCKET:
+            allowed, tokens = self.backend.token_bucket(key, limit, window, now)
+            return _token_bucket_result(limit, window, tokens, allowed)
+
+        allowed, previous, current, elapsed = self.backend.sliding_window(key, limit, window, now)
+        return _sliding_window_result(limit, window, elapsed, previous, current, allowed)
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Retorna o RateLimiter do processo
+
+    Usa Redis quando RATE_LIMIT_REDIS_URL está configurado e acessível;
+    caso contrário, o backend em memória.
+    """
+    global _rate_limiter
+    if _rate_limiter is not None:
+        return _rate_limiter
+
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            backend = None
+            redis_url = getattr(settings, 'RATE_LIMIT_REDIS_URL', None)
+            if redis_url and redis is not None:
+                try:
+                    client = redis.Redis.from_url(redis_url, socket_timeout=0.5)
+                    client.ping()
+                    backend = RedisRateLimitBackend(client)
+                except Exception as e:
+                    logger.warning(f"Rate limit: Redis indisponível ({e}), usando memória")
+            _rate_limiter = RateLimiter(backend)
+    return _rate_limiter
@@ -0,0 +1,100 @@
+"""
+Renderer JSON rápido para a API
+
+Serializa uma única vez, direto para bytes UTF-8 (sem escapar unicode),
+usando orjson quando disponível e o encoder do DRF como fallback.
+"""
+import datetime
+import json
+from decimal import Decimal
+
+from django.db.models.query import QuerySet
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson é opcional
+    orjson = None
+
+
+PRETTY_PARAMS = ('1', 'true', 'yes')
+
+# Separadores de linha que quebram JavaScript embutido (mesmo tratamento do DRF)
+_LINE_SEPARATORS = (
+    (b'\xe2\x80\xa8', b'\\u2028'),
+    (b'\xe2\x80\xa9', b'\\u2029'),
+)
+
+
+def _default(obj):
+    """Converte tipos que o orjson não serializa nativamente"""
+    if isinstance(obj, Decimal):
+        # Mesmo comportamento do encoder do DRF
+        return float(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, QuerySet):
+        return tuple(obj)
+    if hasattr(obj, 'tolist'):
+        # Tipos numpy
+        return obj.tolist()
+    if hasattr(obj, '__iter__'):
+        return tuple(obj)
+    raise TypeError(f'Type {type(obj).__name__} is not JSON serializable')
+
+
+def dumps(data, pretty=False) -> bytes:
+    """
+    Serializa `data` para JSON em bytes UTF-8 (equivalente a ensure_ascii=False)
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        content = orjson.dumps(data, default=_default, option=option)
+    else:
+        content = json.dumps(
+            data,
+            cls=JSONEncoder,
+            ensure_ascii=False,
+            allow_nan=False,
+            indent=2 if pretty else None,
+            separators=(',', ': ') if pretty else (',', ':'),
+        ).encode('utf-8')
+
+    for separator, escaped in _LINE_SEPARATORS:
+        content = content.replace(separator, escaped)
+    return content
+
+
+def wants_pretty(request) -> bool:
+    """Indica se o cliente pediu JSON formatado com ?pretty=1"""
+    if request is None:
+        return False
+    params = getattr(request, 'query_params', None) or getattr(request, 'GET', {})
+    return str(params.get('pretty', '')).lower() in PRETTY_PARAMS
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Renderer padrão da API: uma única serialização, compacta por padrão
+    e formatada apenas quando solicitado via ?pretty=1
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        pretty = (
+            wants_pretty(renderer_context.get('request'))
+            or bool(self.get_indent(accepted_media_type, renderer_context))
+        )
+        return dumps(data, pretty=pretty)
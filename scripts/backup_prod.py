@@ -1,24 +1,134 @@
 #!/usr/bin/env python3
 """
 Script de backup automatizado para produção
+
+Banco de dados:
+- padrão: pg_dump em formato diretório com N workers (-j), cada tabela
+  comprimida pelo próprio pg_dump; nada passa por arquivo temporário;
+- --single-file: um arquivo só (formato custom) comprimido em streaming
+  (zstd se o pacote zstandard existir, senão gzip), para cópia offsite;
+- --base-backup: pg_basebackup para recuperação point-in-time junto com o
+  arquivamento de WAL (PG_ARCHIVE_MODE=on no docker-compose.prod.yml);
+- --restore: pg_restore paralelo, com tempo de cada etapa.
+
+Os binários do Postgres rodam dentro do container `db` (que monta
+./backups em /backups). Com BACKUP_PG_HOST (ou --local) usa os binários
+locais conectando em BACKUP_PG_HOST:BACKUP_PG_PORT.
 """
 
-import os
-import sys
-import subprocess
+import argparse
 import gzip
+import json
+import os
 import shutil
-from datetime import datetime, timedelta
+import subprocess
+import sys
+import tarfile
+import threading
+import time
+from datetime import datetime
 from pathlib import Path
 
+try:
+    import zstandard
+except ImportError:  # zstandard é opcional
+    zstandard = None
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def path_size(path):
+    """Tamanho de um arquivo ou da soma dos arquivos de um diretório"""
+    path = Path(path)
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+    return path.stat().st_size
+
+
+def open_compressed(path, mode, level=6):
+    """Abre um .zst ou .gz para leitura/escrita em streaming"""
+    path = str(path)
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError('Arquivos .zst exigem o pacote zstandard')
+        raw = open(path, mode + 'b')
+        if mode == 'w':
+            return zstandard.ZstdCompressor(level=level, threads=-1).stream_writer(raw)
+        return zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    return gzip.open(path, mode + 'b', compresslevel=level) if mode == 'w' else gzip.open(path, 'rb')
+
+
+def _drain(stream, chunks):
+    for line in iter(stream.readline, b''):
+        chunks.append(line)
+    stream.close()
+
+
+def stream_command_to_file(command, path, level=6):
+    """
+    Roda `command` e comprime o stdout direto em `path` (sem arquivo
+    intermediário). Retorna (sucesso, stderr); em falha remove o parcial.
+    """
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    errors = []
+    drainer = threading.Thread(target=_drain, args=(process.stderr, errors), daemon=True)
+    drainer.start()
+    try:
+        with open_compressed(path, 'w', level) as out:
+            for chunk in iter(lambda: process.stdout.read(CHUNK_SIZE), b''):
+                out.write(chunk)
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+        drainer.join()
+
+    stderr = b''.join(errors).decode(errors='replace')
+    if returncode != 0:
+        Path(path).unlink(missing_ok=True)
+        return False, stderr
+    return True, stderr
+
+
+def stream_file_to_command(path, command):
+    """Descomprime `path` em streaming para o stdin de `command`"""
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    errors = []
+    drainer = threading.Thread(target=_drain, args=(process.stderr, errors), daemon=True)
+    drainer.start()
+    try:
+        with open_compressed(path, 'r') as source:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                process.stdin.write(chunk)
+    except BrokenPipeError:
+        pass
+    finally:
+        process.stdin.close()
+        returncode = process.wait()
+        drainer.join()
+    return returncode == 0, b''.join(errors).decode(errors='replace')
+
+
 class ProductionBackup:
-    def __init__(self):
-        self.backup_dir = Path("backups")
+    def __init__(self, local=None, jobs=None):
+        self.backup_dir = Path(os.environ.get('BACKUP_DIR', 'backups'))
         self.backup_dir.mkdir(exist_ok=True)
+        self.compose_file = 'docker-compose.prod.yml'
         
         # Configurações
         self.max_backups = 7  # Manter 7 backups
         self.compress = True
+        self.compress_level = int(os.environ.get('BACKUP_COMPRESS_LEVEL', 6))
+        self.jobs = jobs or int(os.environ.get('BACKUP_JOBS', min(4, os.cpu_count() or 1)))
+        self.timings = {}
+
+        # Conexão com o Postgres
+        self.db_user = os.environ.get('POSTGRES_USER', 'nossa_grana_user')
+        self.db_name = os.environ.get('POSTGRES_DB', 'nossa_grana_prod')
+        self.pg_host = os.environ.get('BACKUP_PG_HOST', 'localhost')
+        self.pg_port = os.environ.get('BACKUP_PG_PORT', '5432')
+        self.local = bool(os.environ.get('BACKUP_PG_HOST')) if local is None else local
+        # Diretório de backups como o Postgres o enxerga
+        self.pg_backup_dir = str(self.backup_dir.absolute()) if self.local else '/backups'
         
     def log(self, message):
         """Log com timestamp"""
@@ -29,7 +139,7 @@ class ProductionBackup:
         """Executa comando e retorna resultado"""
         self.log(f"Executando: {description}")
         
-        result = subprocess.run(command, shell=True, capture_output=True, text=True)
+        result = subprocess.run(command, shell=isinstance(command, str), capture_output=True, text=True)
         
         if result.returncode == 0:
             self.log(f"✅ {description} - Sucesso")
@@ -38,46 +148,167 @@ class ProductionBackup:
             self.log(f"❌ {description} - Erro: {result.stderr}")
             return False, result.stderr
     
-    def backup_database(self):
-        """Backup do PostgreSQL"""
-        self.log("Iniciando backup do banco de dados...")
+    def pg_command(self, args):
+        """Linha de comando de um binário do Postgres (container db ou local)"""
+        program, *rest = args
+        if self.local:
+            return [program, '-h', self.pg_host, '-p', self.pg_port, '-U', self.db_user, '--no-password', *rest]
+        return [
+            'docker-compose', '-f', self.compose_file, 'exec', '-T', 'db',
+            program, '-U', self.db_user, '--no-password', *rest,
+        ]
+
+    def timed(self, key, description, func, *args):
+        """Executa `func` registrando a duração em self.timings"""
+        started = time.monotonic()
+        result = func(*args)
+        elapsed = time.monotonic() - started
+        self.timings[key] = round(elapsed, 2)
+        self.log(f"⏱️ {description}: {elapsed:.1f}s")
+        return result
+
+    def report_size(self, path, key):
+        size = path_size(path)
+        size_mb = size / (1024 * 1024)
+        elapsed = self.timings.get(key)
+        throughput = f" ({size_mb / elapsed:.1f} MB/s)" if elapsed else ""
+        self.log(f"Tamanho do backup: {size_mb:.2f} MB{throughput}")
+
+    def backup_database(self, single_file=False):
+        """Backup do PostgreSQL (formato diretório paralelo ou arquivo único)"""
+        if single_file:
+            return self.backup_database_stream()
+
+        self.log(f"Iniciando backup do banco de dados ({self.jobs} workers)...")
         
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_file = self.backup_dir / f"db_backup_{timestamp}.sql"
-        
-        # Comando de backup
-        cmd = f"""docker-compose -f docker-compose.prod.yml exec -T db pg_dump \
-            -U nossa_grana_user \
-            -h localhost \
-            -d nossa_grana_prod \
-            --no-password \
-            --verbose \
-            --clean \
-            --if-exists \
-            --create > {backup_file}"""
-        
-        success, output = self.run_command(cmd, "Backup PostgreSQL")
-        
-        if success and backup_file.exists():
-            # Comprimir backup
-            if self.compress:
-                compressed_file = f"{backup_file}.gz"
-                with open(backup_file, 'rb') as f_in:
-                    with gzip.open(compressed_file, 'wb') as f_out:
-                        shutil.copyfileobj(f_in, f_out)
-                
-                # Remove arquivo não comprimido
-                backup_file.unlink()
-                backup_file = Path(compressed_file)
-                self.log(f"Backup comprimido: {backup_file}")
-            
-            # Verifica tamanho do backup
-            size_mb = backup_file.stat().st_size / (1024 * 1024)
-            self.log(f"Tamanho do backup: {size_mb:.2f} MB")
-            
-            return backup_file
+        backup_path = self.backup_dir / f"db_backup_{timestamp}"
+        
+        # Formato diretório: um arquivo comprimido por tabela, dump paralelo
+        cmd = self.pg_command([
+            'pg_dump', '-d', self.db_name, '-Fd', '-j', str(self.jobs),
+            '-Z', str(self.compress_level if self.compress else 0),
+            '-f', f'{self.pg_backup_dir}/{backup_path.name}',
+        ])
+        
+        success, output = self.timed('pg_dump', 'pg_dump', self.run_command, cmd, "Backup PostgreSQL")
         
+        if success and backup_path.exists():
+            self.report_size(backup_path, 'pg_dump')
+            return backup_path
+        
+        return None
+
+    def backup_database_stream(self):
+        """Dump em arquivo único, comprimido em streaming (sem temporário)"""
+        self.log("Iniciando backup do banco de dados (arquivo único)...")
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        extension = '.zst' if zstandard is not None else '.gz'
+        backup_file = self.backup_dir / f"db_backup_{timestamp}.dump{extension}"
+
+        # -Z 0: a compressão é feita no pipeline
+        cmd = self.pg_command(['pg_dump', '-d', self.db_name, '-Fc', '-Z', '0'])
+        success, stderr = self.timed(
+            'pg_dump', 'pg_dump (stream)', stream_command_to_file, cmd, backup_file, self.compress_level
+        )
+
+        if not success:
+            self.log(f"❌ Backup PostgreSQL - Erro: {stderr}")
+            return None
+
+        self.log(f"✅ Backup PostgreSQL - Sucesso: {backup_file.name}")
+        self.report_size(backup_file, 'pg_dump')
+        return backup_file
+
+    def base_backup(self):
+        """
+        Base backup físico para PITR
+
+        Combinado com os WAL arquivados em backups/wal permite restaurar o
+        banco em qualquer instante depois do base backup (prepare_pitr).
+        """
+        self.log("Iniciando base backup (pg_basebackup)...")
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_path = self.backup_dir / f"base_backup_{timestamp}"
+        cmd = self.pg_command([
+            'pg_basebackup', '-D', f'{self.pg_backup_dir}/{backup_path.name}',
+            '-Ft', '-z', '-X', 'stream', '--checkpoint=fast', '-l', f'nossa_grana_{timestamp}',
+        ])
+
+        success, output = self.timed('pg_basebackup', 'pg_basebackup', self.run_command, cmd, "Base backup")
+
+        if success and backup_path.exists():
+            self.report_size(backup_path, 'pg_basebackup')
+            return backup_path
+
         return None
+
+    def prepare_pitr(self, base_backup, data_dir, target_time=None):
+        """
+        Monta um diretório de dados para recuperação point-in-time
+
+        Extrai o base backup em `data_dir` e configura restore_command
+        (WAL em backups/wal) e o alvo da recuperação. Iniciar o Postgres com
+        esse diretório aplica os WAL até `target_time` (ou até o fim) e
+        promove o servidor.
+        """
+        base_path = self.backup_dir / base_backup
+        data_dir = Path(data_dir)
+        if data_dir.exists() and any(data_dir.iterdir()):
+            raise RuntimeError(f"Diretório de dados não está vazio: {data_dir}")
+        data_dir.mkdir(parents=True, exist_ok=True)
+
+        def extract():
+            with tarfile.open(base_path / 'base.tar.gz') as tar:
+                tar.extractall(data_dir)
+            wal_tar = base_path / 'pg_wal.tar.gz'
+            if wal_tar.exists():
+                with tarfile.open(wal_tar) as tar:
+                    tar.extractall(data_dir / 'pg_wal')
+
+        self.timed('pitr_extract', 'Extração do base backup', extract)
+
+        recovery = [
+            "restore_command = 'gunzip -c /backups/wal/%f.gz > %p'",
+            "recovery_target_action = 'promote'",
+        ]
+        if target_time:
+            recovery.append(f"recovery_target_time = '{target_time}'")
+        with open(data_dir / 'postgresql.auto.conf', 'a') as f:
+            f.write('\n# Recuperação point-in-time (backup_prod.py)\n' + '\n'.join(recovery) + '\n')
+        (data_dir / 'recovery.signal').touch()
+
+        self.log(f"✅ Diretório de PITR pronto: {data_dir}")
+        return data_dir
+
+    def restore_database(self, backup_name, target_db=None, create=False):
+        """pg_restore paralelo de um backup em formato diretório (ou arquivo único)"""
+        backup_path = self.backup_dir / backup_name
+        if not backup_path.exists():
+            self.log(f"❌ Backup não encontrado: {backup_path}")
+            return False
+
+        target_db = target_db or self.db_name
+        if create:
+            success, output = self.run_command(self.pg_command(['createdb', target_db]), f"Criando banco {target_db}")
+            if not success:
+                return False
+
+        options = ['-d', target_db, '--clean', '--if-exists', '--no-owner']
+        if backup_path.is_dir():
+            self.log(f"Restaurando {backup_path.name} em {target_db} ({self.jobs} workers)...")
+            cmd = self.pg_command(['pg_restore', '-j', str(self.jobs), *options, f'{self.pg_backup_dir}/{backup_path.name}'])
+            success, output = self.timed('pg_restore', 'pg_restore', self.run_command, cmd, "Restore PostgreSQL")
+        else:
+            # Arquivo único chega pelo stdin: pg_restore não paraleliza sem seek
+            self.log(f"Restaurando {backup_path.name} em {target_db} (stream)...")
+            cmd = self.pg_command(['pg_restore', *options])
+            success, stderr = self.timed('pg_restore', 'pg_restore (stream)', stream_file_to_command, backup_path, cmd)
+            self.log(f"✅ Restore PostgreSQL - Sucesso" if success else f"❌ Restore PostgreSQL - Erro: {stderr}")
+
+        return success
     
     def backup_media_files(self):
         """Backup dos arquivos de mídia"""
@@ -138,7 +369,7 @@ class ProductionBackup:
         self.log("Limpando backups antigos...")
         
         # Lista todos os backups por tipo
-        backup_types = ['db_backup_', 'media_backup_', 'redis_backup_']
+        backup_types = ['db_backup_', 'base_backup_', 'media_backup_', 'redis_backup_']
         
         for backup_type in backup_types:
             backups = list(self.backup_dir.glob(f"{backup_type}*"))
@@ -148,17 +379,32 @@ class ProductionBackup:
             if len(backups) > self.max_backups:
                 for old_backup in backups[self.max_backups:]:
                     self.log(f"Removendo backup antigo: {old_backup.name}")
-                    old_backup.unlink()
+                    if old_backup.is_dir():
+                        shutil.rmtree(old_backup)
+                    else:
+                        old_backup.unlink()
+
+        # WAL anteriores ao base backup mais antigo não servem mais para PITR
+        base_backups = sorted(self.backup_dir.glob("base_backup_*"), key=lambda x: x.stat().st_mtime)
+        wal_dir = self.backup_dir / 'wal'
+        if base_backups and wal_dir.exists():
+            oldest = base_backups[0].stat().st_mtime
+            removed = 0
+            for segment in wal_dir.iterdir():
+                if segment.stat().st_mtime < oldest:
+                    segment.unlink()
+                    removed += 1
+            if removed:
+                self.log(f"Removidos {removed} segmentos de WAL antigos")
     
     def create_backup_manifest(self, backups):
         """Cria manifesto do backup"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         manifest_file = self.backup_dir / f"backup_manifest_{timestamp}.json"
         
-        import json
-        
         manifest = {
             "timestamp": datetime.now().isoformat(),
+            "timings_seconds": self.timings,
             "backups": []
         }
         
@@ -166,8 +412,9 @@ class ProductionBackup:
             if backup_file and backup_file.exists():
                 manifest["backups"].append({
                     "file": backup_file.name,
-                    "size_bytes": backup_file.stat().st_size,
+                    "size_bytes": path_size(backup_file),
                     "type": "database" if "db_backup" in backup_file.name else
+                           "base" if "base_backup" in backup_file.name else
                            "media" if "media_backup" in backup_file.name else "redis"
                 })
         
@@ -177,7 +424,7 @@ class ProductionBackup:
         self.log(f"Manifesto criado: {manifest_file.name}")
         return manifest_file
     
-    def run_full_backup(self):
+    def run_full_backup(self, single_file=False, base_backup=False):
         """Executa backup completo"""
         self.log("🔄 Iniciando backup completo de produção")
         self.log("=" * 50)
@@ -186,9 +433,15 @@ class ProductionBackup:
         
         try:
             # Backup do banco de dados
-            db_backup = self.backup_database()
+            db_backup = self.backup_database(single_file=single_file)
             if db_backup:
                 backups.append(db_backup)
+
+            # Base backup para PITR
+            if base_backup:
+                base = self.base_backup()
+                if base:
+                    backups.append(base)
             
             # Backup dos arquivos de mídia
             media_backup = self.backup_media_files()
@@ -214,8 +467,10 @@ class ProductionBackup:
                 self.log("✅ Backup concluído com sucesso!")
                 self.log(f"Arquivos criados: {len(backups)}")
                 
-                total_size = sum(b.stat().st_size for b in backups if b.exists())
+                total_size = sum(path_size(b) for b in backups if b.exists())
                 self.log(f"Tamanho total: {total_size / (1024*1024):.2f} MB")
+                for step, seconds in self.timings.items():
+                    self.log(f"  {step}: {seconds:.1f}s")
             else:
                 self.log("⚠️ Nenhum backup foi criado")
             
@@ -227,23 +482,44 @@ class ProductionBackup:
 
 def main():
     """Função principal"""
-    backup = ProductionBackup()
+    parser = argparse.ArgumentParser(description="Backup de produção do Nossa Grana")
+    parser.add_argument('--database-only', action='store_true', help="Apenas o dump do banco")
+    parser.add_argument('--media-only', action='store_true', help="Apenas os arquivos de mídia")
+    parser.add_argument('--redis-only', action='store_true', help="Apenas o Redis")
+    parser.add_argument('--cleanup', action='store_true', help="Apenas remove backups antigos")
+    parser.add_argument('--single-file', action='store_true', help="Dump em arquivo único comprimido em streaming")
+    parser.add_argument('--base-backup', action='store_true', help="Inclui pg_basebackup (PITR)")
+    parser.add_argument('--jobs', '-j', type=int, help="Workers do pg_dump/pg_restore")
+    parser.add_argument('--local', action='store_true', help="Usa binários locais do Postgres (BACKUP_PG_HOST)")
+    parser.add_argument('--restore', metavar='BACKUP', help="Restaura um backup de backups/ com pg_restore")
+    parser.add_argument('--target-db', help="Banco de destino do --restore")
+    parser.add_argument('--create-db', action='store_true', help="Cria o banco de destino antes do --restore")
+    parser.add_argument('--pitr', metavar='BASE_BACKUP', help="Prepara diretório de dados para PITR a partir do base backup")
+    parser.add_argument('--data-dir', help="Diretório de dados de destino do --pitr")
+    parser.add_argument('--target-time', help="Instante alvo do --pitr (ex.: '2024-05-01 12:00:00-03')")
+    args = parser.parse_args()
     
-    if len(sys.argv) > 1:
-        if sys.argv[1] == "--database-only":
-            backup.backup_database()
-        elif sys.argv[1] == "--media-only":
-            backup.backup_media_files()
-        elif sys.argv[1] == "--redis-only":
-            backup.backup_redis_data()
-        elif sys.argv[1] == "--cleanup":
-            backup.cleanup_old_backups()
-        else:
-            print("Uso: python backup_prod.py [--database-only|--media-only|--redis-only|--cleanup]")
+    backup = ProductionBackup(local=True if args.local else None, jobs=args.jobs)
+
+    if args.database_only:
+        success = backup.backup_database(single_file=args.single_file) is not None
+    elif args.media_only:
+        success = backup.backup_media_files() is not None
+    elif args.redis_only:
+        success = backup.backup_redis_data() is not None
+    elif args.cleanup:
+        backup.cleanup_old_backups()
+        success = True
+    elif args.restore:
+        success = backup.restore_database(args.restore, args.target_db, create=args.create_db)
+    elif args.pitr:
+        if not args.data_dir:
+            parser.error("--pitr exige --data-dir")
+        success = backup.prepare_pitr(args.pitr, args.data_dir, args.target_time) is not None
     else:
         # Backup completo
-        success = backup.run_full_backup()
-        sys.exit(0 if success else 1)
+        success = backup.run_full_backup(single_file=args.single_file, base_backup=args.base_backup)
+    sys.exit(0 if success else 1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()